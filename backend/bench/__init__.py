@@ -0,0 +1,9 @@
+"""
+基準測試與壓力測試
+
+每個模組量測 services/ 中的一項功能，以暫存目錄中的數據庫執行，不會動到 gym.db。
+在 backend/ 下執行：
+    python -m bench.<模組> [參數]
+
+建立暫存數據庫、啟動伺服器等共用的步驟見 bench/support.py。
+"""
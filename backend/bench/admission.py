@@ -0,0 +1,118 @@
+"""
+准入控制的負載測試（services/admission.py）
+
+以暫存數據庫（會員照片、交易記錄）在另一個程序啟動伺服器，dashboards 個看板不斷重新取得
+會員照片與交易記錄列表，同時每 0.1 秒一次入場打卡，比較停用與啟用准入控制的打卡延遲。
+
+    python -m bench.admission [看板數] [秒數]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+import database
+from bench.support import (
+    free_port,
+    insert_members,
+    insert_memberships,
+    member_phone,
+    percentile,
+    scratch_database,
+    start_server,
+)
+
+MEMBERS = 2000
+
+
+async def _dashboard(client: httpx.AsyncClient, number: int, stop: float, counts: dict) -> None:
+    """不斷重新取得會員照片與交易記錄列表的看板（各自一個 X-Client-Id，如同各自的工作階段）"""
+    headers = {"X-Client-Id": f"dashboard-{number}"}
+    while time.monotonic() < stop:
+        for path in ("/member_photo/", "/transaction_records/"):
+            response = await client.get(path, headers=headers)
+            counts[response.status_code] = counts.get(response.status_code, 0) + 1
+            if response.status_code == 429:
+                # 不理會 Retry-After 的看板，只稍微等待
+                await asyncio.sleep(0.1)
+
+
+async def _front_desk(client: httpx.AsyncClient, stop: float, latencies: list) -> None:
+    """每 0.1 秒一次入場打卡，記錄每次的延遲"""
+    member = MEMBERS - 1
+    while time.monotonic() < stop:
+        started = time.perf_counter()
+        await client.post("/checkinrecord/", json={"mContactNum": member_phone(member)})
+        latencies.append((time.perf_counter() - started) * 1000)
+        member -= 1
+        await asyncio.sleep(0.1)
+
+
+async def _run(base_url: str, dashboards: int, seconds: float) -> tuple[list[float], dict]:
+    latencies, counts = [], {}
+    stop = time.monotonic() + seconds
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        await asyncio.gather(
+            _front_desk(client, stop, latencies),
+            *(_dashboard(client, n, stop, counts) for n in range(dashboards)),
+        )
+    return latencies, counts
+
+
+def main(dashboards: int, seconds: float) -> None:
+    scratch_database()
+    insert_members(MEMBERS)
+    insert_memberships(MEMBERS)
+    conn = database.get_connection()
+    conn.executemany(
+        "INSERT INTO MemberPhoto (mPhotoName, mPhoto, mContactNum) VALUES (?, ?, ?)",
+        ((f"photo{i}.jpg", os.urandom(20_000), member_phone(i)) for i in range(200)),
+    )
+    conn.executemany(
+        """
+        INSERT INTO TransactionRecord
+            (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod)
+        VALUES (?, '2026-01-01 10:00:00', 'P001', 2, 500, 1.0, 1000, 'cash')
+        """,
+        ((member_phone(i % MEMBERS),) for i in range(20_000)),
+    )
+    conn.commit()
+    conn.close()
+
+    print(f"{dashboards} 個看板，{seconds:.0f} 秒，200 張會員照片、20,000 筆交易記錄")
+    for enabled in (False, True):
+        # 每次重新建立打卡記錄
+        conn = database.get_connection()
+        conn.execute("DELETE FROM CheckInRecord")
+        conn.commit()
+        conn.close()
+
+        port = free_port()
+        server = start_server(
+            port, lifespan=False, env={"GYM_RATE_LIMIT": "1" if enabled else "0"}
+        )
+        try:
+            latencies, counts = asyncio.run(
+                _run(f"http://127.0.0.1:{port}", dashboards, seconds)
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        latencies.sort()
+        print(f"准入控制{'啟用' if enabled else '停用'}")
+        print(
+            f"  入場打卡 {len(latencies)} 次  p50 {statistics.median(latencies):.1f} ms  "
+            f"p99 {percentile(latencies, 99):.1f} ms  最大 {latencies[-1]:.1f} ms"
+        )
+        print(f"  看板請求 {dict(sorted(counts.items()))}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 15,
+    )
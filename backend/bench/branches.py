@@ -0,0 +1,92 @@
+"""
+分店數據庫的隔離與平行查詢（services/branches.py）
+
+以暫存數據庫比較：
+1. 另一個分店執行長時間寫入交易（每次持有寫入鎖 50 ms，例如批次匯入）時，
+   本分店新增交易的延遲：兩個分店共用一個數據庫 vs. 各自的分店數據庫
+2. 跨分店營收查詢，依序查詢 vs. 平行查詢
+
+    python -m bench.branches [寫入數] [分店數]
+"""
+
+import os
+import statistics
+import sys
+import threading
+import time
+
+from bench.support import percentile, scratch_database
+from database import get_connection
+from services import branches
+
+TRANSACTION = {
+    "mContactNum": "0912345678",
+    "gsNo": "P001",
+    "count": 1,
+    "unitPrice": 500,
+    "discount": 1.0,
+    "paymentMethod": "cash",
+}
+
+
+def _bulk_writer(branchId: str, stop: threading.Event) -> None:
+    """持續執行每次持有寫入鎖 50 ms 的交易"""
+    while not stop.is_set():
+        with branches.branch_storage(branchId).transaction() as session:
+            session.execute("UPDATE TransactionRecord SET count = count WHERE tNo = 0")
+            time.sleep(0.05)
+        time.sleep(0.01)
+
+
+def main(writes: int, branch_count: int) -> None:
+    scratch_database(sample_data=True)
+    branchIds = [f"B{i:02d}" for i in range(branch_count)]
+    for branchId in branchIds:
+        branches.create_branch(branchId, f"分店{branchId}")
+
+    print(f"另一個分店持續執行 50 ms 的寫入交易時，新增 {writes} 筆交易的延遲")
+    for name, busy_branch in (("共用數據庫", branchIds[0]), ("各自的分店數據庫", branchIds[1])):
+        stop = threading.Event()
+        writer = threading.Thread(target=_bulk_writer, args=(busy_branch, stop))
+        writer.start()
+        repository = branches.branch_transactions(branchIds[0])
+        latencies, errors = [], 0
+        for _ in range(writes):
+            started = time.perf_counter()
+            errors += "error" in repository.create(TRANSACTION)
+            latencies.append((time.perf_counter() - started) * 1000)
+        stop.set()
+        writer.join()
+        latencies.sort()
+        print(
+            f"  {name:<10} p50 {statistics.median(latencies):7.2f} ms"
+            f"  p99 {percentile(latencies, 99):7.2f} ms  錯誤 {errors}"
+        )
+
+    # 每個分店先寫入一些交易，讓查詢有實際的資料量
+    for branchId in branchIds:
+        conn = get_connection(branches.branch_path(branchId))
+        conn.executemany(
+            """
+            INSERT INTO TransactionRecord (mContactNum, transDateTime, gsNo, count, unitPrice, totalAmount, paymentMethod)
+            VALUES ('0912345678', '2024-01-01 10:00:00', 'P001', 1, 500, 500, 'cash')
+            """,
+            [()] * 50000,
+        )
+        conn.commit()
+        conn.close()
+
+    print(f"跨分店營收（{branch_count} 個分店，各 5 萬筆交易），CPU 核心數 {os.cpu_count()}")
+    for name, workers in (("依序查詢", 1), ("平行查詢", min(branch_count, 8))):
+        branches.BRANCH_FANOUT_WORKERS = workers
+        started = time.perf_counter()
+        for _ in range(10):
+            branches.branch_revenue()
+        print(f"  {name:<10} {(time.perf_counter() - started) / 10 * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+    )
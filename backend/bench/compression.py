@@ -0,0 +1,76 @@
+"""
+回應壓縮的傳輸量與延遲（services/compression.py）
+
+以暫存數據庫建立 members 名會員（每人兩筆交易與一筆打卡），
+比較各列表 API 未壓縮、gzip、Brotli 與 304 的傳輸量與延遲。
+
+    python -m bench.compression [會員數]
+"""
+
+import logging
+import os
+import statistics
+import sys
+import time
+
+import database
+from bench.support import insert_members, member_phone, scratch_database
+from services.compression import COMPRESS_MIN_SIZE, brotli
+
+
+def main(members: int, runs: int = 20) -> None:
+    scratch_database()
+    insert_members(members)
+    conn = database.get_connection()
+    conn.executemany(
+        """
+        INSERT INTO TransactionRecord
+            (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod)
+        VALUES (?, '2026-01-01 10:00:00', 'P001', 2, 500, 1.0, 1000, 'cash')
+        """,
+        ((member_phone(i % members),) for i in range(members * 2)),
+    )
+    conn.executemany(
+        """
+        INSERT INTO CheckInRecord (mContactNum, checkInDatetime, checkOutDatetime, checkOutStatus)
+        VALUES (?, '2026-01-01 09:00:00', '2026-01-01 10:00:00', 1)
+        """,
+        ((member_phone(i),) for i in range(members)),
+    )
+    conn.commit()
+    conn.close()
+
+    # 同一個客戶端連續下載大型列表，不啟用速率限制；main 在數據庫設定之後才匯入
+    os.environ["GYM_RATE_LIMIT"] = "0"
+    from fastapi.testclient import TestClient
+
+    import main
+
+    logging.disable(logging.CRITICAL)
+    client = TestClient(main.app)
+
+    def measure(path: str, headers: dict[str, str]) -> tuple[int, float, int]:
+        latencies = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            # stream 取得壓縮後（未解碼）的傳輸量
+            with client.stream("GET", path, headers=headers) as response:
+                size = len(b"".join(response.iter_raw()))
+            latencies.append((time.perf_counter() - started) * 1000)
+        return size, statistics.median(latencies), response.status_code
+
+    print(f"{members} 名會員，每項 {runs} 次，壓縮門檻 {COMPRESS_MIN_SIZE} bytes")
+    for path in ("/members/", "/transaction_records/", "/checkinrecord/"):
+        etag = client.get(path).headers.get("ETag", "")
+        cases = {"未壓縮": {"Accept-Encoding": "identity"}, "gzip": {"Accept-Encoding": "gzip"}}
+        if brotli is not None:
+            cases["br"] = {"Accept-Encoding": "br"}
+        cases["304"] = {"Accept-Encoding": "gzip, br", "If-None-Match": etag}
+        print(path)
+        for name, headers in cases.items():
+            size, latency, status = measure(path, headers)
+            print(f"  {name:<6} {status}  {size:>10,} bytes  {latency:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
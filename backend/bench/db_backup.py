@@ -0,0 +1,82 @@
+"""
+線上備份期間的寫入延遲（services/db_backup.py）
+
+以暫存數據庫（members 名會員，每人 20 筆交易記錄）比較：
+沒有備份時、分段備份（預設設定）期間、單一步驟備份期間，帳本寫入的延遲。
+
+    python -m bench.db_backup [會員數]
+"""
+
+import statistics
+import sys
+import threading
+import time
+
+import database
+from bench.support import insert_members, member_phone, percentile, scratch_database
+from models.member_ledger import apply_ledger_change
+from services import db_backup
+
+
+def _writer(members: int, stop: threading.Event, latencies: list[float]) -> None:
+    """每 5 ms 寫入一筆帳本記錄，記錄每筆的延遲"""
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        conn = database.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            apply_ledger_change(cursor, member_phone(i % members), "reward_points", 1, "備份測試")
+            conn.commit()
+        finally:
+            conn.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+        i += 1
+        time.sleep(0.005)
+
+
+def main(members: int) -> None:
+    scratch_database()
+    insert_members(members)
+    conn = database.get_connection()
+    conn.executemany(
+        """
+        INSERT INTO TransactionRecord
+            (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod)
+        VALUES (?, '2026-01-01 10:00:00', 'P001', 2, 500, 1.0, 1000, 'cash')
+        """,
+        ((member_phone(i % members),) for i in range(members * 20)),
+    )
+    conn.commit()
+    conn.close()
+
+    size = database.DB_PATH.stat().st_size
+    print(f"{members} 名會員，數據庫 {size / 1024 / 1024:.1f} MB，每 5 ms 一筆帳本寫入")
+    for name, backup in (
+        ("沒有備份", lambda: time.sleep(2)),
+        ("分段備份", db_backup.create_backup),
+        ("單一步驟備份", lambda: db_backup.create_backup(pages=-1, pause=0)),
+    ):
+        stop, latencies = threading.Event(), []
+        writer = threading.Thread(target=_writer, args=(members, stop, latencies))
+        writer.start()
+        time.sleep(0.2)
+        result = backup()
+        stop.set()
+        writer.join()
+        latencies.sort()
+        print(
+            f"  {name:<8} 寫入 {len(latencies):5d} 筆  p50 {statistics.median(latencies):6.2f} ms"
+            f"  p99 {percentile(latencies, 99):7.2f} ms  最大 {latencies[-1]:7.2f} ms"
+        )
+        if result:
+            print(
+                f"           備份 {result['durationMs']:.0f} ms，鎖定 {result['lockedMs']:.0f} ms"
+                f"（最長一段 {result['maxStepLockedMs']:.1f} ms），{result['steps']} 段，"
+                f"重新開始 {result['restarts']} 次，改為單一步驟 {result['fullCopyFallback']}"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,98 @@
+"""
+即時動態的壓力測試（services/event_stream.py）
+
+以暫存數據庫在另一個程序啟動 uvicorn，開 subscribers 個 SSE 連線，
+逐一入場 checkins 名會員，量測每個事件送到所有訂閱者的延遲與中斷的連線數。
+
+    python -m bench.event_stream [訂閱者數] [入場次數]
+"""
+
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+import httpx
+
+from bench.support import (
+    free_port,
+    insert_members,
+    insert_memberships,
+    member_phone,
+    percentile,
+    scratch_database,
+    start_server,
+)
+from services.event_stream import SSE_QUEUE_SIZE
+
+
+def main(subscribers: int, checkins: int) -> None:
+    scratch_database()
+    insert_members(checkins)
+    insert_memberships(checkins)
+
+    port = free_port()
+    # 數百個 SSE 連線來自同一個客戶端，不啟用速率限制
+    server = start_server(port, lifespan=False, env={"GYM_RATE_LIMIT": "0"})
+    base_url = f"http://127.0.0.1:{port}"
+
+    committed_at: dict[str, float] = {}
+    latencies: list[float] = []
+    overflowed = 0
+
+    async def subscriber(client: httpx.AsyncClient, ready: asyncio.Event, counter: list) -> None:
+        nonlocal overflowed
+        received = 0
+        async with client.stream("GET", "/events/stream", params={"types": "checkin"}) as response:
+            counter[0] += 1
+            if counter[0] == subscribers:
+                ready.set()
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    if event == "overflow":
+                        overflowed += 1
+                        return
+                    member = json.loads(line[6:])["mContactNum"]
+                    latencies.append((time.perf_counter() - committed_at[member]) * 1000)
+                    received += 1
+                    if received == checkins:
+                        return
+
+    async def run() -> float:
+        limits = httpx.Limits(max_connections=subscribers + 10)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            ready, counter = asyncio.Event(), [0]
+            tasks = [asyncio.create_task(subscriber(client, ready, counter)) for _ in range(subscribers)]
+            await ready.wait()
+            started = time.perf_counter()
+            for i in range(checkins):
+                member = member_phone(i)
+                committed_at[member] = time.perf_counter()
+                await client.post("/checkinrecord/", json={"mContactNum": member})
+            await asyncio.wait_for(asyncio.gather(*tasks), 120)
+            return time.perf_counter() - started
+
+    try:
+        elapsed = asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    print(f"{subscribers} 個訂閱者，{checkins} 次入場，佇列上限 {SSE_QUEUE_SIZE}")
+    print(f"  送達事件 {len(latencies):,} / {subscribers * checkins:,}，中斷的訂閱者 {overflowed}")
+    print(
+        f"  延遲（提交前到收到） p50 {statistics.median(latencies):.1f} ms  "
+        f"p99 {percentile(latencies, 99):.1f} ms  最大 {latencies[-1]:.1f} ms"
+    )
+    print(f"  總耗時 {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100,
+    )
@@ -0,0 +1,115 @@
+"""
+日誌開銷（services/log_pipeline.py）
+
+1. 每次 logger 呼叫在請求執行緒中的耗時（輸出 / 被抽樣略過 / 等級不足）
+2. 每個請求的平均耗時：暫存數據庫與 TestClient，每個請求查詢會員並新增一筆帳本記錄
+   （帳本變動寫 DEBUG 日誌）。各設定輪流執行 rounds 輪取中位數，減少雜訊。
+
+輸出寫到暫存檔，模擬導向檔案或管線的 stderr。
+
+    python -m bench.log_pipeline [請求數]
+"""
+
+import io
+import logging
+import os
+import statistics
+import sys
+import time
+
+from bench.support import scratch_database
+from services.log_pipeline import setup_logging, shutdown_logging
+
+
+class SlowStream(io.StringIO):
+    """每寫一行暫停 200 µs，模擬終端機或讀取端跟不上的管線"""
+
+    def write(self, text: str) -> int:
+        time.sleep(0.0002)
+        return super().write(text)
+
+
+def main(requests: int, rounds: int = 5) -> None:
+    path = scratch_database(
+        sample_data=True, tmp_dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    workdir = os.path.dirname(path)
+
+    # main 在數據庫設定之後才匯入
+    from fastapi.testclient import TestClient
+
+    from main import app
+
+    scenarios = {
+        "WARNING（不輸出）": lambda out: logging.basicConfig(
+            level=logging.WARNING, stream=out, force=True
+        ),
+        "同步 DEBUG（原本的 basicConfig）": lambda out: logging.basicConfig(
+            level=logging.DEBUG, stream=out, force=True
+        ),
+        "佇列 JSON INFO": lambda out: setup_logging("INFO", {}, stream=out),
+        "佇列 JSON DEBUG 抽樣 1%": lambda out: setup_logging(
+            "DEBUG", {}, sample_rate=0.01, stream=out
+        ),
+        "佇列 JSON DEBUG 全部": lambda out: setup_logging(
+            "DEBUG", {}, sample_rate=1, stream=out
+        ),
+    }
+    log_path = os.path.join(workdir, "log.txt")
+
+    def per_call(configure, level: int, slow: bool, calls: int = 2000) -> float:
+        """每次 logger 呼叫的平均耗時（µs）"""
+        bench_logger = logging.getLogger("benchmark")
+        with open(log_path, "w") as out:
+            configure(SlowStream() if slow else out)
+            started = time.perf_counter()
+            for i in range(calls):
+                bench_logger.log(level, "會員帳本變動: %s %s %+d", "0912345678", "balance", i)
+            elapsed = time.perf_counter() - started
+            shutdown_logging()
+            logging.basicConfig(level=logging.WARNING, force=True)
+        return elapsed / calls * 1_000_000
+
+    print("每次 logger 呼叫在請求執行緒中的耗時（檔案 / 慢速輸出）")
+    for name, configure in scenarios.items():
+        print(
+            f"  {name:<30}"
+            f" INFO {per_call(configure, logging.INFO, False):6.1f} / "
+            f"{per_call(configure, logging.INFO, True):6.1f} µs"
+            f"   DEBUG {per_call(configure, logging.DEBUG, False):6.1f} / "
+            f"{per_call(configure, logging.DEBUG, True):6.1f} µs"
+        )
+
+    timings: dict[str, list[float]] = {name: [] for name in scenarios}
+    with TestClient(app) as client:
+        for round_no in range(rounds + 1):
+            for name, configure in scenarios.items():
+                with open(log_path, "w") as out:
+                    configure(out)
+                    started = time.perf_counter()
+                    for i in range(requests):
+                        client.get("/members/0912345678")
+                        client.post(
+                            "/members/0912345678/ledger/",
+                            json={
+                                "account": "reward_points",
+                                "delta": 1 if i % 2 == 0 else -1,
+                                "reason": "日誌測試",
+                            },
+                        )
+                    elapsed = time.perf_counter() - started
+                    shutdown_logging()
+                    logging.basicConfig(level=logging.WARNING, force=True)
+                # 第一輪為暖機，不列入
+                if round_no > 0:
+                    timings[name].append(elapsed / requests * 1_000_000)
+
+    results = {name: statistics.median(values) for name, values in timings.items()}
+    baseline = results["WARNING（不輸出）"]
+    print(f"每個請求平均耗時（{requests} 個請求 x {rounds} 輪中位數，各含一次查詢與一次帳本寫入）")
+    for name, micros in results.items():
+        print(f"  {name:<30} {micros:9.1f} µs  ({micros - baseline:+.1f} µs)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
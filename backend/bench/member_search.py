@@ -0,0 +1,71 @@
+"""
+會員搜尋延遲（services/member_search.py）
+
+以暫存數據庫建立 members 名會員，量測各類搜尋的延遲，
+並與原本前台的做法（下載全部會員後在本機篩選）比較。
+
+    python -m bench.member_search [會員數]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+from bench.support import insert_members, member_phone, percentile, scratch_database
+from models.member import Member
+from services.member_search import (
+    SEARCH_DEFAULT_LIMIT,
+    SEARCH_LATENCY_TARGET_MS,
+    search_members,
+)
+
+SURNAMES = "王李張劉陳楊黃趙吳周徐孫馬朱胡郭何林高羅"
+GIVEN = "小大明華美偉芳娟秀英敏靜麗強磊軍洋勇艷傑娜濤超"
+
+
+def main(members: int, runs: int = 200) -> None:
+    scratch_database()
+    random.seed(0)
+    insert_members(
+        members,
+        (
+            random.choice(SURNAMES) + "".join(random.choices(GIVEN, k=random.choice((1, 2))))
+            for _ in range(members)
+        ),
+    )
+
+    def sample_phone() -> str:
+        return member_phone(random.randrange(members))
+
+    queries = {
+        "電話前 6 碼": lambda: sample_phone()[:6],
+        "電話末 4 碼": lambda: sample_phone()[-4:],
+        "姓名（2 字）": lambda: random.choice(SURNAMES) + random.choice(GIVEN),
+        "姓名（3 字，打錯 1 字）": lambda: random.choice(SURNAMES) + "".join(random.choices(GIVEN, k=2)),
+        "電子郵件": lambda: f"user{random.randrange(members)}@",
+    }
+
+    print(f"{members} 名會員，每類 {runs} 次，limit={SEARCH_DEFAULT_LIMIT}，目標 p95 < {SEARCH_LATENCY_TARGET_MS} ms")
+    for name, make_query in queries.items():
+        latencies = []
+        for _ in range(runs):
+            query = make_query()
+            started = time.perf_counter()
+            search_members(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        p95 = percentile(latencies, 95)
+        print(
+            f"  {name:<16} p50 {statistics.median(latencies):6.2f} ms"
+            f"  p95 {p95:6.2f} ms  {'✓' if p95 < SEARCH_LATENCY_TARGET_MS else '✗'}"
+        )
+
+    started = time.perf_counter()
+    all_members = Member.get_all_members()
+    [m for m in all_members if "5678" in m["mContactNum"]]
+    print(f"  下載全部會員後篩選     {(time.perf_counter() - started) * 1000:6.1f} ms（{len(all_members)} 筆）")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,62 @@
+"""
+冷啟動耗時（services/startup.py）
+
+每次以新的 Python 程序（-X importtime）量測 import main 的耗時、
+到可以回應請求的耗時，以及 import 自身耗時最多的模組。
+
+    python -m bench.startup [次數]
+"""
+
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from bench.support import BACKEND_DIR, scratch_database
+
+STARTUP_SCRIPT = (
+    "import time; t = time.perf_counter()\n"
+    "import main\n"
+    "imported = time.perf_counter()\n"
+    "from fastapi.testclient import TestClient\n"
+    "with TestClient(main.app) as client:\n"
+    "    client.get('/health')\n"
+    "print(f'{(imported - t) * 1000:.1f} {(time.perf_counter() - t) * 1000:.1f}')\n"
+)
+
+
+def main(runs: int) -> None:
+    # 子程序經由 GYM_DB_PATH 使用同一個暫存數據庫
+    scratch_database(sample_data=True)
+
+    imports, totals = [], []
+    self_times: dict[str, list[int]] = defaultdict(list)
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+        )
+        import_ms, total_ms = result.stdout.strip().splitlines()[-1].split()
+        imports.append(float(import_ms))
+        totals.append(float(total_ms))
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+) \|\s+\d+ \|\s+(.+)", line)
+            if match:
+                self_times[match.group(2).strip()].append(int(match.group(1)))
+
+    print(f"執行 {runs} 次（每次新的 Python 程序）")
+    print(f"  import main: 中位數 {statistics.median(imports):.1f} ms")
+    print(f"  到可以回應請求: 中位數 {statistics.median(totals):.1f} ms")
+    print("  import 自身耗時最多的模組:")
+    slowest = sorted(
+        self_times.items(), key=lambda item: statistics.median(item[1]), reverse=True
+    )
+    for module, times in slowest[:15]:
+        print(f"    {statistics.median(times) / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
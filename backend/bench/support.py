@@ -0,0 +1,134 @@
+"""
+基準測試共用的步驟：暫存數據庫、測試資料、在另一個程序啟動伺服器
+"""
+
+import contextlib
+import io
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Iterable, Optional
+
+import database
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def scratch_database(sample_data: bool = False, tmp_dir: Optional[str] = None) -> str:
+    """
+    在暫存目錄建立數據庫並設為 database.DB_PATH
+
+    必須在寫入執行緒啟動、匯入 main 之前呼叫；
+    同時設定 GYM_DB_PATH，之後啟動的伺服器程序使用同一個數據庫。
+
+    Args:
+        sample_data: 是否寫入 database.insert_sample_data 的範例資料
+        tmp_dir: 暫存目錄的上層目錄（例如 /dev/shm），None 為系統預設
+
+    Returns:
+        str: 數據庫路徑
+    """
+    path = os.path.join(tempfile.mkdtemp(dir=tmp_dir), "gym.db")
+    database.DB_PATH = Path(path)
+    os.environ["GYM_DB_PATH"] = path
+    with contextlib.redirect_stdout(io.StringIO()):
+        database.create_all_tables()
+        if sample_data:
+            database.insert_sample_data()
+    return path
+
+
+def member_phone(i: int) -> str:
+    """第 i 名測試會員的電話"""
+    return f"09{i:08d}"
+
+
+def insert_members(count: int, names: Optional[Iterable[str]] = None) -> None:
+    """新增 count 名測試會員（電話為 member_phone(0) 到 member_phone(count - 1)）"""
+    names = iter(names) if names is not None else (f"會員{i}" for i in range(count))
+    conn = database.get_connection()
+    try:
+        conn.executemany(
+            """
+            INSERT INTO Member (mContactNum, mName, mEmail, mDob, mEmergencyName, mEmergencyNum)
+            VALUES (?, ?, ?, '1990-01-01', '緊急聯絡人', '0900000000')
+            """,
+            ((member_phone(i), next(names), f"user{i}@example.com") for i in range(count)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def insert_memberships(count: int) -> None:
+    """為前 count 名測試會員新增今天有效的會籍（入場打卡需要有效會籍）"""
+    today = date.today()
+    conn = database.get_connection()
+    try:
+        conn.executemany(
+            """
+            INSERT INTO MembershipStatus (mContactNum, startDate, endDate, isActive)
+            VALUES (?, ?, ?, 1)
+            """,
+            (
+                (
+                    member_phone(i),
+                    (today - timedelta(days=1)).isoformat(),
+                    (today + timedelta(days=365)).isoformat(),
+                )
+                for i in range(count)
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(
+    port: int, workers: int = 1, lifespan: bool = True, env: Optional[dict[str, str]] = None
+) -> subprocess.Popen:
+    """
+    在另一個程序以 uvicorn 啟動應用程式（使用 GYM_DB_PATH 的數據庫），回應 /health 後才返回
+
+    伺服器與客戶端不在同一個程序，避免共用 GIL 影響量測。
+    """
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--port", str(port), "--workers", str(workers),
+            "--lifespan", "on" if lifespan else "off",
+            "--no-access-log", "--log-level", "critical",
+        ],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "GYM_LOG_LEVEL": "CRITICAL", **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1)
+            # 多個 worker 時等其餘 worker 也啟動完成
+            time.sleep(1 if workers > 1 else 0)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("伺服器沒有在 30 秒內啟動")
+
+
+def percentile(latencies: list[float], p: float) -> float:
+    """已排序的 latencies 中第 p 百分位數（p 為 0 到 100）"""
+    return latencies[max(0, int(len(latencies) * p / 100) - 1)]
@@ -0,0 +1,110 @@
+"""
+多個 worker 的吞吐量（services/workers.py）
+
+以暫存數據庫分別啟動 1、2、4 ... N 個 uvicorn worker，量測每秒請求數。
+每個客戶端程序輪流查詢會員、查詢會員總覽並新增一筆帳本記錄（約 2:1 讀寫）。
+
+    python -m bench.workers [最多 worker 數] [每次秒數]
+"""
+
+import http.client
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from bench.support import free_port, scratch_database, start_server
+
+MEMBERS = ["0912345678", "0923456789", "0934567890"]
+
+
+def _client(port: int, seconds: float, client_no: int) -> tuple[int, int, dict[str, int]]:
+    """
+    一個客戶端在 seconds 秒內持續送出請求
+
+    Returns:
+        tuple: (成功請求數, 失敗請求數, 各狀態碼次數)
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    ok, failed, statuses = 0, 0, {}
+    deadline = time.perf_counter() + seconds
+    i = client_no
+    while time.perf_counter() < deadline:
+        member = MEMBERS[i % len(MEMBERS)]
+        if i % 3 == 0:
+            body = json.dumps(
+                {"account": "reward_points", "delta": 1, "reason": "吞吐量測試"}
+            )
+            conn.request(
+                "POST",
+                f"/members/{member}/ledger/",
+                body,
+                {"Content-Type": "application/json"},
+            )
+        elif i % 3 == 1:
+            conn.request("GET", f"/members/{member}/")
+        else:
+            conn.request("GET", f"/members/{member}/profile")
+        response = conn.getresponse()
+        response.read()
+        statuses[str(response.status)] = statuses.get(str(response.status), 0) + 1
+        if response.status < 500:
+            ok += 1
+        else:
+            failed += 1
+        i += 1
+    conn.close()
+    return ok, failed, statuses
+
+
+def _load(port: int, seconds: float, clients: int) -> tuple[int, int, dict[str, int]]:
+    """以 clients 個客戶端程序同時送出請求，合計各客戶端的結果"""
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(_client, [(port, seconds, i) for i in range(clients)])
+
+    ok = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    statuses: dict[str, int] = {}
+    for _, _, client_statuses in results:
+        for status, count in client_statuses.items():
+            statuses[status] = statuses.get(status, 0) + count
+    return ok, failed, statuses
+
+
+def main(max_workers: int, seconds: float) -> None:
+    scratch_database(sample_data=True)
+
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+
+    print(f"CPU 核心數: {os.cpu_count()}，每次 {seconds} 秒，讀寫約 2:1")
+    # 客戶端數固定，各 worker 數承受相同的負載
+    clients = max(4, max_workers * 2)
+    baseline = None
+    for workers in counts:
+        port = free_port()
+        # 量測伺服器本身的吞吐量，不啟用每個客戶端的速率限制
+        server = start_server(port, workers=workers, env={"GYM_RATE_LIMIT": "0"})
+        try:
+            ok, failed, statuses = _load(port, seconds, clients)
+        finally:
+            server.terminate()
+            server.wait()
+
+        throughput = ok / seconds
+        baseline = baseline or throughput
+        print(
+            f"  {workers:2d} workers: {throughput:8.1f} req/s"
+            f"  ({throughput / baseline:.2f}x)  失敗 {failed}  狀態碼 {statuses}"
+        )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1),
+        float(sys.argv[2]) if len(sys.argv) > 2 else 5,
+    )
@@ -0,0 +1,76 @@
+"""
+群組提交的吞吐量（services/write_queue.py）
+
+以暫存數據庫比較帳本寫入的吞吐量：
+每個寫入各自開連接提交（原本的做法） vs. 經由寫入佇列群組提交
+
+    python -m bench.write_queue [執行緒數] [每個執行緒的寫入數]
+"""
+
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.support import scratch_database
+from database import get_connection
+from models.member_ledger import apply_ledger_change
+from services.write_queue import get_write_queue_metrics, run_write, stop_writer
+
+MEMBERS = ["0912345678", "0923456789", "0934567890"]
+
+
+def _direct(i: int) -> dict:
+    """各自開連接、各自提交"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        result = apply_ledger_change(
+            cursor, MEMBERS[i % len(MEMBERS)], "reward_points", 1, "吞吐量測試"
+        )
+        conn.commit()
+        return result
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"error": str(e)}
+    finally:
+        conn.close()
+
+
+def _queued(i: int) -> dict:
+    """經由寫入佇列"""
+    try:
+        return run_write(
+            apply_ledger_change, MEMBERS[i % len(MEMBERS)], "reward_points", 1, "吞吐量測試"
+        )
+    except sqlite3.Error as e:
+        return {"error": str(e)}
+
+
+def main(threads: int, writes: int) -> None:
+    scratch_database(sample_data=True)
+
+    total = threads * writes
+    print(f"{threads} 個執行緒，共 {total} 筆帳本寫入")
+    for name, write in (("各自提交", _direct), ("寫入佇列群組提交", _queued)):
+        before = get_write_queue_metrics()["batches"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(write, range(total)))
+        elapsed = time.perf_counter() - started
+        errors = [r["error"] for r in results if "error" in r]
+        batches = get_write_queue_metrics()["batches"] - before
+        print(
+            f"  {name:<12} {total / elapsed:8.1f} 筆/秒  錯誤 {len(errors)}"
+            + (f"（{errors[0]}）" if errors else "")
+            + (f"  平均每批 {total / batches:.1f} 筆" if batches else "")
+        )
+    stop_writer()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
@@ -16,35 +16,110 @@
 - Product: 商品資料
 - MembershipPlan: 會籍方案
 - OrderTable: 訂單資料
+- MembershipDaysRemaining: 會籍剩餘天數
+- MemberLedger: 會員帳本
+- RewardPointRule: 回饋點數規則
+- ArchiveWatermark: 歷史記錄封存時間點
+- CacheVersion: 跨程序快取版本
+- Branch: 分店（各分店的會籍、打卡與交易記錄在 branches/ 中各自的數據庫）
+- MemberSearch: 會員搜尋索引（FTS5，由 Member 的觸發器同步）
+- TableVersion: 各表格的變更計數（由觸發器更新，列表 API 的 ETag 使用）
+- ChangeLog: 會員、打卡、交易、會籍的變更記錄（由觸發器寫入，GET /changes/ 使用）
+- IdempotencyKey: 帶 Idempotency-Key 的 POST 第一次的回應（重複送出時直接返回）
 """
 
+import functools
 import os
 import sqlite3
+import time
 from pathlib import Path
 import logging
 from models.pydantic_models import PaymentMethod
 
+# 日誌設定（等級、輸出格式）由 services/log_pipeline.py 在應用程式啟動時統一處理
+logger = logging.getLogger(__name__)
+
+# 確保數據庫文件在正確的目錄（可用環境變數 GYM_DB_PATH 指定其他位置）
+DB_PATH = Path(os.environ.get("GYM_DB_PATH", Path(__file__).parent / "gym.db"))
 
-# 確保數據庫文件在正確的目錄
-DB_PATH = Path(__file__).parent / "gym.db"
+# 多個程序同時寫入時，等待寫入鎖的秒數（超過才回報 database is locked）
+DB_BUSY_TIMEOUT = float(os.environ.get("GYM_DB_BUSY_TIMEOUT", "5"))
+# 等待逾時後整個寫入操作重試的次數與第一次重試前的等待秒數（之後加倍）
+DB_BUSY_RETRIES = 3
+DB_BUSY_BACKOFF_SECONDS = 0.05
 
 
-def get_connection():
+def get_connection(path=None):
     """
     建立並返回數據庫連接
 
+    Args:
+        path: 數據庫檔案位置，預設為 DB_PATH（分店數據庫見 services/branches.py）
+
     Returns:
         sqlite3.Connection | None: 數據庫連接對象，連接失敗時返回 None
     """
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = sqlite3.connect(path or DB_PATH, timeout=DB_BUSY_TIMEOUT)
         conn.execute("PRAGMA foreign_keys = ON")
+        # WAL 模式下 NORMAL 不會損毀數據庫，只有斷電時可能遺失最後幾筆已提交的交易
+        conn.execute("PRAGMA synchronous = NORMAL")
         return conn
     except sqlite3.Error as e:
-        print(f"數據庫連接錯誤: {e}")
+        logger.error(f"數據庫連接錯誤: {e}")
         return None
 
 
+def enable_wal() -> str:
+    """
+    將數據庫切換為 WAL 模式（設定會保存在數據庫檔案中）
+
+    WAL 模式下讀取不會被寫入擋住，多個程序（uvicorn / gunicorn workers）
+    可以同時讀取，寫入仍一次一個。
+
+    Returns:
+        str: 目前的 journal_mode
+    """
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT)
+    try:
+        return conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def is_busy_error(error) -> bool:
+    """是否為等待寫入鎖逾時的錯誤（sqlite3 例外或模型回傳的錯誤訊息）"""
+    message = str(error)
+    return "database is locked" in message or "database is busy" in message
+
+
+def retry_when_busy(func):
+    """
+    寫入操作等待寫入鎖逾時時，整個操作重試（交易已回滾，可以安全重試）
+
+    同時處理拋出 sqlite3.OperationalError 的函數，
+    以及回傳 {"error": ...} 的模型方法。
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(DB_BUSY_RETRIES + 1):
+            last_attempt = attempt == DB_BUSY_RETRIES
+            try:
+                result = func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or last_attempt:
+                    raise
+            else:
+                busy = isinstance(result, dict) and is_busy_error(result.get("error", ""))
+                if not busy or last_attempt:
+                    return result
+            logger.warning(f"{func.__qualname__} 等待寫入鎖逾時，第 {attempt + 1} 次重試")
+            time.sleep(DB_BUSY_BACKOFF_SECONDS * 2**attempt)
+
+    return wrapper
+
+
 def execute_query(query, error_message="執行查詢時發生錯誤"):
     """
     執行 SQL 查詢的通用函數
@@ -66,18 +141,13 @@ def execute_query(query, error_message="執行查詢時發生錯誤"):
         conn.commit()
         return True
     except sqlite3.Error as e:
-        print(f"{error_message}: {e}")
+        logger.error(f"{error_message}: {e}")
         return False
     finally:
         conn.close()
 
 
-# 設置日誌
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
-
-# 表格創建 SQL 語句
+# 表格創建 SQL 語句（遷移 v0001 的基準結構，之後的變更見 migrations/）
 
 CREATE_MEMBER_TABLE = """
     CREATE TABLE IF NOT EXISTS Member (
@@ -122,6 +192,7 @@ CREATE_MEMBERSHIP_STATUS_TABLE = """
 """
 
 
+# v0004 將會員外鍵改為 ON UPDATE CASCADE
 CREATE_CHECK_IN_RECORD_TABLE = """
     CREATE TABLE IF NOT EXISTS CheckInRecord (
         checkInNo INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -154,6 +225,7 @@ CREATE_MEMBERSHIP_PLAN_TABLE = """
     )
 """
 
+# v0004 將會員外鍵改為 ON UPDATE CASCADE
 CREATE_TRANSACTION_TABLE = """
     CREATE TABLE IF NOT EXISTS TransactionRecord (
         tNo INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -169,37 +241,179 @@ CREATE_TRANSACTION_TABLE = """
     )
 """
 
+# 會籍剩餘天數（由會籍到期排程每次執行後重新計算）
+CREATE_MEMBERSHIP_DAYS_REMAINING_TABLE = """
+    CREATE TABLE IF NOT EXISTS MembershipDaysRemaining (
+        sid INTEGER PRIMARY KEY,
+        mContactNum VARCHAR(20) NOT NULL,
+        endDate DATE NOT NULL,
+        daysRemaining INTEGER NOT NULL
+    )
+"""
+
+# 會員帳本（餘額與回饋點數的變動紀錄，只新增不修改）
+CREATE_MEMBER_LEDGER_TABLE = """
+    CREATE TABLE IF NOT EXISTS MemberLedger (
+        ledgerNo INTEGER PRIMARY KEY AUTOINCREMENT,
+        mContactNum VARCHAR(20) NOT NULL,
+        account VARCHAR(20) NOT NULL CHECK (account IN ('balance', 'reward_points')),
+        delta INTEGER NOT NULL,
+        balanceAfter INTEGER NOT NULL CHECK (balanceAfter >= 0),
+        reason VARCHAR(100),
+        createdAt DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+        FOREIGN KEY (mContactNum) REFERENCES Member(mContactNum)
+            ON UPDATE CASCADE
+    )
+"""
+
+# 回饋點數規則（每一元可累積的點數，可依商品/會籍編號或付款方式設定）
+CREATE_REWARD_POINT_RULE_TABLE = """
+    CREATE TABLE IF NOT EXISTS RewardPointRule (
+        ruleId INTEGER PRIMARY KEY AUTOINCREMENT,
+        gsNo VARCHAR(20),
+        paymentMethod VARCHAR(20),
+        pointsPerDollar REAL NOT NULL CHECK (pointsPerDollar >= 0),
+        isActive INTEGER DEFAULT 1
+    )
+"""
+
+
+# 各表格已封存到的時間點（早於此時間的記錄在 archive/gym_<年份>.db）
+CREATE_ARCHIVE_WATERMARK_TABLE = """
+    CREATE TABLE IF NOT EXISTS ArchiveWatermark (
+        tableName VARCHAR(50) PRIMARY KEY,
+        archivedBefore DATETIME NOT NULL
+    )
+"""
+
+
+# 索引
+CREATE_INDEXES = [
+    (
+        "idx_membership_status_active_end",
+        """
+        CREATE INDEX IF NOT EXISTS idx_membership_status_active_end
+        ON MembershipStatus (isActive, endDate)
+        """,
+    ),
+    (
+        "idx_membership_status_member",
+        """
+        CREATE INDEX IF NOT EXISTS idx_membership_status_member
+        ON MembershipStatus (mContactNum, isActive, endDate)
+        """,
+    ),
+    # 只索引未結束的打卡記錄，入場判斷與出場只需碰到一筆
+    (
+        "idx_checkin_record_open_visit",
+        """
+        CREATE INDEX IF NOT EXISTS idx_checkin_record_open_visit
+        ON CheckInRecord (mContactNum, checkInNo)
+        WHERE checkOutStatus = 0
+        """,
+    ),
+    (
+        "idx_checkin_record_open_since",
+        """
+        CREATE INDEX IF NOT EXISTS idx_checkin_record_open_since
+        ON CheckInRecord (checkInDatetime)
+        WHERE checkOutStatus = 0
+        """,
+    ),
+    (
+        "idx_member_ledger_member",
+        """
+        CREATE INDEX IF NOT EXISTS idx_member_ledger_member
+        ON MemberLedger (mContactNum, account, ledgerNo)
+        """,
+    ),
+    (
+        "idx_reward_point_rule_target",
+        """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reward_point_rule_target
+        ON RewardPointRule (IFNULL(gsNo, ''), IFNULL(paymentMethod, ''))
+        """,
+    ),
+    # 分批刪除會員時依會員取出歷史記錄
+    (
+        "idx_checkin_record_member",
+        """
+        CREATE INDEX IF NOT EXISTS idx_checkin_record_member
+        ON CheckInRecord (mContactNum)
+        """,
+    ),
+    (
+        "idx_transaction_record_member",
+        """
+        CREATE INDEX IF NOT EXISTS idx_transaction_record_member
+        ON TransactionRecord (mContactNum)
+        """,
+    ),
+    (
+        "idx_member_photo_member",
+        """
+        CREATE INDEX IF NOT EXISTS idx_member_photo_member
+        ON MemberPhoto (mContactNum)
+        """,
+    ),
+    # 依日期找出要封存的記錄
+    (
+        "idx_checkin_record_datetime",
+        """
+        CREATE INDEX IF NOT EXISTS idx_checkin_record_datetime
+        ON CheckInRecord (checkInDatetime)
+        """,
+    ),
+    (
+        "idx_transaction_record_datetime",
+        """
+        CREATE INDEX IF NOT EXISTS idx_transaction_record_datetime
+        ON TransactionRecord (transDateTime)
+        """,
+    ),
+    (
+        "idx_membership_days_remaining",
+        """
+        CREATE INDEX IF NOT EXISTS idx_membership_days_remaining
+        ON MembershipDaysRemaining (daysRemaining)
+        """,
+    ),
+]
+
+
+# 基準結構（遷移 v0001 / v0002 使用），之後的結構變更寫在 migrations/ 的遷移檔中
+CREATE_TABLES = [
+    ("MemberPhoto", CREATE_MEMBER_PHOTO_TABLE),
+    ("Member", CREATE_MEMBER_TABLE),
+    ("MembershipStatus", CREATE_MEMBERSHIP_STATUS_TABLE),
+    ("CheckInRecord", CREATE_CHECK_IN_RECORD_TABLE),
+    ("Product", CREATE_PRODUCT_TABLE),
+    ("MembershipPlan", CREATE_MEMBERSHIP_PLAN_TABLE),
+    ("TransactionRecord", CREATE_TRANSACTION_TABLE),
+    ("MembershipDaysRemaining", CREATE_MEMBERSHIP_DAYS_REMAINING_TABLE),
+    ("MemberLedger", CREATE_MEMBER_LEDGER_TABLE),
+    ("RewardPointRule", CREATE_REWARD_POINT_RULE_TABLE),
+    ("ArchiveWatermark", CREATE_ARCHIVE_WATERMARK_TABLE),
+]
+
 
 def create_all_tables():
     """
-    創建所有必要的數據庫表格
-
-    包含以下表格：
-    - MemberPhoto: 會員照片
-    - Member: 會員基本資料
-    - MembershipStatus: 會籍狀態
-    - CheckInRecord: 進出場紀錄
-    - TransactionRecord: 交易紀錄
-    - Product: 商品資料
-    - MembershipPlan: 會籍方案
+    建立或更新數據庫結構
+
+    依序套用 migrations/ 中尚未套用的遷移（記錄在 SchemaVersion 表格），
+    已是最新版本時不做任何事。
+
     Returns:
-        bool: 所有表格創建成功返回 True，任一表格創建失敗返回 False
+        bool: 所有遷移套用成功返回 True，任一遷移失敗返回 False
     """
+    from migrations.runner import run_migrations
 
-    tables = [
-        ("MemberPhoto", CREATE_MEMBER_PHOTO_TABLE),
-        ("Member", CREATE_MEMBER_TABLE),
-        ("MembershipStatus", CREATE_MEMBERSHIP_STATUS_TABLE),
-        ("CheckInRecord", CREATE_CHECK_IN_RECORD_TABLE),
-        ("Product", CREATE_PRODUCT_TABLE),
-        ("MembershipPlan", CREATE_MEMBERSHIP_PLAN_TABLE),
-        ("TransactionRecord", CREATE_TRANSACTION_TABLE),
-    ]
-
-    for table_name, create_query in tables:
-        if not execute_query(create_query, f"創建 {table_name} 表格時發生錯誤"):
-            print(f"創建 {table_name} 表格失敗")
-            return False
+    enable_wal()
+    result = run_migrations()
+    if "error" in result:
+        logger.error(f"數據庫遷移失敗: {result['error']}")
+        return False
     return True
 
 
@@ -229,6 +443,8 @@ def insert_sample_data():
         # 1. 先清空所有表格（按照外鍵約束的相反順序）
         tables = [
             "OrderTable",
+            "MemberLedger",
+            "RewardPointRule",
             "MembershipPlan",
             "Product",
             "TransactionRecord",
@@ -372,6 +588,24 @@ def insert_sample_data():
             print(f"✗ 交易紀錄插入失敗: {e}")
             raise
 
+        # 9. 插入回饋點數規則
+        print("\n插入回饋點數規則...")
+        try:
+            cursor.execute(
+                f"""
+                INSERT INTO RewardPointRule
+                (gsNo, paymentMethod, pointsPerDollar)
+                VALUES
+                (NULL, NULL, 0.01),
+                (NULL, '{PaymentMethod.REWARD_POINTS.value}', 0),
+                ('M003', NULL, 0.02)
+            """
+            )
+            print("✓ 回饋點數規則插入成功")
+        except sqlite3.Error as e:
+            print(f"✗ 回饋點數規則插入失敗: {e}")
+            raise
+
         conn.commit()
         print("範例資料插入成功")
         return True
@@ -1,9 +1,32 @@
 """FastAPI application for gym management"""
 
-import uvicorn
-from fastapi import FastAPI
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from services.admission import AdmissionMiddleware
+from services.branches import run_branch_relay
+from services.change_log import run_change_log_pruner
+from services.compression import CompressionMiddleware
+from services.idempotency import IdempotencyMiddleware, run_idempotency_pruner
+from services.log_pipeline import request_id_var, setup_logging
+from services.member_key_sync import run_member_key_sync
+from services.startup import get_startup_metrics, startup
+from services.membership_sweeper import run_membership_sweeper
+from services.record_archive import run_record_archiver
+from services.table_version import NotModified, not_modified_handler
+from services.db_backup import run_backup_scheduler
+from services.workers import WORKERS, acquire_scheduler_lock, release_scheduler_lock
+from services.write_queue import (
+    WriteTimeout,
+    start_writer,
+    stop_writer,
+    write_timeout_handler,
+)
+
 from routes import (
     member_routes,
     membership_plan_routes,
@@ -12,20 +35,84 @@ from routes import (
     membership_status_routes,
     checkinrecord_routes,
     transaction_record_routes,
+    member_ledger_routes,
+    reward_point_rule_routes,
+    record_archive_routes,
+    db_backup_routes,
+    schema_routes,
+    branch_routes,
+    change_routes,
+    event_routes,
 )
 
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    啟動時套用數據庫遷移並預熱，再啟動寫入執行緒與會籍到期、歷史記錄封存、備份、
+    變更記錄與 Idempotency-Key 記錄清除、分店變更轉送與會員換電話同步排程
+
+    多個 worker 時只有取得排程鎖的程序執行背景排程。
+    """
+    await startup()
+    start_writer()
+    tasks = []
+    if acquire_scheduler_lock():
+        tasks = [
+            asyncio.create_task(run_membership_sweeper()),
+            asyncio.create_task(run_record_archiver()),
+            asyncio.create_task(run_backup_scheduler()),
+            asyncio.create_task(run_change_log_pruner()),
+            asyncio.create_task(run_idempotency_pruner()),
+            asyncio.create_task(run_branch_relay()),
+            asyncio.create_task(run_member_key_sync()),
+        ]
+    yield
+    for task in tasks:
+        task.cancel()
+    release_scheduler_lock()
+    # 寫完佇列中已送出的寫入再結束
+    await asyncio.to_thread(stop_writer)
 
-app = FastAPI(title="健身房管理系統")
+
+app = FastAPI(title="健身房管理系統", lifespan=lifespan)
 
 origins = ["*"]
 
+# 交易、打卡、購買的 POST 帶 Idempotency-Key 時只執行一次（見 services/idempotency.py）
+# 最內層：重送時返回的記錄回應同樣經過 CORS 與壓縮
+app.add_middleware(IdempotencyMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "ETag", "Idempotent-Replayed", "Retry-After"],
 )
+# 可壓縮且夠大的回應以 Brotli / gzip 壓縮
+app.add_middleware(CompressionMiddleware)
+# 限流：列表、照片等大量請求不影響入場打卡（見 services/admission.py）
+app.add_middleware(AdmissionMiddleware)
+# 列表 API 的資料沒有變更時返回 304（見 services/table_version.py）
+app.add_exception_handler(NotModified, not_modified_handler)
+# 寫入佇列逾時返回 503（見 services/write_queue.py）
+app.add_exception_handler(WriteTimeout, write_timeout_handler)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """為每個請求設定 requestId（沿用呼叫端的 X-Request-ID），日誌記錄會帶上這個編號"""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
 
 app.include_router(member_routes.router)
 app.include_router(product_routes.router)
@@ -34,6 +121,14 @@ app.include_router(member_photo_routes.router)
 app.include_router(membership_status_routes.router)
 app.include_router(checkinrecord_routes.router)
 app.include_router(transaction_record_routes.router)
+app.include_router(member_ledger_routes.router)
+app.include_router(reward_point_rule_routes.router)
+app.include_router(record_archive_routes.router)
+app.include_router(db_backup_routes.router)
+app.include_router(schema_routes.router)
+app.include_router(branch_routes.router)
+app.include_router(change_routes.router)
+app.include_router(event_routes.router)
 
 
 @app.get("/", tags=["home"])
@@ -41,5 +136,22 @@ def home_page():
     return {"message": "歡迎來到 FITOPIA 健身房管理系統"}
 
 
+@app.get("/health", tags=["home"])
+def health():
+    """啟動狀態（結構版本與啟動各階段耗時），可作為容器的 readiness 檢查"""
+    return get_startup_metrics()
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    import uvicorn
+
+    # log_config=None: uvicorn 的日誌交給根 logger，同樣以 JSON 輸出
+    # 多個 worker 時 uvicorn 需要以字串指定 app，讓每個 worker 程序自行匯入
+    # timeout_graceful_shutdown: 關閉時不無限等待 SSE 串流（/events/stream）結束
+    if WORKERS > 1:
+        uvicorn.run(
+            "main:app", host="0.0.0.0", port=8000, workers=WORKERS, log_config=None,
+            timeout_graceful_shutdown=5,
+        )
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None, timeout_graceful_shutdown=5)
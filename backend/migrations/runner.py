@@ -0,0 +1,400 @@
+"""
+數據庫遷移
+
+migrations/ 中的 vNNNN_<名稱>.py 依編號順序套用，已套用的版本記錄在 SchemaVersion。
+每個遷移檔提供 upgrade(cursor)，在一個 BEGIN IMMEDIATE 交易中執行並寫入版本記錄，
+失敗時整個遷移回滾。
+
+大型表格的結構變更（SQLite 無法 ALTER 的限制、外鍵等）在遷移檔中設定
+TRANSACTIONAL = False，改以 rebuild_table() 分批複製到新表格，
+複製期間以觸發器同步舊表格的寫入，最後在一個短交易中替換表格。
+
+命令列：
+    python -m migrations.runner          套用所有未套用的遷移
+    python -m migrations.runner status   顯示目前版本
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import importlib
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from typing import Optional, TypedDict
+
+import pytz
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+REBUILD_BATCH_SIZE = 5000
+# 批次之間暫停的時間，讓等待寫入鎖的請求有機會取得鎖
+REBUILD_BATCH_PAUSE_SECONDS = 0.01
+
+CREATE_SCHEMA_VERSION_TABLE = """
+    CREATE TABLE IF NOT EXISTS SchemaVersion (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        appliedAt DATETIME NOT NULL,
+        durationMs REAL NOT NULL
+    )
+"""
+
+
+class SchemaVersionDict(TypedDict):
+    """已套用的遷移"""
+
+    version: int
+    name: str
+    appliedAt: str
+    durationMs: float
+
+
+class RebuildProgressDict(TypedDict):
+    """表格重建進度"""
+
+    table: str
+    status: str  # copying / done / failed
+    copied: int
+    total: int
+    batches: int
+    swapMs: float  # 替換表格時寫入被擋住的時間
+
+
+_rebuild_progress: dict[str, RebuildProgressDict] = {}
+
+
+def _now() -> str:
+    return datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def discover_migrations() -> list[tuple[int, str]]:
+    """找出所有遷移檔，依版本排序"""
+    migrations = []
+    for path in Path(__file__).parent.glob("v[0-9][0-9][0-9][0-9]_*.py"):
+        migrations.append((int(path.stem[1:5]), path.stem))
+    return sorted(migrations)
+
+
+def get_applied_versions(cursor: sqlite3.Cursor) -> list[SchemaVersionDict]:
+    cursor.execute(CREATE_SCHEMA_VERSION_TABLE)
+    cursor.execute("SELECT * FROM SchemaVersion ORDER BY version")
+    return [
+        dict(zip(SchemaVersionDict.__annotations__.keys(), row))
+        for row in cursor.fetchall()
+    ]
+
+
+def run_migrations(target: Optional[int] = None) -> dict:
+    """
+    套用所有尚未套用的遷移
+
+    Args:
+        target: 只套用到這個版本（None 表示最新）
+
+    Returns:
+        dict: version（目前版本）、applied（本次套用的遷移名稱），失敗時包含 error
+    """
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    applied = []
+    try:
+        cursor = conn.cursor()
+        done = {row["version"] for row in get_applied_versions(cursor)}
+
+        for version, name in discover_migrations():
+            if version in done or (target is not None and version > target):
+                continue
+
+            module = importlib.import_module(f"migrations.{name}")
+            started = time.perf_counter()
+            logger.info(f"套用遷移 {name}")
+
+            if getattr(module, "TRANSACTIONAL", True):
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    module.upgrade(cursor)
+                    _record_version(cursor, version, name, started)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            else:
+                # 自行管理交易（分批重建表格），完成後才記錄版本
+                module.upgrade(conn)
+                cursor.execute("BEGIN IMMEDIATE")
+                _record_version(cursor, version, name, started)
+                conn.commit()
+
+            applied.append(name)
+
+        current = max((row["version"] for row in get_applied_versions(cursor)), default=0)
+        if applied:
+            logger.info(f"數據庫遷移完成: 版本 {current}, 套用 {applied}")
+        return {"version": current, "applied": applied}
+    except Exception as e:
+        logger.error(f"數據庫遷移失敗: {e}")
+        return {"error": f"{e}", "applied": applied}
+    finally:
+        conn.close()
+
+
+def _record_version(
+    cursor: sqlite3.Cursor, version: int, name: str, started: float
+) -> None:
+    cursor.execute(
+        "INSERT INTO SchemaVersion (version, name, appliedAt, durationMs) VALUES (?, ?, ?, ?)",
+        (version, name, _now(), round((time.perf_counter() - started) * 1000, 3)),
+    )
+
+
+def get_migration_status() -> dict:
+    """目前版本、已套用與未套用的遷移、表格重建進度"""
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        cursor = conn.cursor()
+        applied = get_applied_versions(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    done = {row["version"] for row in applied}
+    return {
+        "version": max(done, default=0),
+        "applied": applied,
+        "pending": [name for version, name in discover_migrations() if version not in done],
+        "rebuilds": [RebuildProgressDict(**p) for p in _rebuild_progress.values()],
+    }
+
+
+def _columns(cursor: sqlite3.Cursor, table: str) -> list[tuple[str, str, int]]:
+    """(欄位名稱, 型別, 主鍵序號)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [(row[1], row[2].upper(), row[5]) for row in cursor.fetchall()]
+
+
+def rebuild_table(
+    conn: sqlite3.Connection,
+    table: str,
+    create_sql: str,
+    batch_size: int = REBUILD_BATCH_SIZE,
+) -> RebuildProgressDict:
+    """
+    分批重建表格（變更欄位、約束或外鍵）
+
+    1. 建立 <table>__new，並在舊表格上建立觸發器同步之後的新增、修改與刪除
+    2. 依 rowid 分批複製，每批一個短交易，批次之間釋放寫入鎖
+    3. 在一個交易中刪除舊表格、改名、重建原本的索引，並確認外鍵
+
+    兩個表格共有的欄位會被複製，新欄位使用預設值，被移除的欄位捨棄。
+
+    Args:
+        conn: 不在交易中的連接
+        table: 表格名稱
+        create_sql: 新表格的 CREATE TABLE 語句，表格名稱寫成 {table}
+        batch_size: 每批複製的筆數
+    """
+    new_table = f"{table}__new"
+    cursor = conn.cursor()
+    progress: RebuildProgressDict = {
+        "table": table,
+        "status": "copying",
+        "copied": 0,
+        "total": 0,
+        "batches": 0,
+        "swapMs": 0.0,
+    }
+    _rebuild_progress[table] = progress
+
+    try:
+        # 清除上次中斷留下的表格與觸發器
+        _drop_capture(cursor, table)
+        cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+        cursor.execute(create_sql.format(table=new_table))
+
+        old_columns = _columns(cursor, table)
+        new_names = {name for name, _, _ in _columns(cursor, new_table)}
+        # INTEGER PRIMARY KEY 即為 rowid，只複製一次
+        rowid_alias = [
+            name for name, type_, pk in old_columns if pk == 1 and type_ == "INTEGER"
+        ]
+        columns = ["rowid"] + [
+            name
+            for name, _, _ in old_columns
+            if name in new_names and name not in rowid_alias
+        ]
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{name}" for name in columns)
+
+        # 複製期間舊表格的寫入同步到新表格
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            f"""
+            CREATE TRIGGER {table}__capture_insert AFTER INSERT ON {table} BEGIN
+                INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+            END
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TRIGGER {table}__capture_update AFTER UPDATE ON {table} BEGIN
+                DELETE FROM {new_table} WHERE rowid = OLD.rowid;
+                INSERT OR REPLACE INTO {new_table} ({column_list}) VALUES ({new_values});
+            END
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TRIGGER {table}__capture_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM {new_table} WHERE rowid = OLD.rowid;
+            END
+            """
+        )
+        cursor.execute(f"SELECT COUNT(*), MAX(rowid) FROM {table}")
+        progress["total"], max_rowid = cursor.fetchone()
+        conn.commit()
+
+        # 分批複製觸發器建立前已存在的記錄
+        last_rowid = 0
+        while max_rowid is not None and last_rowid < max_rowid:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.execute(
+                    f"""
+                    SELECT MAX(rowid) FROM (
+                        SELECT rowid FROM {table} WHERE rowid > ? AND rowid <= ?
+                        ORDER BY rowid LIMIT ?
+                    )
+                    """,
+                    (last_rowid, max_rowid, batch_size),
+                )
+                upper = cursor.fetchone()[0]
+                if upper is None:
+                    conn.commit()
+                    break
+                cursor.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {new_table} ({column_list})
+                    SELECT {column_list} FROM {table} WHERE rowid > ? AND rowid <= ?
+                    """,
+                    (last_rowid, upper),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            progress["copied"] += cursor.rowcount
+            progress["batches"] += 1
+            last_rowid = upper
+            logger.info(f"重建 {table}: 已複製 {progress['copied']}/{progress['total']}")
+            time.sleep(REBUILD_BATCH_PAUSE_SECONDS)
+
+        swap_started = time.perf_counter()
+        _swap_tables(conn, table, new_table)
+        progress["swapMs"] = round((time.perf_counter() - swap_started) * 1000, 3)
+        progress["status"] = "done"
+        return RebuildProgressDict(**progress)
+    except sqlite3.Error:
+        progress["status"] = "failed"
+        _drop_capture(cursor, table)
+        cursor.execute(f"DROP TABLE IF EXISTS {new_table}")
+        raise
+
+
+def _drop_capture(cursor: sqlite3.Cursor, table: str) -> None:
+    for action in ("insert", "update", "delete"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}__capture_{action}")
+
+
+def _swap_tables(conn: sqlite3.Connection, table: str, new_table: str) -> None:
+    """
+    以新表格取代舊表格
+
+    依 SQLite 建議的重建步驟，交易期間關閉外鍵約束（刪除舊表格不觸發串聯刪除），
+    提交前以 foreign_key_check 確認資料仍符合外鍵。
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,),
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            row = None
+            if _has_sequence(cursor):
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+                row = cursor.fetchone()
+
+            _drop_capture(cursor, table)
+            cursor.execute(f"DROP TABLE {table}")
+            cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+            for index_sql in indexes:
+                cursor.execute(index_sql)
+            # AUTOINCREMENT 的序號不可倒退
+            if row is not None:
+                cursor.execute(
+                    "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?",
+                    (row[0], table),
+                )
+
+            cursor.execute(f"PRAGMA foreign_key_check({table})")
+            violations = cursor.fetchall()
+            for child in _child_tables(cursor, table):
+                cursor.execute(f"PRAGMA foreign_key_check({child})")
+                violations += cursor.fetchall()
+            if violations:
+                raise sqlite3.IntegrityError(f"重建 {table} 後外鍵檢查失敗: {violations[:5]}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    finally:
+        cursor.execute("PRAGMA foreign_keys = ON")
+
+
+def _has_sequence(cursor: sqlite3.Cursor) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'"
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _child_tables(cursor: sqlite3.Cursor, table: str) -> list[str]:
+    """參照此表格的表格"""
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )
+    children = []
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"PRAGMA foreign_key_list({name})")
+        if any(row[2] == table for row in cursor.fetchall()):
+            children.append(name)
+    return children
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        status = get_migration_status()
+        print(f"目前版本: {status['version']}")
+        for row in status["applied"]:
+            print(f"  ✓ {row['name']} ({row['appliedAt']}, {row['durationMs']} ms)")
+        for name in status["pending"]:
+            print(f"  - {name}")
+    else:
+        print(run_migrations())
@@ -0,0 +1,14 @@
+"""
+基準結構：建立所有表格
+
+使用 CREATE TABLE IF NOT EXISTS，已經由舊版 create_all_tables 建立的數據庫也可以直接套用。
+"""
+
+import sqlite3
+
+from database import CREATE_TABLES
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    for _, create_query in CREATE_TABLES:
+        cursor.execute(create_query)
@@ -0,0 +1,12 @@
+"""
+基準索引
+"""
+
+import sqlite3
+
+from database import CREATE_INDEXES
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    for _, create_query in CREATE_INDEXES:
+        cursor.execute(create_query)
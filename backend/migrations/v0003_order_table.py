@@ -0,0 +1,35 @@
+"""
+建立 OrderTable（models/order_table.py 的結構）
+
+insert_sample_data、Product.delete_product 與測試都會 DELETE FROM OrderTable，
+付款方式與 TransactionRecord 使用相同的值。
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS OrderTable (
+            orderId INTEGER PRIMARY KEY AUTOINCREMENT,
+            tNo INTEGER NOT NULL,
+            gsNo VARCHAR(20) NOT NULL,
+            salePrice INTEGER NOT NULL CHECK (salePrice > 0),
+            amount INTEGER NOT NULL CHECK (amount > 0),
+            paymentMethod VARCHAR(20) NOT NULL,
+            orderType VARCHAR(10) NOT NULL,
+
+            FOREIGN KEY (tNo) REFERENCES TransactionRecord(tNo)
+                ON DELETE RESTRICT
+                ON UPDATE CASCADE,
+            CHECK (
+                orderType IN ('product', 'membership') AND
+                paymentMethod IN ('cash', 'credit_card', 'e_transfer', 'reward_points')
+            )
+        )
+        """
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_order_table_transaction ON OrderTable (tNo)"
+    )
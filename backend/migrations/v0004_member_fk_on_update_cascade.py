@@ -0,0 +1,51 @@
+"""
+CheckInRecord 與 TransactionRecord 的會員外鍵加上 ON UPDATE CASCADE
+
+其他參照 Member 的表格都已是 ON UPDATE CASCADE，這兩個表格缺少，
+會員更換電話時會違反外鍵。SQLite 無法 ALTER 外鍵，兩個表格都以分批複製重建。
+"""
+
+import sqlite3
+
+from migrations.runner import rebuild_table
+
+TRANSACTIONAL = False
+
+
+def upgrade(conn: sqlite3.Connection) -> None:
+    rebuild_table(
+        conn,
+        "CheckInRecord",
+        """
+        CREATE TABLE {table} (
+            checkInNo INTEGER PRIMARY KEY AUTOINCREMENT,
+            mContactNum VARCHAR(20) NOT NULL,
+            checkInDatetime DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+            checkOutDatetime DATETIME,
+            checkInStatus INTEGER DEFAULT 1,
+            checkOutStatus INTEGER DEFAULT 0,
+            FOREIGN KEY (mContactNum) REFERENCES Member(mContactNum)
+                ON UPDATE CASCADE,
+            CHECK (checkOutDatetime IS NULL OR checkOutDatetime > checkInDatetime)
+        )
+        """,
+    )
+    rebuild_table(
+        conn,
+        "TransactionRecord",
+        """
+        CREATE TABLE {table} (
+            tNo INTEGER PRIMARY KEY AUTOINCREMENT,
+            mContactNum VARCHAR(20) NOT NULL,
+            transDateTime DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            gsNo VARCHAR(20) NOT NULL,
+            count INTEGER NOT NULL CHECK (count > 0),
+            unitPrice INTEGER NOT NULL CHECK (unitPrice > 0),
+            discount REAL NOT NULL DEFAULT 1 CHECK (discount <= 1 AND discount > 0),
+            totalAmount INTEGER NOT NULL CHECK (totalAmount > 0),
+            paymentMethod VARCHAR(20) NOT NULL CHECK (paymentMethod IN ('cash', 'credit_card', 'e_transfer', 'reward_points')),
+            FOREIGN KEY (mContactNum) REFERENCES Member(mContactNum)
+                ON UPDATE CASCADE
+        )
+        """,
+    )
@@ -0,0 +1,22 @@
+"""
+建立 CacheVersion（跨程序的快取版本）
+
+多個 worker 程序各自有記憶體快取，資料異動時在同一個交易中更新對應的版本，
+其他程序讀取快取前比對版本，不同時重新載入（見 services/cache_version.py）。
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS CacheVersion (
+            name VARCHAR(50) PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """
+    )
+    cursor.execute(
+        "INSERT OR IGNORE INTO CacheVersion (name, version) VALUES ('RewardPointRule', 0)"
+    )
@@ -0,0 +1,20 @@
+"""
+建立 Branch（分店）
+
+會員資料留在主數據庫，各分店的會籍、打卡與交易記錄在 branches/gym_<分店編號>.db，
+分店數據庫的結構由 services/branches.py 建立。
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS Branch (
+            branchId VARCHAR(20) PRIMARY KEY,
+            bName VARCHAR(50) NOT NULL,
+            createdAt DATETIME NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+        """
+    )
@@ -0,0 +1,54 @@
+"""
+建立會員搜尋索引 MemberSearch（FTS5）
+
+以 trigram 分詞索引 Member 的電話、姓名與電子郵件，支援任意位置的子字串與電話前綴搜尋。
+MemberSearch 是 Member 的外部內容索引（content='Member'），不另外保存資料，
+以 Member 的 rowid 對應，由觸發器在新增、修改、刪除會員時同步。
+
+重建 Member 表格（rowid 會改變）後需要執行 services.member_search.rebuild_member_search()。
+"""
+
+import sqlite3
+
+# 同步 MemberSearch 的觸發器
+CREATE_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_insert AFTER INSERT ON Member BEGIN
+        INSERT INTO MemberSearch (rowid, mContactNum, mName, mEmail)
+        VALUES (new.rowid, new.mContactNum, new.mName, new.mEmail);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_delete AFTER DELETE ON Member BEGIN
+        INSERT INTO MemberSearch (MemberSearch, rowid, mContactNum, mName, mEmail)
+        VALUES ('delete', old.rowid, old.mContactNum, old.mName, old.mEmail);
+    END
+    """,
+    # 只有搜尋欄位改變時才更新索引（餘額、點數的更新不碰索引）
+    """
+    CREATE TRIGGER IF NOT EXISTS member_search_update
+    AFTER UPDATE OF mContactNum, mName, mEmail ON Member BEGIN
+        INSERT INTO MemberSearch (MemberSearch, rowid, mContactNum, mName, mEmail)
+        VALUES ('delete', old.rowid, old.mContactNum, old.mName, old.mEmail);
+        INSERT INTO MemberSearch (rowid, mContactNum, mName, mEmail)
+        VALUES (new.rowid, new.mContactNum, new.mName, new.mEmail);
+    END
+    """,
+]
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS MemberSearch USING fts5(
+            mContactNum, mName, mEmail,
+            content = 'Member',
+            content_rowid = 'rowid',
+            tokenize = 'trigram'
+        )
+        """
+    )
+    for query in CREATE_TRIGGERS:
+        cursor.execute(query)
+    # 為既有會員建立索引
+    cursor.execute("INSERT INTO MemberSearch (MemberSearch) VALUES ('rebuild')")
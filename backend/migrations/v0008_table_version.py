@@ -0,0 +1,54 @@
+"""
+建立 TableVersion（各表格的變更計數）
+
+列表 API 的 ETag 由相關表格的版本組成（見 services/table_version.py）。
+每個表格的新增、修改、刪除觸發器在同一個交易中更新版本，
+任何程序或直接寫入數據庫的修改都會讓 ETag 改變。
+
+版本取 MAX(版本 + 1, 目前毫秒數)：從備份還原後的第一次修改，
+版本也會大於還原前發出過的任何版本，不會與舊的 ETag 相同。
+"""
+
+import sqlite3
+
+# 列表 API 使用的表格
+VERSIONED_TABLES = (
+    "Member",
+    "Product",
+    "MembershipPlan",
+    "MembershipStatus",
+    "CheckInRecord",
+    "TransactionRecord",
+    "MemberPhoto",
+    "RewardPointRule",
+)
+
+BUMP_VERSION = """
+    UPDATE TableVersion
+    SET version = MAX(version + 1, CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER))
+    WHERE tableName = '{table}';
+"""
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS TableVersion (
+            tableName VARCHAR(50) PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """
+    )
+    for table in VERSIONED_TABLES:
+        cursor.execute(
+            "INSERT OR IGNORE INTO TableVersion (tableName, version) VALUES (?, 0)", (table,)
+        )
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cursor.execute(
+                f"""
+                CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    {BUMP_VERSION.format(table=table)}
+                END
+                """
+            )
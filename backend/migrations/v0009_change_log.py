@@ -0,0 +1,67 @@
+"""
+建立 ChangeLog（變更記錄）
+
+Member、CheckInRecord、TransactionRecord、MembershipStatus 的新增、修改、刪除
+由觸發器在同一個交易中寫入 ChangeLog。changeVersion 是 AUTOINCREMENT 主鍵，
+只會遞增、不會重複使用，作為資料列的版本；GET /changes?since= 以此返回差異
+（見 services/change_log.py）。
+
+修改主鍵（會員換電話）時先記錄舊主鍵的刪除，再記錄新主鍵的修改。
+"""
+
+import sqlite3
+
+# 記錄變更的表格與主鍵
+CHANGE_TABLES = {
+    "Member": "mContactNum",
+    "CheckInRecord": "checkInNo",
+    "TransactionRecord": "tNo",
+    "MembershipStatus": "sid",
+}
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ChangeLog (
+            changeVersion INTEGER PRIMARY KEY AUTOINCREMENT,
+            tableName VARCHAR(50) NOT NULL,
+            rowKey VARCHAR(20) NOT NULL,
+            operation VARCHAR(10) NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+            changedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # 清除過期記錄用
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_changelog_changedat ON ChangeLog (changedAt)"
+    )
+
+    for table, pk in CHANGE_TABLES.items():
+        prefix = f"{table.lower()}_changelog"
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO ChangeLog (tableName, rowKey, operation)
+                VALUES ('{table}', new.{pk}, 'insert');
+            END
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_update AFTER UPDATE ON {table} BEGIN
+                INSERT INTO ChangeLog (tableName, rowKey, operation)
+                SELECT '{table}', old.{pk}, 'delete' WHERE old.{pk} IS NOT new.{pk};
+                INSERT INTO ChangeLog (tableName, rowKey, operation)
+                VALUES ('{table}', new.{pk}, 'update');
+            END
+            """
+        )
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {prefix}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO ChangeLog (tableName, rowKey, operation)
+                VALUES ('{table}', old.{pk}, 'delete');
+            END
+            """
+        )
@@ -0,0 +1,28 @@
+"""
+建立 IdempotencyKey（POST 請求的重複送出紀錄）
+
+交易、打卡、購買等 POST 請求帶 Idempotency-Key 標頭時，記錄第一次的回應；
+相同的 key 再次送出時直接返回記錄的回應，不再執行（見 services/idempotency.py）。
+statusCode 為 NULL 表示第一次的請求仍在處理中。
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS IdempotencyKey (
+            idemKey VARCHAR(255) PRIMARY KEY,
+            fingerprint CHAR(32) NOT NULL,
+            statusCode INTEGER,
+            contentType VARCHAR(100),
+            responseBody BLOB,
+            createdAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # 清除過期記錄用
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_idempotencykey_createdat ON IdempotencyKey (createdAt)"
+    )
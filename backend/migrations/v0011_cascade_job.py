@@ -0,0 +1,28 @@
+"""
+建立 CascadeJob（分批刪除工作的進度）
+
+刪除會員等分批刪除工作的進度原本記錄在程序記憶體中，
+多個 worker 時查詢進度的請求可能由其他 worker 處理而查不到。
+改為記錄在主數據庫，每一批刪除與進度在同一個交易中寫入（見 services/cascade_delete.py）。
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS CascadeJob (
+            jobNo INTEGER PRIMARY KEY AUTOINCREMENT,
+            target VARCHAR(50) NOT NULL,
+            mContactNum VARCHAR(20) NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'running'
+                CHECK (status IN ('running', 'done', 'failed')),
+            deleted TEXT NOT NULL DEFAULT '{}',
+            batches INTEGER NOT NULL DEFAULT 0,
+            startedAt DATETIME NOT NULL,
+            finishedAt DATETIME,
+            error TEXT
+        )
+        """
+    )
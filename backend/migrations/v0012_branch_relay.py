@@ -0,0 +1,54 @@
+"""
+分店變更轉送與會員換電話記錄
+
+- ChangeLog 新增 branchId：分店數據庫的變更轉送到主數據庫後，branchId 為來源分店，
+  主數據庫本身的變更為 NULL（見 services/branches.py 的 relay_branch_changes）
+- BranchRelay：每個分店已轉送到的變更版本，轉送與版本在主數據庫的同一個交易中寫入，
+  分店交易的回饋點數只處理一次
+- MemberKeyChange：會員換電話時由觸發器記錄舊電話與新電話，
+  套用到封存與分店數據庫（見 services/member_key_sync.py）
+"""
+
+import sqlite3
+
+
+def upgrade(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("PRAGMA table_info(ChangeLog)")
+    if "branchId" not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE ChangeLog ADD COLUMN branchId VARCHAR(20)")
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS BranchRelay (
+            branchId VARCHAR(20) PRIMARY KEY,
+            relayedVersion INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS MemberKeyChange (
+            changeNo INTEGER PRIMARY KEY AUTOINCREMENT,
+            oldContactNum VARCHAR(20) NOT NULL,
+            newContactNum VARCHAR(20) NOT NULL,
+            changedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    # 轉送分店交易時依舊電話找出目前的電話
+    cursor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_member_key_change_old
+        ON MemberKeyChange (oldContactNum, changeNo)
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS member_key_change AFTER UPDATE OF mContactNum ON Member
+        WHEN old.mContactNum IS NOT new.mContactNum BEGIN
+            INSERT INTO MemberKeyChange (oldContactNum, newContactNum)
+            VALUES (old.mContactNum, new.mContactNum);
+        END
+        """
+    )
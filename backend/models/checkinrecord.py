@@ -21,13 +21,19 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from typing import Optional, TypedDict
-from database import get_connection
+from typing import Optional, Sequence, TypedDict
+from database import get_connection, is_busy_error, retry_when_busy
+from services.cascade_delete import cascade_delete
+from services.event_stream import notify_committed
+from services.record_archive import select_with_archives
+from services.write_queue import WriteTimeout, run_write
 import sqlite3
 import logging
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import pytz
-from icecream import ic
+from models.pydantic_models import CheckInReason
+
+logger = logging.getLogger(__name__)
 
 
 class CheckInRecordDict(TypedDict):
@@ -41,75 +47,189 @@ class CheckInRecordDict(TypedDict):
     checkOutStatus: int
 
 
+# fields= 可選擇的欄位
+CHECKIN_RECORD_COLUMNS = tuple(CheckInRecordDict.__annotations__)
+
+
+class CheckInResultDict(TypedDict):
+    """入場判斷結果資料結構定義"""
+
+    admitted: bool
+    reason: str
+    checkInNo: Optional[int]
+
+
+def _check_in(cursor: sqlite3.Cursor, mContactNum: str) -> CheckInResultDict:
+    """入場判斷與建立打卡記錄（在寫入佇列的交易中執行）"""
+    # 使用台北時區
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    current_time = datetime.now(taipei_tz)
+    today = current_time.strftime("%Y-%m-%d")
+
+    cursor.execute(
+        """
+        SELECT
+            EXISTS (SELECT 1 FROM Member WHERE mContactNum = :m),
+            EXISTS (
+                SELECT 1 FROM MembershipStatus
+                WHERE mContactNum = :m AND isActive = 1
+                AND endDate >= :today AND startDate <= :today
+            ),
+            EXISTS (
+                SELECT 1 FROM CheckInRecord
+                WHERE mContactNum = :m AND checkOutStatus = 0
+            )
+        """,
+        {"m": mContactNum, "today": today},
+    )
+    member_exists, has_membership, has_open_visit = cursor.fetchone()
+
+    if not member_exists:
+        reason = CheckInReason.MEMBER_NOT_FOUND
+    elif not has_membership:
+        reason = CheckInReason.NO_ACTIVE_MEMBERSHIP
+    elif has_open_visit:
+        reason = CheckInReason.ALREADY_CHECKED_IN
+    else:
+        reason = CheckInReason.ADMITTED
+
+    if reason != CheckInReason.ADMITTED:
+        return {"admitted": False, "reason": reason.value, "checkInNo": None}
+
+    cursor.execute(
+        "INSERT INTO CheckInRecord (mContactNum, checkInDatetime, checkInStatus) VALUES (?, ?, 1)",
+        (mContactNum, current_time.strftime("%Y-%m-%d %H:%M:%S")),
+    )
+    return {"admitted": True, "reason": reason.value, "checkInNo": cursor.lastrowid}
+
+
+def _check_out(cursor: sqlite3.Cursor, mContactNum: str) -> dict[str, str]:
+    """會員退場：登出最新一筆未結束的打卡記錄（在寫入佇列的交易中執行）"""
+    # 使用台北時區
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    formatted_time = datetime.now(taipei_tz).strftime("%Y-%m-%d %H:%M:%S")
+
+    # 透過未結束打卡的部分索引找到最新一筆，只更新該筆記錄
+    cursor.execute(
+        """
+        UPDATE CheckInRecord SET checkOutDatetime = ?, checkOutStatus = 1
+        WHERE checkInNo = (
+            SELECT checkInNo FROM CheckInRecord
+            WHERE mContactNum = ? AND checkOutStatus = 0
+            ORDER BY checkInNo DESC
+            LIMIT 1
+        )
+        """,
+        (formatted_time, mContactNum),
+    )
+
+    if cursor.rowcount == 0:
+        # 沒有未結束的打卡記錄，再確認是否有任何打卡記錄
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM CheckInRecord WHERE mContactNum = ?)",
+            (mContactNum,),
+        )
+        if cursor.fetchone()[0]:
+            return {"error": "該記錄已經登出"}
+        return {"error": "打卡記錄不存在"}
+    return {"message": "打卡記錄更新成功"}
+
+
+def _auto_checkout(cursor: sqlite3.Cursor, before: str) -> int:
+    """登出 before 之前入場、仍未登出的打卡記錄（在寫入佇列的交易中執行），返回筆數"""
+    cursor.execute(
+        """
+        UPDATE CheckInRecord
+        SET checkOutDatetime = MAX(
+                datetime(checkInDatetime, 'start of day', '+1 day', '-1 second'),
+                datetime(checkInDatetime, '+1 second')
+            ),
+            checkOutStatus = 1
+        WHERE checkOutStatus = 0 AND checkInDatetime < ?
+        """,
+        (before,),
+    )
+    return cursor.rowcount
+
+
 class CheckInRecord:
     """打卡記錄類別：負責打卡記錄相關操作，如創建、更新、查詢等"""
 
     @classmethod
+    @retry_when_busy
     def create_checkin_record(cls, mContactNum: str) -> dict[str, str]:
         """創建打卡記錄
         當會員進場時，以mContactNum為索引，
         創建一條打卡記錄，checkInDatetime為現在時間，checkInStatus為1，checkOutStatus為0
-
+        與 check_in 相同，需有有效會籍且沒有未結束的打卡記錄
         """
-        conn = get_connection()
-        if not conn:
-            return {"error": "數據庫連接失敗"}
-
         try:
-            cursor = conn.cursor()
-
-            # 檢查會員是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,)
-            )
-            member_count = cursor.fetchone()[0]
-            if member_count == 0:
-                return {"error": "會員不存在"}
-
-            # 檢查是否有未結束的打卡記錄
-            cursor.execute(
-                "SELECT COUNT(*) FROM CheckInRecord WHERE mContactNum = ? AND checkOutStatus = 0",
-                (mContactNum,),
-            )
-            if cursor.fetchone()[0] > 0:
-                return {"error": "已有未結束的打卡記錄"}
+            result = run_write(_check_in, mContactNum)
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                # 交給 retry_when_busy 重試
+                raise
+            return {"error": str(e)}
 
-            # 使用台北時區
-            taipei_tz = pytz.timezone("Asia/Taipei")
-            current_time = datetime.now(taipei_tz)
-            formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
+        if result["reason"] == CheckInReason.MEMBER_NOT_FOUND:
+            return {"error": "會員不存在"}
+        if result["reason"] == CheckInReason.NO_ACTIVE_MEMBERSHIP:
+            return {"error": "沒有有效會籍"}
+        if result["reason"] == CheckInReason.ALREADY_CHECKED_IN:
+            return {"error": "已有未結束的打卡記錄"}
+        notify_committed()
+        return {"message": "打卡記錄創建成功"}
 
-            # 創建打卡記錄
-            cursor.execute(
-                "INSERT INTO CheckInRecord (mContactNum, checkInDatetime, checkInStatus) VALUES (?, ?, 1)",
-                (mContactNum, formatted_time),
-            )
-            conn.commit()
-            return {"message": "打卡記錄創建成功"}
-        except Exception as e:
-            conn.rollback()
-            return {"error": str(e)}
-        finally:
-            conn.close()
+    @classmethod
+    @retry_when_busy
+    def check_in(cls, mContactNum: str) -> Optional[CheckInResultDict]:
+        """會員入場
+        以一次查詢同時確認：會員存在、今天在有效會籍期間內、沒有未結束的打卡記錄，
+        允許入場時在同一個交易中建立打卡記錄（經由寫入佇列與其他寫入一起提交）。
+
+        Returns:
+            Optional[CheckInResultDict]: 入場判斷結果，數據庫錯誤時返回 None
+        """
+        try:
+            result = run_write(_check_in, mContactNum)
+            if result["admitted"]:
+                notify_committed()
+            return result
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                # 交給 retry_when_busy 重試
+                raise
+            logger.error(f"入場打卡失敗: {e}")
+            return None
 
     @classmethod
-    def get_checkin_record(cls, mContactNum: str) -> list[CheckInRecordDict]:
-        """查詢打卡記錄"""
+    def get_checkin_record(
+        cls,
+        mContactNum: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> list[CheckInRecordDict]:
+        """查詢打卡記錄（日期範圍早於封存時間點時一併查詢封存數據庫）"""
         conn = get_connection()
         if not conn:
             return []
 
         try:
             cursor = conn.cursor()
-            cursor.execute(
-                """
-                SELECT * FROM CheckInRecord 
-                WHERE mContactNum = ?
-                ORDER BY checkInDatetime DESC
-                """,
+            checkin_record = select_with_archives(
+                cursor,
+                "CheckInRecord",
+                "mContactNum = ?",
                 (mContactNum,),
+                start_date,
+                end_date,
             )
-            checkin_record = cursor.fetchall()
             if not checkin_record:
                 return []
 
@@ -118,77 +238,96 @@ class CheckInRecord:
                 for record in checkin_record
             ]
         except Exception as e:
-            logging.error(f"查詢打卡記錄操作失敗: {e}")
+            logger.error(f"查詢打卡記錄操作失敗: {e}")
             return []
         finally:
             conn.close()
 
     @classmethod
-    def get_all_checkin_records(cls) -> list[CheckInRecordDict]:
-        """查詢所有打卡記錄"""
+    def get_all_checkin_records(
+        cls,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> list[CheckInRecordDict]:
+        """
+        查詢所有打卡記錄
+
+        Args:
+            columns: 只查詢這些欄位（需為 CHECKIN_RECORD_COLUMNS 中的欄位），None 表示所有欄位
+        """
+        columns = tuple(columns or CHECKIN_RECORD_COLUMNS)
         conn = get_connection()
         if not conn:
             return []
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM CheckInRecord")
-            checkin_records = cursor.fetchall()
-            return [
-                dict(zip(CheckInRecordDict.__annotations__.keys(), record))
-                for record in checkin_records
-            ]
+            checkin_records = select_with_archives(
+                cursor,
+                "CheckInRecord",
+                "1 = 1",
+                (),
+                start_date,
+                end_date,
+                descending=False,
+                columns=columns,
+            )
+            return [dict(zip(columns, record)) for record in checkin_records]
         except Exception as e:
-            logging.error(f"查詢所有打卡記錄操作失敗: {e}")
+            logger.error(f"查詢所有打卡記錄操作失敗: {e}")
             return []
         finally:
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_checkin_record(cls, mContactNum: str) -> dict[str, str]:
         """更新打卡記錄
         當會員退場時，以mContactNum為索引，
         更新checkOutDatetime為現在時間，checkOutStatus為1(代表退場)
         """
-        conn = get_connection()
-        if not conn:
-            return {"error": "數據庫連接失敗"}
-
         try:
-            cursor = conn.cursor()
+            result = run_write(_check_out, mContactNum)
+        except sqlite3.IntegrityError:
+            return {"error": "登出時間必須晚於登入時間"}
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                # 交給 retry_when_busy 重試
+                raise
+            return {"error": str(e)}
+
+        if "error" not in result:
+            notify_committed()
+        return result
 
-            # 使用台北時區
+    @classmethod
+    @retry_when_busy
+    def auto_checkout_open_visits(cls, before: Optional[str] = None) -> dict[str, str]:
+        """批次自動登出
+        將 before (YYYY-MM-DD，預設為今天) 之前入場、仍未登出的打卡記錄，
+        以單一 UPDATE 登出，登出時間為入場當天 23:59:59
+        """
+        if before is None:
             taipei_tz = pytz.timezone("Asia/Taipei")
-            current_time = datetime.now(taipei_tz)
-            formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
-            # 檢查打卡記錄是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM CheckInRecord WHERE mContactNum = ?",
-                (mContactNum,),
-            )
-            count = cursor.fetchone()[0]
-            if count == 0:
-                return {"error": "打卡記錄不存在"}
+            before = datetime.now(taipei_tz).strftime("%Y-%m-%d")
 
-            cursor.execute(
-                """
-                UPDATE CheckInRecord SET checkOutDatetime = ?, checkOutStatus = 1 
-                WHERE mContactNum = ?
-                AND checkOutStatus = 0
-                AND checkInNo = (
-                    SELECT MAX(checkInNo) FROM CheckInRecord WHERE mContactNum = ?
-                    AND checkOutStatus = 0
-                )
-                """,
-                (formatted_time, mContactNum, mContactNum),
-            )
-            conn.commit()
-            return {"message": "打卡記錄更新成功"}
-        except Exception as e:
-            conn.rollback()
+        try:
+            count = run_write(_auto_checkout, before)
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.Error as e:
+            if is_busy_error(e):
+                raise
             return {"error": str(e)}
-        finally:
-            conn.close()
+
+        notify_committed()
+        logger.info(f"自動登出 {count} 筆打卡記錄")
+        return {"message": "自動登出成功", "count": str(count)}
 
     @classmethod
     def delete_checkin_record(cls, mContactNum: str) -> dict[str, str]:
@@ -209,32 +348,20 @@ class CheckInRecord:
             if count == 0:
                 return {"error": "打卡記錄不存在"}
 
-            # 關閉外鍵約束
-            cursor.execute("PRAGMA foreign_keys = OFF")
-
-            tables = ["CheckInRecord"]
-
-            for table in tables:
-                cursor.execute(
-                    f"DELETE FROM {table} WHERE mContactNum = ?", (mContactNum,)
-                )
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")
-
-            conn.commit()
-            logging.info("刪除操作已提交")
-            return {"success": "打卡記錄刪除成功"}
         except Exception as e:
-            conn.rollback()
             return {"error": str(e)}
         finally:
-            if conn:
-                cursor.execute("PRAGMA foreign_keys = ON")
-                conn.commit()
-                conn.close()
-                logging.info("數據庫連接已關閉")
+            conn.close()
+
+        progress = cascade_delete("checkin_record", mContactNum, ["CheckInRecord"])
+        if progress["status"] == "failed":
+            return {"error": progress["error"]}
+        return {"success": "打卡記錄刪除成功", "jobId": progress["jobId"]}
 
 
 if __name__ == "__main__":
+    from icecream import ic
+
     # 設置日誌
     logging.basicConfig(level=logging.INFO)
 
@@ -8,10 +8,18 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import logging
-from database import get_connection
+from database import get_connection, is_busy_error, retry_when_busy
 import sqlite3
-from typing import Optional, TypedDict
+from typing import Optional, Sequence, TypedDict
 from datetime import date
+from models.membership_status import MembershipStatusDict
+from models.checkinrecord import CheckInRecordDict
+from models.transaction_record import TransactionRecordDict
+from models.member_ledger import insert_ledger_entry
+from services.cascade_delete import MEMBER_CHILD_TABLES, cascade_delete
+from services.write_queue import WriteTimeout, run_write
+
+logger = logging.getLogger(__name__)
 
 
 class MemberDict(TypedDict):
@@ -41,12 +49,78 @@ class MemberDict(TypedDict):
     creation_date: date
 
 
+# fields= 可選擇的欄位
+MEMBER_COLUMNS = tuple(MemberDict.__annotations__)
+
+
+def _update_member(
+    cursor: sqlite3.Cursor,
+    mContactNum: str,
+    update_fields: list[str],
+    values: list,
+    mBalance: Optional[int],
+    mRewardPoints: Optional[int],
+) -> dict[str, str]:
+    """更新會員資料，直接設定餘額或點數時記錄差額到會員帳本（在寫入佇列的交易中執行）"""
+    cursor.execute(
+        "SELECT mBalance, mRewardPoints FROM Member WHERE mContactNum = ?",
+        (mContactNum,),
+    )
+    current = cursor.fetchone()
+    if current is None:
+        return {"error": "會員不存在"}
+
+    cursor.execute(
+        f"""
+        UPDATE Member
+        SET {', '.join(update_fields)}
+        WHERE mContactNum = ?
+        """,
+        [*values, mContactNum],
+    )
+
+    for account, new_value, old_value in (
+        ("balance", mBalance, current[0]),
+        ("reward_points", mRewardPoints, current[1]),
+    ):
+        if new_value is not None and new_value != old_value:
+            insert_ledger_entry(
+                cursor,
+                mContactNum,
+                account,
+                new_value - old_value,
+                new_value,
+                "手動調整",
+            )
+    return {"message": "會員資料更新成功"}
+
+
+class MemberProfileDict(TypedDict):
+    """
+    會員總覽資料結構定義
+
+    欄位說明：
+    - member: 會員基本資料
+    - membershipStatus: 目前有效會籍（沒有則為 None）
+    - photo: 目前照片的檔名與狀態，不含照片內容（沒有則為 None）
+    - openCheckIn: 尚未登出的打卡記錄（沒有則為 None）
+    - recentTransactions: 最近的交易記錄
+    """
+
+    member: MemberDict
+    membershipStatus: Optional[MembershipStatusDict]
+    photo: Optional[dict]
+    openCheckIn: Optional[CheckInRecordDict]
+    recentTransactions: list[TransactionRecordDict]
+
+
 class Member:
     """
     會員類別：負責會員相關操作，如創建、更新、查詢等
     """
 
     @classmethod
+    @retry_when_busy
     def create_member(
         cls,
         mContactNum: str,
@@ -111,7 +185,7 @@ class Member:
             )
 
             conn.commit()
-            logging.info(f"會員創建成功: {mName} ({mContactNum})")
+            logger.info(f"會員創建成功: {mName} ({mContactNum})")
             return {"message": "會員創建成功"}
 
         except sqlite3.IntegrityError:
@@ -154,44 +228,146 @@ class Member:
             return dict(zip(MemberDict.__annotations__.keys(), member))
 
         except sqlite3.Error as e:
-            logging.error(f"查詢會員失敗: {e}")
+            logger.error(f"查詢會員失敗: {e}")
             return None
         finally:
             conn.close()
 
     @classmethod
-    def get_all_members(cls) -> list[MemberDict]:
+    def get_all_members(cls, columns: Optional[Sequence[str]] = None) -> list[MemberDict]:
         """
         查詢所有會員資料
 
+        Args:
+            columns: 只查詢這些欄位（需為 MEMBER_COLUMNS 中的欄位），None 表示所有欄位
+
         Returns:
             list[MemberDict]: 會員資料列表
         """
+        columns = tuple(columns or MEMBER_COLUMNS)
         conn = get_connection()
         if conn is None:
             return []
 
         try:
             cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(columns)} FROM Member")
+
+            members = cursor.fetchall()
+            return [dict(zip(columns, member)) for member in members]
+
+        except sqlite3.Error as e:
+            logger.error(f"查詢所有會員失敗: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @classmethod
+    def get_member_profile(
+        cls, mContactNum: str, transaction_limit: int = 5
+    ) -> Optional[MemberProfileDict]:
+        """
+        查詢會員總覽：基本資料、有效會籍、照片、未結束的打卡與最近交易
+
+        所有查詢在同一個連接、同一個讀取交易中完成，
+        前台只需一次請求即可取得會員相關資料。
+
+        Args:
+            mContactNum: 會員電話
+            transaction_limit: 最近交易筆數（預設：5）
+
+        Returns:
+            Optional[MemberProfileDict]: 會員總覽，如果會員不存在則返回 None
+        """
+        conn = get_connection()
+        if conn is None:
+            return None
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN")
+
+            cursor.execute("SELECT * FROM Member WHERE mContactNum = ?", (mContactNum,))
+            member = cursor.fetchone()
+            if not member:
+                return None
+
             cursor.execute(
                 """
-                SELECT * FROM Member
-            """
+                SELECT * FROM MembershipStatus
+                WHERE mContactNum = ? AND isActive = 1
+                ORDER BY endDate DESC
+                LIMIT 1
+                """,
+                (mContactNum,),
             )
+            status = cursor.fetchone()
 
-            members = cursor.fetchall()
-            return [
-                dict(zip(MemberDict.__annotations__.keys(), member))
-                for member in members
-            ]
+            cursor.execute(
+                """
+                SELECT mPhotoName, isActive FROM MemberPhoto
+                WHERE mContactNum = ? AND isActive = 1
+                ORDER BY rowid DESC
+                LIMIT 1
+                """,
+                (mContactNum,),
+            )
+            photo = cursor.fetchone()
+
+            cursor.execute(
+                """
+                SELECT * FROM CheckInRecord
+                WHERE mContactNum = ? AND checkOutStatus = 0
+                ORDER BY checkInNo DESC
+                LIMIT 1
+                """,
+                (mContactNum,),
+            )
+            open_checkin = cursor.fetchone()
+
+            cursor.execute(
+                """
+                SELECT * FROM TransactionRecord
+                WHERE mContactNum = ?
+                ORDER BY transDateTime DESC, tNo DESC
+                LIMIT ?
+                """,
+                (mContactNum, transaction_limit),
+            )
+            transactions = cursor.fetchall()
+
+            return {
+                "member": dict(zip(MemberDict.__annotations__.keys(), member)),
+                "membershipStatus": (
+                    dict(zip(MembershipStatusDict.__annotations__.keys(), status))
+                    if status
+                    else None
+                ),
+                "photo": (
+                    {"mPhotoName": photo[0], "isActive": bool(photo[1])}
+                    if photo
+                    else None
+                ),
+                "openCheckIn": (
+                    dict(zip(CheckInRecordDict.__annotations__.keys(), open_checkin))
+                    if open_checkin
+                    else None
+                ),
+                "recentTransactions": [
+                    dict(zip(TransactionRecordDict.__annotations__.keys(), record))
+                    for record in transactions
+                ],
+            }
 
         except sqlite3.Error as e:
-            logging.error(f"查詢所有會員失敗: {e}")
-            return []
+            logger.error(f"查詢會員總覽失敗: {e}")
+            return None
         finally:
+            conn.rollback()
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_member(
         cls,
         mContactNum: str,
@@ -213,65 +389,53 @@ class Member:
         Returns:
             dict: 包含操作結果訊息
         """
-        conn = get_connection()
-        if conn is None:
-            return {"error": "數據庫連接失敗"}
+        # 構建更新語句
+        update_fields = []
+        values = []
+
+        if mName is not None:
+            update_fields.append("mName = ?")
+            values.append(mName)
+        if mEmail is not None:
+            update_fields.append("mEmail = ?")
+            values.append(mEmail)
+        if mDob is not None:
+            update_fields.append("mDob = ?")
+            values.append(mDob)
+        if mEmergencyName is not None:
+            update_fields.append("mEmergencyName = ?")
+            values.append(mEmergencyName)
+        if mEmergencyNum is not None:
+            update_fields.append("mEmergencyNum = ?")
+            values.append(mEmergencyNum)
+        if mBalance is not None:
+            update_fields.append("mBalance = ?")
+            values.append(mBalance)
+        if mRewardPoints is not None:
+            update_fields.append("mRewardPoints = ?")
+            values.append(mRewardPoints)
+
+        if not update_fields:
+            return {"message": "沒有需要更新的資料"}
 
         try:
-            cursor = conn.cursor()
-
-            # 構建更新語句
-            update_fields = []
-            values = []
-
-            if mName is not None:
-                update_fields.append("mName = ?")
-                values.append(mName)
-            if mEmail is not None:
-                update_fields.append("mEmail = ?")
-                values.append(mEmail)
-            if mDob is not None:
-                update_fields.append("mDob = ?")
-                values.append(mDob)
-            if mEmergencyName is not None:
-                update_fields.append("mEmergencyName = ?")
-                values.append(mEmergencyName)
-            if mEmergencyNum is not None:
-                update_fields.append("mEmergencyNum = ?")
-                values.append(mEmergencyNum)
-            if mBalance is not None:
-                update_fields.append("mBalance = ?")
-                values.append(mBalance)
-            if mRewardPoints is not None:
-                update_fields.append("mRewardPoints = ?")
-                values.append(mRewardPoints)
-
-            if not update_fields:
-                return {"message": "沒有需要更新的資料"}
-
-            values.append(mContactNum)
-
-            # 執行更新
-            cursor.execute(
-                f"""
-                UPDATE Member
-                SET {', '.join(update_fields)}
-                WHERE mContactNum = ?
-            """,
-                values,
+            # 經由寫入佇列執行：讀取目前值與更新在同一個寫入交易中，帳本差額不會因其他寫入而錯誤
+            result = run_write(
+                _update_member, mContactNum, update_fields, values, mBalance, mRewardPoints
             )
-
-            if cursor.rowcount == 0:
-                return {"error": "會員不存在"}
-
-            conn.commit()
-            logging.info(f"會員資料更新成功: {mContactNum}")
-            return {"message": "會員資料更新成功"}
-
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
         except sqlite3.Error as e:
+            if is_busy_error(e):
+                # 交給 retry_when_busy 重試
+                raise
             return {"error": f"更新會員資料失敗: {e}"}
-        finally:
-            conn.close()
+        if "error" in result:
+            return result
+
+        logger.info(f"會員資料更新成功: {mContactNum}")
+        return result
 
     @classmethod
     def delete_member(cls, mContactNum: str) -> dict[str, str]:
@@ -284,11 +448,11 @@ class Member:
         Returns:
             dict: 包含操作結果訊息
         """
-        logging.info(f"開始刪除會員: {mContactNum}")  # 添加日誌
+        logger.info(f"開始刪除會員: {mContactNum}")  # 添加日誌
 
         conn = get_connection()
         if conn is None:
-            logging.error("數據庫連接失敗")  # 添加日誌
+            logger.error("數據庫連接失敗")  # 添加日誌
             return {"error": "數據庫連接失敗"}
 
         try:
@@ -299,44 +463,27 @@ class Member:
                 "SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,)
             )
             count = cursor.fetchone()[0]
-            logging.info(f"找到 {count} 個會員")  # 添加日誌
+            logger.debug("找到 %d 個會員", count)  # 添加日誌
 
             if count == 0:
-                logging.warning("會員不存在")  # 添加日誌
+                logger.warning("會員不存在")  # 添加日誌
                 return {"error": "會員不存在"}
 
-            # 關閉外鍵約束
-            cursor.execute("PRAGMA foreign_keys = OFF")
-            logging.info("已關閉外鍵約束")  # 添加日誌
-
-            # 刪除相關記錄（按照順序）
-            tables = [
-                "MembershipStatus",
-                "CheckInRecord",
-                "Member",
-                "TransactionRecord",
-                "MemberPhoto",
-            ]
-            for table in tables:
-                cursor.execute(
-                    f"DELETE FROM {table} WHERE mContactNum = ?", (mContactNum,)
-                )
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")  # 添加日誌
-
-            conn.commit()
-            logging.info("刪除操作已提交")  # 添加日誌
-
-            return {"message": "會員刪除成功"}
-
         except sqlite3.Error as e:
-            logging.error(f"刪除失敗: {e}")  # 添加日誌
+            logger.error(f"刪除失敗: {e}")  # 添加日誌
             return {"error": f"刪除會員失敗: {e}"}
         finally:
-            if conn:
-                cursor.execute("PRAGMA foreign_keys = ON")
-                conn.commit()
-                conn.close()
-                logging.info("數據庫連接已關閉")  # 添加日誌
+            conn.close()
+
+        # 分批刪除相關記錄，最後刪除會員（外鍵約束保持開啟）
+        progress = cascade_delete(
+            "member", mContactNum, MEMBER_CHILD_TABLES, delete_member=True
+        )
+        if progress["status"] == "failed":
+            return {"error": f"刪除會員失敗: {progress['error']}"}
+
+        logger.debug("刪除操作已提交")  # 添加日誌
+        return {"message": "會員刪除成功", "jobId": progress["jobId"]}
 
 
 if __name__ == "__main__":
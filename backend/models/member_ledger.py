@@ -0,0 +1,273 @@
+"""
+會員帳本類別：記錄會員餘額與回饋點數的每一筆變動
+
+Member.mBalance / Member.mRewardPoints 是目前值（O(1) 查詢），
+MemberLedger 是只新增不修改的變動紀錄，兩者在同一個交易中寫入。
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import logging
+from database import get_connection, retry_when_busy
+from services.write_queue import WriteTimeout, run_write
+import sqlite3
+from typing import Optional, TypedDict
+from datetime import datetime
+import pytz
+
+logger = logging.getLogger(__name__)
+
+
+"""
+    CREATE TABLE IF NOT EXISTS MemberLedger (
+        ledgerNo INTEGER PRIMARY KEY AUTOINCREMENT,
+        mContactNum VARCHAR(20) NOT NULL,
+        account VARCHAR(20) NOT NULL CHECK (account IN ('balance', 'reward_points')),
+        delta INTEGER NOT NULL,
+        balanceAfter INTEGER NOT NULL,
+        reason VARCHAR(100),
+        createdAt DATETIME NOT NULL,
+        FOREIGN KEY (mContactNum) REFERENCES Member(mContactNum)
+            ON UPDATE CASCADE
+    )
+"""
+
+# 帳本科目對應的會員欄位
+ACCOUNT_COLUMNS = {
+    "balance": "mBalance",
+    "reward_points": "mRewardPoints",
+}
+
+# 餘額不足時的錯誤訊息
+INSUFFICIENT_MESSAGES = {
+    "balance": "會員餘額不足",
+    "reward_points": "回饋點數不足",
+}
+
+
+class MemberLedgerDict(TypedDict):
+    """會員帳本資料結構定義"""
+
+    ledgerNo: int
+    mContactNum: str
+    account: str
+    delta: int
+    balanceAfter: int
+    reason: Optional[str]
+    createdAt: datetime
+
+
+def insert_ledger_entry(
+    cursor: sqlite3.Cursor,
+    mContactNum: str,
+    account: str,
+    delta: int,
+    balance_after: int,
+    reason: Optional[str] = None,
+) -> int:
+    """
+    新增一筆帳本記錄（不更新 Member，由呼叫者負責交易）
+
+    Returns:
+        int: 帳本編號
+    """
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    created_at = datetime.now(taipei_tz).strftime("%Y-%m-%d %H:%M:%S")
+    cursor.execute(
+        """
+        INSERT INTO MemberLedger (mContactNum, account, delta, balanceAfter, reason, createdAt)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (mContactNum, account, delta, balance_after, reason, created_at),
+    )
+    return cursor.lastrowid
+
+
+def apply_ledger_change(
+    cursor: sqlite3.Cursor,
+    mContactNum: str,
+    account: str,
+    delta: int,
+    reason: Optional[str] = None,
+) -> dict[str, str]:
+    """
+    在呼叫者的交易中變動會員餘額或回饋點數並寫入帳本
+
+    使用 `SET 欄位 = 欄位 + ?` 原子更新，並確保變動後不為負數。
+    呼叫者負責 commit / rollback。
+
+    Returns:
+        dict: 成功時包含 balance（變動後的值），失敗時包含 error
+    """
+    if account not in ACCOUNT_COLUMNS:
+        return {"error": "無效的帳本科目"}
+    column = ACCOUNT_COLUMNS[account]
+
+    cursor.execute(
+        f"""
+        UPDATE Member SET {column} = {column} + ?
+        WHERE mContactNum = ? AND {column} + ? >= 0
+        RETURNING {column}
+        """,
+        (delta, mContactNum, delta),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute(
+            "SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,)
+        )
+        if cursor.fetchone()[0] == 0:
+            return {"error": "會員不存在"}
+        return {"error": INSUFFICIENT_MESSAGES[account]}
+
+    insert_ledger_entry(cursor, mContactNum, account, delta, row[0], reason)
+    return {"balance": str(row[0])}
+
+
+class MemberLedger:
+    """會員帳本類別：負責餘額與回饋點數的變動、查詢與對帳"""
+
+    @classmethod
+    @retry_when_busy
+    def apply_delta(
+        cls, mContactNum: str, account: str, delta: int, reason: Optional[str] = None
+    ) -> dict[str, str]:
+        """
+        變動會員餘額或回饋點數
+
+        Args:
+            mContactNum: 會員電話
+            account: 帳本科目 (balance / reward_points)
+            delta: 變動數量（正數為增加，負數為減少）
+            reason: 變動原因
+
+        Returns:
+            dict: 包含操作結果訊息與變動後的值
+        """
+        try:
+            # 經由寫入佇列與其他寫入一起提交
+            result = run_write(apply_ledger_change, mContactNum, account, delta, reason)
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.Error as e:
+            return {"error": f"數據庫錯誤: {str(e)}"}
+        if "error" in result:
+            return result
+
+        logger.debug("會員帳本變動: %s %s %+d", mContactNum, account, delta)
+        return {"message": "會員帳本變動成功", "balance": result["balance"]}
+
+    @classmethod
+    def get_member_ledger(
+        cls, mContactNum: str, limit: int = 50
+    ) -> list[MemberLedgerDict]:
+        """查詢會員最近的帳本記錄"""
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT * FROM MemberLedger
+                WHERE mContactNum = ?
+                ORDER BY ledgerNo DESC
+                LIMIT ?
+                """,
+                (mContactNum, limit),
+            )
+            return [
+                dict(zip(MemberLedgerDict.__annotations__.keys(), row))
+                for row in cursor.fetchall()
+            ]
+        except sqlite3.Error as e:
+            logger.error(f"查詢會員帳本失敗: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @classmethod
+    def reconcile(cls, batch_size: int = 500) -> dict:
+        """
+        對帳：確認 Member 上的目前值與帳本加總一致
+
+        依 mContactNum 分批讀取，每批各自一個短的讀取交易，不會長時間占用數據庫。
+        期初值取第一筆帳本記錄變動前的值，沒有帳本記錄的會員不需對帳。
+
+        Returns:
+            dict: checked（已檢查會員數）與 mismatches（不一致的明細）
+        """
+        checked = 0
+        mismatches = []
+        last_key = ""
+
+        while True:
+            conn = get_connection()
+            if not conn:
+                return {"error": "數據庫連接失敗"}
+
+            try:
+                cursor = conn.cursor()
+                # 同一批的兩個查詢在同一個讀取交易中，看到同一個快照，
+                # 兩個查詢之間提交的變動不會被當成不一致
+                cursor.execute("BEGIN")
+                cursor.execute(
+                    """
+                    SELECT mContactNum, mBalance, mRewardPoints FROM Member
+                    WHERE mContactNum > ?
+                    ORDER BY mContactNum
+                    LIMIT ?
+                    """,
+                    (last_key, batch_size),
+                )
+                members = cursor.fetchall()
+                if not members:
+                    break
+                last_key = members[-1][0]
+                cached = {
+                    m[0]: {"balance": m[1], "reward_points": m[2]} for m in members
+                }
+
+                cursor.execute(
+                    """
+                    SELECT l.mContactNum, l.account, SUM(l.delta),
+                        (
+                            SELECT f.balanceAfter - f.delta FROM MemberLedger f
+                            WHERE f.mContactNum = l.mContactNum AND f.account = l.account
+                            ORDER BY f.ledgerNo
+                            LIMIT 1
+                        )
+                    FROM MemberLedger l
+                    WHERE l.mContactNum BETWEEN ? AND ?
+                    GROUP BY l.mContactNum, l.account
+                    """,
+                    (members[0][0], last_key),
+                )
+                for mContactNum, account, total, opening in cursor.fetchall():
+                    if mContactNum not in cached:
+                        continue
+                    expected = opening + total
+                    if cached[mContactNum][account] != expected:
+                        mismatches.append(
+                            {
+                                "mContactNum": mContactNum,
+                                "account": account,
+                                "cached": cached[mContactNum][account],
+                                "expected": expected,
+                            }
+                        )
+                checked += len(members)
+            except sqlite3.Error as e:
+                logger.error(f"會員帳本對帳失敗: {e}")
+                return {"error": f"數據庫錯誤: {str(e)}"}
+            finally:
+                conn.rollback()
+                conn.close()
+
+        logger.info(f"會員帳本對帳完成: 檢查 {checked} 位會員, {len(mismatches)} 筆不一致")
+        return {"checked": checked, "mismatches": mismatches}
@@ -3,12 +3,13 @@
 """
 
 from typing import Optional, TypedDict
-from database import get_connection
+from database import get_connection, retry_when_busy
+from services.cascade_delete import cascade_delete
 import sqlite3
 import logging
 from datetime import datetime
 
-from icecream import ic
+logger = logging.getLogger(__name__)
 
 
 class MemberPhotoDict(TypedDict):
@@ -24,6 +25,7 @@ class MemberPhoto:
     """會員照片類別：負責會員照片相關操作，如創建、更新、查詢等"""
 
     @classmethod
+    @retry_when_busy
     def create_member_photo(cls, mPhoto: bytes, mContactNum: str) -> dict[str, str]:
         """創建會員照片"""
         conn = get_connection()
@@ -86,7 +88,7 @@ class MemberPhoto:
             return dict(zip(MemberPhotoDict.__annotations__.keys(), photo_info))
 
         except sqlite3.Error as e:
-            logging.error(f"查詢會員照片操作失敗: {e}")
+            logger.error(f"查詢會員照片操作失敗: {e}")
             return None
 
         finally:
@@ -110,12 +112,13 @@ class MemberPhoto:
             ]
 
         except sqlite3.Error as e:
-            logging.error(f"查詢所有會員照片操作失敗: {e}")
+            logger.error(f"查詢所有會員照片操作失敗: {e}")
             return []
         finally:
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_member_photo(cls, mContactNum: str, new_photo: bytes) -> dict[str, str]:
         """更新會員照片"""
         conn = get_connection()
@@ -180,25 +183,12 @@ class MemberPhoto:
             if count == 0:
                 return {"error": "會員照片不存在"}
 
-            # 關閉外鍵約束
-            cursor.execute("PRAGMA foreign_keys = OFF")
-
-            tables = ["MemberPhoto"]
-
-            for table in tables:
-                cursor.execute(
-                    f"DELETE FROM {table} WHERE mContactNum = ?", (mContactNum,)
-                )
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")
-
-            conn.commit()
-            logging.info("刪除操作已提交")
-            return {"success": "會員照片刪除成功"}
         except sqlite3.Error as e:
             return {"error": f"數據庫操作失敗: {e}"}
         finally:
-            if conn:
-                cursor.execute("PRAGMA foreign_keys = ON")
-                conn.commit()
-                conn.close()
-                logging.info("數據庫連接已關閉")
+            conn.close()
+
+        progress = cascade_delete("member_photo", mContactNum, ["MemberPhoto"])
+        if progress["status"] == "failed":
+            return {"error": f"數據庫操作失敗: {progress['error']}"}
+        return {"success": "會員照片刪除成功", "jobId": progress["jobId"]}
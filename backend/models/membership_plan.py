@@ -8,11 +8,13 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import logging
-from database import get_connection
+from database import get_connection, retry_when_busy
 import sqlite3
 from typing import Optional, TypedDict
 from datetime import date
 
+logger = logging.getLogger(__name__)
+
 
 class MembershipPlanDict(TypedDict):
     """會籍方案資料結構定義"""
@@ -27,6 +29,7 @@ class MembershipPlan:
     """會籍方案類別：負責會籍方案相關操作，如創建、更新、查詢等"""
 
     @classmethod
+    @retry_when_busy
     def create_membership_plan(
         cls,
         gsNo: str,
@@ -58,7 +61,7 @@ class MembershipPlan:
                 (gsNo, salePrice, planType, planDuration),
             )
             conn.commit()
-            logging.info(f"會籍方案創建成功: {gsNo}")
+            logger.info(f"會籍方案創建成功: {gsNo}")
             return {"message": "會籍方案創建成功"}
 
         except sqlite3.IntegrityError:
@@ -93,7 +96,7 @@ class MembershipPlan:
             return dict(zip(MembershipPlanDict.__annotations__.keys(), membership_plan))
 
         except sqlite3.Error as e:
-            logging.error(f"查詢會籍方案失敗: {e}")
+            logger.error(f"查詢會籍方案失敗: {e}")
             return None
         finally:
             conn.close()
@@ -115,12 +118,13 @@ class MembershipPlan:
             ]
 
         except sqlite3.Error as e:
-            logging.error(f"查詢所有會籍方案失敗: {e}")
+            logger.error(f"查詢所有會籍方案失敗: {e}")
             return []
         finally:
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_membership_plan(cls, gsNo: str, **kwargs) -> dict[str, str]:
         """更新會籍方案資料"""
         conn = get_connection()
@@ -157,7 +161,7 @@ class MembershipPlan:
                 return {"error": "會籍方案不存在"}
 
             conn.commit()
-            logging.info(f"會籍方案更新成功: {gsNo}")
+            logger.info(f"會籍方案更新成功: {gsNo}")
             return {"message": "會籍方案更新成功"}
 
         except sqlite3.Error as e:
@@ -180,28 +184,28 @@ class MembershipPlan:
                 "SELECT COUNT(*) FROM MembershipPlan WHERE gsNo = ?", (gsNo,)
             )
             count = cursor.fetchone()[0]
-            logging.info(f"找到 {count} 個會籍方案")
+            logger.debug("找到 %d 個會籍方案", count)
 
             if count == 0:
-                logging.warning("會籍方案不存在")
+                logger.warning("會籍方案不存在")
                 return {"error": "會籍方案不存在"}
 
             # 關閉外鍵約束
             cursor.execute("PRAGMA foreign_keys = OFF")
-            logging.info("已關閉外鍵約束")
+            logger.debug("已關閉外鍵約束")
 
             # 刪除相關記錄（按照順序）
             tables = ["MembershipPlan"]
             for table in tables:
                 cursor.execute(f"DELETE FROM {table} WHERE gsNo = ?", (gsNo,))
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")
+                logger.debug("從 %s 刪除了 %d 條記錄", table, cursor.rowcount)
 
             conn.commit()
-            logging.info("刪除操作已提交")
+            logger.debug("刪除操作已提交")
             return {"message": "會籍方案刪除成功"}
 
         except sqlite3.Error as e:
-            logging.error(f"刪除失敗: {e}")
+            logger.error(f"刪除失敗: {e}")
             return {"error": f"刪除失敗: {e}"}
         finally:
             conn.close()
@@ -7,11 +7,20 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
+import calendar
 import logging
-from database import get_connection
+from database import get_connection, retry_when_busy
+from services.cascade_delete import cascade_delete
+from services.event_stream import notify_committed
+from services.write_queue import WriteTimeout, run_write
 import sqlite3
 from typing import Optional, TypedDict
-from datetime import date
+from datetime import date, datetime
+import pytz
+from models.reward_point_rule import apply_transaction_points
+from models.transaction_record import transaction_total
+
+logger = logging.getLogger(__name__)
 
 
 """
@@ -41,12 +50,139 @@ class MembershipStatusDict(TypedDict):
     isActive: bool
 
 
+def add_months(start: date, months: int) -> date:
+    """
+    日期加上月數，月底超出時取該月最後一天（例如 1/31 + 1 個月 = 2/28）
+    """
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+class MembershipDaysRemainingDict(TypedDict):
+    """
+    會籍剩餘天數資料結構定義
+    """
+
+    sId: int
+    mContactNum: str
+    endDate: date
+    daysRemaining: int
+
+
+def _purchase_membership_plan(
+    cursor: sqlite3.Cursor,
+    mContactNum: str,
+    gsNo: str,
+    paymentMethod: str,
+    startDate: Optional[date],
+    discount: float,
+) -> dict[str, str]:
+    """購買會籍方案的所有寫入（在寫入佇列的交易中執行）"""
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    now = datetime.now(taipei_tz)
+    if startDate is None:
+        startDate = now.date()
+
+    cursor.execute(
+        "SELECT COUNT(*) FROM Member WHERE mContactNum = ?",
+        (mContactNum,),
+    )
+    if cursor.fetchone()[0] == 0:
+        return {"error": "會員不存在"}
+
+    cursor.execute(
+        "SELECT salePrice, planDuration FROM MembershipPlan WHERE gsNo = ?",
+        (gsNo,),
+    )
+    plan = cursor.fetchone()
+    if not plan:
+        return {"error": "會籍方案不存在"}
+
+    sale_price, plan_duration = plan
+    total_amount = transaction_total(sale_price, 1, discount)
+    if total_amount <= 0:
+        return {"error": "金額必須大於0"}
+
+    cursor.execute(
+        """
+        INSERT INTO TransactionRecord (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod)
+        VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+        """,
+        (
+            mContactNum,
+            now.strftime("%Y-%m-%d %H:%M:%S"),
+            gsNo,
+            sale_price,
+            discount,
+            total_amount,
+            paymentMethod,
+        ),
+    )
+    tNo = cursor.lastrowid
+
+    result = apply_transaction_points(
+        cursor, mContactNum, gsNo, paymentMethod, total_amount, tNo
+    )
+    if "error" in result:
+        return result
+
+    # 仍有效的會籍直接延長，否則停用舊會籍並建立新會籍
+    cursor.execute(
+        """
+        SELECT sid, startDate, endDate FROM MembershipStatus
+        WHERE mContactNum = ? AND isActive = 1
+        ORDER BY endDate DESC
+        LIMIT 1
+        """,
+        (mContactNum,),
+    )
+    current = cursor.fetchone()
+    if current and date.fromisoformat(current[2]) >= startDate:
+        sId = current[0]
+        new_start = date.fromisoformat(current[1])
+        new_end = add_months(date.fromisoformat(current[2]), plan_duration)
+        cursor.execute(
+            "UPDATE MembershipStatus SET endDate = ? WHERE sid = ?",
+            (new_end.isoformat(), sId),
+        )
+    else:
+        cursor.execute(
+            """
+            UPDATE MembershipStatus SET isActive = 0
+            WHERE mContactNum = ? AND isActive = 1
+            """,
+            (mContactNum,),
+        )
+        new_start = startDate
+        new_end = add_months(startDate, plan_duration)
+        cursor.execute(
+            """
+            INSERT INTO MembershipStatus (mContactNum, startDate, endDate, isActive)
+            VALUES (?, ?, ?, 1)
+            """,
+            (mContactNum, new_start.isoformat(), new_end.isoformat()),
+        )
+        sId = cursor.lastrowid
+
+    return {
+        "message": "會籍方案購買成功",
+        "tNo": str(tNo),
+        "sId": str(sId),
+        "startDate": new_start.isoformat(),
+        "endDate": new_end.isoformat(),
+    }
+
+
 class MembershipStatus:
     """
     會籍狀態類別：負責會籍狀態相關操作，如創建、更新、查詢等
     """
 
     @classmethod
+    @retry_when_busy
     def create_membership_status(
         cls,
         mContactNum: str,
@@ -91,6 +227,60 @@ class MembershipStatus:
         finally:
             conn.close()
 
+    @classmethod
+    @retry_when_busy
+    def purchase_membership_plan(
+        cls,
+        mContactNum: str,
+        gsNo: str,
+        paymentMethod: str,
+        startDate: Optional[date] = None,
+        discount: float = 1.0,
+    ) -> dict[str, str]:
+        """
+        購買會籍方案
+
+        在同一個 SQLite 交易中完成：
+        1. 依 MembershipPlan.planDuration 計算結束日期
+        2. 新增交易記錄
+        3. 延長仍有效的會籍，或停用過期會籍並建立新會籍
+        4. 以回饋點數付款時扣除點數，並依規則累積點數
+
+        經由寫入佇列執行：同時送出的購買請求由寫入執行緒依序執行，
+        不會讀到彼此尚未提交的資料。
+
+        Args:
+            mContactNum: 會員電話
+            gsNo: 會籍方案編號
+            paymentMethod: 付款方式
+            startDate: 會籍開始日期（預設：今天）
+            discount: 折扣（預設：1.0）
+
+        Returns:
+            dict: 包含操作結果訊息、交易編號、會籍編號與會籍期間
+        """
+        try:
+            result = run_write(
+                _purchase_membership_plan,
+                mContactNum,
+                gsNo,
+                paymentMethod,
+                startDate,
+                discount,
+            )
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
+        except sqlite3.IntegrityError as e:
+            return {"error": f"資料完整性錯誤: {str(e)}"}
+        except sqlite3.Error as e:
+            return {"error": f"數據庫錯誤: {str(e)}"}
+
+        if "message" in result:
+            notify_committed()
+            logger.info(f"會籍方案購買成功: {mContactNum} {gsNo} -> {result['endDate']}")
+        return result
+
     @classmethod
     def get_membership_status(cls, mContactNum: str) -> Optional[MembershipStatusDict]:
         """
@@ -116,7 +306,7 @@ class MembershipStatus:
             else:
                 return dict(zip(MembershipStatusDict.__annotations__.keys(), result))
         except sqlite3.Error as e:
-            logging.error(f"查詢會籍狀態失敗: {e}")
+            logger.error(f"查詢會籍狀態失敗: {e}")
             return None
         finally:
             conn.close()
@@ -145,6 +335,120 @@ class MembershipStatus:
             conn.close()
 
     @classmethod
+    def deactivate_expired(cls, today: str, batch_size: int = 500) -> int:
+        """
+        停用已過期的會籍（每次最多 batch_size 筆）
+
+        使用 (isActive, endDate) 索引找出過期會籍，以單一 UPDATE 停用。
+
+        Args:
+            today: 今天日期 (YYYY-MM-DD)，endDate 早於此日期即視為過期
+            batch_size: 每批最多停用筆數
+
+        Returns:
+            int: 本批停用的筆數，失敗時返回 0
+        """
+        conn = get_connection()
+        if not conn:
+            return 0
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE MembershipStatus SET isActive = 0
+                WHERE sid IN (
+                    SELECT sid FROM MembershipStatus
+                    WHERE isActive = 1 AND endDate < ?
+                    LIMIT ?
+                )
+                """,
+                (today, batch_size),
+            )
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"停用過期會籍失敗: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    @classmethod
+    def refresh_days_remaining(cls, today: str) -> int:
+        """
+        重新計算所有有效會籍的剩餘天數
+
+        Args:
+            today: 今天日期 (YYYY-MM-DD)
+
+        Returns:
+            int: 有效會籍筆數，失敗時返回 0
+        """
+        conn = get_connection()
+        if not conn:
+            return 0
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM MembershipDaysRemaining")
+            cursor.execute(
+                """
+                INSERT INTO MembershipDaysRemaining (sid, mContactNum, endDate, daysRemaining)
+                SELECT sid, mContactNum, endDate,
+                       CAST(julianday(endDate) - julianday(?) AS INTEGER)
+                FROM MembershipStatus
+                WHERE isActive = 1
+                """,
+                (today,),
+            )
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"計算會籍剩餘天數失敗: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    @classmethod
+    def get_expiring_membership_status(
+        cls, within_days: int
+    ) -> list[MembershipDaysRemainingDict]:
+        """
+        查詢即將到期的會籍（依最近一次排程計算的剩餘天數）
+
+        Args:
+            within_days: 剩餘天數上限
+
+        Returns:
+            list[MembershipDaysRemainingDict]: 即將到期的會籍，依剩餘天數排序
+        """
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT sid, mContactNum, endDate, daysRemaining
+                FROM MembershipDaysRemaining
+                WHERE daysRemaining <= ?
+                ORDER BY daysRemaining
+                """,
+                (within_days,),
+            )
+            return [
+                dict(zip(MembershipDaysRemainingDict.__annotations__.keys(), row))
+                for row in cursor.fetchall()
+            ]
+        except sqlite3.Error as e:
+            logger.error(f"查詢即將到期會籍失敗: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @classmethod
+    @retry_when_busy
     def update_membership_status(
         cls, mContactNum: str, startDate: date, endDate: date, isActive: bool
     ):
@@ -190,7 +494,7 @@ class MembershipStatus:
                 return {"error": "會籍狀態不存在"}
 
             conn.commit()
-            logging.info(f"會籍狀態更新成功: {mContactNum}")
+            logger.info(f"會籍狀態更新成功: {mContactNum}")
             return {"message": "會籍狀態更新成功"}
         except sqlite3.Error as e:
             return {"error": f"數據庫錯誤: {str(e)}"}
@@ -203,7 +507,7 @@ class MembershipStatus:
         刪除會籍狀態
         """
 
-        logging.info(f"開始刪除會籍狀態: {mContactNum}")
+        logger.info(f"開始刪除會籍狀態: {mContactNum}")
 
         conn = get_connection()
         if not conn:
@@ -218,38 +522,28 @@ class MembershipStatus:
                 (mContactNum,),
             )
             count = cursor.fetchone()[0]
-            logging.info(f"找到 {count} 個會籍狀態")
+            logger.debug("找到 %d 個會籍狀態", count)
 
             if count == 0:
-                logging.warning("會籍狀態不存在")
+                logger.warning("會籍狀態不存在")
                 return {"error": "會籍狀態不存在"}
 
-            # 關閉外鍵約束
-            cursor.execute("PRAGMA foreign_keys = OFF")
-            logging.info("已關閉外鍵約束")
-
-            tables = ["MembershipStatus"]
-
-            for table in tables:
-                cursor.execute(
-                    f"DELETE FROM {table} WHERE mContactNum = ?", (mContactNum,)
-                )
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")
-
-            conn.commit()
-            logging.info("刪除操作已提交")
-
-            return {"message": "會籍狀態刪除成功"}
-
         except sqlite3.Error as e:
-            logging.error(f"刪除失敗: {e}")
+            logger.error(f"刪除失敗: {e}")
             return {"error": f"刪除會籍狀態失敗: {e}"}
         finally:
-            if conn:
-                cursor.execute("PRAGMA foreign_keys = ON")
-                conn.commit()
-                conn.close()
-                logging.info("數據庫連接已關閉")
+            conn.close()
+
+        progress = cascade_delete(
+            "membership_status",
+            mContactNum,
+            ["MembershipDaysRemaining", "MembershipStatus"],
+        )
+        if progress["status"] == "failed":
+            return {"error": f"刪除會籍狀態失敗: {progress['error']}"}
+
+        logger.debug("刪除操作已提交")
+        return {"message": "會籍狀態刪除成功", "jobId": progress["jobId"]}
 
 
 if __name__ == "__main__":
@@ -68,7 +68,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from typing import TypedDict, Optional
-from database import get_connection
+from database import get_connection, retry_when_busy
 import sqlite3
 from datetime import datetime
 import pytz
@@ -99,6 +99,7 @@ class OrderTable:
     """訂單表 CRUD"""
 
     @classmethod
+    @retry_when_busy
     def create_orders_with_transaction(
         cls, mContactNum: str, orders: list[OrderTableDict]
     ) -> dict[str, str]:
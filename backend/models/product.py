@@ -8,9 +8,11 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import logging
-from database import get_connection
+from database import get_connection, retry_when_busy
 import sqlite3
-from typing import Optional, TypedDict
+from typing import Optional, Sequence, TypedDict
+
+logger = logging.getLogger(__name__)
 
 
 class ProductDict(TypedDict):
@@ -22,10 +24,15 @@ class ProductDict(TypedDict):
     pImage: Optional[bytes]
 
 
+# fields= 可選擇的欄位
+PRODUCT_COLUMNS = tuple(ProductDict.__annotations__)
+
+
 class Product:
     """商品類別：負責商品相關操作，如創建、更新、查詢等"""
 
     @classmethod
+    @retry_when_busy
     def create_product(
         cls, gsNo: str, salePrice: int, pName: str, pImage: Optional[bytes] = None
     ) -> dict[str, str]:
@@ -54,7 +61,7 @@ class Product:
             )
 
             conn.commit()
-            logging.info(f"商品創建成功: {pName} ({gsNo})")
+            logger.info(f"商品創建成功: {pName} ({gsNo})")
             return {"message": "商品創建成功"}
         except sqlite3.IntegrityError:
             return {"error": "商品已存在"}
@@ -85,34 +92,38 @@ class Product:
             return dict(zip(ProductDict.__annotations__.keys(), product))
 
         except sqlite3.Error as e:
-            logging.error(f"查詢商品失敗: {e}")
+            logger.error(f"查詢商品失敗: {e}")
             return None
 
         finally:
             conn.close()
 
     @classmethod
-    def get_all_products(cls) -> list[ProductDict]:
-        """取得所有商品"""
+    def get_all_products(cls, columns: Optional[Sequence[str]] = None) -> list[ProductDict]:
+        """
+        取得所有商品
+
+        Args:
+            columns: 只查詢這些欄位（需為 PRODUCT_COLUMNS 中的欄位），None 表示所有欄位
+        """
+        columns = tuple(columns or PRODUCT_COLUMNS)
         conn = get_connection()
         if conn is None:
             return []
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM Product")
+            cursor.execute(f"SELECT {', '.join(columns)} FROM Product")
             products = cursor.fetchall()
-            return [
-                dict(zip(ProductDict.__annotations__.keys(), product))
-                for product in products
-            ]
+            return [dict(zip(columns, product)) for product in products]
         except sqlite3.Error as e:
-            logging.error(f"查詢所有商品失敗: {e}")
+            logger.error(f"查詢所有商品失敗: {e}")
             return []
         finally:
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_product(
         cls, gsNo: str, salePrice: int, pName: str, pImage: Optional[bytes] = None
     ) -> dict[str, str]:
@@ -154,7 +165,7 @@ class Product:
                 return {"error": "商品不存在"}
 
             conn.commit()
-            logging.info(f"商品更新成功: {gsNo}")
+            logger.info(f"商品更新成功: {gsNo}")
             return {"message": "商品更新成功"}
 
         except sqlite3.Error as e:
@@ -166,11 +177,11 @@ class Product:
     def delete_product(cls, gsNo: str):
         """刪除商品"""
 
-        logging.info(f"開始刪除商品: {gsNo}")
+        logger.info(f"開始刪除商品: {gsNo}")
 
         conn = get_connection()
         if conn is None:
-            logging.error("數據庫連接失敗")
+            logger.error("數據庫連接失敗")
             return {"error": "數據庫連接失敗"}
 
         try:
@@ -179,35 +190,35 @@ class Product:
             # 先檢查商品是否存在
             cursor.execute("SELECT COUNT(*) FROM Product WHERE gsNo = ?", (gsNo,))
             count = cursor.fetchone()[0]
-            logging.info(f"找到 {count} 個商品")
+            logger.debug("找到 %d 個商品", count)
 
             if count == 0:
-                logging.warning("商品不存在")
+                logger.warning("商品不存在")
                 return {"error": "商品不存在"}
 
             # 關閉外鍵約束
             cursor.execute("PRAGMA foreign_keys = OFF")
-            logging.info("已關閉外鍵約束")
+            logger.debug("已關閉外鍵約束")
 
             # 刪除相關記錄（按照順序）
             tables = ["Product", "OrderTable"]
             for table in tables:
                 cursor.execute(f"DELETE FROM {table} WHERE gsNo = ?", (gsNo,))
-                logging.info(f"從 {table} 刪除了 {cursor.rowcount} 條記錄")
+                logger.debug("從 %s 刪除了 %d 條記錄", table, cursor.rowcount)
 
             conn.commit()
-            logging.info(f"商品刪除成功: {gsNo}")
+            logger.info(f"商品刪除成功: {gsNo}")
             return {"message": "商品刪除成功"}
 
         except sqlite3.Error as e:
-            logging.error(f"刪除商品失敗: {e}")
+            logger.error(f"刪除商品失敗: {e}")
             return {"error": f"刪除商品失敗: {e}"}
         finally:
             if conn:
                 cursor.execute("PRAGMA foreign_keys = ON")
                 conn.commit()
                 conn.close()
-                logging.info("數據庫連接已關閉")
+                logger.debug("數據庫連接已關閉")
 
 
 if __name__ == "__main__":
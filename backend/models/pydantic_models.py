@@ -49,6 +49,73 @@ class MemberResponse(BaseModel):
     creation_date: date
 
 
+class LedgerAccount(str, Enum):
+    """會員帳本科目"""
+
+    BALANCE = "balance"
+    REWARD_POINTS = "reward_points"
+
+
+class MemberSearchMatch(str, Enum):
+    """會員搜尋的符合方式"""
+
+    PHONE_PREFIX = "phone_prefix"
+    SUBSTRING = "substring"
+    FUZZY = "fuzzy"
+
+
+class MemberSearchResponse(BaseModel):
+    """會員搜尋結果"""
+
+    mContactNum: str
+    mName: str
+    mEmail: str
+    matchType: MemberSearchMatch
+
+
+class MemberLedgerCreate(BaseModel):
+    """會員餘額或回饋點數變動用"""
+
+    account: LedgerAccount
+    delta: int = Field(...)  # 正數為增加，負數為減少
+    reason: Optional[str] = Field(None, max_length=100)
+
+    @field_validator("delta")
+    @classmethod
+    def validate_delta(cls, v: int) -> int:
+        if v == 0:
+            raise ValueError("變動數量不能為 0")
+        return v
+
+
+class MemberLedgerResponse(BaseModel):
+    """會員帳本記錄響應模型"""
+
+    ledgerNo: int
+    mContactNum: str
+    account: LedgerAccount
+    delta: int
+    balanceAfter: int
+    reason: Optional[str] = None
+    createdAt: datetime
+
+
+class LedgerMismatch(BaseModel):
+    """對帳不一致明細"""
+
+    mContactNum: str
+    account: LedgerAccount
+    cached: int
+    expected: int
+
+
+class LedgerReconcileResponse(BaseModel):
+    """會員帳本對帳結果"""
+
+    checked: int
+    mismatches: list[LedgerMismatch]
+
+
 class MemberUpdate(BaseModel):
     """用於更新會員資料的數據模型"""
 
@@ -245,6 +312,40 @@ class MembershipStatusResponse(BaseModel):
     isActive: bool
 
 
+class MembershipDaysRemainingResponse(BaseModel):
+    """會籍剩餘天數響應模型"""
+
+    sId: int
+    mContactNum: str
+    endDate: date
+    daysRemaining: int
+
+
+class SweepMetricsResponse(BaseModel):
+    """會籍到期排程統計響應模型"""
+
+    runs: int
+    lastRunAt: Optional[str] = None
+    lastDurationMs: float
+    lastDeactivated: int
+    totalDeactivated: int
+    activeMemberships: int
+
+
+class CascadeProgressResponse(BaseModel):
+    """分批刪除工作進度響應模型"""
+
+    jobId: str
+    target: str
+    mContactNum: str
+    status: str
+    deleted: dict[str, int]
+    batches: int
+    startedAt: str
+    finishedAt: Optional[str] = None
+    error: Optional[str] = None
+
+
 class MembershipStatusUpdate(BaseModel):
     startDate: date | None = None
     endDate: date | None = None
@@ -290,6 +391,23 @@ class CheckInRecordUpdate(BaseModel):
     message: str
 
 
+class CheckInReason(str, Enum):
+    """入場判斷結果代碼"""
+
+    ADMITTED = "admitted"
+    MEMBER_NOT_FOUND = "member_not_found"
+    NO_ACTIVE_MEMBERSHIP = "no_active_membership"
+    ALREADY_CHECKED_IN = "already_checked_in"
+
+
+class CheckInResultResponse(BaseModel):
+    """入場判斷結果"""
+
+    admitted: bool
+    reason: CheckInReason
+    checkInNo: Optional[int] = None
+
+
 # 交易記錄
 """
     CREATE TABLE IF NOT EXISTS TransactionRecord (
@@ -356,3 +474,187 @@ class TransactionRecordUpdate(BaseModel):
     unitPrice: Optional[int] = Field(None, gt=0)
     discount: Optional[float] = Field(None, gt=0, le=1)
     paymentMethod: Optional[PaymentMethod] = None
+
+
+class MembershipPurchaseCreate(BaseModel):
+    """購買會籍方案請求模型"""
+
+    mContactNum: str = Field(..., min_length=1, max_length=20)
+    gsNo: str = Field(..., min_length=1, max_length=20)
+    paymentMethod: PaymentMethod
+    startDate: Optional[date] = None  # 預設為今天
+    discount: float = Field(default=1.0, gt=0, le=1)
+
+
+# 回饋點數規則
+
+
+class RewardPointRuleCreate(BaseModel):
+    """創建回饋點數規則用（gsNo 與 paymentMethod 皆空為預設規則）"""
+
+    gsNo: Optional[str] = Field(None, min_length=1, max_length=20)
+    paymentMethod: Optional[PaymentMethod] = None
+    pointsPerDollar: float = Field(..., ge=0)
+
+
+class RewardPointRuleResponse(BaseModel):
+    """回饋點數規則響應模型"""
+
+    ruleId: int
+    gsNo: Optional[str] = None
+    paymentMethod: Optional[PaymentMethod] = None
+    pointsPerDollar: float
+    isActive: bool
+
+
+class PointsAdjustment(BaseModel):
+    """點數重算差額"""
+
+    mContactNum: str
+    delta: int
+    applied: bool
+
+
+class PointsRecomputeResponse(BaseModel):
+    """點數重算結果"""
+
+    checked: int
+    adjustments: list[PointsAdjustment]
+
+
+# 會員總覽
+
+
+class MemberPhotoInfo(BaseModel):
+    """會員照片資訊（不含照片內容）"""
+
+    mPhotoName: str
+    isActive: bool
+
+
+class MemberProfileResponse(BaseModel):
+    """會員總覽響應模型"""
+
+    member: MemberResponse
+    membershipStatus: Optional[MembershipStatusResponse] = None
+    photo: Optional[MemberPhotoInfo] = None
+    openCheckIn: Optional[CheckInRecordResponse] = None
+    recentTransactions: list[TransactionRecordResponse] = []
+
+
+class ArchiveRunResponse(BaseModel):
+    """歷史記錄封存結果響應模型"""
+
+    cutoff: date
+    archived: dict[str, int]
+
+
+class ArchiveFileResponse(BaseModel):
+    """封存數據庫響應模型"""
+
+    year: int
+    path: str
+    counts: dict[str, int]
+
+
+class BackupResultResponse(BaseModel):
+    """數據庫備份結果響應模型"""
+
+    name: str
+    sizeBytes: int
+    pages: int
+    steps: int
+    restarts: int
+    fullCopyFallback: bool
+    durationMs: float
+    lockedMs: float
+    maxStepLockedMs: float
+    throughputBytesPerSec: float
+    integrity: str
+    createdAt: str
+
+
+class BackupFileResponse(BaseModel):
+    """備份檔響應模型"""
+
+    name: str
+    sizeBytes: int
+    createdAt: str
+
+
+class BackupMetricsResponse(BaseModel):
+    """數據庫備份統計響應模型"""
+
+    runs: int
+    failures: int
+    lastError: Optional[str] = None
+    lastBackup: Optional[BackupResultResponse] = None
+
+
+# 分店
+
+
+class BranchCreate(BaseModel):
+    """創建分店用"""
+
+    branchId: str = Field(..., min_length=1, max_length=20, pattern=r"^[A-Za-z0-9]+$")
+    bName: str = Field(..., min_length=1, max_length=50)
+
+
+class BranchResponse(BaseModel):
+    """分店響應模型"""
+
+    branchId: str
+    bName: str
+    createdAt: datetime
+
+
+class BranchOccupancyResponse(BaseModel):
+    """分店在場人數響應模型"""
+
+    branchId: str
+    bName: str
+    occupancy: int
+    checkInsToday: int
+
+
+class BranchRevenueResponse(BaseModel):
+    """分店營收響應模型"""
+
+    branchId: str
+    bName: str
+    transactions: int
+    revenue: int
+
+
+class ChangeOperation(str, Enum):
+    """變更記錄的操作"""
+
+    INSERT = "insert"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class ChangeResponse(BaseModel):
+    """一筆資料列的變更（row 為目前內容，刪除時為 None；分店的變更 branchId 為來源分店）"""
+
+    changeVersion: int
+    tableName: str
+    rowKey: str
+    operation: ChangeOperation
+    row: Optional[dict[str, Any]] = None
+    branchId: Optional[str] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    """變更記錄響應模型（version 為下次查詢的 since）"""
+
+    version: int
+    hasMore: bool
+    changes: list[ChangeResponse]
+
+
+class ChangeVersionResponse(BaseModel):
+    """目前最新的變更版本"""
+
+    version: int
@@ -0,0 +1,453 @@
+"""
+回饋點數規則類別：依商品/會籍編號或付款方式設定每一元可累積的點數，
+並在新增交易記錄時於同一個交易中累積或兌換點數
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import logging
+import sqlite3
+from typing import Optional, TypedDict
+
+from database import get_connection, retry_when_busy
+from models.member_ledger import apply_ledger_change
+from services.cache_version import bump_cache_version, get_cache_version
+from services.member_key_sync import applied_change_no, current_contact
+from services.record_archive import (
+    archive_years,
+    attach_archives,
+    detach_archives,
+    get_watermark,
+)
+
+logger = logging.getLogger(__name__)
+
+
+"""
+    CREATE TABLE IF NOT EXISTS RewardPointRule (
+        ruleId INTEGER PRIMARY KEY AUTOINCREMENT,
+        gsNo VARCHAR(20),
+        paymentMethod VARCHAR(20),
+        pointsPerDollar REAL NOT NULL CHECK (pointsPerDollar >= 0),
+        isActive INTEGER DEFAULT 1
+    )
+"""
+
+# 交易點數相關帳本記錄的原因前綴，重算時以此辨識
+POINTS_REASON_PREFIX = "交易點數"
+
+# 規則快取在 CacheVersion 中的名稱，任一程序修改規則時更新版本
+RULE_CACHE_NAME = "RewardPointRule"
+
+_rule_cache: Optional[dict[tuple[Optional[str], Optional[str]], float]] = None
+_rule_cache_version: Optional[int] = None
+
+
+class RewardPointRuleDict(TypedDict):
+    """回饋點數規則資料結構定義"""
+
+    ruleId: int
+    gsNo: Optional[str]
+    paymentMethod: Optional[str]
+    pointsPerDollar: float
+    isActive: bool
+
+
+def invalidate_rule_cache() -> None:
+    """規則異動後清除快取"""
+    global _rule_cache
+    _rule_cache = None
+
+
+def _load_rules(cursor: sqlite3.Cursor) -> dict[tuple[Optional[str], Optional[str]], float]:
+    """讀取有效規則（使用快取，版本與 CacheVersion 不同時重新載入）"""
+    global _rule_cache, _rule_cache_version
+    version = get_cache_version(cursor, RULE_CACHE_NAME)
+    if _rule_cache is None or version != _rule_cache_version:
+        cursor.execute(
+            "SELECT gsNo, paymentMethod, pointsPerDollar FROM RewardPointRule WHERE isActive = 1"
+        )
+        _rule_cache = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        _rule_cache_version = version
+    return _rule_cache
+
+
+def warm_rule_cache() -> int:
+    """啟動時預先載入規則快取，回傳規則數量"""
+    conn = get_connection()
+    if not conn:
+        return 0
+
+    try:
+        invalidate_rule_cache()
+        return len(_load_rules(conn.cursor()))
+    finally:
+        conn.close()
+
+
+def points_per_dollar(cursor: sqlite3.Cursor, gsNo: str, paymentMethod: str) -> float:
+    """
+    取得適用的累積比例
+
+    優先順序：商品+付款方式 > 商品 > 付款方式 > 預設規則（兩者皆空）
+    沒有任何規則時不累積點數。
+    """
+    rules = _load_rules(cursor)
+    for key in (
+        (gsNo, paymentMethod),
+        (gsNo, None),
+        (None, paymentMethod),
+        (None, None),
+    ):
+        if key in rules:
+            return rules[key]
+    return 0.0
+
+
+def redemption_reason(tNo: int, branchId: Optional[str] = None) -> str:
+    """以回饋點數付款的交易扣除點數時的帳本原因"""
+    source = f"tNo={tNo}" if branchId is None else f"branch={branchId} tNo={tNo}"
+    return f"{POINTS_REASON_PREFIX} 兌換 {source}"
+
+
+def is_redeemed(cursor: sqlite3.Cursor, tNo: int, branchId: str) -> bool:
+    """分店交易的點數是否已經扣除（分店兌換在寫入交易前扣除）"""
+    cursor.execute(
+        "SELECT 1 FROM MemberLedger WHERE account = 'reward_points' AND reason = ? LIMIT 1",
+        (redemption_reason(tNo, branchId),),
+    )
+    return cursor.fetchone() is not None
+
+
+def apply_transaction_points(
+    cursor: sqlite3.Cursor,
+    mContactNum: str,
+    gsNo: str,
+    paymentMethod: str,
+    totalAmount: int,
+    tNo: int,
+    branchId: Optional[str] = None,
+    redeemed: bool = False,
+) -> dict[str, str]:
+    """
+    在呼叫者的交易中處理一筆交易的點數：
+    以回饋點數付款時先扣除點數，再依規則累積點數
+
+    Args:
+        branchId: 分店的交易（tNo 為分店數據庫中的編號）
+        redeemed: 點數已經扣除（分店兌換），只累積點數
+
+    Returns:
+        dict: 成功時為空 dict，失敗時包含 error
+    """
+    source = f"tNo={tNo}" if branchId is None else f"branch={branchId} tNo={tNo}"
+    if paymentMethod == "reward_points" and not redeemed:
+        result = apply_ledger_change(
+            cursor,
+            mContactNum,
+            "reward_points",
+            -totalAmount,
+            redemption_reason(tNo, branchId),
+        )
+        if "error" in result:
+            return result
+
+    points = int(totalAmount * points_per_dollar(cursor, gsNo, paymentMethod))
+    if points > 0:
+        result = apply_ledger_change(
+            cursor,
+            mContactNum,
+            "reward_points",
+            points,
+            f"{POINTS_REASON_PREFIX} 累積 {source}",
+        )
+        if "error" in result:
+            return result
+    return {}
+
+
+def reverse_transaction_points(
+    cursor: sqlite3.Cursor, mContactNum: str, tNo: int
+) -> dict[str, str]:
+    """
+    在呼叫者的交易中沖銷主數據庫一筆交易已處理的點數（修改或刪除交易前呼叫）
+
+    以帳本中這筆交易的兌換、累積與先前沖銷記錄的加總寫入一筆相反的記錄，
+    重算時交易點數相關記錄的加總與剩下的交易一致。
+
+    Returns:
+        dict: 成功時為空 dict，失敗時包含 error（例如累積的點數已經用掉）
+    """
+    cursor.execute(
+        """
+        SELECT COALESCE(SUM(delta), 0) FROM MemberLedger
+        WHERE mContactNum = ? AND account = 'reward_points' AND reason IN (?, ?, ?)
+        """,
+        (
+            mContactNum,
+            *(f"{POINTS_REASON_PREFIX} {kind} tNo={tNo}" for kind in ("兌換", "累積", "沖銷")),
+        ),
+    )
+    applied = cursor.fetchone()[0]
+    if applied == 0:
+        return {}
+    result = apply_ledger_change(
+        cursor,
+        mContactNum,
+        "reward_points",
+        -applied,
+        f"{POINTS_REASON_PREFIX} 沖銷 tNo={tNo}",
+    )
+    return {"error": result["error"]} if "error" in result else {}
+
+
+def _replay_branch_points(cursor: sqlite3.Cursor) -> dict[str, int]:
+    """
+    依目前規則彙總各分店已轉送到主數據庫的交易應有的點數變動
+
+    轉送版本在呼叫者的交易中讀取；尚未轉送的交易還沒有處理點數，不計入，
+    但已經扣除點數的兌換（分店兌換在寫入交易前扣除）計入扣除的點數。
+    分店尚未套用的會員換電話以目前的電話計算。
+    """
+    # services.branches 匯入 models，在這裡才匯入以避免循環匯入
+    from services.branches import branch_path, get_branches
+
+    cursor.execute("SELECT branchId, relayedVersion FROM BranchRelay")
+    relayed = dict(cursor.fetchall())
+    replayed: dict[str, int] = {}
+    for branch in get_branches():
+        path = branch_path(branch["branchId"])
+        if not path.exists():
+            continue
+        conn = get_connection(path)
+        if conn is None:
+            raise sqlite3.OperationalError(f"分店數據庫連接失敗: {path}")
+        try:
+            branch_cursor = conn.cursor()
+            branch_cursor.execute("BEGIN")
+            applied = applied_change_no(branch_cursor)
+            unrelayed = """
+                SELECT CAST(rowKey AS INTEGER) FROM ChangeLog
+                WHERE tableName = 'TransactionRecord' AND operation = 'insert'
+                    AND changeVersion > ?
+            """
+            version = relayed.get(branch["branchId"], 0)
+            branch_cursor.execute(
+                f"""
+                SELECT mContactNum, gsNo, paymentMethod, totalAmount, COUNT(*)
+                FROM TransactionRecord
+                WHERE tNo NOT IN ({unrelayed})
+                GROUP BY mContactNum, gsNo, paymentMethod, totalAmount
+                """,
+                (version,),
+            )
+            groups = branch_cursor.fetchall()
+            branch_cursor.execute(
+                f"""
+                SELECT tNo, mContactNum, totalAmount FROM TransactionRecord
+                WHERE paymentMethod = 'reward_points' AND tNo IN ({unrelayed})
+                """,
+                (version,),
+            )
+            pending = branch_cursor.fetchall()
+        finally:
+            conn.rollback()
+            conn.close()
+
+        for tNo, mContactNum, totalAmount in pending:
+            if is_redeemed(cursor, tNo, branch["branchId"]):
+                mContactNum = current_contact(cursor, mContactNum, applied)
+                replayed[mContactNum] = replayed.get(mContactNum, 0) - totalAmount
+
+        for mContactNum, gsNo, paymentMethod, totalAmount, count in groups:
+            points = int(totalAmount * points_per_dollar(cursor, gsNo, paymentMethod))
+            if paymentMethod == "reward_points":
+                points -= totalAmount
+            mContactNum = current_contact(cursor, mContactNum, applied)
+            replayed[mContactNum] = replayed.get(mContactNum, 0) + points * count
+    return replayed
+
+
+class RewardPointRule:
+    """回饋點數規則類別：負責規則的新增、查詢、刪除與點數重算"""
+
+    @classmethod
+    @retry_when_busy
+    def create_rule(
+        cls,
+        pointsPerDollar: float,
+        gsNo: Optional[str] = None,
+        paymentMethod: Optional[str] = None,
+    ) -> dict[str, str]:
+        """新增規則（同一組商品/付款方式只能有一條規則）"""
+        conn = get_connection()
+        if not conn:
+            return {"error": "數據庫連接失敗"}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                INSERT INTO RewardPointRule (gsNo, paymentMethod, pointsPerDollar)
+                VALUES (?, ?, ?)
+                """,
+                (gsNo, paymentMethod, pointsPerDollar),
+            )
+            ruleId = cursor.lastrowid
+            bump_cache_version(cursor, RULE_CACHE_NAME)
+            conn.commit()
+            invalidate_rule_cache()
+            return {"message": "回饋點數規則創建成功", "ruleId": str(ruleId)}
+        except sqlite3.IntegrityError:
+            return {"error": "回饋點數規則已存在"}
+        except sqlite3.Error as e:
+            return {"error": f"數據庫錯誤: {str(e)}"}
+        finally:
+            conn.close()
+
+    @classmethod
+    def get_all_rules(cls) -> list[RewardPointRuleDict]:
+        """查詢所有規則"""
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM RewardPointRule ORDER BY ruleId")
+            return [
+                dict(zip(RewardPointRuleDict.__annotations__.keys(), row))
+                for row in cursor.fetchall()
+            ]
+        except sqlite3.Error as e:
+            logger.error(f"查詢回饋點數規則失敗: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @classmethod
+    @retry_when_busy
+    def delete_rule(cls, ruleId: int) -> dict[str, str]:
+        """刪除規則"""
+        conn = get_connection()
+        if not conn:
+            return {"error": "數據庫連接失敗"}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM RewardPointRule WHERE ruleId = ?", (ruleId,))
+            if cursor.rowcount == 0:
+                return {"error": "回饋點數規則不存在"}
+            bump_cache_version(cursor, RULE_CACHE_NAME)
+            conn.commit()
+            invalidate_rule_cache()
+            return {"message": "回饋點數規則刪除成功"}
+        except sqlite3.Error as e:
+            return {"error": f"數據庫錯誤: {str(e)}"}
+        finally:
+            conn.close()
+
+    @classmethod
+    def recompute_points(cls, apply: bool = False) -> dict:
+        """
+        依目前規則重算所有交易記錄應有的點數
+
+        以一次 GROUP BY 彙總全部交易（含封存數據庫中早於封存時間點的交易，
+        每筆交易以 LEFT JOIN 找出適用規則），加上各分店已轉送的交易，
+        再與帳本中交易點數相關記錄的加總比較。
+        封存數據庫中不早於封存時間點的記錄（例如換過主數據庫後留下的舊檔）不計入。
+        apply 為 True 時，對差額寫入一筆調整記錄。
+
+        Returns:
+            dict: checked（有交易的會員數）、adjustments（差額明細）
+        """
+        conn = get_connection()
+        if not conn:
+            return {"error": "數據庫連接失敗"}
+
+        cursor = conn.cursor()
+        aliases = []
+        try:
+            # services.branches 匯入 models，在這裡才匯入以避免循環匯入
+            from services.branches import relay_all_branches
+
+            # 先轉送分店的交易，讓點數處理與重算一致
+            relay_all_branches()
+            # ATTACH 必須在交易開始前執行；沒有封存時間點表示沒有封存過任何交易
+            watermark = get_watermark(cursor, "TransactionRecord")
+            years = []
+            if watermark is not None:
+                years = [year for year in archive_years() if year <= int(watermark[:4])]
+            aliases = attach_archives(cursor, years, "TransactionRecord")
+            transactions = " UNION ALL ".join(
+                ["SELECT * FROM main.TransactionRecord"]
+                + [
+                    f"SELECT * FROM {alias}.TransactionRecord WHERE transDateTime < '{watermark}'"
+                    for alias in aliases
+                ]
+            )
+            cursor.execute("BEGIN IMMEDIATE" if apply else "BEGIN")
+            cursor.execute(
+                f"""
+                SELECT t.mContactNum,
+                    SUM(CAST(t.totalAmount * COALESCE(
+                        r1.pointsPerDollar, r2.pointsPerDollar,
+                        r3.pointsPerDollar, r4.pointsPerDollar, 0
+                    ) AS INTEGER))
+                    - SUM(CASE WHEN t.paymentMethod = 'reward_points'
+                          THEN CAST(t.totalAmount AS INTEGER) ELSE 0 END)
+                FROM ({transactions}) t
+                LEFT JOIN RewardPointRule r1 ON r1.isActive = 1
+                    AND r1.gsNo = t.gsNo AND r1.paymentMethod = t.paymentMethod
+                LEFT JOIN RewardPointRule r2 ON r2.isActive = 1
+                    AND r2.gsNo = t.gsNo AND r2.paymentMethod IS NULL
+                LEFT JOIN RewardPointRule r3 ON r3.isActive = 1
+                    AND r3.gsNo IS NULL AND r3.paymentMethod = t.paymentMethod
+                LEFT JOIN RewardPointRule r4 ON r4.isActive = 1
+                    AND r4.gsNo IS NULL AND r4.paymentMethod IS NULL
+                GROUP BY t.mContactNum
+                """
+            )
+            replayed = dict(cursor.fetchall())
+            for mContactNum, points in _replay_branch_points(cursor).items():
+                replayed[mContactNum] = replayed.get(mContactNum, 0) + points
+
+            cursor.execute(
+                """
+                SELECT mContactNum, SUM(delta) FROM MemberLedger
+                WHERE account = 'reward_points' AND reason LIKE ?
+                GROUP BY mContactNum
+                """,
+                (f"{POINTS_REASON_PREFIX}%",),
+            )
+            recorded = dict(cursor.fetchall())
+
+            adjustments = []
+            for mContactNum in sorted(replayed.keys() | recorded.keys()):
+                diff = replayed.get(mContactNum, 0) - recorded.get(mContactNum, 0)
+                if diff == 0:
+                    continue
+                adjustment = {"mContactNum": mContactNum, "delta": diff, "applied": False}
+                if apply:
+                    result = apply_ledger_change(
+                        cursor,
+                        mContactNum,
+                        "reward_points",
+                        diff,
+                        f"{POINTS_REASON_PREFIX} 重算調整",
+                    )
+                    adjustment["applied"] = "error" not in result
+                adjustments.append(adjustment)
+
+            conn.commit()
+            logger.info(f"回饋點數重算完成: {len(adjustments)} 位會員有差額")
+            return {"checked": len(replayed), "adjustments": adjustments}
+        except sqlite3.Error as e:
+            conn.rollback()
+            return {"error": f"數據庫錯誤: {str(e)}"}
+        finally:
+            detach_archives(cursor, aliases)
+            conn.close()
@@ -43,16 +43,21 @@ from pathlib import Path
 
 # 將專案根目錄加入 Python 路徑
 sys.path.append(str(Path(__file__).resolve().parent.parent))
-from typing import TypedDict, Optional
-from database import get_connection
+from typing import TypedDict, Optional, Sequence
+from database import get_connection, retry_when_busy
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime
 import pytz
 import logging
-from icecream import ic
 from pydantic import BaseModel, Field
+from models.reward_point_rule import apply_transaction_points, reverse_transaction_points
+from services.record_archive import select_with_archives
+from services.event_stream import notify_committed
+from services.write_queue import WriteTimeout, run_write
 from typing import Literal
 
+logger = logging.getLogger(__name__)
+
 
 class TransactionRecordDict(TypedDict):
     """交易記錄資料結構"""
@@ -68,6 +73,10 @@ class TransactionRecordDict(TypedDict):
     paymentMethod: str
 
 
+# fields= 可選擇的欄位
+TRANSACTION_RECORD_COLUMNS = tuple(TransactionRecordDict.__annotations__)
+
+
 class TransactionDetail(BaseModel):
     """交易詳情模型"""
 
@@ -78,10 +87,169 @@ class TransactionDetail(BaseModel):
     paymentMethod: Literal["cash", "credit_card", "e_transfer", "reward_points"]
 
 
+def transaction_total(unitPrice: int, count: int, discount: float) -> int:
+    """交易總金額：四捨五入到整數，寫入 totalAmount 與處理點數都使用這個值"""
+    return round(unitPrice * count * discount)
+
+
+def _item_exists(cursor: sqlite3.Cursor, gsNo: str) -> bool:
+    """商品或會籍方案是否存在"""
+    cursor.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM Product WHERE gsNo = ?)
+            OR EXISTS (SELECT 1 FROM MembershipPlan WHERE gsNo = ?)
+        """,
+        (gsNo, gsNo),
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def _create_transaction_record(cursor: sqlite3.Cursor, transaction_dict: dict) -> dict[str, str]:
+    """新增交易記錄並處理點數（在寫入佇列的交易中執行）"""
+    # 檢查會員是否存在
+    cursor.execute(
+        "SELECT COUNT(*) FROM Member WHERE mContactNum = ?",
+        (transaction_dict["mContactNum"],),
+    )
+    member_count = cursor.fetchone()[0]
+    if member_count == 0:
+        return {"error": "會員不存在"}
+
+    # 使用台北時區
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    trans_datetime = datetime.now(taipei_tz)
+
+    if not _item_exists(cursor, transaction_dict["gsNo"]):
+        return {"error": "商品或會籍方案不存在"}
+
+    total_amount = transaction_total(
+        transaction_dict["unitPrice"],
+        transaction_dict["count"],
+        transaction_dict["discount"],
+    )
+
+    # 新增交易記錄
+    cursor.execute(
+        """
+        INSERT INTO TransactionRecord (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod) 
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            transaction_dict["mContactNum"],
+            trans_datetime,
+            transaction_dict["gsNo"],
+            transaction_dict["count"],
+            transaction_dict["unitPrice"],
+            transaction_dict["discount"],
+            total_amount,
+            transaction_dict["paymentMethod"],
+        ),
+    )
+
+    # 同一個交易中兌換或累積回饋點數
+    points_result = apply_transaction_points(
+        cursor,
+        transaction_dict["mContactNum"],
+        transaction_dict["gsNo"],
+        transaction_dict["paymentMethod"],
+        total_amount,
+        cursor.lastrowid,
+    )
+    if "error" in points_result:
+        return points_result
+
+    return {"message": "交易記錄創建成功"}
+
+
+def _update_transaction_record(
+    cursor: sqlite3.Cursor, mContactNum: str, tNo: int, updates: dict
+) -> dict[str, str]:
+    """
+    修改交易記錄並重新處理點數（在寫入佇列的交易中執行）
+
+    先沖銷這筆交易已處理的點數，再依修改後的內容兌換或累積。
+    """
+    cursor.execute("SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,))
+    if cursor.fetchone()[0] == 0:
+        return {"error": "會員不存在"}
+
+    cursor.execute(
+        """
+        SELECT mContactNum, gsNo, count, unitPrice, discount, paymentMethod
+        FROM TransactionRecord WHERE tNo = ?
+        """,
+        (tNo,),
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return {"error": "交易紀錄不存在"}
+
+    owner = row[0]
+    current = dict(zip(("gsNo", "count", "unitPrice", "discount", "paymentMethod"), row[1:]))
+    current.update(updates)
+    if "gsNo" in updates and not _item_exists(cursor, current["gsNo"]):
+        return {"error": "商品或會籍方案不存在"}
+    total_amount = transaction_total(
+        current["unitPrice"], current["count"], current["discount"]
+    )
+    if total_amount <= 0:
+        return {"error": "金額必須大於0"}
+
+    result = reverse_transaction_points(cursor, owner, tNo)
+    if "error" in result:
+        return result
+
+    cursor.execute(
+        """
+        UPDATE TransactionRecord
+        SET gsNo = ?, count = ?, unitPrice = ?, discount = ?, totalAmount = ?, paymentMethod = ?
+        WHERE tNo = ?
+        """,
+        (
+            current["gsNo"],
+            current["count"],
+            current["unitPrice"],
+            current["discount"],
+            total_amount,
+            current["paymentMethod"],
+            tNo,
+        ),
+    )
+
+    result = apply_transaction_points(
+        cursor, owner, current["gsNo"], current["paymentMethod"], total_amount, tNo
+    )
+    if "error" in result:
+        return result
+    return {"message": "交易記錄更新成功"}
+
+
+def _delete_transaction_record(
+    cursor: sqlite3.Cursor, mContactNum: str, tNo: int
+) -> dict[str, str]:
+    """刪除交易記錄並沖銷已處理的點數（在寫入佇列的交易中執行）"""
+    cursor.execute("SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,))
+    if cursor.fetchone()[0] == 0:
+        return {"error": "會員不存在"}
+
+    cursor.execute("SELECT mContactNum FROM TransactionRecord WHERE tNo = ?", (tNo,))
+    row = cursor.fetchone()
+    if row is None:
+        return {"error": "交易紀錄不存在"}
+
+    result = reverse_transaction_points(cursor, row[0], tNo)
+    if "error" in result:
+        return result
+
+    cursor.execute("DELETE FROM TransactionRecord WHERE tNo = ?", (tNo,))
+    return {"message": "交易記錄刪除成功"}
+
+
 class TransactionRecord:
     """交易記錄模型"""
 
     @classmethod
+    @retry_when_busy
     def create_transaction_record(cls, transaction_dict: dict) -> dict[str, str]:
         """新增交易記錄
 
@@ -96,78 +264,25 @@ class TransactionRecord:
 
         """
 
-        conn = get_connection()
-        if not conn:
-            return {"error": "數據庫連接失敗"}
-
         try:
-            cursor = conn.cursor()
-
-            # 檢查會員是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM Member WHERE mContactNum = ?",
-                (transaction_dict["mContactNum"],),
-            )
-            member_count = cursor.fetchone()[0]
-            if member_count == 0:
-                return {"error": "會員不存在"}
-
-            # 使用台北時區
-            taipei_tz = pytz.timezone("Asia/Taipei")
-            trans_datetime = datetime.now(taipei_tz)
-
-            cursor.execute(
-                """
-                SELECT
-                    CASE
-                        WHEN EXISTS (SELECT 1 FROM Product WHERE gsNo = ?) THEN 'product'
-                        WHEN EXISTS (SELECT 1 FROM MembershipPlan WHERE gsNo = ?) THEN 'membership_plan'
-                        ELSE 'not_found'
-                    END
-                """,
-                (transaction_dict["gsNo"], transaction_dict["gsNo"]),
-            )
-            item_type = cursor.fetchone()[0]
-            if item_type == "not_found":
-                return {"error": "商品或會籍方案不存在"}
-
-            # 計算總金額
-            total_amount = (
-                transaction_dict["unitPrice"]
-                * transaction_dict["count"]
-                * transaction_dict["discount"]
-            )
-
-            # 新增交易記錄
-            cursor.execute(
-                """
-                INSERT INTO TransactionRecord (mContactNum, transDateTime, gsNo, count, unitPrice, discount, totalAmount, paymentMethod) 
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    transaction_dict["mContactNum"],
-                    trans_datetime,
-                    transaction_dict["gsNo"],
-                    transaction_dict["count"],
-                    transaction_dict["unitPrice"],
-                    transaction_dict["discount"],
-                    total_amount,
-                    transaction_dict["paymentMethod"],
-                ),
-            )
-
-            conn.commit()
-            return {"message": "交易記錄創建成功"}
+            result = run_write(_create_transaction_record, transaction_dict)
+            if "error" not in result:
+                notify_committed()
+            return result
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
         except sqlite3.Error as e:
             return {"error": f"數據庫操作失敗: {e}"}
-        finally:
-            conn.close()
 
     @classmethod
     def get_member_transaction_record(
-        cls, mContactNum: str
+        cls,
+        mContactNum: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
     ) -> list[TransactionRecordDict]:
-        """查詢會員的所有交易記錄"""
+        """查詢會員的所有交易記錄（日期範圍早於封存時間點時一併查詢封存數據庫）"""
 
         conn = get_connection()
         if not conn:
@@ -185,14 +300,14 @@ class TransactionRecord:
                 return []
 
             # 查詢該會員交易記錄
-            cursor.execute(
-                """
-                SELECT * FROM TransactionRecord WHERE mContactNum = ?
-                ORDER BY transDateTime DESC
-                """,
+            transaction_records = select_with_archives(
+                cursor,
+                "TransactionRecord",
+                "mContactNum = ?",
                 (mContactNum,),
+                start_date,
+                end_date,
             )
-            transaction_records = cursor.fetchall()
 
             if not transaction_records:
                 return []
@@ -203,174 +318,118 @@ class TransactionRecord:
                 for record in transaction_records
             ]
         except sqlite3.Error as e:
-            logging.error(f"查詢交易記錄失敗: {str(e)}")
+            logger.error(f"查詢交易記錄失敗: {str(e)}")
             return []
         finally:
             conn.close()
 
     @classmethod
-    def get_all_transaction_records(cls) -> list[TransactionRecordDict]:
-        """查詢所有交易記錄"""
+    def get_all_transaction_records(
+        cls,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        columns: Optional[Sequence[str]] = None,
+    ) -> list[TransactionRecordDict]:
+        """
+        查詢所有交易記錄
 
+        Args:
+            columns: 只查詢這些欄位（需為 TRANSACTION_RECORD_COLUMNS 中的欄位），None 表示所有欄位
+        """
+        columns = tuple(columns or TRANSACTION_RECORD_COLUMNS)
         conn = get_connection()
         if not conn:
             return []
 
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM TransactionRecord")
-            transaction_records = cursor.fetchall()
-            return [
-                dict(zip(TransactionRecordDict.__annotations__.keys(), record))
-                for record in transaction_records
-            ]
+            transaction_records = select_with_archives(
+                cursor,
+                "TransactionRecord",
+                "1 = 1",
+                (),
+                start_date,
+                end_date,
+                descending=False,
+                columns=columns,
+            )
+            return [dict(zip(columns, record)) for record in transaction_records]
         except sqlite3.Error as e:
-            logging.error(f"查詢交易記錄失敗: {str(e)}")
+            logger.error(f"查詢交易記錄失敗: {str(e)}")
             return []
         finally:
             conn.close()
 
     @classmethod
+    @retry_when_busy
     def update_transaction_record(
         cls, mContactNum: str, tNo: int, updates: dict
     ) -> dict[str, str]:
-        """更新交易記錄"""
-
-        conn = get_connection()
-        if not conn:
-            return {"error": "數據庫連接失敗"}
+        """更新交易記錄（已處理的點數依修改後的內容重新計算）"""
+
+        new_gsNo = updates.get("gsNo", None)
+        new_count = updates.get("count", None)
+        new_unitPrice = updates.get("unitPrice", None)
+        new_discount = updates.get("discount", None)
+        new_paymentMethod = updates.get("paymentMethod", None)
+
+        valid_updates = {}
+        if new_gsNo is not None:
+            valid_updates["gsNo"] = new_gsNo
+        if new_count is not None:
+            if not isinstance(new_count, int) or new_count <= 0:
+                return {"error": "無效的數量值"}
+            valid_updates["count"] = new_count
+        if new_unitPrice is not None:
+            if not isinstance(new_unitPrice, int) or new_unitPrice <= 0:
+                return {"error": "無效的單價值"}
+            valid_updates["unitPrice"] = new_unitPrice
+        if new_discount is not None:
+            if (
+                not isinstance(new_discount, (int, float))
+                or new_discount <= 0
+                or new_discount > 1
+            ):
+                return {"error": "無效的折扣值"}
+            valid_updates["discount"] = new_discount
+        if new_paymentMethod is not None:
+            valid_methods = ["cash", "credit_card", "e_transfer", "reward_points"]
+            if new_paymentMethod not in valid_methods:
+                return {"error": "無效的支付方式"}
+            valid_updates["paymentMethod"] = new_paymentMethod
+
+        if not valid_updates:
+            return {"error": "沒有有效的更新欄位"}
 
         try:
-            cursor = conn.cursor()
-
-            # 檢查會員是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,)
-            )
-            member_count = cursor.fetchone()[0]
-            if member_count == 0:
-                return {"error": "會員不存在"}
-
-            # 檢查交易紀錄是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM TransactionRecord WHERE tNo = ?",
-                (tNo,),
-            )
-            transaction_count = cursor.fetchone()[0]
-            if transaction_count == 0:
-                return {"error": "交易紀錄不存在"}
-
-            new_gsNo = updates.get("gsNo", None)
-            new_count = updates.get("count", None)
-            new_unitPrice = updates.get("unitPrice", None)
-            new_discount = updates.get("discount", None)
-            new_paymentMethod = updates.get("paymentMethod", None)
-
-            update_fields = []
-            update_values = []
-
-            if new_gsNo is not None:
-                update_fields.append("gsNo = ?")
-                update_values.append(new_gsNo)
-            if new_count is not None:
-                if not isinstance(new_count, int) or new_count <= 0:
-                    return {"error": "無效的數量值"}
-                update_fields.append("count = ?")
-                update_values.append(new_count)
-            if new_unitPrice is not None:
-                if not isinstance(new_unitPrice, int) or new_unitPrice <= 0:
-                    return {"error": "無效的單價值"}
-                update_fields.append("unitPrice = ?")
-                update_values.append(new_unitPrice)
-            if new_discount is not None:
-                if (
-                    not isinstance(new_discount, (int, float))
-                    or new_discount <= 0
-                    or new_discount > 1
-                ):
-                    return {"error": "無效的折扣值"}
-                update_fields.append("discount = ?")
-                update_values.append(new_discount)
-            if new_paymentMethod is not None:
-                valid_methods = ["cash", "credit_card", "e_transfer", "reward_points"]
-                if new_paymentMethod not in valid_methods:
-                    return {"error": "無效的支付方式"}
-                update_fields.append("paymentMethod = ?")
-                update_values.append(new_paymentMethod)
-
-            if not update_fields:
-                return {"error": "沒有有效的更新欄位"}
-
-            # 更新交易記錄
-            update_values.append(tNo)  # 添加 WHERE 條件的參數
-            sql = f"""
-                UPDATE TransactionRecord 
-                SET {', '.join(update_fields)}
-                WHERE tNo = ?
-            """
-            cursor.execute(sql, tuple(update_values))
-
-            if any(field in ["count", "unitPrice", "discount"] for field in updates):
-                # 更新總金額
-                cursor.execute(
-                    """
-                    UPDATE TransactionRecord 
-                    SET totalAmount = (count * unitPrice * discount)
-                    WHERE tNo = ?
-                    """,
-                    (tNo,),
-                )
-            conn.commit()
-            return {"message": "交易記錄更新成功"}
-
+            result = run_write(_update_transaction_record, mContactNum, tNo, valid_updates)
+            if "error" not in result:
+                notify_committed()
+            return result
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
         except sqlite3.Error as e:
             return {"error": f"數據庫操作失敗: {e}"}
-        finally:
-            conn.close()
 
     @classmethod
+    @retry_when_busy
     def delete_transaction_record(cls, mContactNum: str, tNo: int) -> dict[str, str]:
-        """刪除交易記錄"""
-
-        conn = get_connection()
-        if not conn:
-            return {"error": "數據庫連接失敗"}
+        """刪除交易記錄（一併沖銷已處理的點數）"""
 
         try:
-            cursor = conn.cursor()
-
-            # 檢查會員是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM Member WHERE mContactNum = ?", (mContactNum,)
-            )
-            member_count = cursor.fetchone()[0]
-            if member_count == 0:
-                return {"error": "會員不存在"}
-
-            # 檢查交易紀錄是否存在
-            cursor.execute(
-                "SELECT COUNT(*) FROM TransactionRecord WHERE tNo = ?",
-                (tNo,),
-            )
-            transaction_count = cursor.fetchone()[0]
-            if transaction_count == 0:
-                return {"error": "交易紀錄不存在"}
-
-            # 刪除交易記錄
-            cursor.execute(
-                "DELETE FROM TransactionRecord WHERE tNo = ?",
-                (tNo,),
-            )
-            conn.commit()
-            return {"message": "交易記錄刪除成功"}
-
+            result = run_write(_delete_transaction_record, mContactNum, tNo)
+            if "error" not in result:
+                notify_committed()
+            return result
+        except WriteTimeout:
+            # 寫入佇列逾時，由 write_timeout_handler 返回 503
+            raise
         except sqlite3.Error as e:
             return {"error": f"數據庫操作失敗: {e}"}
-        finally:
-            conn.close()
-
 
 if __name__ == "__main__":
+    from icecream import ic
 
     transaction_detail = TransactionDetail(
         gsNo="M001", count=2, unitPrice=100, discount=1, paymentMethod="cash"
@@ -0,0 +1,125 @@
+"""分店路由：分店管理、分店的會籍/入場/退場/交易，以及跨分店的在場人數與營收"""
+
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+from models.pydantic_models import (
+    BranchCreate,
+    BranchOccupancyResponse,
+    BranchResponse,
+    BranchRevenueResponse,
+    CheckInRecordCreate,
+    CheckInRecordResponse,
+    CheckInRecordUpdate,
+    CheckInResultResponse,
+    MembershipStatusCreate,
+    TransactionRecordCreate,
+)
+from services import branches
+
+router = APIRouter(tags=["branches"])
+
+
+def _require_branch(branchId: str) -> None:
+    if branches.get_branch(branchId) is None:
+        raise HTTPException(status_code=404, detail="分店不存在")
+
+
+@router.post("/branches/", response_model=dict[str, str])
+def create_branch(branch: BranchCreate) -> dict[str, str]:
+    """創建分店"""
+    result = branches.create_branch(branch.branchId, branch.bName)
+    if "error" in result:
+        if "分店已存在" in result["error"]:
+            raise HTTPException(status_code=400, detail="分店已存在")
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/branches/", response_model=list[BranchResponse])
+def get_branches() -> list[BranchResponse]:
+    """查詢所有分店"""
+    return branches.get_branches()
+
+
+@router.get("/branches/occupancy/", response_model=list[BranchOccupancyResponse])
+def get_branch_occupancy() -> list[BranchOccupancyResponse]:
+    """各分店目前在場人數與今天的入場次數（平行查詢各分店）"""
+    return branches.branch_occupancy()
+
+
+@router.get("/branches/revenue/", response_model=list[BranchRevenueResponse])
+def get_branch_revenue(
+    start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> list[BranchRevenueResponse]:
+    """各分店的交易筆數與營收（可指定日期範圍，平行查詢各分店）"""
+    return branches.branch_revenue(start_date, end_date)
+
+
+@router.post("/branches/{branchId}/membership_status/", response_model=dict[str, str])
+def create_branch_membership(
+    branchId: str, status: MembershipStatusCreate
+) -> dict[str, str]:
+    """在分店新增會籍"""
+    _require_branch(branchId)
+    result = branches.add_branch_membership(
+        branchId, status.mContactNum, status.startDate, status.endDate, status.isActive
+    )
+    if "error" in result:
+        if "數據庫錯誤" in result["error"]:
+            raise HTTPException(status_code=500, detail=result["error"])
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+
+@router.post("/branches/{branchId}/checkin/", response_model=CheckInResultResponse)
+def branch_check_in(branchId: str, record: CheckInRecordCreate) -> CheckInResultResponse:
+    """會員在分店入場（依該分店的會籍判斷）"""
+    _require_branch(branchId)
+    result = branches.branch_check_in(branchId, record.mContactNum)
+    if result is None:
+        raise HTTPException(status_code=500, detail="入場打卡失敗")
+    return result
+
+
+@router.put("/branches/{branchId}/checkin/{mContactNum}/", response_model=CheckInRecordUpdate)
+def branch_check_out(branchId: str, mContactNum: str) -> CheckInRecordUpdate:
+    """會員在分店退場"""
+    _require_branch(branchId)
+    result = branches.branch_check_out(branchId, mContactNum)
+    if "error" in result:
+        if "打卡記錄不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="打卡記錄不存在")
+        if "該記錄已經登出" in result["error"] or "登出時間必須晚於登入時間" in result["error"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get(
+    "/branches/{branchId}/checkin/{mContactNum}/", response_model=list[CheckInRecordResponse]
+)
+def get_branch_checkin_records(branchId: str, mContactNum: str) -> list[CheckInRecordResponse]:
+    """查詢會員在分店的打卡記錄"""
+    _require_branch(branchId)
+    return branches.branch_checkin_records(branchId, mContactNum)
+
+
+@router.post("/branches/{branchId}/transaction_records/", response_model=dict[str, str])
+def create_branch_transaction_record(
+    branchId: str, transaction_record: TransactionRecordCreate
+) -> dict[str, str]:
+    """在分店新增交易記錄（累積或兌換回饋點數）"""
+    _require_branch(branchId)
+    result = branches.create_branch_transaction(branchId, transaction_record.model_dump())
+    if "error" in result:
+        if (
+            "會員不存在" in result["error"]
+            or "商品或會籍方案不存在" in result["error"]
+            or "回饋點數不足" in result["error"]
+        ):
+            raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
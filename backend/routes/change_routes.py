@@ -0,0 +1,46 @@
+"""變更記錄（增量同步）路由"""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from models.pydantic_models import ChangeFeedResponse, ChangeVersionResponse
+from services.change_log import (
+    CHANGE_FEED_DEFAULT_LIMIT,
+    CHANGE_FEED_MAX_LIMIT,
+    get_changes,
+    get_latest_version,
+)
+
+router = APIRouter(tags=["changes"])
+
+
+@router.get("/changes/latest", response_model=ChangeVersionResponse)
+def get_change_version() -> ChangeVersionResponse:
+    """取得目前最新的版本（取得完整資料前先呼叫，之後以此查詢變更）"""
+    result = get_latest_version()
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/changes/", response_model=ChangeFeedResponse)
+def get_change_feed(
+    since: int = Query(..., ge=0),
+    limit: int = Query(CHANGE_FEED_DEFAULT_LIMIT, ge=1, le=CHANGE_FEED_MAX_LIMIT),
+    tables: Optional[str] = Query(None, description="只取得這些表格的變更，以逗號分隔，例如 CheckInRecord"),
+) -> ChangeFeedResponse:
+    """
+    取得 since 之後新增、修改、刪除的資料列
+
+    hasMore 為 true 時以返回的 version 繼續查詢；
+    返回 410 時變更記錄已清除，需重新取得完整資料。
+    """
+    table_list = [name.strip() for name in tables.split(",") if name.strip()] if tables else None
+    result = get_changes(since, limit, table_list)
+    if "error" in result:
+        if "不支援的表格" in result["error"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        if "請重新取得完整資料" in result["error"]:
+            raise HTTPException(status_code=410, detail=result["error"])
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
@@ -1,14 +1,18 @@
 """打卡記錄路由"""
 
-from fastapi import APIRouter, HTTPException
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Response
+from datetime import date, datetime
+from typing import Optional
 import pytz
-from models.checkinrecord import CheckInRecord
+from models.checkinrecord import CHECKIN_RECORD_COLUMNS, CheckInRecord
+from models.projection import parse_fields, project_model, projected_response
 from models.pydantic_models import (
+    CheckInResultResponse,
     CheckInRecordCreate,
     CheckInRecordResponse,
     CheckInRecordUpdate,
 )
+from services.table_version import table_etag
 
 router = APIRouter(tags=["checkinrecord"])
 
@@ -20,26 +24,56 @@ def create_checkin_record(record: CheckInRecordCreate) -> dict[str, str]:
     if "error" in result:
         if "會員不存在" in result["error"]:
             raise HTTPException(status_code=400, detail="會員不存在")
+        if "沒有有效會籍" in result["error"]:
+            raise HTTPException(status_code=400, detail="沒有有效會籍")
         if "已有未結束的打卡記錄" in result["error"]:
             raise HTTPException(status_code=400, detail="已有未結束的打卡記錄")
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
 
+@router.post("/checkinrecord/checkin/", response_model=CheckInResultResponse)
+def check_in(record: CheckInRecordCreate) -> CheckInResultResponse:
+    """會員入場（確認會員、有效會籍與未結束打卡後建立打卡記錄）"""
+    result = CheckInRecord.check_in(record.mContactNum)
+    if result is None:
+        raise HTTPException(status_code=500, detail="入場打卡失敗")
+    return result
+
+
 @router.get("/checkinrecord/{mContactNum}/", response_model=list[CheckInRecordResponse])
-def get_checkin_record(mContactNum: str) -> list[CheckInRecordResponse]:
-    """查詢特定會員的打卡記錄"""
-    record = CheckInRecord.get_checkin_record(mContactNum)
+def get_checkin_record(
+    mContactNum: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> list[CheckInRecordResponse]:
+    """查詢特定會員的打卡記錄（可指定日期範圍）"""
+    record = CheckInRecord.get_checkin_record(mContactNum, start_date, end_date)
     if not record:
         raise HTTPException(status_code=404, detail="打卡記錄不存在")
     return [CheckInRecordResponse(**record) for record in record]
 
 
-@router.get("/checkinrecord/", response_model=list[CheckInRecordResponse])
-def get_all_checkin_records() -> list[CheckInRecordResponse]:
-    """查詢所有打卡記錄"""
-    records = CheckInRecord.get_all_checkin_records()
-    return [CheckInRecordResponse(**record) for record in records]
+@router.get(
+    "/checkinrecord/",
+    response_model=None,
+    responses={200: {"model": list[CheckInRecordResponse]}},
+    dependencies=[table_etag("CheckInRecord")],
+)
+def get_all_checkin_records(
+    response: Response,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="只返回這些欄位，以逗號分隔，例如 mContactNum,checkInDatetime"),
+) -> Response:
+    """查詢所有打卡記錄（可指定日期範圍，fields= 只返回指定欄位）"""
+    try:
+        columns = parse_fields(fields, CHECKIN_RECORD_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model = project_model(CheckInRecordResponse, columns)
+    records = CheckInRecord.get_all_checkin_records(start_date, end_date, columns)
+    return projected_response(model, records, response)
 
 
 @router.put("/checkinrecord/{mContactNum}/", response_model=CheckInRecordUpdate)
@@ -58,6 +92,17 @@ def update_checkin_record(mContactNum: str) -> CheckInRecordUpdate:
     return result
 
 
+@router.post("/checkinrecord/auto_checkout/", response_model=dict[str, str])
+def auto_checkout(before: Optional[date] = None) -> dict[str, str]:
+    """批次自動登出 before（預設今天）之前仍未登出的打卡記錄"""
+    result = CheckInRecord.auto_checkout_open_visits(
+        before.isoformat() if before else None
+    )
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
 @router.delete("/checkinrecord/{mContactNum}/", response_model=dict[str, str])
 def delete_checkin_record(mContactNum: str) -> dict[str, str]:
     """刪除打卡記錄"""
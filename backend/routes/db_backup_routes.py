@@ -0,0 +1,53 @@
+"""數據庫備份路由"""
+
+from fastapi import APIRouter, HTTPException, Query
+from models.pydantic_models import (
+    BackupFileResponse,
+    BackupMetricsResponse,
+    BackupResultResponse,
+)
+from services.db_backup import (
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_RETENTION,
+    create_backup,
+    get_backup_metrics,
+    list_backups,
+    restore_backup,
+)
+
+router = APIRouter(tags=["db_backup"])
+
+
+@router.post("/backups/", response_model=BackupResultResponse)
+def create_db_backup(
+    pages: int = Query(BACKUP_PAGES_PER_STEP, ge=1),
+    retention: int = Query(BACKUP_RETENTION, ge=1),
+) -> BackupResultResponse:
+    """立即建立一份線上備份"""
+    result = create_backup(pages=pages, retention=retention)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/backups/", response_model=list[BackupFileResponse])
+def get_db_backups() -> list[BackupFileResponse]:
+    """列出備份檔"""
+    return list_backups()
+
+
+@router.get("/backups/metrics", response_model=BackupMetricsResponse)
+def get_db_backup_metrics() -> BackupMetricsResponse:
+    """取得備份統計（吞吐量、主數據庫鎖定時間）"""
+    return get_backup_metrics()
+
+
+@router.post("/backups/{name}/restore", response_model=dict[str, str])
+def restore_db_backup(name: str) -> dict[str, str]:
+    """以備份覆蓋主數據庫"""
+    result = restore_backup(name)
+    if "error" in result:
+        if "備份不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="備份不存在")
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
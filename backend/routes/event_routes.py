@@ -0,0 +1,36 @@
+"""即時動態（Server-Sent Events）路由"""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from services.event_stream import EVENT_TYPES, broker, event_stream
+
+router = APIRouter(tags=["events"])
+
+
+@router.get("/events/stream", response_class=StreamingResponse)
+async def stream_events(
+    types: Optional[str] = Query(None, description="只接收這些事件，以逗號分隔：checkin, checkout, sale"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID", ge=0),
+) -> StreamingResponse:
+    """
+    訂閱入場、登出、銷售事件（text/event-stream）
+
+    事件 id 是變更版本，重新連線時帶上 Last-Event-ID 補送漏掉的事件；
+    收到 reset 時需重新取得完整資料；收到 overflow 表示連線跟不上，需重新連線。
+    """
+    type_set = frozenset(name.strip() for name in types.split(",") if name.strip()) if types else frozenset(EVENT_TYPES)
+    unknown = sorted(type_set.difference(EVENT_TYPES))
+    if unknown or not type_set:
+        raise HTTPException(status_code=400, detail=f"不支援的事件: {', '.join(unknown)}")
+
+    subscription = await broker.subscribe(type_set)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="訂閱人數已滿，請稍後再試")
+    return StreamingResponse(
+        event_stream(subscription, last_event_id),
+        media_type="text/event-stream",
+        # 代理伺服器（nginx）不要緩衝串流
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,45 @@
+"""會員帳本路由"""
+
+from fastapi import APIRouter, HTTPException, Query
+from models.member_ledger import MemberLedger
+from models.pydantic_models import (
+    LedgerReconcileResponse,
+    MemberLedgerCreate,
+    MemberLedgerResponse,
+)
+
+router = APIRouter(tags=["member_ledger"])
+
+
+@router.post("/members/{mContactNum}/ledger/", response_model=dict[str, str])
+def create_ledger_entry(mContactNum: str, entry: MemberLedgerCreate) -> dict[str, str]:
+    """變動會員餘額或回饋點數（以差額原子更新，並寫入帳本）"""
+    result = MemberLedger.apply_delta(
+        mContactNum, entry.account.value, entry.delta, entry.reason
+    )
+    if "error" in result:
+        if "會員不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="會員不存在")
+        if "不足" in result["error"]:
+            raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/members/{mContactNum}/ledger/", response_model=list[MemberLedgerResponse])
+def get_member_ledger(
+    mContactNum: str, limit: int = Query(50, ge=1, le=500)
+) -> list[MemberLedgerResponse]:
+    """獲取會員最近的帳本記錄"""
+    return MemberLedger.get_member_ledger(mContactNum, limit)
+
+
+@router.post("/member_ledger/reconcile/", response_model=LedgerReconcileResponse)
+def reconcile_member_ledger(
+    batch_size: int = Query(500, ge=1, le=5000)
+) -> LedgerReconcileResponse:
+    """對帳：確認會員目前餘額與帳本加總一致"""
+    result = MemberLedger.reconcile(batch_size)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
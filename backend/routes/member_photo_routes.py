@@ -9,6 +9,7 @@ from models.pydantic_models import (
     MemberPhotoResponse,
     MemberPhotoUpdate,
 )
+from services.table_version import table_etag
 
 router = APIRouter(tags=["member_photo"])
 
@@ -34,7 +35,11 @@ async def create_member_photo(
     return result
 
 
-@router.get("/member_photo/", response_model=list[MemberPhotoResponse])
+@router.get(
+    "/member_photo/",
+    response_model=list[MemberPhotoResponse],
+    dependencies=[table_etag("MemberPhoto")],
+)
 def get_all_member_photos() -> list[MemberPhotoResponse]:
     """獲取所有會員照片"""
     member_photos = MemberPhoto.get_all_photos()
@@ -1,6 +1,19 @@
-from fastapi import APIRouter, HTTPException
-from models.pydantic_models import MemberCreate, MemberResponse, MemberUpdate
-from models.member import Member
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from models.pydantic_models import (
+    CascadeProgressResponse,
+    MemberCreate,
+    MemberProfileResponse,
+    MemberResponse,
+    MemberSearchResponse,
+    MemberUpdate,
+)
+from models.member import MEMBER_COLUMNS, Member
+from models.projection import parse_fields, project_model, projected_response
+from services.cascade_delete import get_cascade_job, get_cascade_jobs
+from services.member_search import SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT, search_members
+from services.table_version import table_etag
 
 router = APIRouter(tags=["members"])
 
@@ -18,11 +31,47 @@ def create_member(member: MemberCreate) -> dict[str, str]:
     return result
 
 
-@router.get("/members/", response_model=list[MemberResponse])
-def get_all_members() -> list[MemberResponse]:
-    """獲取所有會員"""
-    members = Member.get_all_members()
-    return members
+@router.get(
+    "/members/",
+    response_model=None,
+    responses={200: {"model": list[MemberResponse]}},
+    dependencies=[table_etag("Member")],
+)
+def get_all_members(
+    response: Response,
+    fields: Optional[str] = Query(None, description="只返回這些欄位，以逗號分隔，例如 mContactNum,mName"),
+) -> Response:
+    """獲取所有會員（fields= 只返回指定欄位）"""
+    try:
+        columns = parse_fields(fields, MEMBER_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model = project_model(MemberResponse, columns)
+    return projected_response(model, Member.get_all_members(columns), response)
+
+
+@router.get("/members/search/", response_model=list[MemberSearchResponse])
+def search_member(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(SEARCH_DEFAULT_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+) -> list[MemberSearchResponse]:
+    """以電話（前幾碼或其中幾碼）、姓名或電子郵件搜尋會員"""
+    return search_members(q, limit)
+
+
+@router.get("/members/delete_jobs/", response_model=list[CascadeProgressResponse])
+def get_delete_jobs() -> list[CascadeProgressResponse]:
+    """獲取最近的分批刪除工作進度"""
+    return get_cascade_jobs()
+
+
+@router.get("/members/delete_jobs/{jobId}", response_model=CascadeProgressResponse)
+def get_delete_job(jobId: str) -> CascadeProgressResponse:
+    """獲取單一分批刪除工作進度"""
+    job = get_cascade_job(jobId)
+    if not job:
+        raise HTTPException(status_code=404, detail="刪除工作不存在")
+    return job
 
 
 @router.get("/members/{mContactNum}/", response_model=MemberResponse)
@@ -34,6 +83,17 @@ def get_member(mContactNum: str) -> MemberResponse:
     return member
 
 
+@router.get("/members/{mContactNum}/profile", response_model=MemberProfileResponse)
+def get_member_profile(
+    mContactNum: str, transaction_limit: int = Query(5, ge=0, le=50)
+) -> MemberProfileResponse:
+    """獲取會員總覽（會員資料、有效會籍、照片、未結束打卡、最近交易）"""
+    profile = Member.get_member_profile(mContactNum, transaction_limit)
+    if not profile:
+        raise HTTPException(status_code=404, detail="會員不存在")
+    return profile
+
+
 @router.put("/members/{mContactNum}/", response_model=dict)
 def update_member(mContactNum: str, member: MemberUpdate):
     """更新會員資料"""
@@ -7,6 +7,7 @@ from models.pydantic_models import (
     MembershipPlanUpdate,
 )
 from models.membership_plan import MembershipPlan
+from services.table_version import table_etag
 
 router = APIRouter(tags=["membership_plans"])
 
@@ -24,7 +25,11 @@ def create_membership_plan(membership_plan: MembershipPlanCreate) -> dict[str, s
     return result
 
 
-@router.get("/membership_plans/", response_model=list[MembershipPlanResponse])
+@router.get(
+    "/membership_plans/",
+    response_model=list[MembershipPlanResponse],
+    dependencies=[table_etag("MembershipPlan")],
+)
 def get_all_membership_plans() -> list[MembershipPlanResponse]:
     """獲取所有會籍方案"""
     membership_plans = MembershipPlan.get_all_membership_plans()
@@ -1,13 +1,18 @@
 """會籍狀態路由"""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from models.pydantic_models import (
+    MembershipDaysRemainingResponse,
+    MembershipPurchaseCreate,
     MembershipStatusCreate,
     MembershipStatusResponse,
     MembershipStatusUpdate,
+    SweepMetricsResponse,
 )
 
 from models.membership_status import MembershipStatus
+from services.membership_sweeper import get_sweep_metrics, sweep_expired_memberships
+from services.table_version import table_etag
 
 
 router = APIRouter(tags=["membership_status"])
@@ -28,13 +33,59 @@ def create_membership_status(
     return result
 
 
-@router.get("/membership_status/", response_model=list[MembershipStatusResponse])
+@router.post("/membership_status/purchase/", response_model=dict[str, str])
+def purchase_membership_plan(purchase: MembershipPurchaseCreate) -> dict[str, str]:
+    """購買會籍方案（交易記錄、會籍狀態、點數扣除一次完成）"""
+    purchase_data = purchase.model_dump()
+    purchase_data["paymentMethod"] = purchase.paymentMethod.value
+    result = MembershipStatus.purchase_membership_plan(**purchase_data)
+    if "error" in result:
+        if "會員不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="會員不存在")
+        if "會籍方案不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="會籍方案不存在")
+        if "回饋點數不足" in result["error"]:
+            raise HTTPException(status_code=400, detail="回饋點數不足")
+        if "金額必須大於0" in result["error"]:
+            raise HTTPException(status_code=400, detail="金額必須大於0")
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get(
+    "/membership_status/",
+    response_model=list[MembershipStatusResponse],
+    dependencies=[table_etag("MembershipStatus")],
+)
 def get_all_membership_status() -> list[MembershipStatusResponse]:
     """獲取所有會籍狀態"""
     membership_statuses = MembershipStatus.get_all_membership_status()
     return membership_statuses
 
 
+@router.get(
+    "/membership_status/expiring/",
+    response_model=list[MembershipDaysRemainingResponse],
+)
+def get_expiring_membership_status(
+    within_days: int = Query(7, ge=0),
+) -> list[MembershipDaysRemainingResponse]:
+    """獲取即將到期的會籍（剩餘天數由會籍到期排程計算）"""
+    return MembershipStatus.get_expiring_membership_status(within_days)
+
+
+@router.get("/membership_status/sweeper/metrics", response_model=SweepMetricsResponse)
+def get_membership_sweeper_metrics() -> SweepMetricsResponse:
+    """獲取會籍到期排程統計"""
+    return get_sweep_metrics()
+
+
+@router.post("/membership_status/sweeper/run", response_model=SweepMetricsResponse)
+def run_membership_sweeper() -> SweepMetricsResponse:
+    """立即執行一次會籍到期檢查"""
+    return sweep_expired_memberships()
+
+
 @router.get(
     "/membership_status/{mContactNum}/", response_model=MembershipStatusResponse
 )
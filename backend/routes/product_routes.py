@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from models.product import Product
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Response
+from models.product import PRODUCT_COLUMNS, Product
+from models.projection import parse_fields, project_model, projected_response
 from models.pydantic_models import ProductCreate, ProductResponse, ProductUpdate
+from services.table_version import table_etag
 
 
 router = APIRouter(tags=["products"])
@@ -19,11 +23,23 @@ def create_product(product: ProductCreate) -> dict[str, str]:
     return result
 
 
-@router.get("/products/", response_model=list[ProductResponse])
-def get_all_products() -> list[ProductResponse]:
-    """獲取所有商品"""
-    products = Product.get_all_products()
-    return products
+@router.get(
+    "/products/",
+    response_model=None,
+    responses={200: {"model": list[ProductResponse]}},
+    dependencies=[table_etag("Product")],
+)
+def get_all_products(
+    response: Response,
+    fields: Optional[str] = Query(None, description="只返回這些欄位，以逗號分隔，例如 gsNo,pName,salePrice"),
+) -> Response:
+    """獲取所有商品（fields= 只返回指定欄位）"""
+    try:
+        columns = parse_fields(fields, PRODUCT_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model = project_model(ProductResponse, columns)
+    return projected_response(model, Product.get_all_products(columns), response)
 
 
 @router.get("/products/{gsNo}", response_model=ProductResponse)
@@ -0,0 +1,28 @@
+"""歷史記錄封存路由"""
+
+from fastapi import APIRouter, HTTPException, Query
+from models.pydantic_models import ArchiveFileResponse, ArchiveRunResponse
+from services.record_archive import (
+    ARCHIVE_RETENTION_DAYS,
+    archive_old_records,
+    get_archive_files,
+)
+
+router = APIRouter(tags=["record_archive"])
+
+
+@router.post("/record_archive/run/", response_model=ArchiveRunResponse)
+def run_record_archive(
+    retention_days: int = Query(ARCHIVE_RETENTION_DAYS, ge=30),
+) -> ArchiveRunResponse:
+    """立即將超過保留天數的打卡與交易記錄搬到封存數據庫"""
+    result = archive_old_records(retention_days)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get("/record_archive/", response_model=list[ArchiveFileResponse])
+def get_record_archive() -> list[ArchiveFileResponse]:
+    """列出封存數據庫與各表格筆數"""
+    return get_archive_files()
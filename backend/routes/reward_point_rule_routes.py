@@ -0,0 +1,57 @@
+"""回饋點數規則路由"""
+
+from fastapi import APIRouter, HTTPException
+from models.reward_point_rule import RewardPointRule
+from models.pydantic_models import (
+    PointsRecomputeResponse,
+    RewardPointRuleCreate,
+    RewardPointRuleResponse,
+)
+from services.table_version import table_etag
+
+router = APIRouter(tags=["reward_point_rules"])
+
+
+@router.post("/reward_point_rules/", response_model=dict[str, str])
+def create_reward_point_rule(rule: RewardPointRuleCreate) -> dict[str, str]:
+    """創建回饋點數規則"""
+    result = RewardPointRule.create_rule(
+        pointsPerDollar=rule.pointsPerDollar,
+        gsNo=rule.gsNo,
+        paymentMethod=rule.paymentMethod.value if rule.paymentMethod else None,
+    )
+    if "error" in result:
+        if "回饋點數規則已存在" in result["error"]:
+            raise HTTPException(status_code=400, detail="回饋點數規則已存在")
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.get(
+    "/reward_point_rules/",
+    response_model=list[RewardPointRuleResponse],
+    dependencies=[table_etag("RewardPointRule")],
+)
+def get_all_reward_point_rules() -> list[RewardPointRuleResponse]:
+    """獲取所有回饋點數規則"""
+    return RewardPointRule.get_all_rules()
+
+
+@router.delete("/reward_point_rules/{ruleId}/", response_model=dict[str, str])
+def delete_reward_point_rule(ruleId: int) -> dict[str, str]:
+    """刪除回饋點數規則"""
+    result = RewardPointRule.delete_rule(ruleId)
+    if "error" in result:
+        if "回饋點數規則不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="回饋點數規則不存在")
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
+
+
+@router.post("/reward_point_rules/recompute/", response_model=PointsRecomputeResponse)
+def recompute_reward_points(apply: bool = False) -> PointsRecomputeResponse:
+    """依目前規則重算交易點數（apply=true 時寫入差額調整）"""
+    result = RewardPointRule.recompute_points(apply)
+    if "error" in result:
+        raise HTTPException(status_code=500, detail=result["error"])
+    return result
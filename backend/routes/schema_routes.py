@@ -0,0 +1,15 @@
+"""數據庫結構版本路由"""
+
+from fastapi import APIRouter, HTTPException
+from migrations.runner import get_migration_status
+
+router = APIRouter(tags=["schema"])
+
+
+@router.get("/schema/migrations", response_model=dict)
+def get_schema_migrations() -> dict:
+    """目前結構版本、已套用與未套用的遷移、表格重建進度"""
+    status = get_migration_status()
+    if "error" in status:
+        raise HTTPException(status_code=500, detail=status["error"])
+    return status
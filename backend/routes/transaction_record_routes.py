@@ -1,19 +1,24 @@
 """交易記錄路由"""
 
-from fastapi import APIRouter, HTTPException
+from datetime import date
+from typing import Optional
 
-from models.transaction_record import TransactionRecord
+from fastapi import APIRouter, HTTPException, Query, Response
+
+from models.projection import parse_fields, project_model, projected_response
+from models.transaction_record import TRANSACTION_RECORD_COLUMNS, TransactionRecord
 from models.pydantic_models import (
     TransactionRecordCreate,
     TransactionRecordUpdate,
     TransactionRecordResponse,
 )
+from services.table_version import table_etag
 
 router = APIRouter(tags=["transaction_record"])
 
 
 @router.post("/transaction_records/", response_model=dict[str, str])
-async def create_transaction_record(
+def create_transaction_record(
     transaction_record: TransactionRecordCreate,
 ) -> dict[str, str]:
     """創建交易記錄"""
@@ -25,27 +30,52 @@ async def create_transaction_record(
             raise HTTPException(status_code=400, detail="會員不存在")
         elif "金額必須大於0" in result["error"]:
             raise HTTPException(status_code=400, detail="金額必須大於0")
+        elif "回饋點數不足" in result["error"]:
+            raise HTTPException(status_code=400, detail="回饋點數不足")
+        elif "商品或會籍方案不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="商品或會籍方案不存在")
         raise HTTPException(status_code=500, detail=result["error"])
 
     return result
 
 
-@router.get("/transaction_records/", response_model=list[TransactionRecordResponse])
-async def get_all_transaction_records() -> list[TransactionRecordResponse]:
-    """獲取所有交易記錄"""
-    transaction_records = TransactionRecord.get_all_transaction_records()
-    return transaction_records
+@router.get(
+    "/transaction_records/",
+    response_model=None,
+    responses={200: {"model": list[TransactionRecordResponse]}},
+    dependencies=[table_etag("TransactionRecord")],
+)
+def get_all_transaction_records(
+    response: Response,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    fields: Optional[str] = Query(None, description="只返回這些欄位，以逗號分隔，例如 transDateTime,totalAmount"),
+) -> Response:
+    """獲取所有交易記錄（可指定日期範圍，fields= 只返回指定欄位）"""
+    try:
+        columns = parse_fields(fields, TRANSACTION_RECORD_COLUMNS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    model = project_model(TransactionRecordResponse, columns)
+    transaction_records = TransactionRecord.get_all_transaction_records(
+        start_date, end_date, columns
+    )
+    return projected_response(model, transaction_records, response)
 
 
 @router.get(
     "/transaction_records/member/{mContactNum}/",
     response_model=list[TransactionRecordResponse],
 )
-async def get_member_transaction_record(
+def get_member_transaction_record(
     mContactNum: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
 ) -> list[TransactionRecordResponse]:
-    """獲取會員的所有交易記錄"""
-    transaction_records = TransactionRecord.get_member_transaction_record(mContactNum)
+    """獲取會員的所有交易記錄（可指定日期範圍）"""
+    transaction_records = TransactionRecord.get_member_transaction_record(
+        mContactNum, start_date, end_date
+    )
     if not transaction_records:
         raise HTTPException(status_code=404, detail="找不到該會員的交易記錄")
     return transaction_records
@@ -64,7 +94,7 @@ class TransactionRecordUpdate(BaseModel):
 
 
 @router.put("/transaction_records/{mContactNum}/{tNo}", response_model=dict[str, str])
-async def update_transaction_record(
+def update_transaction_record(
     mContactNum: str, tNo: int, transaction_record: TransactionRecordUpdate
 ) -> dict[str, str]:
     """更新交易記錄"""
@@ -77,6 +107,12 @@ async def update_transaction_record(
             raise HTTPException(status_code=400, detail="會員不存在")
         elif "金額必須大於0" in result["error"]:
             raise HTTPException(status_code=400, detail="金額必須大於0")
+        elif "回饋點數不足" in result["error"]:
+            raise HTTPException(status_code=400, detail="回饋點數不足")
+        elif "商品或會籍方案不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="商品或會籍方案不存在")
+        elif "交易紀錄不存在" in result["error"]:
+            raise HTTPException(status_code=404, detail="交易紀錄不存在")
         raise HTTPException(status_code=500, detail=result["error"])
     return result
 
@@ -84,11 +120,13 @@ async def update_transaction_record(
 @router.delete(
     "/transaction_records/{mContactNum}/{tNo}", response_model=dict[str, str]
 )
-async def delete_transaction_record(mContactNum: str, tNo: int) -> dict[str, str]:
+def delete_transaction_record(mContactNum: str, tNo: int) -> dict[str, str]:
     """刪除交易記錄"""
     result = TransactionRecord.delete_transaction_record(mContactNum, tNo)
     if "error" in result:
-        if "找不到該會員的交易記錄" in result["error"]:
+        if "找不到該會員的交易記錄" in result["error"] or "交易紀錄不存在" in result["error"]:
             raise HTTPException(status_code=404, detail="找不到該會員的交易記錄")
+        elif "回饋點數不足" in result["error"]:
+            raise HTTPException(status_code=400, detail="回饋點數不足")
         raise HTTPException(status_code=500, detail=result["error"])
     return result
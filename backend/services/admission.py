@@ -0,0 +1,219 @@
+"""
+限流與准入控制
+
+會員照片列表（每張照片 base64 編碼）、交易記錄列表等一次返回整個表格，
+一個不斷重新整理的看板就能佔滿 worker，讓櫃台的入場打卡等待。
+請求依路由分為三類：
+
+- checkin：入場、登出，不限流、不受同時處理數限制（優先）
+- heavy：整個表格的列表、照片、備份與重新計算，
+  每個呼叫者 HEAVY_RATE 個/秒（最多累積 HEAVY_BURST 個），
+  每個呼叫者同時最多 HEAVY_MAX_CONCURRENCY_PER_CLIENT 個，
+  每個 worker 同時最多處理 HEAVY_MAX_CONCURRENCY 個，
+  其餘執行緒與 CPU 留給入場打卡與一般請求
+- default：其他請求，每個呼叫者 DEFAULT_RATE 個/秒（最多累積 DEFAULT_BURST 個）
+
+超過時返回 429 與 Retry-After（幾秒後再試）。限制是每個 worker 程序各自計算。
+GYM_RATE_LIMIT=0 時停用。
+
+呼叫者以 X-Client-Id 標頭區分，沒有標頭時以用戶端 IP 區分。所有櫃台都經由
+同一台 Streamlit 伺服器呼叫後端，IP 都相同，因此前端每個工作階段送出自己的
+X-Client-Id（frontend/utils/api.py 的 api_session）。標頭由呼叫者自行提供，
+部署時後端只開放給 Streamlit 伺服器與內部網路；換標頭可以避開每個呼叫者的
+限制，但避不開每個 worker 的 HEAVY_MAX_CONCURRENCY。
+
+看板不斷重新整理時的入場打卡延遲（停用與啟用准入控制）的負載測試見 bench/admission.py。
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import time
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get("GYM_RATE_LIMIT", "1") != "0"
+DEFAULT_RATE = 50.0
+DEFAULT_BURST = 200
+HEAVY_RATE = 2.0
+HEAVY_BURST = 20
+# 同時處理的 heavy 請求：每個 worker 的上限與每個呼叫者的上限
+# （一個看板同時只佔一個，其他櫃台的列表查詢不必等它）
+HEAVY_MAX_CONCURRENCY = 4
+HEAVY_MAX_CONCURRENCY_PER_CLIENT = 1
+# 超過這個數量時清除已經補滿（閒置）的呼叫者
+MAX_TRACKED_BUCKETS = 10_000
+# 區分呼叫者的標頭（前端每個工作階段一個），過長的值不採用
+CLIENT_ID_HEADER = b"x-client-id"
+MAX_CLIENT_ID_LENGTH = 64
+
+# (方法, 路徑) 的分類；沒有符合的為 default
+ROUTE_CLASSES = [
+    (
+        "checkin",
+        re.compile(
+            r"^(?:POST /checkinrecord(?:/checkin)?"
+            r"|PUT /checkinrecord/[^/]+"
+            r"|POST /branches/[^/]+/checkin"
+            r"|PUT /branches/[^/]+/checkin/[^/]+)/?$"
+        ),
+    ),
+    (
+        "heavy",
+        re.compile(
+            r"^(?:GET /(?:member_photo|transaction_records|checkinrecord|members|membership_status)"
+            r"|GET /branches/(?:occupancy|revenue)"
+            r"|POST /(?:backups|member_ledger/reconcile|reward_point_rules/recompute|record_archive/run))/?$"
+        ),
+    ),
+]
+
+
+def caller_id(scope: Scope) -> str:
+    """請求的呼叫者：X-Client-Id 標頭，沒有標頭時為用戶端 IP"""
+    for name, value in scope.get("headers", []):
+        if name == CLIENT_ID_HEADER and 0 < len(value) <= MAX_CLIENT_ID_LENGTH:
+            return "id:" + value.decode("latin-1")
+    return "ip:" + (scope["client"][0] if scope.get("client") else "unknown")
+
+
+def classify(method: str, path: str) -> str:
+    """請求的分類：checkin / heavy / default"""
+    route = f"{method} {path}"
+    for name, pattern in ROUTE_CLASSES:
+        if pattern.match(route):
+            return name
+    return "default"
+
+
+class TokenBucket:
+    """每秒補充 rate 個、最多 capacity 個的令牌桶"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """取得一個令牌，成功時返回 0，否則返回需要等待的秒數"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class AdmissionController:
+    """每個呼叫者、每種分類一個令牌桶，heavy 另外限制同時處理數（整個 worker 與每個呼叫者）"""
+
+    def __init__(
+        self,
+        limits: Optional[dict[str, tuple[float, int]]] = None,
+        heavy_max_concurrency: int = HEAVY_MAX_CONCURRENCY,
+        heavy_max_concurrency_per_client: int = HEAVY_MAX_CONCURRENCY_PER_CLIENT,
+    ):
+        self.limits = limits or {
+            "default": (DEFAULT_RATE, DEFAULT_BURST),
+            "heavy": (HEAVY_RATE, HEAVY_BURST),
+        }
+        self.heavy_max_concurrency = heavy_max_concurrency
+        self.heavy_max_concurrency_per_client = heavy_max_concurrency_per_client
+        self.heavy_in_flight = 0
+        self._heavy_in_flight_by_client: dict[str, int] = {}
+        self.rejected = {"rate": 0, "concurrency": 0}
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, client: str, route_class: str) -> TokenBucket:
+        bucket = self._buckets.get((client, route_class))
+        if bucket is None:
+            if len(self._buckets) >= MAX_TRACKED_BUCKETS:
+                now = time.monotonic()
+                # 補滿的令牌桶與新建立的相同，可以丟棄
+                self._buckets = {k: b for k, b in self._buckets.items() if not b.is_full(now)}
+            bucket = TokenBucket(*self.limits[route_class])
+            self._buckets[(client, route_class)] = bucket
+        return bucket
+
+    def admit(self, client: str, route_class: str) -> Optional[int]:
+        """准入時返回 None（需在完成後呼叫 release），拒絕時返回 Retry-After 秒數"""
+        if route_class not in self.limits:
+            return None
+        # 先確認同時處理數，因同時處理數被拒絕的請求不消耗令牌
+        if route_class == "heavy" and (
+            self.heavy_in_flight >= self.heavy_max_concurrency
+            or self._heavy_in_flight_by_client.get(client, 0)
+            >= self.heavy_max_concurrency_per_client
+        ):
+            self.rejected["concurrency"] += 1
+            return 1
+        wait = self._bucket(client, route_class).acquire()
+        if wait > 0:
+            self.rejected["rate"] += 1
+            return max(1, math.ceil(wait))
+        if route_class == "heavy":
+            self.heavy_in_flight += 1
+            self._heavy_in_flight_by_client[client] = (
+                self._heavy_in_flight_by_client.get(client, 0) + 1
+            )
+        return None
+
+    def release(self, client: str, route_class: str) -> None:
+        if route_class == "heavy":
+            self.heavy_in_flight -= 1
+            remaining = self._heavy_in_flight_by_client[client] - 1
+            if remaining:
+                self._heavy_in_flight_by_client[client] = remaining
+            else:
+                del self._heavy_in_flight_by_client[client]
+
+
+class AdmissionMiddleware:
+    """依分類限流，超過時返回 429 與 Retry-After"""
+
+    def __init__(self, app: ASGIApp, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not RATE_LIMIT_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        client = caller_id(scope)
+        retry_after = self.controller.admit(client, route_class)
+        if retry_after is not None:
+            logger.warning(f"拒絕 {route_class} 請求 {scope['method']} {scope['path']}（{client}）")
+            body = json.dumps({"detail": "請求過於頻繁，請稍後再試"}, ensure_ascii=False).encode()
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(retry_after).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client, route_class)
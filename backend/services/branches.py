@@ -0,0 +1,664 @@
+"""
+多分店
+
+會員資料（Member、MemberLedger、MemberPhoto）與商品、會籍方案留在主數據庫，
+各分店的營運資料——會籍（MembershipStatus）、打卡（CheckInRecord）與交易（TransactionRecord）——
+在 branches/gym_<分店編號>.db 中各自一個數據庫：
+- 分店的寫入只鎖定該分店的數據庫，不同分店、主數據庫之間互不等待
+- 分店數據庫的連接以唯讀方式 ATTACH 主數據庫，入場與交易時直接確認會員與商品，
+  不會取得主數據庫的寫入鎖
+- 分店數據庫沒有指向 Member 的外鍵（外鍵不能跨數據庫），會員是否存在由
+  storage/repositories.py 在寫入前確認；會員換電話在分店寫入與查詢前套用
+  （見 services/member_key_sync.py），刪除會員時一併刪除分店的記錄（見 services/cascade_delete.py）
+
+分店的變更由觸發器寫入分店數據庫自己的 ChangeLog，寫入後（以及背景排程每
+BRANCH_RELAY_INTERVAL_SECONDS 秒）由寫入佇列轉送到主數據庫：
+- 主數據庫的 ChangeLog 新增一筆 branchId 為該分店的記錄，GET /changes 與即時動態照常收到
+- 新增的交易依回饋點數規則累積點數，以回饋點數付款時扣除點數
+- 轉送與 BranchRelay（已轉送到的版本）在主數據庫的同一個交易中寫入，中斷後重新轉送不會重複處理
+以回饋點數付款的交易在寫入佇列中先在主數據庫扣除點數、再寫入分店交易，
+分店交易寫入失敗時扣除一併復原；轉送時看到已扣除的記錄只累積點數，
+轉送失敗也不會留下沒有扣除點數的兌換。
+
+跨分店的統計（在場人數、營收）以執行緒平行查詢各分店後合併。
+
+主數據庫原有的 CheckInRecord / TransactionRecord / MembershipStatus 維持不變，
+沒有分店的路由照常使用。
+
+分店之間的寫入隔離與平行查詢的量測見 bench/branches.py。
+"""
+
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional, TypedDict, TypeVar
+
+import pytz
+
+import database
+from database import get_connection, retry_when_busy
+from models.checkinrecord import CheckInRecordDict, CheckInResultDict
+from models.member_ledger import apply_ledger_change
+from models.reward_point_rule import apply_transaction_points, is_redeemed, redemption_reason
+from models.transaction_record import transaction_total
+from services.change_log import CHANGE_TABLES, fetch_rows
+from services.event_stream import notify_committed
+from services.member_key_sync import (
+    CREATE_MEMBER_KEY_SYNC_TABLE,
+    applied_change_no,
+    apply_member_key_changes,
+    current_contact,
+    init_member_key_sync,
+)
+from services.write_queue import WriteTimeout, run_write
+from storage.repositories import CheckInRepository, TransactionRepository
+from storage.sqlite import SQLiteStorage
+
+logger = logging.getLogger(__name__)
+
+# 跨分店查詢同時查詢的分店數
+BRANCH_FANOUT_WORKERS = 8
+
+# 分店數據庫中以別名 gym 唯讀掛上主數據庫
+MAIN_DB_ALIAS = "gym"
+
+# 分店數據庫中的會員營運資料表格
+BRANCH_TABLES = ["MembershipStatus", "CheckInRecord", "TransactionRecord"]
+
+# 一次轉送到主數據庫的變更記錄數
+BRANCH_RELAY_BATCH_SIZE = 500
+# 背景轉送的間隔（分店寫入後會立即轉送，背景排程補上轉送失敗的變更）
+BRANCH_RELAY_INTERVAL_SECONDS = 5
+
+# 分店數據庫的表格（與主數據庫相同，但沒有指向 Member 的外鍵）
+CREATE_BRANCH_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS MembershipStatus (
+        sid INTEGER PRIMARY KEY AUTOINCREMENT,
+        mContactNum VARCHAR(20) NOT NULL,
+        startDate DATE NOT NULL,
+        endDate DATE NOT NULL,
+        isActive INTEGER DEFAULT 1,
+        CHECK (endDate > startDate)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS CheckInRecord (
+        checkInNo INTEGER PRIMARY KEY AUTOINCREMENT,
+        mContactNum VARCHAR(20) NOT NULL,
+        checkInDatetime DATETIME NOT NULL DEFAULT (datetime('now', 'localtime')),
+        checkOutDatetime DATETIME,
+        checkInStatus INTEGER DEFAULT 1,
+        checkOutStatus INTEGER DEFAULT 0,
+        CHECK (checkOutDatetime IS NULL OR checkOutDatetime > checkInDatetime)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TransactionRecord (
+        tNo INTEGER PRIMARY KEY AUTOINCREMENT,
+        mContactNum VARCHAR(20) NOT NULL,
+        transDateTime DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        gsNo VARCHAR(20) NOT NULL,
+        count INTEGER NOT NULL CHECK (count > 0),
+        unitPrice INTEGER NOT NULL CHECK (unitPrice > 0),
+        discount REAL NOT NULL DEFAULT 1 CHECK (discount <= 1 AND discount > 0),
+        totalAmount INTEGER NOT NULL CHECK (totalAmount > 0),
+        paymentMethod VARCHAR(20) NOT NULL CHECK (paymentMethod IN ('cash', 'credit_card', 'e_transfer', 'reward_points'))
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_membership_status_member
+    ON MembershipStatus (mContactNum, isActive, endDate)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_checkin_record_open_visit
+    ON CheckInRecord (mContactNum, checkInNo)
+    WHERE checkOutStatus = 0
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_checkin_record_member ON CheckInRecord (mContactNum)",
+    "CREATE INDEX IF NOT EXISTS idx_checkin_record_datetime ON CheckInRecord (checkInDatetime)",
+    "CREATE INDEX IF NOT EXISTS idx_transaction_record_member ON TransactionRecord (mContactNum)",
+    "CREATE INDEX IF NOT EXISTS idx_transaction_record_datetime ON TransactionRecord (transDateTime)",
+    # 尚未轉送到主數據庫的變更（轉送後刪除）
+    """
+    CREATE TABLE IF NOT EXISTS ChangeLog (
+        changeVersion INTEGER PRIMARY KEY AUTOINCREMENT,
+        tableName VARCHAR(50) NOT NULL,
+        rowKey VARCHAR(20) NOT NULL,
+        operation VARCHAR(10) NOT NULL CHECK (operation IN ('insert', 'update', 'delete')),
+        changedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    CREATE_MEMBER_KEY_SYNC_TABLE.format(schema="main"),
+] + [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {table.lower()}_changelog_{operation}
+    AFTER {operation.upper()} ON {table} BEGIN
+        INSERT INTO ChangeLog (tableName, rowKey, operation)
+        VALUES ('{table}', {'old' if operation == 'delete' else 'new'}.{CHANGE_TABLES[table]}, '{operation}');
+    END
+    """
+    for table in BRANCH_TABLES
+    for operation in ("insert", "update", "delete")
+]
+
+T = TypeVar("T")
+
+
+class BranchDict(TypedDict):
+    """分店資料結構定義"""
+
+    branchId: str
+    bName: str
+    createdAt: str
+
+
+class BranchOccupancyDict(TypedDict):
+    """分店在場人數"""
+
+    branchId: str
+    bName: str
+    occupancy: int
+    checkInsToday: int
+
+
+class BranchRevenueDict(TypedDict):
+    """分店營收"""
+
+    branchId: str
+    bName: str
+    transactions: int
+    revenue: int
+
+
+def branch_dir() -> Path:
+    """分店數據庫所在目錄（與主數據庫同一層的 branches/）"""
+    return Path(database.DB_PATH).parent / "branches"
+
+
+def branch_path(branchId: str) -> Path:
+    return branch_dir() / f"gym_{branchId}.db"
+
+
+def branch_storage(branchId: str) -> SQLiteStorage:
+    """分店數據庫的儲存後端（唯讀掛上主數據庫）"""
+    main_db = Path(database.DB_PATH).resolve().as_uri()
+    return SQLiteStorage(
+        branch_path(branchId), attach={MAIN_DB_ALIAS: f"{main_db}?mode=ro"}
+    )
+
+
+def branch_checkins(branchId: str) -> CheckInRepository:
+    return CheckInRepository(branch_storage(branchId))
+
+
+def branch_transactions(branchId: str) -> TransactionRepository:
+    return TransactionRepository(branch_storage(branchId))
+
+
+def _create_branch_db(branchId: str) -> None:
+    branch_dir().mkdir(exist_ok=True)
+    conn = get_connection(branch_path(branchId))
+    if conn is None:
+        raise sqlite3.OperationalError("分店數據庫連接失敗")
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        main_db = Path(database.DB_PATH).resolve().as_uri()
+        conn.execute(f"ATTACH DATABASE ? AS {MAIN_DB_ALIAS}", (f"{main_db}?mode=ro",))
+        for query in CREATE_BRANCH_TABLES:
+            conn.execute(query)
+        init_member_key_sync(conn.cursor(), "main", MAIN_DB_ALIAS)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def upgrade_branch_databases() -> int:
+    """
+    為既有的分店數據庫建立之後新增的表格、索引與觸發器（啟動時在套用遷移後執行）
+
+    Returns:
+        int: 檢查的分店數據庫數
+    """
+    upgraded = 0
+    for branch in get_branches():
+        path = branch_path(branch["branchId"])
+        if not path.exists():
+            continue
+        conn = get_connection(path)
+        if conn is None:
+            raise sqlite3.OperationalError(f"分店數據庫連接失敗: {path}")
+        try:
+            for query in CREATE_BRANCH_TABLES:
+                conn.execute(query)
+            conn.commit()
+        finally:
+            conn.close()
+        upgraded += 1
+    return upgraded
+
+
+def create_branch(branchId: str, bName: str) -> dict[str, str]:
+    """新增分店並建立分店數據庫"""
+    if not branchId.isalnum():
+        return {"error": "分店編號只能包含英文字母與數字"}
+
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO Branch (branchId, bName) VALUES (?, ?)", (branchId, bName)
+        )
+        # 先建立分店數據庫再提交，數據庫建立失敗時不會留下分店記錄
+        _create_branch_db(branchId)
+        conn.commit()
+        logger.info(f"分店創建成功: {bName} ({branchId})")
+        return {"message": "分店創建成功"}
+    except sqlite3.IntegrityError:
+        return {"error": "分店已存在"}
+    except sqlite3.Error as e:
+        conn.rollback()
+        return {"error": f"創建分店失敗: {e}"}
+    finally:
+        conn.close()
+
+
+def get_branches() -> list[BranchDict]:
+    """查詢所有分店"""
+    conn = get_connection()
+    if conn is None:
+        return []
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT branchId, bName, createdAt FROM Branch ORDER BY branchId")
+        return [dict(zip(BranchDict.__annotations__.keys(), row)) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logger.error(f"查詢分店失敗: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def get_branch(branchId: str) -> Optional[BranchDict]:
+    """查詢單一分店，不存在時返回 None"""
+    for branch in get_branches():
+        if branch["branchId"] == branchId:
+            return branch
+    return None
+
+
+def _read_outbox(
+    branchId: str, since: int, limit: int
+) -> tuple[list[tuple], dict[str, dict], int]:
+    """
+    讀取分店 since 之後的變更記錄
+
+    Returns:
+        tuple: (變更記錄, 新增的交易 {tNo: 交易記錄}, 分店已套用到的電話變更 changeNo)
+    """
+    conn = get_connection(branch_path(branchId))
+    if conn is None:
+        raise sqlite3.OperationalError("分店數據庫連接失敗")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        cursor.execute(
+            """
+            SELECT changeVersion, tableName, rowKey, operation FROM ChangeLog
+            WHERE changeVersion > ? ORDER BY changeVersion LIMIT ?
+            """,
+            (since, limit),
+        )
+        entries = cursor.fetchall()
+        sales = fetch_rows(
+            cursor,
+            "TransactionRecord",
+            [
+                key
+                for _, table, key, operation in entries
+                if table == "TransactionRecord" and operation == "insert"
+            ],
+        )
+        return entries, sales, applied_change_no(cursor)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def _apply_branch_points(
+    cursor: sqlite3.Cursor, branchId: str, sale: dict, applied: int
+) -> None:
+    """分店交易的點數；失敗時（例如會員已刪除）只記錄錯誤，不影響其他變更的轉送"""
+    # 分店尚未套用的換電話：以目前的電話處理點數
+    mContactNum = current_contact(cursor, sale["mContactNum"], applied)
+    cursor.execute("SAVEPOINT branch_points")
+    result = apply_transaction_points(
+        cursor,
+        mContactNum,
+        sale["gsNo"],
+        sale["paymentMethod"],
+        sale["totalAmount"],
+        sale["tNo"],
+        branchId,
+        redeemed=sale["paymentMethod"] == "reward_points"
+        and is_redeemed(cursor, sale["tNo"], branchId),
+    )
+    if "error" in result:
+        cursor.execute("ROLLBACK TO branch_points")
+        logger.error(f"分店 {branchId} 交易 tNo={sale['tNo']} 點數處理失敗: {result['error']}")
+    cursor.execute("RELEASE branch_points")
+
+
+def _relay(cursor: sqlite3.Cursor, branchId: str) -> dict:
+    """
+    寫入佇列中執行：將分店一批尚未轉送的變更寫入主數據庫的 ChangeLog，
+    新增的交易在同一個交易中處理點數，並記錄已轉送到的版本
+    """
+    cursor.execute("SELECT relayedVersion FROM BranchRelay WHERE branchId = ?", (branchId,))
+    row = cursor.fetchone()
+    version = row[0] if row else 0
+    entries, sales, applied = _read_outbox(branchId, version, BRANCH_RELAY_BATCH_SIZE)
+    for _, table, key, operation in entries:
+        cursor.execute(
+            "INSERT INTO ChangeLog (tableName, rowKey, operation, branchId) VALUES (?, ?, ?, ?)",
+            (table, key, operation, branchId),
+        )
+        if table == "TransactionRecord" and operation == "insert" and key in sales:
+            _apply_branch_points(cursor, branchId, sales[key], applied)
+
+    if entries:
+        version = entries[-1][0]
+        cursor.execute(
+            """
+            INSERT INTO BranchRelay (branchId, relayedVersion) VALUES (?, ?)
+            ON CONFLICT (branchId) DO UPDATE SET relayedVersion = excluded.relayedVersion
+            """,
+            (branchId, version),
+        )
+    return {
+        "relayed": len(entries),
+        "version": version,
+        "hasMore": len(entries) == BRANCH_RELAY_BATCH_SIZE,
+    }
+
+
+@retry_when_busy
+def _prune_outbox(branchId: str, version: int) -> None:
+    """刪除分店數據庫中已轉送的變更記錄"""
+    conn = get_connection(branch_path(branchId))
+    if conn is None:
+        raise sqlite3.OperationalError("分店數據庫連接失敗")
+
+    try:
+        conn.execute("DELETE FROM ChangeLog WHERE changeVersion <= ?", (version,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def relay_branch_changes(branchId: str) -> int:
+    """
+    將分店尚未轉送的變更全部轉送到主數據庫
+
+    Returns:
+        int: 轉送的變更記錄數
+    """
+    relayed = 0
+    while True:
+        result = run_write(_relay, branchId)
+        relayed += result["relayed"]
+        if not result["hasMore"]:
+            break
+    if relayed:
+        notify_committed()
+        _prune_outbox(branchId, result["version"])
+    return relayed
+
+
+def relay_all_branches() -> int:
+    """轉送所有分店尚未轉送的變更，返回轉送的變更記錄數"""
+    relayed = 0
+    for branch in get_branches():
+        if not branch_path(branch["branchId"]).exists():
+            continue
+        try:
+            relayed += relay_branch_changes(branch["branchId"])
+        except sqlite3.Error as e:
+            logger.error(f"轉送分店 {branch['branchId']} 的變更失敗: {e}")
+    return relayed
+
+
+async def run_branch_relay(interval: int = BRANCH_RELAY_INTERVAL_SECONDS) -> None:
+    """每 interval 秒轉送所有分店尚未轉送的變更，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(relay_all_branches)
+        except Exception as e:
+            logger.error(f"轉送分店變更失敗: {e}")
+        await asyncio.sleep(interval)
+
+
+def _relay_after_write(branchId: str) -> None:
+    """分店寫入後立即轉送；失敗時只記錄錯誤，由背景排程補上"""
+    try:
+        relay_branch_changes(branchId)
+    except sqlite3.Error as e:
+        logger.error(f"轉送分店 {branchId} 的變更失敗: {e}")
+
+
+def _sync_member_keys(branchId: str) -> Optional[str]:
+    """分店寫入或查詢前套用會員換電話，失敗時返回錯誤訊息"""
+    try:
+        apply_member_key_changes(branch_path(branchId), BRANCH_TABLES)
+        return None
+    except sqlite3.Error as e:
+        logger.error(f"套用分店 {branchId} 的會員換電話失敗: {e}")
+        return f"數據庫錯誤: {e}"
+
+
+def branch_check_in(branchId: str, mContactNum: str) -> Optional[CheckInResultDict]:
+    """會員在分店入場（數據庫錯誤時返回 None）"""
+    if _sync_member_keys(branchId):
+        return None
+    result = branch_checkins(branchId).check_in(mContactNum)
+    if result is not None and result["admitted"]:
+        _relay_after_write(branchId)
+    return result
+
+
+def branch_check_out(branchId: str, mContactNum: str) -> dict[str, str]:
+    """會員在分店退場"""
+    error = _sync_member_keys(branchId)
+    if error:
+        return {"error": error}
+    result = branch_checkins(branchId).check_out(mContactNum)
+    if "error" not in result:
+        _relay_after_write(branchId)
+    return result
+
+
+def branch_checkin_records(branchId: str, mContactNum: str) -> list[CheckInRecordDict]:
+    """查詢會員在分店的打卡記錄（新到舊）"""
+    _sync_member_keys(branchId)
+    return branch_checkins(branchId).list_for_member(mContactNum)
+
+
+def _redeem_at_branch(cursor: sqlite3.Cursor, branchId: str, transaction: dict) -> dict:
+    """
+    寫入佇列中執行：先在主數據庫扣除點數，再寫入分店交易
+
+    分店交易寫入失敗時返回 error，寫入佇列復原扣除。分店交易的 tNo 寫入後才知道，
+    在同一個主數據庫交易中補上帳本記錄的原因，轉送時依此不再扣除。
+    """
+    mContactNum = transaction["mContactNum"]
+    total_amount = transaction_total(
+        transaction["unitPrice"], transaction["count"], transaction["discount"]
+    )
+    result = apply_ledger_change(cursor, mContactNum, "reward_points", -total_amount)
+    if "error" in result:
+        return result
+    # 寫入佇列只有一個寫入者，這位會員最新的帳本記錄就是剛才的扣除
+    cursor.execute("SELECT MAX(ledgerNo) FROM MemberLedger WHERE mContactNum = ?", (mContactNum,))
+    ledgerNo = cursor.fetchone()[0]
+
+    result = branch_transactions(branchId).create(transaction)
+    if "error" in result:
+        return result
+    cursor.execute(
+        "UPDATE MemberLedger SET reason = ? WHERE ledgerNo = ?",
+        (redemption_reason(int(result["tNo"]), branchId), ledgerNo),
+    )
+    return result
+
+
+def create_branch_transaction(branchId: str, transaction: dict) -> dict[str, str]:
+    """
+    在分店新增交易記錄並處理回饋點數
+
+    transaction: mContactNum、gsNo、count、unitPrice、discount、paymentMethod
+    """
+    error = _sync_member_keys(branchId)
+    if error:
+        return {"error": error}
+    if transaction["paymentMethod"] != "reward_points":
+        result = branch_transactions(branchId).create(transaction)
+        if "error" not in result:
+            _relay_after_write(branchId)
+        return result
+
+    try:
+        result = run_write(_redeem_at_branch, branchId, transaction)
+    except WriteTimeout:
+        raise
+    except sqlite3.Error as e:
+        # 主數據庫的扣除沒有提交；分店交易已寫入時，由背景排程轉送並扣除點數
+        logger.error(f"分店 {branchId} 點數兌換失敗: {e}")
+        return {"error": f"數據庫操作失敗: {e}"}
+    if "error" not in result:
+        notify_committed()
+        _relay_after_write(branchId)
+    return result
+
+
+def add_branch_membership(
+    branchId: str, mContactNum: str, startDate: date, endDate: date, isActive: bool = True
+) -> dict[str, str]:
+    """在分店新增會籍（會員必須存在於主數據庫）"""
+    error = _sync_member_keys(branchId)
+    if error:
+        return {"error": error}
+    storage = branch_storage(branchId)
+    try:
+        with storage.transaction() as session:
+            if not session.execute(
+                "SELECT 1 FROM Member WHERE mContactNum = ?", (mContactNum,)
+            ).fetchone():
+                return {"error": "會員不存在"}
+            sid = session.insert(
+                """
+                INSERT INTO MembershipStatus (mContactNum, startDate, endDate, isActive)
+                VALUES (?, ?, ?, ?)
+                """,
+                (mContactNum, startDate.isoformat(), endDate.isoformat(), int(isActive)),
+                "sid",
+            )
+        _relay_after_write(branchId)
+        return {"message": "會籍狀態創建成功", "sId": str(sid)}
+    except sqlite3.IntegrityError:
+        return {"error": "結束日期必須晚於開始日期"}
+    except sqlite3.Error as e:
+        return {"error": f"數據庫錯誤: {e}"}
+
+
+def fan_out(
+    query: Callable[[sqlite3.Cursor], T], branches: Optional[list[BranchDict]] = None
+) -> list[tuple[BranchDict, Optional[T]]]:
+    """
+    以執行緒平行在各分店數據庫執行 query(cursor)
+
+    Returns:
+        list: (分店, 結果)，依分店編號排序；查詢失敗的分店結果為 None
+    """
+    branches = get_branches() if branches is None else branches
+    if not branches:
+        return []
+
+    def run(branch: BranchDict) -> Optional[T]:
+        conn = get_connection(branch_path(branch["branchId"]))
+        if conn is None:
+            return None
+        try:
+            return query(conn.cursor())
+        except sqlite3.Error as e:
+            logger.error(f"查詢分店 {branch['branchId']} 失敗: {e}")
+            return None
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(min(BRANCH_FANOUT_WORKERS, len(branches))) as pool:
+        return list(zip(branches, pool.map(run, branches)))
+
+
+def branch_occupancy() -> list[BranchOccupancyDict]:
+    """各分店目前在場人數（未登出的打卡）與今天的入場次數"""
+    today = datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y-%m-%d")
+
+    def query(cursor: sqlite3.Cursor) -> tuple[int, int]:
+        cursor.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM CheckInRecord WHERE checkOutStatus = 0),
+                (SELECT COUNT(*) FROM CheckInRecord WHERE checkInDatetime >= ?)
+            """,
+            (today,),
+        )
+        return cursor.fetchone()
+
+    return [
+        BranchOccupancyDict(
+            branchId=branch["branchId"],
+            bName=branch["bName"],
+            occupancy=result[0] if result else 0,
+            checkInsToday=result[1] if result else 0,
+        )
+        for branch, result in fan_out(query)
+    ]
+
+
+def branch_revenue(
+    start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> list[BranchRevenueDict]:
+    """各分店在日期範圍內（含兩端）的交易筆數與營收"""
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append("transDateTime >= ?")
+        params.append(start_date.isoformat())
+    if end_date is not None:
+        conditions.append("transDateTime < ?")
+        params.append((end_date + timedelta(days=1)).isoformat())
+    where = " AND ".join(conditions) or "1 = 1"
+
+    def query(cursor: sqlite3.Cursor) -> tuple[int, int]:
+        cursor.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(totalAmount), 0) FROM TransactionRecord WHERE {where}",
+            params,
+        )
+        return cursor.fetchone()
+
+    return [
+        BranchRevenueDict(
+            branchId=branch["branchId"],
+            bName=branch["bName"],
+            transactions=result[0] if result else 0,
+            revenue=result[1] if result else 0,
+        )
+        for branch, result in fan_out(query)
+    ]
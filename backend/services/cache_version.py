@@ -0,0 +1,50 @@
+"""
+跨程序快取版本
+
+每個 worker 程序的記憶體快取（例如回饋點數規則）記下載入時的版本，
+使用前以主鍵查詢 CacheVersion 比對，版本不同表示其他程序修改過資料，需要重新載入。
+修改資料的交易在提交前呼叫 bump_cache_version，讓版本與資料同時生效。
+"""
+
+import sqlite3
+import time
+from typing import Optional
+
+from database import get_connection
+
+
+def get_cache_version(cursor: sqlite3.Cursor, name: str) -> int:
+    """取得快取目前的版本（沒有記錄時為 0）"""
+    cursor.execute("SELECT version FROM CacheVersion WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def bump_cache_version(cursor: Optional[sqlite3.Cursor], name: str) -> None:
+    """
+    更新快取版本，讓所有程序的快取失效
+
+    版本使用目前時間（奈秒），從備份還原後版本也不會回到某個程序快取中的舊值。
+
+    Args:
+        cursor: 呼叫者交易中的 cursor；None 時自行開啟連接並提交
+    """
+    if cursor is None:
+        conn = get_connection()
+        if conn is None:
+            return
+        try:
+            bump_cache_version(conn.cursor(), name)
+            conn.commit()
+        finally:
+            conn.close()
+        return
+
+    cursor.execute(
+        """
+        INSERT INTO CacheVersion (name, version) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET
+            version = MAX(version + 1, excluded.version)
+        """,
+        (name, time.time_ns()),
+    )
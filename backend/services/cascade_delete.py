@@ -0,0 +1,355 @@
+"""
+分批串聯刪除
+
+刪除會員或會員的歷史記錄時，每次只刪除固定筆數，每批各自一個短交易，
+批次之間釋放寫入鎖，讓打卡、交易等其他請求可以寫入。
+外鍵約束全程保持開啟：先刪除參照 Member 的子表格，最後才刪除 Member。
+
+主數據庫以外的資料一併刪除：
+- 封存數據庫（archive/gym_<年份>.db）中同一個表格的記錄
+- 刪除會員時，各分店數據庫（branches/gym_<分店編號>.db）中該會員的會籍、打卡與交易
+
+執行進度記錄在主數據庫的 CascadeJob 表格（每一批刪除與進度在同一個交易中寫入），
+任何 worker 都可以透過 API 查詢。
+"""
+
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, TypedDict
+
+import pytz
+
+from database import get_connection, retry_when_busy
+from services.record_archive import ARCHIVED_TABLES, archive_path, archive_years
+from services.write_queue import run_write
+
+logger = logging.getLogger(__name__)
+
+CASCADE_BATCH_SIZE = 500
+# 批次之間暫停的時間，讓等待寫入鎖的請求有機會取得鎖
+CASCADE_BATCH_PAUSE_SECONDS = 0.01
+# 保留最近幾筆刪除工作的進度
+MAX_TRACKED_JOBS = 100
+
+# 參照 Member 的表格，依刪除順序排列
+MEMBER_CHILD_TABLES = [
+    "MemberPhoto",
+    "CheckInRecord",
+    "TransactionRecord",
+    "MemberLedger",
+    "MembershipDaysRemaining",
+    "MembershipStatus",
+]
+
+
+class CascadeProgressDict(TypedDict):
+    """刪除工作進度"""
+
+    jobId: str
+    target: str
+    mContactNum: str
+    status: str  # running / done / failed
+    deleted: dict[str, int]
+    batches: int
+    startedAt: str
+    finishedAt: Optional[str]
+    error: Optional[str]
+
+
+def _now() -> str:
+    return datetime.now(pytz.timezone("Asia/Taipei")).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _job_from_row(row: tuple) -> CascadeProgressDict:
+    jobNo, target, mContactNum, status, deleted, batches, startedAt, finishedAt, error = row
+    return CascadeProgressDict(
+        jobId=f"{target}-{jobNo}",
+        target=target,
+        mContactNum=mContactNum,
+        status=status,
+        deleted=json.loads(deleted),
+        batches=batches,
+        startedAt=startedAt,
+        finishedAt=finishedAt,
+        error=error,
+    )
+
+
+def _create_job(cursor: sqlite3.Cursor, target: str, mContactNum: str) -> dict:
+    """寫入佇列中執行：登記一筆刪除工作，並清除超過保留數量的舊工作"""
+    cursor.execute(
+        "INSERT INTO CascadeJob (target, mContactNum, startedAt) VALUES (?, ?, ?)",
+        (target, mContactNum, _now()),
+    )
+    jobNo = cursor.lastrowid
+    cursor.execute(
+        "DELETE FROM CascadeJob WHERE jobNo <= ?", (jobNo - MAX_TRACKED_JOBS,)
+    )
+    cursor.execute(
+        """
+        SELECT jobNo, target, mContactNum, status, deleted, batches, startedAt, finishedAt, error
+        FROM CascadeJob WHERE jobNo = ?
+        """,
+        (jobNo,),
+    )
+    return {"job": _job_from_row(cursor.fetchone())}
+
+
+def _save_progress(cursor: sqlite3.Cursor, job: CascadeProgressDict) -> dict:
+    """寫入佇列中執行（或在刪除的交易中）：記錄進度"""
+    cursor.execute(
+        """
+        UPDATE CascadeJob
+        SET status = ?, deleted = ?, batches = ?, finishedAt = ?, error = ?
+        WHERE jobNo = ?
+        """,
+        (
+            job["status"],
+            json.dumps(job["deleted"]),
+            job["batches"],
+            job["finishedAt"],
+            job["error"],
+            int(job["jobId"].rsplit("-", 1)[1]),
+        ),
+    )
+    return {"message": "已記錄進度"}
+
+
+def _count(job: CascadeProgressDict, name: str, count: int) -> CascadeProgressDict:
+    """加上一批刪除筆數後的進度"""
+    deleted = {**job["deleted"], name: job["deleted"].get(name, 0) + count}
+    return CascadeProgressDict(**{**job, "deleted": deleted, "batches": job["batches"] + 1})
+
+
+def _delete_batch(
+    cursor: sqlite3.Cursor,
+    job: CascadeProgressDict,
+    table: str,
+    mContactNum: str,
+    batch_size: int,
+) -> dict:
+    """寫入佇列中執行：刪除一批記錄，並在同一個交易中記錄進度"""
+    cursor.execute(
+        f"""
+        DELETE FROM {table} WHERE rowid IN (
+            SELECT rowid FROM {table} WHERE mContactNum = ? LIMIT ?
+        )
+        """,
+        (mContactNum, batch_size),
+    )
+    job = _count(job, table, cursor.rowcount)
+    _save_progress(cursor, job)
+    return {"job": job}
+
+
+def _delete_member_row(
+    cursor: sqlite3.Cursor, job: CascadeProgressDict, mContactNum: str, tables: list[str]
+) -> dict:
+    """
+    寫入佇列中執行：刪除 Member 本身
+
+    分批刪除期間可能有新的子記錄寫入，因此在同一個交易中
+    再清除一次子表格（此時通常只剩零筆或幾筆）後才刪除 Member。
+    """
+    deleted = dict(job["deleted"])
+    for table in tables:
+        cursor.execute(f"DELETE FROM {table} WHERE mContactNum = ?", (mContactNum,))
+        deleted[table] = deleted.get(table, 0) + cursor.rowcount
+    cursor.execute("DELETE FROM Member WHERE mContactNum = ?", (mContactNum,))
+    deleted["Member"] = cursor.rowcount
+    job = CascadeProgressDict(**{**job, "deleted": deleted, "batches": job["batches"] + 1})
+    _save_progress(cursor, job)
+    return {"job": job}
+
+
+def _satellite_databases(tables: list[str], delete_member: bool) -> list[tuple[str, Path, list[str]]]:
+    """
+    主數據庫以外需要一併刪除的數據庫
+
+    Returns:
+        list: (名稱, 路徑, 表格)；封存數據庫只刪除 tables 中可封存的表格，
+        分店數據庫只在刪除會員時刪除
+    """
+    databases = []
+    archived = [table for table in tables if table in ARCHIVED_TABLES]
+    if archived:
+        for year in archive_years():
+            databases.append((f"archive_{year}", archive_path(year), archived))
+    if delete_member:
+        # services.branches 匯入 models，在這裡才匯入以避免循環匯入
+        from services.branches import BRANCH_TABLES, branch_path, get_branches
+
+        for branch in get_branches():
+            path = branch_path(branch["branchId"])
+            if path.exists():
+                databases.append((f"branch_{branch['branchId']}", path, BRANCH_TABLES))
+    return databases
+
+
+@retry_when_busy
+def _delete_file_batch(path: Path, table: str, mContactNum: str, batch_size: int) -> int:
+    """
+    在封存或分店數據庫中以一個短交易刪除一批記錄
+
+    Returns:
+        int: 本批刪除的筆數（數據庫中沒有這個表格時為 0）
+    """
+    conn = get_connection(path)
+    if conn is None:
+        raise sqlite3.OperationalError(f"數據庫連接失敗: {path}")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        )
+        if cursor.fetchone()[0] == 0:
+            conn.rollback()
+            return 0
+        cursor.execute(
+            f"""
+            DELETE FROM {table} WHERE rowid IN (
+                SELECT rowid FROM {table} WHERE mContactNum = ? LIMIT ?
+            )
+            """,
+            (mContactNum, batch_size),
+        )
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _delete_satellites(
+    job: CascadeProgressDict,
+    databases: list[tuple[str, Path, list[str]]],
+    mContactNum: str,
+    batch_size: int,
+) -> CascadeProgressDict:
+    """分批刪除封存、分店數據庫中的記錄，每個表格完成後記錄進度"""
+    for name, path, tables in databases:
+        for table in tables:
+            count = 0
+            while True:
+                deleted = _delete_file_batch(path, table, mContactNum, batch_size)
+                count += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(CASCADE_BATCH_PAUSE_SECONDS)
+            job = _count(job, f"{name}.{table}", count)
+            run_write(_save_progress, job)
+    return job
+
+
+def cascade_delete(
+    target: str,
+    mContactNum: str,
+    tables: list[str],
+    delete_member: bool = False,
+    batch_size: int = CASCADE_BATCH_SIZE,
+) -> CascadeProgressDict:
+    """
+    依序分批刪除會員在各表格中的記錄
+
+    Args:
+        target: 工作名稱（member / member_photo / ...），用於進度查詢
+        mContactNum: 會員電話
+        tables: 要刪除的表格，依順序處理（封存數據庫中的同名表格一併刪除）
+        delete_member: 是否在最後刪除 Member 本身（分店數據庫中的記錄一併刪除）
+        batch_size: 每批刪除的筆數
+
+    Returns:
+        CascadeProgressDict: 執行結果（status 為 done 或 failed）
+    """
+    try:
+        job = run_write(_create_job, target, mContactNum)["job"]
+    except sqlite3.Error as e:
+        logger.error(f"登記刪除工作失敗: {e}")
+        return CascadeProgressDict(
+            jobId="",
+            target=target,
+            mContactNum=mContactNum,
+            status="failed",
+            deleted={},
+            batches=0,
+            startedAt=_now(),
+            finishedAt=_now(),
+            error=str(e),
+        )
+
+    try:
+        for table in tables:
+            while True:
+                before = job["deleted"].get(table, 0)
+                job = run_write(_delete_batch, job, table, mContactNum, batch_size)["job"]
+                if job["deleted"][table] - before < batch_size:
+                    break
+                time.sleep(CASCADE_BATCH_PAUSE_SECONDS)
+            logger.debug("從 %s 刪除了 %d 條記錄", table, job["deleted"][table])
+
+        databases = _satellite_databases(tables, delete_member)
+        job = _delete_satellites(job, databases, mContactNum, batch_size)
+
+        if delete_member:
+            job = run_write(_delete_member_row, job, mContactNum, tables)["job"]
+            # 刪除期間分店可能又寫入了記錄（分店只在寫入前確認會員存在），會員刪除後再清除一次
+            branches = [database for database in databases if database[0].startswith("branch_")]
+            job = _delete_satellites(job, branches, mContactNum, batch_size)
+
+        job = CascadeProgressDict(**{**job, "status": "done"})
+    except sqlite3.Error as e:
+        logger.error(f"分批刪除失敗 ({job['jobId']}): {e}")
+        job = CascadeProgressDict(**{**job, "status": "failed", "error": str(e)})
+
+    job = CascadeProgressDict(**{**job, "finishedAt": _now()})
+    try:
+        run_write(_save_progress, job)
+    except sqlite3.Error as e:
+        logger.error(f"記錄刪除工作進度失敗 ({job['jobId']}): {e}")
+    return job
+
+
+def _select_jobs(where: str = "1 = 1", params: tuple = ()) -> list[CascadeProgressDict]:
+    conn = get_connection()
+    if conn is None:
+        return []
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT jobNo, target, mContactNum, status, deleted, batches, startedAt, finishedAt, error
+            FROM CascadeJob WHERE {where}
+            ORDER BY jobNo DESC
+            """,
+            params,
+        )
+        return [_job_from_row(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logger.error(f"查詢刪除工作失敗: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def get_cascade_jobs() -> list[CascadeProgressDict]:
+    """取得最近的刪除工作進度（新的在前）"""
+    return _select_jobs()
+
+
+def get_cascade_job(jobId: str) -> Optional[CascadeProgressDict]:
+    """取得單一刪除工作進度"""
+    target, _, jobNo = jobId.rpartition("-")
+    if not jobNo.isdigit():
+        return None
+    jobs = _select_jobs("jobNo = ? AND target = ?", (int(jobNo), target))
+    return jobs[0] if jobs else None
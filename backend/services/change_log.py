@@ -0,0 +1,269 @@
+"""
+變更記錄：增量同步
+
+前台或報表先取得完整資料與目前版本（GET /changes/latest），
+之後以 GET /changes?since=<版本> 只取得之後新增、修改、刪除的資料列，
+不需要重新下載整個表格。變更記錄由觸發器寫入（見 migrations/v0009_change_log.py）。
+
+- 同一頁中同一資料列的多次變更只返回最後一次，row 為讀取時的最新內容，刪除時為 None
+- 變更記錄保留 CHANGE_LOG_RETENTION_DAYS 天；since 早於保留範圍時返回錯誤，
+  呼叫者需重新取得完整資料
+- 封存歷史記錄（搬到封存數據庫）不算刪除，不出現在變更中
+- 分店數據庫的變更轉送到主數據庫後才出現（見 services/branches.py），branchId 為來源分店，
+  row 為分店數據庫中的內容（rowKey 只在同一個分店中唯一）
+"""
+
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, TypedDict
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# 記錄變更的表格與主鍵（與 migrations/v0009_change_log.py 相同）
+CHANGE_TABLES = {
+    "Member": "mContactNum",
+    "CheckInRecord": "checkInNo",
+    "TransactionRecord": "tNo",
+    "MembershipStatus": "sid",
+}
+CHANGE_FEED_DEFAULT_LIMIT = 500
+CHANGE_FEED_MAX_LIMIT = 5000
+CHANGE_LOG_RETENTION_DAYS = 7
+CHANGE_LOG_PRUNE_INTERVAL_SECONDS = 3600
+# IN (...) 一次查詢的主鍵數
+ROW_FETCH_CHUNK = 500
+
+
+class ChangeDict(TypedDict):
+    """一筆資料列的變更"""
+
+    changeVersion: int
+    tableName: str
+    rowKey: str
+    operation: str
+    row: Optional[dict[str, Any]]
+    branchId: Optional[str]
+
+
+class ChangeFeedDict(TypedDict):
+    """
+    變更記錄查詢結果
+
+    欄位說明：
+    - version: 下次查詢的 since
+    - hasMore: 還有更多變更（以 version 繼續查詢）
+    """
+
+    version: int
+    hasMore: bool
+    changes: list[ChangeDict]
+
+
+def latest_version(cursor: sqlite3.Cursor) -> int:
+    """最新的版本：AUTOINCREMENT 的最大值（包含已清除的記錄）"""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'ChangeLog'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def is_retained(cursor: sqlite3.Cursor, since: int) -> bool:
+    """since 之後的變更記錄是否都還在（沒有被清除，且 since 不晚於最新版本）"""
+    latest = latest_version(cursor)
+    cursor.execute("SELECT MIN(changeVersion) FROM ChangeLog")
+    oldest = cursor.fetchone()[0] or latest + 1
+    return oldest - 1 <= since <= latest
+
+
+def get_latest_version() -> dict:
+    """取得目前最新的版本（完整下載資料前先取得，之後以此查詢變更）"""
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        return {"version": latest_version(conn.cursor())}
+    except sqlite3.Error as e:
+        return {"error": f"查詢變更版本失敗: {e}"}
+    finally:
+        conn.close()
+
+
+def fetch_rows(
+    cursor: sqlite3.Cursor, table: str, keys: list[str]
+) -> dict[str, dict[str, Any]]:
+    """依主鍵取得資料列目前的內容 {主鍵（字串）: 資料列}"""
+    pk = CHANGE_TABLES[table]
+    rows = {}
+    for i in range(0, len(keys), ROW_FETCH_CHUNK):
+        chunk = keys[i : i + ROW_FETCH_CHUNK]
+        cursor.execute(
+            f"SELECT * FROM {table} WHERE {pk} IN ({', '.join('?' * len(chunk))})", chunk
+        )
+        columns = [column[0] for column in cursor.description]
+        for values in cursor.fetchall():
+            row = dict(zip(columns, values))
+            rows[str(row[pk])] = row
+    return rows
+
+
+def fetch_branch_rows(
+    branchId: str, table: str, keys: list[str]
+) -> dict[str, dict[str, Any]]:
+    """依主鍵取得分店數據庫中資料列目前的內容，每一列加上 branchId"""
+    if not keys:
+        return {}
+    # services.branches 匯入 models，在這裡才匯入以避免循環匯入
+    from services.branches import branch_path
+
+    conn = get_connection(branch_path(branchId))
+    if conn is None:
+        raise sqlite3.OperationalError("分店數據庫連接失敗")
+    try:
+        rows = fetch_rows(conn.cursor(), table, keys)
+    finally:
+        conn.close()
+    return {key: {**row, "branchId": branchId} for key, row in rows.items()}
+
+
+def fetch_change_rows(
+    cursor: sqlite3.Cursor, entries: list[tuple[Optional[str], str, str]]
+) -> dict[tuple[Optional[str], str], dict[str, dict[str, Any]]]:
+    """
+    取得變更記錄所指資料列目前的內容
+
+    Args:
+        entries: (branchId, 表格, 主鍵)，branchId 為 None 時讀取主數據庫
+
+    Returns:
+        dict: {(branchId, 表格): {主鍵: 資料列}}
+    """
+    keys: dict[tuple[Optional[str], str], list[str]] = {}
+    for branchId, table, key in entries:
+        keys.setdefault((branchId, table), []).append(key)
+    return {
+        (branchId, table): (
+            fetch_rows(cursor, table, table_keys)
+            if branchId is None
+            else fetch_branch_rows(branchId, table, table_keys)
+        )
+        for (branchId, table), table_keys in keys.items()
+    }
+
+
+def get_changes(
+    since: int,
+    limit: int = CHANGE_FEED_DEFAULT_LIMIT,
+    tables: Optional[list[str]] = None,
+) -> dict:
+    """
+    取得 since 之後的變更
+
+    Args:
+        since: 上次取得的版本（GET /changes/latest 或上次結果的 version）
+        limit: 最多讀取幾筆變更記錄
+        tables: 只取得這些表格的變更，None 表示 CHANGE_TABLES 中所有表格
+
+    Returns:
+        ChangeFeedDict | dict: 成功時返回變更；since 早於保留範圍或晚於最新版本時返回 error
+    """
+    tables = tables or list(CHANGE_TABLES)
+    unknown = sorted(set(tables).difference(CHANGE_TABLES))
+    if unknown:
+        return {"error": f"不支援的表格: {', '.join(unknown)}"}
+
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        cursor = conn.cursor()
+        # 變更記錄與資料列在同一個讀取交易中讀取
+        cursor.execute("BEGIN")
+        latest = latest_version(cursor)
+        if not is_retained(cursor, since):
+            return {"error": "變更記錄已清除或版本不存在，請重新取得完整資料"}
+
+        cursor.execute(
+            f"""
+            SELECT changeVersion, tableName, rowKey, operation, branchId FROM ChangeLog
+            WHERE changeVersion > ? AND tableName IN ({', '.join('?' * len(tables))})
+            ORDER BY changeVersion
+            LIMIT ?
+            """,
+            (since, *tables, limit + 1),
+        )
+        entries = cursor.fetchall()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        # 同一資料列只保留最後一次變更
+        last: dict[tuple[Optional[str], str, str], tuple] = {}
+        for entry in entries:
+            last.pop((entry[4], entry[1], entry[2]), None)
+            last[(entry[4], entry[1], entry[2])] = entry
+
+        rows = fetch_change_rows(
+            cursor, [key for key, entry in last.items() if entry[3] != "delete"]
+        )
+        changes = []
+        for (branchId, table, key), (changeVersion, _, _, operation, _) in last.items():
+            row = None if operation == "delete" else rows[(branchId, table)].get(key)
+            changes.append(
+                ChangeDict(
+                    changeVersion=changeVersion,
+                    tableName=table,
+                    rowKey=key,
+                    # 之後的交易已刪除這一列（刪除記錄在後面的頁）
+                    operation="delete" if row is None else operation,
+                    row=row,
+                    branchId=branchId,
+                )
+            )
+
+        # 沒有更多變更時直接跳到最新版本（略過其他表格的變更）
+        version = entries[-1][0] if has_more else latest
+        return ChangeFeedDict(version=version, hasMore=has_more, changes=changes)
+    except sqlite3.Error as e:
+        logger.error(f"查詢變更記錄失敗: {e}")
+        return {"error": f"查詢變更記錄失敗: {e}"}
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def prune_change_log(retention_days: int = CHANGE_LOG_RETENTION_DAYS) -> int:
+    """刪除超過保留天數的變更記錄，返回刪除筆數"""
+    # changedAt 為 UTC（CURRENT_TIMESTAMP）
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    conn = get_connection()
+    if conn is None:
+        return 0
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM ChangeLog WHERE changedAt < ?", (cutoff,))
+        conn.commit()
+        if cursor.rowcount:
+            logger.info(f"清除變更記錄 {cursor.rowcount} 筆")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logger.error(f"清除變更記錄失敗: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+async def run_change_log_pruner(interval: int = CHANGE_LOG_PRUNE_INTERVAL_SECONDS) -> None:
+    """每 interval 秒清除一次過期的變更記錄，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(prune_change_log)
+        except Exception as e:
+            logger.error(f"清除變更記錄失敗: {e}")
+        await asyncio.sleep(interval)
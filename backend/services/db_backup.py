@@ -0,0 +1,293 @@
+"""
+數據庫線上備份
+
+以 sqlite3.Connection.backup 分段複製數據庫：每次只複製 BACKUP_PAGES_PER_STEP 頁，
+段與段之間暫停 BACKUP_STEP_PAUSE_SECONDS 秒。主數據庫只在複製每一段時被鎖住，
+打卡、交易等寫入可以在段與段之間進行。
+複製期間主數據庫被其他連接寫入時 SQLite 會從頭重新複製，
+重新開始超過 BACKUP_MAX_RESTARTS 次後改以單一步驟複製整個數據庫，避免一直無法完成。
+
+備份寫到 backups/ 下的暫存檔，完成後對備份執行 integrity_check，通過才改成正式檔名，
+並只保留最近 BACKUP_RETENTION 份。
+
+備份、列出與還原由 /backups/ 路由執行（見 routes/db_backup_routes.py），
+備份期間寫入延遲的量測見 bench/db_backup.py。
+"""
+
+import asyncio
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, TypedDict
+
+import pytz
+
+import database
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE_SECONDS = 0.01
+BACKUP_INTERVAL_SECONDS = 6 * 3600
+BACKUP_RETENTION = 14
+BACKUP_MAX_RESTARTS = 3
+
+
+class BackupResultDict(TypedDict):
+    """備份執行結果"""
+
+    name: str
+    sizeBytes: int
+    pages: int
+    steps: int
+    restarts: int
+    fullCopyFallback: bool
+    durationMs: float
+    lockedMs: float
+    maxStepLockedMs: float
+    throughputBytesPerSec: float
+    integrity: str
+    createdAt: str
+
+
+class BackupFileDict(TypedDict):
+    """備份檔資訊"""
+
+    name: str
+    sizeBytes: int
+    createdAt: str
+
+
+class BackupMetricsDict(TypedDict):
+    """備份統計"""
+
+    runs: int
+    failures: int
+    lastError: Optional[str]
+    lastBackup: Optional[BackupResultDict]
+
+
+_metrics: BackupMetricsDict = {
+    "runs": 0,
+    "failures": 0,
+    "lastError": None,
+    "lastBackup": None,
+}
+
+
+def backup_dir() -> Path:
+    """備份所在目錄（與主數據庫同一層的 backups/）"""
+    return Path(database.DB_PATH).parent / "backups"
+
+
+class _TooManyRestarts(Exception):
+    """分段複製重新開始太多次"""
+
+
+def _integrity_check(path: Path) -> str:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def list_backups() -> list[BackupFileDict]:
+    """列出備份檔（新的在前）"""
+    if not backup_dir().exists():
+        return []
+    files = sorted(backup_dir().glob("gym_*.db"), reverse=True)
+    taipei_tz = pytz.timezone("Asia/Taipei")
+    return [
+        BackupFileDict(
+            name=path.name,
+            sizeBytes=path.stat().st_size,
+            createdAt=datetime.fromtimestamp(path.stat().st_mtime, taipei_tz).strftime(
+                "%Y-%m-%d %H:%M:%S"
+            ),
+        )
+        for path in files
+    ]
+
+
+def prune_backups(retention: int = BACKUP_RETENTION) -> list[str]:
+    """只保留最近 retention 份備份，回傳刪除的檔名"""
+    removed = []
+    for backup in list_backups()[retention:]:
+        (backup_dir() / backup["name"]).unlink(missing_ok=True)
+        removed.append(backup["name"])
+    return removed
+
+
+def create_backup(
+    pages: int = BACKUP_PAGES_PER_STEP,
+    pause: float = BACKUP_STEP_PAUSE_SECONDS,
+    retention: int = BACKUP_RETENTION,
+) -> dict:
+    """
+    建立一份線上備份
+
+    Args:
+        pages: 每段複製的頁數
+        pause: 段與段之間暫停的秒數
+        retention: 保留的備份份數
+
+    Returns:
+        dict: 成功時為 BackupResultDict，失敗時包含 error
+    """
+    now = datetime.now(pytz.timezone("Asia/Taipei"))
+    name = f"gym_{now.strftime('%Y%m%d_%H%M%S')}.db"
+    backup_dir().mkdir(parents=True, exist_ok=True)
+    target = backup_dir() / name
+    partial = target.with_suffix(".partial")
+
+    stats = {"steps": 0, "restarts": 0, "locked": 0.0, "max_step": 0.0, "pages": 0}
+    last = {"remaining": None, "released": 0.0}
+
+    def progress(status: int, remaining: int, total: int) -> None:
+        # 從上一段結束到這裡是 backup_step 執行的時間，也就是主數據庫被鎖住的時間
+        locked = time.perf_counter() - last["released"]
+        stats["locked"] += locked
+        stats["max_step"] = max(stats["max_step"], locked)
+        stats["steps"] += 1
+        stats["pages"] = total
+        # 每段都會減少剩餘頁數；沒有減少表示主數據庫被其他連接修改，SQLite 從頭開始
+        if last["remaining"] is not None and remaining >= last["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > BACKUP_MAX_RESTARTS:
+                raise _TooManyRestarts()
+        last["remaining"] = remaining
+        if remaining > 0:
+            time.sleep(pause)
+        last["released"] = time.perf_counter()
+
+    _metrics["runs"] += 1
+    source = get_connection()
+    if source is None:
+        _metrics["failures"] += 1
+        _metrics["lastError"] = "數據庫連接失敗"
+        return {"error": "數據庫連接失敗"}
+
+    started = time.perf_counter()
+    fallback = False
+    try:
+        destination = sqlite3.connect(partial)
+        try:
+            last["released"] = time.perf_counter()
+            try:
+                source.backup(destination, pages=pages, progress=progress)
+            except _TooManyRestarts:
+                logger.warning("備份重新開始太多次，改以單一步驟複製")
+                fallback = True
+                step_started = time.perf_counter()
+                source.backup(destination)
+                locked = time.perf_counter() - step_started
+                stats["locked"] += locked
+                stats["max_step"] = max(stats["max_step"], locked)
+                stats["steps"] += 1
+        finally:
+            destination.close()
+    except sqlite3.Error as e:
+        partial.unlink(missing_ok=True)
+        _metrics["failures"] += 1
+        _metrics["lastError"] = str(e)
+        logger.error(f"數據庫備份失敗: {e}")
+        return {"error": f"數據庫備份失敗: {str(e)}"}
+    finally:
+        source.close()
+    duration = time.perf_counter() - started
+
+    integrity = _integrity_check(partial)
+    if integrity != "ok":
+        partial.unlink(missing_ok=True)
+        _metrics["failures"] += 1
+        _metrics["lastError"] = f"備份完整性檢查失敗: {integrity}"
+        logger.error(_metrics["lastError"])
+        return {"error": _metrics["lastError"]}
+
+    partial.rename(target)
+    size = target.stat().st_size
+    result = BackupResultDict(
+        name=name,
+        sizeBytes=size,
+        pages=stats["pages"],
+        steps=stats["steps"],
+        restarts=stats["restarts"],
+        fullCopyFallback=fallback,
+        durationMs=round(duration * 1000, 3),
+        lockedMs=round(stats["locked"] * 1000, 3),
+        maxStepLockedMs=round(stats["max_step"] * 1000, 3),
+        throughputBytesPerSec=round(size / duration, 1) if duration > 0 else 0.0,
+        integrity=integrity,
+        createdAt=now.strftime("%Y-%m-%d %H:%M:%S"),
+    )
+    _metrics["lastBackup"] = result
+    _metrics["lastError"] = None
+
+    removed = prune_backups(retention)
+    logger.info(
+        f"數據庫備份完成: {name}, {size} bytes, 耗時 {result['durationMs']} ms, "
+        f"鎖定 {result['lockedMs']} ms, 刪除舊備份 {len(removed)} 份"
+    )
+    return result
+
+
+def restore_backup(name: str) -> dict[str, str]:
+    """
+    以備份覆蓋主數據庫
+
+    還原前先檢查備份完整性；還原以單一步驟複製，過程中主數據庫會被鎖住。
+
+    Args:
+        name: 備份檔名（list_backups 回傳的 name）
+    """
+    path = backup_dir() / name
+    if path.parent != backup_dir() or not path.name.startswith("gym_") or not path.exists():
+        return {"error": "備份不存在"}
+
+    integrity = _integrity_check(path)
+    if integrity != "ok":
+        return {"error": f"備份完整性檢查失敗: {integrity}"}
+
+    destination = get_connection()
+    if destination is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        source = sqlite3.connect(path)
+        try:
+            source.backup(destination)
+        finally:
+            source.close()
+    except sqlite3.Error as e:
+        logger.error(f"數據庫還原失敗: {e}")
+        return {"error": f"數據庫還原失敗: {str(e)}"}
+    finally:
+        destination.close()
+
+    # 還原後規則可能不同，清除本程序的快取並更新版本讓其他程序重新載入
+    from models.reward_point_rule import RULE_CACHE_NAME, invalidate_rule_cache
+    from services.cache_version import bump_cache_version
+
+    invalidate_rule_cache()
+    bump_cache_version(None, RULE_CACHE_NAME)
+    logger.info(f"數據庫已從 {name} 還原")
+    return {"message": "數據庫還原成功", "name": name}
+
+
+def get_backup_metrics() -> BackupMetricsDict:
+    """取得備份統計"""
+    return BackupMetricsDict(**_metrics)
+
+
+async def run_backup_scheduler(interval: int = BACKUP_INTERVAL_SECONDS) -> None:
+    """每 interval 秒建立一次備份，直到被取消"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(create_backup)
+        except Exception as e:
+            logger.error(f"數據庫備份失敗: {e}")
@@ -0,0 +1,321 @@
+"""
+即時動態：入場、登出、銷售事件的 Server-Sent Events 推播
+
+櫃台看板、前台以 GET /events/stream 訂閱，打卡記錄與交易記錄提交後即時收到事件，
+不需要每幾秒重新取得整個列表。
+
+事件來源是變更記錄（ChangeLog，見 services/change_log.py），不是程序內的呼叫：
+- 每個 worker 程序各自一個 EventBroker，由 tail 任務讀取新的變更記錄並分送給訂閱者，
+  其他 worker 提交的寫入同樣會被讀到（最多延遲 SSE_POLL_INTERVAL_SECONDS）
+- 本程序提交後呼叫 notify_committed() 立即喚醒 tail 任務，不必等下一次輪詢
+- 事件 id 是 changeVersion，斷線重新連線時瀏覽器帶上 Last-Event-ID，
+  從變更記錄補送中間漏掉的事件；記錄已清除時送出 reset 事件，呼叫者重新取得完整資料
+
+背壓：每個訂閱者一個 SSE_QUEUE_SIZE 的佇列，分送時不等待。
+佇列滿了（連線太慢跟不上）的訂閱者直接中斷：送出 overflow 事件後結束串流，
+由呼叫者以 Last-Event-ID 重新連線補齊。慢的連線不會拖慢其他訂閱者，也不會累積記憶體。
+
+tail 任務只在有訂閱者時執行，最後一個訂閱者離開後結束。
+
+數百個 SSE 連線同時訂閱的壓力測試見 bench/event_stream.py。
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+from typing import Any, AsyncIterator, Optional, TypedDict
+
+from database import get_connection
+from services.change_log import fetch_change_rows, is_retained, latest_version
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("checkin", "checkout", "sale")
+# 產生事件的表格
+EVENT_TABLES = ("CheckInRecord", "TransactionRecord")
+# 每個訂閱者最多累積的事件數，超過時中斷該訂閱者
+SSE_QUEUE_SIZE = 256
+SSE_MAX_SUBSCRIBERS = 1000
+# 讀取其他 worker 寫入的間隔（本程序的寫入由 notify_committed 立即喚醒）
+SSE_POLL_INTERVAL_SECONDS = 0.5
+# 沒有事件時送出註解，避免代理伺服器關閉閒置連線
+SSE_HEARTBEAT_SECONDS = 15
+# 瀏覽器斷線後重新連線的等待時間
+SSE_RETRY_MS = 3000
+# 一次讀取的變更記錄數
+EVENT_BATCH_SIZE = 500
+# 重新連線時最多補送的事件數，超過時送出 reset
+SSE_REPLAY_MAX = 5000
+
+
+class EventDict(TypedDict):
+    """
+    即時事件
+
+    欄位說明：
+    - id: 變更記錄的 changeVersion（重新連線時的 Last-Event-ID）
+    - type: checkin / checkout / sale
+    - data: 打卡記錄或交易記錄的內容（分店的記錄包含 branchId）
+    """
+
+    id: int
+    type: str
+    data: dict[str, Any]
+
+
+def _to_event(changeVersion: int, table: str, operation: str, row: Optional[dict]) -> Optional[EventDict]:
+    """變更記錄轉為事件，不產生事件的變更（刪除、其他修改）返回 None"""
+    if row is None:
+        return None
+    if table == "CheckInRecord":
+        if operation == "insert":
+            return EventDict(id=changeVersion, type="checkin", data=row)
+        # 登出是把 checkOutStatus 改為 1 的修改
+        if operation == "update" and row.get("checkOutStatus") == 1:
+            return EventDict(id=changeVersion, type="checkout", data=row)
+    elif table == "TransactionRecord" and operation == "insert":
+        return EventDict(id=changeVersion, type="sale", data=row)
+    return None
+
+
+def read_events(
+    since: int, until: Optional[int] = None, limit: int = EVENT_BATCH_SIZE
+) -> Optional[tuple[list[EventDict], int]]:
+    """
+    讀取 since 之後（不超過 until）的事件
+
+    Returns:
+        Optional[tuple[list[EventDict], int]]: (事件, 已讀到的版本)；
+        since 之後的變更記錄已清除時返回 None
+    """
+    conn = get_connection()
+    if conn is None:
+        raise sqlite3.OperationalError("數據庫連接失敗")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")
+        if not is_retained(cursor, since):
+            return None
+        latest = latest_version(cursor)
+        until = latest if until is None else min(until, latest)
+        cursor.execute(
+            f"""
+            SELECT changeVersion, tableName, rowKey, operation, branchId FROM ChangeLog
+            WHERE changeVersion > ? AND changeVersion <= ?
+                AND tableName IN ({', '.join('?' * len(EVENT_TABLES))})
+                AND operation != 'delete'
+            ORDER BY changeVersion
+            LIMIT ?
+            """,
+            (since, until, *EVENT_TABLES, limit),
+        )
+        entries = cursor.fetchall()
+        rows = fetch_change_rows(
+            cursor, [(branchId, table, key) for _, table, key, _, branchId in entries]
+        )
+        events = [
+            event
+            for changeVersion, table, key, operation, branchId in entries
+            if (
+                event := _to_event(
+                    changeVersion, table, operation, rows[(branchId, table)].get(key)
+                )
+            )
+        ]
+        # 讀滿一批時只讀到最後一筆，否則已讀到 until
+        return events, entries[-1][0] if len(entries) == limit else until
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def replay_events(since: int, until: int) -> Optional[list[EventDict]]:
+    """重新連線時補送 (since, until] 的事件，記錄已清除或太多時返回 None"""
+    events: list[EventDict] = []
+    while since < until:
+        result = read_events(since, until)
+        if result is None:
+            return None
+        batch, since = result
+        events.extend(batch)
+        if len(events) > SSE_REPLAY_MAX:
+            return None
+    return events
+
+
+def format_event(event_type: str, data: Any, event_id: Optional[int] = None) -> str:
+    """SSE 格式的一個事件"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines += [f"event: {event_type}", f"data: {json.dumps(data, ensure_ascii=False)}"]
+    return "\n".join(lines) + "\n\n"
+
+
+# 佇列滿了被中斷時放入的記號
+OVERFLOW = object()
+
+
+class Subscription:
+    """一個 SSE 連線的訂閱：只接收 types 中的事件，start 之後的事件由佇列收到"""
+
+    def __init__(self, types: frozenset[str], start: int, queue_size: int):
+        self.types = types
+        self.start = start
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+
+class EventBroker:
+    """程序內的事件分送：讀取變更記錄，分送到每個訂閱者的佇列"""
+
+    def __init__(
+        self,
+        queue_size: int = SSE_QUEUE_SIZE,
+        max_subscribers: int = SSE_MAX_SUBSCRIBERS,
+        poll_interval: float = SSE_POLL_INTERVAL_SECONDS,
+    ):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.poll_interval = poll_interval
+        self._subscribers: set[Subscription] = set()
+        # 已分送到的版本，沒有訂閱者時為 None
+        self.version: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    async def subscribe(self, types: frozenset[str]) -> Optional[Subscription]:
+        """新增訂閱者，超過 max_subscribers 時返回 None"""
+        if len(self._subscribers) >= self.max_subscribers:
+            return None
+        if self.version is None:
+            version = await asyncio.to_thread(_latest_version)
+            # 等待期間其他訂閱者可能已經設定
+            if self.version is None:
+                self.version = version
+        subscription = Subscription(types, self.version, self.queue_size)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._tail())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._wake is not None:
+            # 讓 tail 任務結束
+            self._wake.set()
+
+    def publish(self, event: EventDict) -> None:
+        """分送事件（不等待），佇列滿了的訂閱者中斷"""
+        self.published += 1
+        for subscription in list(self._subscribers):
+            if event["type"] not in subscription.types:
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+        self.dropped += 1
+        # 清空佇列後只留下中斷記號，之後的事件由重新連線補送
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(OVERFLOW)
+        logger.warning(f"SSE 訂閱者跟不上事件，已中斷（佇列上限 {self.queue_size}）")
+
+    def notify(self) -> None:
+        """有新的提交時喚醒 tail 任務（可以從任何執行緒呼叫）"""
+        loop, wake = self._loop, self._wake
+        if loop is None or wake is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            # 事件迴圈已關閉
+            pass
+
+    async def _tail(self) -> None:
+        """讀取新的變更記錄並分送，直到沒有訂閱者"""
+        while self._subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                while self._subscribers:
+                    result = await asyncio.to_thread(read_events, self.version)
+                    if result is None:
+                        # 變更記錄被清除（例如還原備份），從最新版本重新開始
+                        logger.warning("SSE 讀取位置的變更記錄已清除，從最新版本繼續")
+                        self.version = await asyncio.to_thread(_latest_version)
+                        break
+                    events, version = result
+                    for event in events:
+                        self.publish(event)
+                    if version == self.version:
+                        break
+                    self.version = version
+            except Exception as e:
+                logger.error(f"讀取即時事件失敗: {e}")
+        self.version = None
+
+
+def _latest_version() -> int:
+    conn = get_connection()
+    if conn is None:
+        raise sqlite3.OperationalError("數據庫連接失敗")
+    try:
+        return latest_version(conn.cursor())
+    finally:
+        conn.close()
+
+
+broker = EventBroker()
+
+
+def notify_committed() -> None:
+    """打卡記錄、交易記錄提交後呼叫，讓訂閱者立即收到事件"""
+    broker.notify()
+
+
+async def event_stream(
+    subscription: Subscription, last_event_id: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    SSE 串流內容：先補送 Last-Event-ID 之後漏掉的事件，再送出佇列中的事件
+
+    佇列滿了被中斷時送出 overflow 後結束；結束（包含連線中斷）時取消訂閱。
+    """
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if last_event_id is not None and last_event_id < subscription.start:
+            replay = await asyncio.to_thread(replay_events, last_event_id, subscription.start)
+            if replay is None:
+                yield format_event("reset", {"version": subscription.start}, subscription.start)
+            else:
+                for event in replay:
+                    if event["type"] in subscription.types:
+                        yield format_event(event["type"], event["data"], event["id"])
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is OVERFLOW:
+                yield format_event("overflow", {"queueSize": subscription.queue.maxsize})
+                return
+            yield format_event(event["type"], event["data"], event["id"])
+    finally:
+        broker.unsubscribe(subscription)
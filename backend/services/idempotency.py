@@ -0,0 +1,365 @@
+"""
+Idempotency-Key：避免重複送出的 POST 建立重複的交易
+
+前台按下「購買」後頁面重新執行、網路逾時後重送，都可能把同一筆交易送出兩次。
+呼叫者為每次操作產生一個 key，以 Idempotency-Key 標頭送出；
+相同的 key 再次送出時不再執行，直接返回第一次的回應（標頭 Idempotent-Replayed: true）。
+
+- 只處理 IDEMPOTENT_PATHS 中的 POST（交易、打卡、購買會籍、帳本儲值扣款），沒有帶標頭時照常執行
+- 記錄存在 IdempotencyKey 表格（所有 worker 共用），保留 IDEMPOTENCY_TTL_HOURS 小時；
+  已完成的回應另外快取在程序記憶體中，重送時不必查詢數據庫
+- 第一次的請求仍在處理中時返回 409；相同的 key 用於不同的請求（路徑或內容不同）時返回 422
+- 5xx 與轉址回應不記錄，呼叫者可以用相同的 key 重試
+- 處理中的記錄超過 IDEMPOTENCY_PENDING_TIMEOUT_SECONDS（程序中途結束）視為放棄，由下一次請求接手
+
+只保證至少一次，不保證恰好一次：登記 key、路由本身的寫入、記錄回應是三個各自提交的交易。
+路由的寫入已提交、回應還沒記錄時程序結束，這個 key 會在處理逾時後被視為放棄，
+重送的請求會再執行一次。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, TypedDict
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from database import get_connection
+from services.write_queue import WRITE_TIMEOUT_SECONDS, WriteTimeout, run_write
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_HOURS = 24
+IDEMPOTENCY_PRUNE_INTERVAL_SECONDS = 3600
+# 記憶體中快取的已完成回應數
+IDEMPOTENCY_CACHE_SIZE = 1024
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# 處理中的記錄超過這個時間視為放棄（寫入最多等待 WRITE_TIMEOUT_SECONDS）
+IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = WRITE_TIMEOUT_SECONDS * 2
+
+# 支援 Idempotency-Key 的 POST 路徑
+IDEMPOTENT_PATHS = re.compile(
+    r"^/(?:transaction_records"
+    r"|checkinrecord(?:/checkin)?"
+    r"|membership_status/purchase"
+    r"|members/[^/]+/ledger"
+    r"|branches/[^/]+/(?:checkin|transaction_records|membership_status))/?$"
+)
+
+
+class StoredResponseDict(TypedDict):
+    """記錄的回應"""
+
+    fingerprint: str
+    statusCode: int
+    contentType: Optional[str]
+    responseBody: bytes
+
+
+class ReserveResultDict(TypedDict, total=False):
+    """
+    保留 key 的結果
+
+    欄位說明：
+    - status: reserved（第一次，繼續執行）/ replay / in_progress / mismatch
+    - response: status 為 replay 時記錄的回應
+    """
+
+    status: str
+    response: StoredResponseDict
+
+
+def _utc(delta: timedelta = timedelta()) -> str:
+    # createdAt 為 UTC（CURRENT_TIMESTAMP）
+    return (datetime.now(timezone.utc) + delta).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def fingerprint_request(method: str, path: str, query: bytes, body: bytes) -> str:
+    """請求的摘要（判斷相同的 key 是否用於相同的請求）"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (method.encode(), path.encode(), query, body):
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _reserve(cursor: sqlite3.Cursor, key: str, fingerprint: str) -> ReserveResultDict:
+    """寫入佇列中執行：沒有記錄（或已過期、已放棄）時保留 key"""
+    cursor.execute(
+        """
+        SELECT fingerprint, statusCode, contentType, responseBody, createdAt
+        FROM IdempotencyKey WHERE idemKey = ?
+        """,
+        (key,),
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        stored_fingerprint, status_code, content_type, body, created_at = row
+        expired = created_at < _utc(-timedelta(hours=IDEMPOTENCY_TTL_HOURS))
+        abandoned = status_code is None and created_at < _utc(
+            -timedelta(seconds=IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+        )
+        if not (expired or abandoned):
+            if stored_fingerprint != fingerprint:
+                return {"status": "mismatch"}
+            if status_code is None:
+                return {"status": "in_progress"}
+            return {
+                "status": "replay",
+                "response": StoredResponseDict(
+                    fingerprint=stored_fingerprint,
+                    statusCode=status_code,
+                    contentType=content_type,
+                    responseBody=bytes(body),
+                ),
+            }
+
+    cursor.execute(
+        """
+        INSERT OR REPLACE INTO IdempotencyKey (idemKey, fingerprint, createdAt)
+        VALUES (?, ?, ?)
+        """,
+        (key, fingerprint, _utc()),
+    )
+    return {"status": "reserved"}
+
+
+def _complete(cursor: sqlite3.Cursor, key: str, response: StoredResponseDict) -> dict:
+    """寫入佇列中執行：記錄回應"""
+    cursor.execute(
+        """
+        UPDATE IdempotencyKey SET statusCode = ?, contentType = ?, responseBody = ?
+        WHERE idemKey = ? AND fingerprint = ?
+        """,
+        (
+            response["statusCode"],
+            response["contentType"],
+            response["responseBody"],
+            key,
+            response["fingerprint"],
+        ),
+    )
+    return {"message": "已記錄回應"}
+
+
+def _release(cursor: sqlite3.Cursor, key: str, fingerprint: str) -> dict:
+    """寫入佇列中執行：刪除處理中的記錄，讓相同的 key 可以重試"""
+    cursor.execute(
+        "DELETE FROM IdempotencyKey WHERE idemKey = ? AND fingerprint = ? AND statusCode IS NULL",
+        (key, fingerprint),
+    )
+    return {"message": "已釋放"}
+
+
+class ResponseCache:
+    """已完成回應的記憶體快取（LRU，超過 TTL 的項目視為不存在）"""
+
+    def __init__(self, size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.size = size
+        self._items: OrderedDict[str, tuple[float, StoredResponseDict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[StoredResponseDict]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, response: StoredResponseDict) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + IDEMPOTENCY_TTL_HOURS * 3600, response)
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+response_cache = ResponseCache()
+
+
+async def _finish(fn, *args) -> bool:
+    """
+    回應送出後記錄結果或釋放 key
+
+    寫入佇列逾時時只記錄日誌：回應已經送出，記錄留在處理中，
+    超過 IDEMPOTENCY_PENDING_TIMEOUT_SECONDS 後由下一次請求接手。
+    """
+    try:
+        await asyncio.to_thread(run_write, fn, *args)
+        return True
+    except WriteTimeout as e:
+        logger.warning(f"Idempotency-Key 記錄失敗 ({fn.__name__}): {e}")
+        return False
+
+
+async def _send_json(send: Send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}, ensure_ascii=False).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_stored(send: Send, response: StoredResponseDict) -> None:
+    headers = [
+        (b"content-length", str(len(response["responseBody"])).encode()),
+        (b"idempotent-replayed", b"true"),
+    ]
+    if response["contentType"]:
+        headers.append((b"content-type", response["contentType"].encode()))
+    await send({"type": "http.response.start", "status": response["statusCode"], "headers": headers})
+    await send({"type": "http.response.body", "body": response["responseBody"]})
+
+
+class IdempotencyMiddleware:
+    """IDEMPOTENT_PATHS 的 POST 帶 Idempotency-Key 時，相同的 key 只執行一次"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not IDEMPOTENT_PATHS.match(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get("Idempotency-Key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key 長度必須為 1 到 {IDEMPOTENCY_KEY_MAX_LENGTH} 個字元")
+            return
+
+        # 讀取整個請求內容計算摘要，之後再交給路由
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        fingerprint = fingerprint_request(
+            scope["method"], scope["path"], scope.get("query_string", b""), body
+        )
+
+        cached = response_cache.get(key)
+        if cached is not None and cached["fingerprint"] == fingerprint:
+            await _send_stored(send, cached)
+            return
+
+        try:
+            result = await asyncio.to_thread(run_write, _reserve, key, fingerprint)
+        except WriteTimeout as e:
+            await _send_json(send, 503, str(e))
+            return
+        if result["status"] == "replay":
+            await _send_stored(send, result["response"])
+            return
+        if result["status"] == "in_progress":
+            await _send_json(send, 409, "相同 Idempotency-Key 的請求處理中，請稍後再試")
+            return
+        if result["status"] == "mismatch":
+            await _send_json(send, 422, "Idempotency-Key 已用於不同的請求")
+            return
+
+        body_sent = False
+
+        async def receive_body() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code = 500
+        content_type = None
+        response_chunks = []
+
+        async def send_recorded(message: Message) -> None:
+            nonlocal status_code, content_type
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = Headers(raw=message["headers"]).get("Content-Type")
+            elif message["type"] == "http.response.body":
+                response_chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_body, send_recorded)
+        except BaseException:
+            await _finish(_release, key, fingerprint)
+            raise
+
+        # 轉址（例如缺少結尾的 /）與伺服器錯誤不記錄
+        if status_code >= 500 or 300 <= status_code < 400:
+            await _finish(_release, key, fingerprint)
+            return
+        response = StoredResponseDict(
+            fingerprint=fingerprint,
+            statusCode=status_code,
+            contentType=content_type,
+            responseBody=b"".join(response_chunks),
+        )
+        if await _finish(_complete, key, response):
+            response_cache.put(key, response)
+
+
+def prune_idempotency_keys(ttl_hours: int = IDEMPOTENCY_TTL_HOURS) -> int:
+    """刪除超過保留時間的記錄，返回刪除筆數"""
+    conn = get_connection()
+    if conn is None:
+        return 0
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM IdempotencyKey WHERE createdAt < ?",
+            (_utc(-timedelta(hours=ttl_hours)),),
+        )
+        conn.commit()
+        if cursor.rowcount:
+            logger.info(f"清除 Idempotency-Key 記錄 {cursor.rowcount} 筆")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logger.error(f"清除 Idempotency-Key 記錄失敗: {e}")
+        return 0
+    finally:
+        conn.close()
+
+
+async def run_idempotency_pruner(interval: int = IDEMPOTENCY_PRUNE_INTERVAL_SECONDS) -> None:
+    """每 interval 秒清除一次過期的 Idempotency-Key 記錄，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(prune_idempotency_keys)
+        except Exception as e:
+            logger.error(f"清除 Idempotency-Key 記錄失敗: {e}")
+        await asyncio.sleep(interval)
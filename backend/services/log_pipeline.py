@@ -0,0 +1,221 @@
+"""
+結構化非同步日誌
+
+請求處理中的 logger 呼叫只把記錄放進佇列（QueueHandler），
+由背景執行緒（QueueListener）格式化成一行 JSON 寫到 stderr，
+寫入速度慢時不會拖慢請求；佇列滿時丟棄記錄並計數，不會阻塞。
+
+每筆記錄帶有目前請求的 requestId（由 main.py 的中介層設定）。
+DEBUG 記錄依呼叫位置抽樣，每 1/GYM_LOG_DEBUG_SAMPLE_RATE 筆保留一筆，
+熱門路徑開啟 DEBUG 時不會被日誌淹沒。
+
+設定（環境變數）：
+    GYM_LOG_LEVEL              預設等級，例如 INFO
+    GYM_LOG_LEVELS             各模組等級，例如 models.member=DEBUG,uvicorn.access=WARNING
+    GYM_LOG_DEBUG_SAMPLE_RATE  DEBUG 記錄保留比例，1 表示全部保留
+    GYM_LOG_QUEUE_SIZE         佇列上限
+
+每個請求的日誌開銷的量測見 bench/log_pipeline.py。
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+from typing import Optional, TypedDict
+
+import pytz
+
+LOG_LEVEL = os.environ.get("GYM_LOG_LEVEL", "INFO")
+LOG_MODULE_LEVELS = os.environ.get("GYM_LOG_LEVELS", "")
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("GYM_LOG_DEBUG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.environ.get("GYM_LOG_QUEUE_SIZE", "10000"))
+
+# 目前請求的編號，由中介層在每個請求開始時設定
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+# LogRecord 本身的屬性，其餘屬性（logger 呼叫時的 extra）會輸出到 JSON
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "requestId"}
+
+
+class LogMetricsDict(TypedDict):
+    """日誌統計"""
+
+    enqueued: int
+    dropped: int
+    sampledOut: int
+    queueSize: int
+
+
+_metrics = {"enqueued": 0, "dropped": 0, "sampledOut": 0}
+_queue: Optional[queue.SimpleQueue] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[logging.Handler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """將記錄格式化成一行 JSON"""
+
+    _tz = pytz.timezone("Asia/Taipei")
+
+    def format(self, record: logging.LogRecord) -> str:
+        created = datetime.fromtimestamp(record.created, self._tz)
+        entry = {
+            "time": f"{created.strftime('%Y-%m-%d %H:%M:%S')}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "requestId": getattr(record, "requestId", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """記錄產生時附上目前請求的 requestId（必須在呼叫 logger 的執行緒中執行）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.requestId = request_id_var.get()
+        return True
+
+
+class DebugSampleFilter(logging.Filter):
+    """
+    DEBUG 記錄依呼叫位置抽樣
+
+    每個呼叫位置（logger 名稱 + 行號）的第 1、1 + n、1 + 2n ... 筆會保留，
+    n = round(1 / rate)。INFO 以上的記錄全部保留。
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.counts: dict[tuple[str, int], int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        if self.every == 0:
+            _metrics["sampledOut"] += 1
+            return False
+        key = (record.name, record.lineno)
+        count = self.counts.get(key, 0)
+        self.counts[key] = count + 1
+        if count % self.every == 0:
+            return True
+        _metrics["sampledOut"] += 1
+        return False
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """佇列滿時丟棄記錄而不是阻塞或印出錯誤"""
+
+    def __init__(self, log_queue: queue.SimpleQueue, maxsize: int):
+        super().__init__(log_queue)
+        self.maxsize = maxsize
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 根 logger 只有這一個 handler，直接修改記錄而不複製；
+        # 只在這裡組出訊息，JSON 格式化交給背景執行緒，例外先轉成文字
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # SimpleQueue 沒有上限也不需要鎖，以 qsize 近似控制長度
+        if self.queue.qsize() >= self.maxsize:
+            _metrics["dropped"] += 1
+            return
+        self.queue.put_nowait(record)
+        _metrics["enqueued"] += 1
+
+
+def parse_module_levels(spec: str) -> dict[str, str]:
+    """解析 GYM_LOG_LEVELS，例如 "models.member=DEBUG, uvicorn.access=WARNING" """
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    module_levels: Optional[dict[str, str]] = None,
+    sample_rate: float = LOG_DEBUG_SAMPLE_RATE,
+    queue_size: int = LOG_QUEUE_SIZE,
+    stream=None,
+) -> None:
+    """
+    設定根 logger：佇列 + 背景執行緒輸出 JSON
+
+    重複呼叫時會先停止舊的背景執行緒再重新設定。
+
+    Args:
+        level: 預設等級
+        module_levels: 各模組等級，None 時讀取 GYM_LOG_LEVELS
+        sample_rate: DEBUG 記錄保留比例
+        queue_size: 佇列上限
+        stream: 輸出位置，預設 stderr
+    """
+    global _queue, _listener, _handler
+    shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    _queue = queue.SimpleQueue()
+    _handler = _NonBlockingQueueHandler(_queue, queue_size)
+    _handler.addFilter(DebugSampleFilter(sample_rate))
+    _handler.addFilter(RequestContextFilter())
+    _listener = logging.handlers.QueueListener(_queue, output)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+
+    if module_levels is None:
+        module_levels = parse_module_levels(LOG_MODULE_LEVELS)
+    for name, module_level in module_levels.items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+def shutdown_logging() -> None:
+    """停止背景執行緒並寫出佇列中剩下的記錄"""
+    global _queue, _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+    _queue, _listener, _handler = None, None, None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_log_metrics() -> LogMetricsDict:
+    """取得日誌統計"""
+    return LogMetricsDict(
+        **_metrics, queueSize=_queue.qsize() if _queue is not None else 0
+    )
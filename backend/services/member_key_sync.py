@@ -0,0 +1,213 @@
+"""
+會員換電話同步到封存與分店數據庫
+
+主數據庫中參照 Member 的表格以外鍵 ON UPDATE CASCADE 跟著換電話
+（見 migrations/v0004_member_fk_on_update_cascade.py），
+封存數據庫（archive/）與分店數據庫（branches/）不能有跨數據庫的外鍵，記錄仍是舊電話。
+
+Member 的電話改變時由觸發器在同一個交易中寫入 MemberKeyChange（見 migrations/v0012_branch_relay.py），
+再依序套用到各數據庫：每個數據庫的 MemberKeySync 記錄已套用到的 changeNo，
+套用與記錄在該數據庫的同一個交易中，不會重複或漏掉。
+新建立的數據庫從建立當時最新的 changeNo 開始（之前的變更與新數據庫無關）。
+
+封存數據庫在搬入記錄的同一個交易中先套用（見 services/record_archive.py），
+分店在每次寫入與查詢前套用（見 services/branches.py），
+其餘由背景排程每 MEMBER_KEY_SYNC_INTERVAL_SECONDS 秒套用一次。
+"""
+
+import asyncio
+import logging
+import sqlite3
+from pathlib import Path
+
+import database
+from database import get_connection, retry_when_busy
+
+logger = logging.getLogger(__name__)
+
+MEMBER_KEY_SYNC_INTERVAL_SECONDS = 60
+
+CREATE_MEMBER_KEY_SYNC_TABLE = """
+    CREATE TABLE IF NOT EXISTS {schema}.MemberKeySync (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        appliedChangeNo INTEGER NOT NULL
+    )
+"""
+
+
+def init_member_key_sync(cursor: sqlite3.Cursor, schema: str, main_schema: str) -> None:
+    """
+    新建立的封存或分店數據庫：從目前最新的電話變更開始記錄（已有記錄時不變）
+
+    Args:
+        schema: 封存或分店數據庫的別名
+        main_schema: 主數據庫的別名
+    """
+    cursor.execute(CREATE_MEMBER_KEY_SYNC_TABLE.format(schema=schema))
+    cursor.execute(
+        f"""
+        INSERT OR IGNORE INTO {schema}.MemberKeySync (id, appliedChangeNo)
+        SELECT 1, COALESCE(MAX(changeNo), 0) FROM {main_schema}.MemberKeyChange
+        """
+    )
+
+
+def _pending_changes(
+    cursor: sqlite3.Cursor, schema: str, main_schema: str
+) -> list[tuple[int, str, str]]:
+    """尚未套用的電話變更 (changeNo, 舊電話, 新電話)，依順序排列（沒有記錄時從頭開始）"""
+    cursor.execute(f"SELECT appliedChangeNo FROM {schema}.MemberKeySync WHERE id = 1")
+    row = cursor.fetchone()
+    cursor.execute(
+        f"""
+        SELECT changeNo, oldContactNum, newContactNum FROM {main_schema}.MemberKeyChange
+        WHERE changeNo > ? ORDER BY changeNo
+        """,
+        (row[0] if row else 0,),
+    )
+    return cursor.fetchall()
+
+
+def apply_pending_changes(
+    cursor: sqlite3.Cursor, schema: str, main_schema: str, tables: list[str]
+) -> int:
+    """
+    在呼叫者的交易中將尚未套用的電話變更套用到 schema 的表格
+
+    Args:
+        schema: 封存或分店數據庫的別名（MemberKeySync 表格必須已建立）
+        main_schema: 主數據庫的別名
+        tables: 有 mContactNum 欄位的表格（數據庫中沒有的表格略過）
+
+    Returns:
+        int: 套用的變更數
+    """
+    changes = _pending_changes(cursor, schema, main_schema)
+    if not changes:
+        return 0
+
+    cursor.execute(
+        f"""
+        SELECT name FROM {schema}.sqlite_master
+        WHERE type = 'table' AND name IN ({', '.join('?' * len(tables))})
+        """,
+        tables,
+    )
+    existing = [name for (name,) in cursor.fetchall()]
+    for _, old, new in changes:
+        for table in existing:
+            cursor.execute(
+                f"UPDATE {schema}.{table} SET mContactNum = ? WHERE mContactNum = ?", (new, old)
+            )
+    cursor.execute(
+        f"""
+        INSERT INTO {schema}.MemberKeySync (id, appliedChangeNo) VALUES (1, ?)
+        ON CONFLICT (id) DO UPDATE SET appliedChangeNo = excluded.appliedChangeNo
+        """,
+        (changes[-1][0],),
+    )
+    return len(changes)
+
+
+def current_contact(cursor: sqlite3.Cursor, mContactNum: str, since: int) -> str:
+    """
+    依 changeNo 在 since 之後的電話變更，找出 mContactNum 目前的電話
+
+    Args:
+        cursor: 主數據庫
+        since: 記錄所在數據庫已套用到的 changeNo
+    """
+    while True:
+        cursor.execute(
+            """
+            SELECT changeNo, newContactNum FROM MemberKeyChange
+            WHERE oldContactNum = ? AND changeNo > ?
+            ORDER BY changeNo LIMIT 1
+            """,
+            (mContactNum, since),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return mContactNum
+        since, mContactNum = row
+
+
+def applied_change_no(cursor: sqlite3.Cursor) -> int:
+    """封存或分店數據庫已套用到的 changeNo（cursor 為該數據庫的連接）"""
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'MemberKeySync'"
+    )
+    if cursor.fetchone()[0] == 0:
+        return 0
+    cursor.execute("SELECT appliedChangeNo FROM MemberKeySync WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+@retry_when_busy
+def apply_member_key_changes(path: Path, tables: list[str]) -> int:
+    """
+    將主數據庫的電話變更套用到一個封存或分店數據庫
+
+    Args:
+        path: 封存或分店數據庫
+        tables: 有 mContactNum 欄位的表格
+
+    Returns:
+        int: 套用的變更數
+    """
+    conn = get_connection(path)
+    if conn is None:
+        raise sqlite3.OperationalError(f"數據庫連接失敗: {path}")
+
+    try:
+        cursor = conn.cursor()
+        main_db = Path(database.DB_PATH).resolve().as_uri()
+        cursor.execute("ATTACH DATABASE ? AS gym", (f"{main_db}?mode=ro",))
+        cursor.execute(CREATE_MEMBER_KEY_SYNC_TABLE.format(schema="main"))
+        # 多數時候沒有新的變更，先以讀取確認，有變更時才取得寫入鎖
+        if not _pending_changes(cursor, "main", "gym"):
+            return 0
+        cursor.execute("BEGIN IMMEDIATE")
+        applied = apply_pending_changes(cursor, "main", "gym", tables)
+        conn.commit()
+        if applied:
+            logger.info(f"套用會員換電話 {applied} 筆到 {path.name}")
+        return applied
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def sync_member_keys() -> int:
+    """
+    將電話變更套用到所有封存與分店數據庫
+
+    Returns:
+        int: 套用的變更數（各數據庫加總）
+    """
+    # services.branches 匯入 models，在這裡才匯入以避免循環匯入
+    from services.branches import BRANCH_TABLES, branch_path, get_branches
+    from services.record_archive import ARCHIVED_TABLES, archive_path, archive_years
+
+    databases = [(archive_path(year), list(ARCHIVED_TABLES)) for year in archive_years()]
+    databases += [
+        (branch_path(branch["branchId"]), BRANCH_TABLES) for branch in get_branches()
+    ]
+    applied = 0
+    for path, tables in databases:
+        if path.exists():
+            applied += apply_member_key_changes(path, tables)
+    return applied
+
+
+async def run_member_key_sync(interval: int = MEMBER_KEY_SYNC_INTERVAL_SECONDS) -> None:
+    """每 interval 秒將電話變更套用到封存與分店數據庫，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(sync_member_keys)
+        except Exception as e:
+            logger.error(f"同步會員換電話失敗: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,198 @@
+"""
+會員搜尋
+
+前台輸入電話的一部分、姓名或電子郵件即可找到會員，不需要下載全部會員。
+依序以下列方式尋找，前面的結果排在前面，湊滿 limit 筆就停止：
+
+1. 電話前綴（輸入只有數字時）：以 Member 主鍵索引的範圍查詢
+2. 子字串：MemberSearch（FTS5 trigram 索引）中電話、姓名或電子郵件包含輸入的文字，
+   以 bm25 排序；少於 3 個字無法使用 trigram 索引，改以 LIKE 比對姓名
+3. 模糊（輸入不是數字時）：姓名與輸入相差一個字（打錯、少打或多打一個字），
+   依相似度排序
+
+10 萬名會員的搜尋延遲的量測見 bench/member_search.py。
+"""
+
+import difflib
+import logging
+import sqlite3
+from typing import TypedDict
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# 10 萬名會員時各類搜尋 p95 延遲的目標
+SEARCH_LATENCY_TARGET_MS = 50
+# trigram 索引只能用於 3 個字以上的輸入
+TRIGRAM_MIN_LENGTH = 3
+# 模糊比對只用於姓名長度的輸入
+FUZZY_MAX_LENGTH = 8
+
+
+class MemberSearchResultDict(TypedDict):
+    """會員搜尋結果
+
+    欄位說明：
+    - matchType: phone_prefix（電話前綴）、substring（子字串）、fuzzy（模糊）
+    """
+
+    mContactNum: str
+    mName: str
+    mEmail: str
+    matchType: str
+
+
+def _fts_phrase(text: str) -> str:
+    """將輸入轉成 FTS5 的片語（雙引號內的雙引號要重複）"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _phone_prefix(cursor: sqlite3.Cursor, digits: str, limit: int) -> list[tuple]:
+    # 主鍵範圍查詢：digits <= mContactNum < digits 的最後一位加一
+    upper = digits[:-1] + chr(ord(digits[-1]) + 1)
+    cursor.execute(
+        """
+        SELECT mContactNum, mName, mEmail FROM Member
+        WHERE mContactNum >= ? AND mContactNum < ?
+        ORDER BY mContactNum
+        LIMIT ?
+        """,
+        (digits, upper, limit),
+    )
+    return cursor.fetchall()
+
+
+def _substring(cursor: sqlite3.Cursor, text: str, limit: int) -> list[tuple]:
+    if len(text) >= TRIGRAM_MIN_LENGTH:
+        cursor.execute(
+            """
+            SELECT mContactNum, mName, mEmail FROM MemberSearch
+            WHERE MemberSearch MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (_fts_phrase(text), limit),
+        )
+        return cursor.fetchall()
+
+    # 一、兩個字的姓名：以姓名開頭相符的排前面
+    pattern = _like_escape(text)
+    cursor.execute(
+        """
+        SELECT mContactNum, mName, mEmail FROM Member
+        WHERE mName LIKE ? ESCAPE '\\'
+        ORDER BY mName NOT LIKE ? ESCAPE '\\', length(mName), mContactNum
+        LIMIT ?
+        """,
+        (f"%{pattern}%", f"{pattern}%", limit),
+    )
+    return cursor.fetchall()
+
+
+def _fuzzy(cursor: sqlite3.Cursor, text: str, limit: int) -> list[tuple]:
+    """
+    姓名與輸入相差一個字：輸入的每個位置換成任一字（_）或刪除該字後，
+    以 LIKE 比對姓名，再依相似度排序
+    """
+    if not 2 <= len(text) <= FUZZY_MAX_LENGTH:
+        return []
+
+    chars = [_like_escape(char) for char in text]
+    patterns = set()
+    for i in range(len(chars)):
+        patterns.add("".join(chars[:i] + ["_"] + chars[i + 1 :]))
+        if len(chars) > 2:
+            patterns.add("".join(chars[:i] + chars[i + 1 :]))
+    conditions = " OR ".join("mName LIKE ? ESCAPE '\\'" for _ in patterns)
+    cursor.execute(
+        f"""
+        SELECT mContactNum, mName, mEmail FROM Member
+        WHERE {conditions}
+        LIMIT ?
+        """,
+        [f"%{pattern}%" for pattern in patterns] + [limit * 5],
+    )
+    rows = cursor.fetchall()
+    rows.sort(
+        key=lambda row: (
+            -difflib.SequenceMatcher(None, text.lower(), row[1].lower()).ratio(),
+            row[0],
+        )
+    )
+    return rows[:limit]
+
+
+def search_members(
+    query: str, limit: int = SEARCH_DEFAULT_LIMIT
+) -> list[MemberSearchResultDict]:
+    """
+    以電話、姓名或電子郵件搜尋會員
+
+    Args:
+        query: 輸入的文字（電話可以只輸入前幾碼或其中幾碼，可包含 - 與空白）
+        limit: 最多返回幾筆（1 到 SEARCH_MAX_LIMIT）
+
+    Returns:
+        list[MemberSearchResultDict]: 依相關程度排序的會員
+    """
+    text = query.strip()
+    if not text:
+        return []
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    digits = "".join(char for char in text if char.isdigit())
+    is_phone = bool(digits) and all(char.isdigit() or char in "-+ ()" for char in text)
+
+    conn = get_connection()
+    if conn is None:
+        return []
+
+    results: dict[str, MemberSearchResultDict] = {}
+
+    def add(rows: list[tuple], matchType: str) -> None:
+        for mContactNum, mName, mEmail in rows:
+            if len(results) >= limit:
+                return
+            if mContactNum not in results:
+                results[mContactNum] = MemberSearchResultDict(
+                    mContactNum=mContactNum, mName=mName, mEmail=mEmail, matchType=matchType
+                )
+
+    try:
+        cursor = conn.cursor()
+        if is_phone:
+            add(_phone_prefix(cursor, digits, limit), "phone_prefix")
+            text = digits
+        if len(results) < limit:
+            # 多取前面已找到的筆數，去除重複後仍可湊滿
+            add(_substring(cursor, text, limit + len(results)), "substring")
+        if len(results) < limit and not is_phone:
+            add(_fuzzy(cursor, text, limit + len(results)), "fuzzy")
+        return list(results.values())
+    except sqlite3.Error as e:
+        logger.error(f"搜尋會員失敗: {e}")
+        return []
+    finally:
+        conn.close()
+
+
+def rebuild_member_search() -> dict[str, str]:
+    """依 Member 重建搜尋索引（重建 Member 表格、rowid 改變後執行）"""
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    try:
+        conn.execute("INSERT INTO MemberSearch (MemberSearch) VALUES ('rebuild')")
+        conn.commit()
+        return {"message": "會員搜尋索引重建成功"}
+    except sqlite3.Error as e:
+        return {"error": f"重建會員搜尋索引失敗: {e}"}
+    finally:
+        conn.close()
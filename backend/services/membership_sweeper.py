@@ -0,0 +1,92 @@
+"""
+會籍到期排程
+
+定期停用已過期的會籍，並重新計算有效會籍的剩餘天數。
+由 main.py 的 lifespan 啟動。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional, TypedDict
+
+import pytz
+
+from models.membership_status import MembershipStatus
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL_SECONDS = 3600
+SWEEP_BATCH_SIZE = 500
+
+
+class SweepMetricsDict(TypedDict):
+    """排程執行統計"""
+
+    runs: int
+    lastRunAt: Optional[str]
+    lastDurationMs: float
+    lastDeactivated: int
+    totalDeactivated: int
+    activeMemberships: int
+
+
+_metrics: SweepMetricsDict = {
+    "runs": 0,
+    "lastRunAt": None,
+    "lastDurationMs": 0.0,
+    "lastDeactivated": 0,
+    "totalDeactivated": 0,
+    "activeMemberships": 0,
+}
+
+
+def sweep_expired_memberships(batch_size: int = SWEEP_BATCH_SIZE) -> SweepMetricsDict:
+    """
+    執行一次會籍到期檢查
+
+    1. 分批停用 endDate 早於今天的會籍，直到沒有過期會籍
+    2. 重新計算有效會籍的剩餘天數
+
+    Returns:
+        SweepMetricsDict: 執行後的統計
+    """
+    started = time.perf_counter()
+    now = datetime.now(pytz.timezone("Asia/Taipei"))
+    today = now.date().isoformat()
+
+    deactivated = 0
+    while True:
+        count = MembershipStatus.deactivate_expired(today, batch_size)
+        deactivated += count
+        if count < batch_size:
+            break
+
+    active = MembershipStatus.refresh_days_remaining(today)
+
+    _metrics["runs"] += 1
+    _metrics["lastRunAt"] = now.strftime("%Y-%m-%d %H:%M:%S")
+    _metrics["lastDurationMs"] = round((time.perf_counter() - started) * 1000, 3)
+    _metrics["lastDeactivated"] = deactivated
+    _metrics["totalDeactivated"] += deactivated
+    _metrics["activeMemberships"] = active
+    logger.info(
+        f"會籍到期檢查完成: 停用 {deactivated} 筆, 耗時 {_metrics['lastDurationMs']} ms"
+    )
+    return get_sweep_metrics()
+
+
+def get_sweep_metrics() -> SweepMetricsDict:
+    """取得排程執行統計"""
+    return SweepMetricsDict(**_metrics)
+
+
+async def run_membership_sweeper(interval: int = SWEEP_INTERVAL_SECONDS) -> None:
+    """每 interval 秒執行一次會籍到期檢查，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(sweep_expired_memberships)
+        except Exception as e:
+            logger.error(f"會籍到期檢查失敗: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,369 @@
+"""
+歷史記錄封存
+
+將超過保留期限的 CheckInRecord / TransactionRecord 搬到依年份分檔的封存數據庫
+（archive/gym_<年份>.db）。搬移時以 ATTACH 掛上封存數據庫，
+每批在同一個交易中 INSERT ... SELECT 到封存表格再從主數據庫 DELETE。
+
+封存數據庫沒有指向 Member 的外鍵，會員換電話由 services/member_key_sync.py 套用。
+
+ArchiveWatermark 記錄每個表格已封存到哪個時間點，
+查詢的日期範圍早於這個時間點時才會掛上對應年份的封存數據庫並以 UNION ALL 合併。
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional, Sequence, TypedDict
+
+import pytz
+
+import database
+from database import get_connection
+from services.member_key_sync import (
+    CREATE_MEMBER_KEY_SYNC_TABLE,
+    apply_pending_changes,
+    init_member_key_sync,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_RETENTION_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+ARCHIVE_INTERVAL_SECONDS = 86400
+# SQLite 預設最多同時 ATTACH 10 個數據庫
+ARCHIVE_MAX_ATTACHED = 10
+
+# 可封存的表格：主鍵、日期欄位、額外條件（未結束的打卡不封存）
+ARCHIVED_TABLES = {
+    "CheckInRecord": ("checkInNo", "checkInDatetime", "checkOutStatus = 1"),
+    "TransactionRecord": ("tNo", "transDateTime", "1 = 1"),
+}
+
+
+class ArchiveFileDict(TypedDict):
+    """封存數據庫資訊"""
+
+    year: int
+    path: str
+    counts: dict[str, int]
+
+
+def archive_dir() -> Path:
+    """封存數據庫所在目錄（預設為與主數據庫同一層的 archive/，可用 GYM_ARCHIVE_DIR 指定）"""
+    if os.environ.get("GYM_ARCHIVE_DIR"):
+        return Path(os.environ["GYM_ARCHIVE_DIR"])
+    return Path(database.DB_PATH).parent / "archive"
+
+
+def archive_path(year: int) -> Path:
+    return archive_dir() / f"gym_{year}.db"
+
+
+def archive_years() -> list[int]:
+    """目前存在的封存年份"""
+    if not archive_dir().exists():
+        return []
+    return sorted(int(p.stem.split("_")[1]) for p in archive_dir().glob("gym_*.db"))
+
+
+def get_watermark(cursor: sqlite3.Cursor, table: str) -> Optional[str]:
+    """取得表格已封存到的時間點（早於此時間的記錄在封存數據庫）"""
+    cursor.execute(
+        "SELECT archivedBefore FROM ArchiveWatermark WHERE tableName = ?", (table,)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def years_for_range(
+    cursor: sqlite3.Cursor,
+    table: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> list[int]:
+    """
+    依查詢的日期範圍決定需要讀取的封存年份
+
+    範圍起點不早於封存時間點時完全不需要封存數據庫。
+    """
+    watermark = get_watermark(cursor, table)
+    if watermark is None:
+        return []
+    if start is not None and start.isoformat() >= watermark[:10]:
+        return []
+    return [
+        year
+        for year in archive_years()
+        if (start is None or year >= start.year) and (end is None or year <= end.year)
+    ]
+
+
+def _range_condition(
+    column: str, start: Optional[date], end: Optional[date]
+) -> tuple[str, list]:
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start.isoformat())
+    if end is not None:
+        conditions.append(f"{column} < ?")
+        params.append((end + timedelta(days=1)).isoformat())
+    return " AND ".join(conditions) or "1 = 1", params
+
+
+def select_with_archives(
+    cursor: sqlite3.Cursor,
+    table: str,
+    where: str,
+    params: tuple,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    descending: bool = True,
+    columns: Optional[Sequence[str]] = None,
+) -> list[tuple]:
+    """
+    查詢主數據庫與日期範圍需要的封存數據庫，依日期欄位排序
+
+    Args:
+        cursor: 不在交易中的 cursor（ATTACH 不能在交易中執行）
+        table: CheckInRecord / TransactionRecord
+        where: 查詢條件（不含日期範圍）
+        params: 查詢條件的參數
+        start, end: 日期範圍（含兩端），None 表示不限
+        columns: 只查詢這些欄位，None 表示所有欄位
+
+    Returns:
+        list[tuple]: 查詢結果
+    """
+    _, date_column, _ = ARCHIVED_TABLES[table]
+    range_sql, range_params = _range_condition(date_column, start, end)
+    order = "DESC" if descending else "ASC"
+
+    select = "*"
+    if columns is not None:
+        # UNION ALL 只能依查詢的欄位排序，沒有選擇日期欄位時附加在最後，取出後再去掉
+        select = ", ".join(columns)
+        if date_column not in columns:
+            select += f", {date_column}"
+
+    aliases = attach_archives(cursor, years_for_range(cursor, table, start, end), table)
+    try:
+        sources = ["main"] + aliases
+        query = " UNION ALL ".join(
+            f"SELECT {select} FROM {source}.{table} WHERE ({where}) AND {range_sql}"
+            for source in sources
+        )
+        cursor.execute(
+            f"{query} ORDER BY {date_column} {order}",
+            (tuple(params) + tuple(range_params)) * len(sources),
+        )
+        rows = cursor.fetchall()
+        if columns is not None and date_column not in columns:
+            rows = [row[:-1] for row in rows]
+        return rows
+    finally:
+        detach_archives(cursor, aliases)
+
+
+def attach_archives(cursor: sqlite3.Cursor, years: list[int], table: str) -> list[str]:
+    """
+    掛上封存數據庫並回傳含有該表格的別名
+
+    超過 ATTACH 上限時只掛上最近的年份（主數據庫已占用一個名額）。
+    """
+    if len(years) > ARCHIVE_MAX_ATTACHED - 1:
+        logger.warning(f"封存年份過多，只讀取最近 {ARCHIVE_MAX_ATTACHED - 1} 年")
+        years = years[-(ARCHIVE_MAX_ATTACHED - 1) :]
+
+    aliases = []
+    for year in years:
+        alias = f"archive_{year}"
+        cursor.execute("ATTACH DATABASE ? AS " + alias, (str(archive_path(year)),))
+        cursor.execute(
+            f"SELECT COUNT(*) FROM {alias}.sqlite_master WHERE type = 'table' AND name = ?",
+            (table,),
+        )
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"DETACH DATABASE {alias}")
+            continue
+        aliases.append(alias)
+    return aliases
+
+
+def detach_archives(cursor: sqlite3.Cursor, aliases: list[str]) -> None:
+    for alias in aliases:
+        cursor.execute(f"DETACH DATABASE {alias}")
+
+
+def _ensure_archive_table(cursor: sqlite3.Cursor, alias: str, table: str) -> None:
+    """在封存數據庫中建立與主表格相同欄位的表格（不含外鍵）"""
+    pk, date_column, _ = ARCHIVED_TABLES[table]
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {alias}.{table} AS SELECT * FROM main.{table} WHERE 0"
+    )
+    # 主鍵唯一索引讓中斷後重跑不會重複寫入
+    cursor.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {alias}.idx_{table}_pk ON {table} ({pk})"
+    )
+    cursor.execute(
+        f"""
+        CREATE INDEX IF NOT EXISTS {alias}.idx_{table}_member
+        ON {table} (mContactNum, {date_column})
+        """
+    )
+
+
+def _archive_year(
+    conn: sqlite3.Connection, table: str, year: int, cutoff: str, batch_size: int
+) -> int:
+    """將某一年早於 cutoff 的記錄分批搬到該年的封存數據庫"""
+    pk, date_column, condition = ARCHIVED_TABLES[table]
+    alias = f"archive_{year}"
+    year_end = min(f"{year + 1}-01-01", cutoff)
+    batch_query = f"""
+        SELECT {pk} FROM main.{table}
+        WHERE {date_column} >= ? AND {date_column} < ? AND {condition}
+        ORDER BY {pk}
+        LIMIT ?
+    """
+    params = (f"{year}-01-01", year_end, batch_size)
+
+    cursor = conn.cursor()
+    new_file = not archive_path(year).exists()
+    cursor.execute("ATTACH DATABASE ? AS " + alias, (str(archive_path(year)),))
+    moved = 0
+    try:
+        _ensure_archive_table(cursor, alias, table)
+        if new_file:
+            init_member_key_sync(cursor, alias, "main")
+        else:
+            cursor.execute(CREATE_MEMBER_KEY_SYNC_TABLE.format(schema=alias))
+        conn.commit()
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # 先把會員換電話套用到已封存的記錄，再搬入目前電話的記錄
+                apply_pending_changes(cursor, alias, "main", list(ARCHIVED_TABLES))
+                cursor.execute("SELECT COALESCE(MAX(changeVersion), 0) FROM main.ChangeLog")
+                last_change = cursor.fetchone()[0]
+                cursor.execute(
+                    f"""
+                    INSERT OR IGNORE INTO {alias}.{table}
+                    SELECT * FROM main.{table} WHERE {pk} IN ({batch_query})
+                    """,
+                    params,
+                )
+                cursor.execute(
+                    f"DELETE FROM main.{table} WHERE {pk} IN ({batch_query})", params
+                )
+                count = cursor.rowcount
+                # 搬到封存數據庫不算刪除，移除觸發器寫入的變更記錄（見 services/change_log.py）
+                cursor.execute(
+                    "DELETE FROM main.ChangeLog WHERE changeVersion > ? AND tableName = ?",
+                    (last_change, table),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            moved += count
+            if count < batch_size:
+                break
+    finally:
+        cursor.execute(f"DETACH DATABASE {alias}")
+    return moved
+
+
+def archive_old_records(
+    retention_days: int = ARCHIVE_RETENTION_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE
+) -> dict:
+    """
+    將超過保留天數的記錄搬到封存數據庫
+
+    Returns:
+        dict: cutoff（封存時間點）、archived（各表格搬移筆數）
+    """
+    started = time.perf_counter()
+    today = datetime.now(pytz.timezone("Asia/Taipei")).date()
+    cutoff = (today - timedelta(days=retention_days)).isoformat()
+
+    archive_dir().mkdir(parents=True, exist_ok=True)
+    conn = get_connection()
+    if conn is None:
+        return {"error": "數據庫連接失敗"}
+
+    archived = {}
+    try:
+        cursor = conn.cursor()
+        for table, (_, date_column, condition) in ARCHIVED_TABLES.items():
+            cursor.execute(
+                f"""
+                SELECT DISTINCT CAST(substr({date_column}, 1, 4) AS INTEGER)
+                FROM {table} WHERE {date_column} < ? AND {condition}
+                """,
+                (cutoff,),
+            )
+            years = sorted(row[0] for row in cursor.fetchall())
+            archived[table] = sum(
+                _archive_year(conn, table, year, cutoff, batch_size) for year in years
+            )
+
+            # 時間點只往後移動
+            cursor.execute(
+                """
+                INSERT INTO ArchiveWatermark (tableName, archivedBefore) VALUES (?, ?)
+                ON CONFLICT (tableName) DO UPDATE SET
+                    archivedBefore = MAX(archivedBefore, excluded.archivedBefore)
+                """,
+                (table, cutoff),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"封存歷史記錄失敗: {e}")
+        return {"error": f"數據庫錯誤: {str(e)}"}
+    finally:
+        conn.close()
+
+    logger.info(
+        f"封存歷史記錄完成: {archived}, 耗時 {round((time.perf_counter() - started) * 1000, 3)} ms"
+    )
+    return {"cutoff": cutoff, "archived": archived}
+
+
+def get_archive_files() -> list[ArchiveFileDict]:
+    """列出封存數據庫與各表格筆數"""
+    files = []
+    for year in archive_years():
+        conn = sqlite3.connect(archive_path(year))
+        try:
+            cursor = conn.cursor()
+            counts = {}
+            for table in ARCHIVED_TABLES:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+                    (table,),
+                )
+                if cursor.fetchone()[0]:
+                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    counts[table] = cursor.fetchone()[0]
+            files.append(
+                ArchiveFileDict(year=year, path=str(archive_path(year)), counts=counts)
+            )
+        finally:
+            conn.close()
+    return files
+
+
+async def run_record_archiver(interval: int = ARCHIVE_INTERVAL_SECONDS) -> None:
+    """每 interval 秒封存一次歷史記錄，直到被取消"""
+    while True:
+        try:
+            await asyncio.to_thread(archive_old_records)
+        except Exception as e:
+            logger.error(f"封存歷史記錄失敗: {e}")
+        await asyncio.sleep(interval)
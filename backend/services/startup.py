@@ -0,0 +1,123 @@
+"""
+應用程式啟動
+
+由 main.py 的 lifespan 呼叫：
+1. 套用數據庫遷移（包含既有的分店數據庫）並確認結構版本是最新版本（版本不符時拒絕啟動）
+2. 平行預熱：載入數據庫結構與常用索引頁、載入回饋點數規則快取
+啟動各階段的耗時記錄在 _metrics，可由 /health 查詢。
+
+冷啟動耗時的量測見 bench/startup.py。
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional, TypedDict
+
+import pytz
+
+from database import create_all_tables, get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class StartupMetricsDict(TypedDict):
+    """啟動統計"""
+
+    startedAt: Optional[str]
+    schemaVersion: int
+    migrationsMs: float
+    warmupMs: float
+    totalMs: float
+    ready: bool
+
+
+_metrics: StartupMetricsDict = {
+    "startedAt": None,
+    "schemaVersion": 0,
+    "migrationsMs": 0.0,
+    "warmupMs": 0.0,
+    "totalMs": 0.0,
+    "ready": False,
+}
+
+
+def prepare_schema() -> int:
+    """
+    套用遷移並確認結構版本
+
+    Returns:
+        int: 目前結構版本
+    """
+    from migrations.runner import discover_migrations, get_migration_status
+
+    from services.branches import upgrade_branch_databases
+    from services.workers import process_lock
+
+    # 多個 worker 同時啟動時依序檢查與套用遷移
+    with process_lock("migrate"):
+        if not create_all_tables():
+            raise RuntimeError("數據庫遷移失敗")
+        upgrade_branch_databases()
+
+    status = get_migration_status()
+    latest = max((version for version, _ in discover_migrations()), default=0)
+    if status.get("version") != latest:
+        raise RuntimeError(
+            f"數據庫結構版本 {status.get('version')} 與程式版本 {latest} 不符"
+        )
+    return latest
+
+
+def warm_database() -> None:
+    """載入數據庫結構並讀取入場、會籍查詢常用的索引頁"""
+    conn = get_connection()
+    if conn is None:
+        raise RuntimeError("數據庫連接失敗")
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+        cursor.execute("SELECT COUNT(*) FROM Member")
+        cursor.execute("SELECT COUNT(*) FROM MembershipStatus WHERE isActive = 1")
+        cursor.execute("SELECT COUNT(*) FROM CheckInRecord WHERE checkOutStatus = 0")
+        cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def warm_caches() -> None:
+    from models.reward_point_rule import warm_rule_cache
+
+    logger.info(f"已載入 {warm_rule_cache()} 條回饋點數規則")
+
+
+async def startup() -> StartupMetricsDict:
+    """執行啟動流程，回傳啟動統計"""
+    started = time.perf_counter()
+    _metrics["startedAt"] = datetime.now(pytz.timezone("Asia/Taipei")).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+    _metrics["schemaVersion"] = await asyncio.to_thread(prepare_schema)
+    migrated = time.perf_counter()
+    _metrics["migrationsMs"] = round((migrated - started) * 1000, 3)
+
+    await asyncio.gather(
+        asyncio.to_thread(warm_database),
+        asyncio.to_thread(warm_caches),
+    )
+    finished = time.perf_counter()
+    _metrics["warmupMs"] = round((finished - migrated) * 1000, 3)
+    _metrics["totalMs"] = round((finished - started) * 1000, 3)
+    _metrics["ready"] = True
+    logger.info(
+        f"啟動完成: 結構版本 {_metrics['schemaVersion']}, 耗時 {_metrics['totalMs']} ms"
+    )
+    return get_startup_metrics()
+
+
+def get_startup_metrics() -> StartupMetricsDict:
+    """取得啟動統計"""
+    return StartupMetricsDict(**_metrics)
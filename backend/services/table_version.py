@@ -0,0 +1,95 @@
+"""
+列表 API 的條件式 GET（弱 ETag）
+
+ETag 由回應依據的表格版本（TableVersion，見 migrations/v0008_table_version.py）
+與查詢參數組成。前台帶 If-None-Match 重新請求時，如果資料沒有變更就返回 304，
+不查詢資料，也不傳送內容。
+
+路由以依賴加入：
+    @router.get("/products/", dependencies=[table_etag("Product")])
+
+版本在查詢資料之前讀取。查詢期間有新的寫入時，ETag 仍是舊版本，內容則是新資料；
+下次請求的版本不同，會重新返回 200，不會把舊資料當成最新的。
+"""
+
+import hashlib
+import logging
+import sqlite3
+from typing import Optional
+
+from fastapi import Depends, Request, Response
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class NotModified(Exception):
+    """資料沒有變更，由 not_modified_handler 返回 304"""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def get_table_versions(tables: tuple[str, ...]) -> dict[str, int]:
+    """取得表格目前的版本（查詢失敗時返回空字典）"""
+    conn = get_connection()
+    if conn is None:
+        return {}
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT tableName, version FROM TableVersion WHERE tableName IN ({', '.join('?' * len(tables))})",
+            tables,
+        )
+        return dict(cursor.fetchall())
+    except sqlite3.Error as e:
+        logger.error(f"查詢表格版本失敗: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+def make_etag(versions: dict[str, int], query: list[tuple[str, str]]) -> str:
+    """由表格版本與（排序後的）查詢參數產生弱 ETag"""
+    key = repr((sorted(versions.items()), sorted(query)))
+    return f'W/"{hashlib.blake2b(key.encode(), digest_size=8).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含 etag（弱比較：忽略 W/）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def table_etag(*tables: str):
+    """
+    條件式 GET 的路由依賴
+
+    Args:
+        tables: 回應內容依據的表格（需在 TableVersion 中）
+    """
+
+    def check_etag(request: Request, response: Response) -> None:
+        versions = get_table_versions(tables)
+        if len(versions) != len(tables):
+            # 無法取得版本時不加 ETag，照常返回內容
+            return
+        etag = make_etag(versions, request.query_params.multi_items())
+        if etag_matches(request.headers.get("If-None-Match"), etag):
+            raise NotModified(etag)
+        response.headers["ETag"] = etag
+        # 瀏覽器等快取每次使用前都要帶 ETag 確認
+        response.headers["Cache-Control"] = "no-cache"
+
+    return Depends(check_etag)
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    """返回沒有內容的 304"""
+    return Response(status_code=304, headers={"ETag": exc.etag, "Cache-Control": "no-cache"})
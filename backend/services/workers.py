@@ -0,0 +1,85 @@
+"""
+多程序（多個 worker）部署
+
+多個 uvicorn / gunicorn worker 共用同一個 gym.db：
+- 數據庫使用 WAL 模式，讀取不會被寫入擋住；寫入一次一個，
+  等待寫入鎖逾時的操作由 database.retry_when_busy 重試
+- 啟動時的數據庫遷移以檔案鎖排隊，同一時間只有一個程序執行
+- 背景排程（會籍到期、歷史記錄封存、備份）只在取得排程鎖的程序中執行
+- 各程序的快取以 CacheVersion 表格同步失效（services/cache_version.py）
+
+啟動方式：
+    GYM_WORKERS=4 python main.py
+    uvicorn main:app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 -b 0.0.0.0:8000 main:app
+
+1 到 N 個 worker 的吞吐量的量測見 bench/workers.py。
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+import database
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，只支援單一程序
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get("GYM_WORKERS", "1"))
+
+# 取得排程鎖的檔案，程序結束時作業系統會自動釋放
+_scheduler_lock_file = None
+
+
+def _lock_path(name: str) -> Path:
+    db_path = Path(database.DB_PATH)
+    return db_path.with_name(f"{db_path.name}.{name}.lock")
+
+
+@contextmanager
+def process_lock(name: str):
+    """同一個數據庫的程序之間互斥（阻塞等待），例如啟動時的數據庫遷移"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(_lock_path(name), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def acquire_scheduler_lock() -> bool:
+    """
+    嘗試成為執行背景排程的程序（不阻塞）
+
+    Returns:
+        bool: 取得鎖（或已持有）時返回 True
+    """
+    global _scheduler_lock_file
+    if fcntl is None or _scheduler_lock_file is not None:
+        return True
+
+    lock_file = open(_lock_path("scheduler"), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return False
+    _scheduler_lock_file = lock_file
+    logger.info(f"程序 {os.getpid()} 負責執行背景排程")
+    return True
+
+
+def release_scheduler_lock() -> None:
+    global _scheduler_lock_file
+    if _scheduler_lock_file is not None:
+        _scheduler_lock_file.close()
+        _scheduler_lock_file = None
@@ -0,0 +1,243 @@
+"""
+單一寫入執行緒與群組提交
+
+入場打卡、交易、購買會籍、帳本變動等頻繁的寫入不再各自開連接並提交，
+而是把寫入函數放進佇列，由同一個寫入執行緒以同一個連接執行：
+取出佇列中已累積（以及 GROUP_COMMIT_WINDOW_SECONDS 內陸續送達）的寫入，
+在一個 BEGIN IMMEDIATE 交易中依序執行，每個寫入各自一個 SAVEPOINT，
+全部執行完才 COMMIT 一次，提交後才把結果交給等待中的請求。
+
+同一個程序內的寫入不再互相爭奪寫入鎖，提交（fsync）的次數也從每個寫入一次
+減少為每批一次。多個 worker 程序時每個程序一個寫入執行緒，
+程序之間仍以 busy timeout 與 retry_when_busy 處理。
+
+寫入函數的形式為 fn(cursor, *args) -> dict：
+- 回傳含 error 的 dict 時只回滾這個寫入（ROLLBACK TO SAVEPOINT），其他寫入照常提交
+- 拋出例外時同樣只回滾這個寫入，例外交給呼叫者
+- 不可以自行 commit / rollback
+
+等待結果超過 WRITE_TIMEOUT_SECONDS 時，還在佇列中的寫入會被取消並拋出 WriteTimeout
+（sqlite3.OperationalError 的子類別），路由經由 write_timeout_handler 返回 503。
+已經開始執行的寫入不會被取消，會等到提交或回滾後才返回，因此拋出 WriteTimeout 時寫入一定沒有執行。
+
+各自提交與群組提交的吞吐量比較見 bench/write_queue.py。
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, TypedDict
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# 取得第一個寫入後，再等待其他寫入加入同一批的時間
+GROUP_COMMIT_WINDOW_SECONDS = 0.001
+GROUP_COMMIT_MAX_BATCH = 64
+# 等待寫入結果的上限（佇列中的寫入加上等待寫入鎖的時間）
+WRITE_TIMEOUT_SECONDS = 30
+
+
+class WriteTimeout(sqlite3.OperationalError):
+    """等待寫入結果逾時，寫入已取消（由 write_timeout_handler 返回 503）"""
+
+
+class WriteQueueMetricsDict(TypedDict):
+    """寫入佇列統計"""
+
+    writes: int
+    batches: int
+    maxBatch: int
+    avgBatch: float
+    rolledBack: int
+    failedBatches: int
+    commitMs: float
+    queued: int
+
+
+_metrics = {
+    "writes": 0,
+    "batches": 0,
+    "maxBatch": 0,
+    "rolledBack": 0,
+    "failedBatches": 0,
+    "commitMs": 0.0,
+}
+
+_queue: "queue.SimpleQueue[Optional[tuple[Callable, tuple, Future]]]" = queue.SimpleQueue()
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+
+
+def _collect_batch(first: tuple) -> tuple[list[tuple], bool]:
+    """
+    從佇列取出要一起提交的寫入
+
+    Returns:
+        tuple: (本批寫入, 是否收到停止訊號)
+    """
+    batch = [first]
+    deadline = time.perf_counter() + GROUP_COMMIT_WINDOW_SECONDS
+    while len(batch) < GROUP_COMMIT_MAX_BATCH:
+        remaining = deadline - time.perf_counter()
+        try:
+            item = _queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait()
+        except queue.Empty:
+            break
+        if item is None:
+            return batch, True
+        batch.append(item)
+    return batch, False
+
+
+def _run_batch(conn: sqlite3.Connection, batch: list[tuple]) -> None:
+    """在一個交易中執行一批寫入並提交，提交後才設定各寫入的結果"""
+    cursor = conn.cursor()
+    outcomes = []
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        for fn, args, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            cursor.execute("SAVEPOINT write_intent")
+            try:
+                result = fn(cursor, *args)
+            except Exception as e:
+                cursor.execute("ROLLBACK TO SAVEPOINT write_intent")
+                cursor.execute("RELEASE SAVEPOINT write_intent")
+                _metrics["rolledBack"] += 1
+                outcomes.append((future, None, e))
+                continue
+            if isinstance(result, dict) and "error" in result:
+                cursor.execute("ROLLBACK TO SAVEPOINT write_intent")
+                _metrics["rolledBack"] += 1
+            cursor.execute("RELEASE SAVEPOINT write_intent")
+            outcomes.append((future, result, None))
+
+        started = time.perf_counter()
+        cursor.execute("COMMIT")
+        _metrics["commitMs"] += (time.perf_counter() - started) * 1000
+    except sqlite3.Error as e:
+        # 取得寫入鎖逾時或提交失敗：整批都沒有寫入
+        if conn.in_transaction:
+            conn.rollback()
+        _metrics["failedBatches"] += 1
+        logger.warning(f"群組提交失敗（{len(batch)} 筆寫入）: {e}")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    # 已取消的寫入沒有執行，不計入
+    _metrics["writes"] += len(outcomes)
+    _metrics["batches"] += 1
+    _metrics["maxBatch"] = max(_metrics["maxBatch"], len(outcomes))
+    for future, result, error in outcomes:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def _writer_loop() -> None:
+    conn = get_connection()
+    if conn is None:
+        logger.error("寫入執行緒無法連接數據庫")
+    else:
+        # 交易完全由寫入執行緒控制
+        conn.isolation_level = None
+
+    stopping = False
+    while not stopping:
+        first = _queue.get()
+        if first is None:
+            break
+        batch, stopping = _collect_batch(first)
+
+        if conn is None:
+            conn = get_connection()
+            if conn is None:
+                error = sqlite3.OperationalError("數據庫連接失敗")
+                for _, _, future in batch:
+                    future.set_exception(error)
+                continue
+            conn.isolation_level = None
+
+        _run_batch(conn, batch)
+
+    if conn is not None:
+        conn.close()
+
+
+def start_writer() -> None:
+    """啟動寫入執行緒（已啟動時不做任何事）"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer.start()
+
+
+def stop_writer() -> None:
+    """處理完佇列中已送出的寫入後停止寫入執行緒"""
+    global _writer
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            _queue.put(None)
+            _writer.join()
+        _writer = None
+
+
+def submit_write(fn: Callable, *args) -> Future:
+    """
+    送出寫入，回傳在提交後才會完成的 Future
+
+    寫入執行緒尚未啟動時（腳本、測試）會自動啟動。
+    """
+    start_writer()
+    future: Future = Future()
+    _queue.put((fn, args, future))
+    return future
+
+
+def run_write(fn: Callable, *args, timeout: float = WRITE_TIMEOUT_SECONDS):
+    """
+    送出寫入並等待提交後的結果（寫入函數的例外會在這裡拋出）
+
+    逾時時取消還在佇列中的寫入並拋出 WriteTimeout；
+    寫入已經開始執行時（只剩等待寫入鎖與提交），繼續等到結果。
+    """
+    future = submit_write(fn, *args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        if future.cancel():
+            logger.warning(f"寫入等待超過 {timeout} 秒，已取消: {fn.__name__}")
+            raise WriteTimeout("寫入忙碌中，請稍後再試") from None
+        return future.result()
+
+
+async def write_timeout_handler(request: Request, exc: WriteTimeout) -> JSONResponse:
+    """返回 503 與 Retry-After"""
+    return JSONResponse(
+        status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"}
+    )
+
+
+def get_write_queue_metrics() -> WriteQueueMetricsDict:
+    """取得寫入佇列統計"""
+    return WriteQueueMetricsDict(
+        **{**_metrics, "commitMs": round(_metrics["commitMs"], 3)},
+        avgBatch=round(_metrics["writes"] / _metrics["batches"], 2)
+        if _metrics["batches"]
+        else 0.0,
+        queued=_queue.qsize(),
+    )
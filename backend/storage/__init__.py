@@ -0,0 +1,60 @@
+"""
+儲存後端與資料存取層
+
+這裡的資料存取層（repositories.py）把會員、會籍、打卡記錄、交易記錄、會員帳本、
+商品與會籍方案的操作寫成與數據庫無關的形式，同一份程式可以在 SQLite 或 PostgreSQL 上執行，
+兩者以 tests/test_storage/ 的一致性測試確認行為相同。
+
+目前的使用範圍：
+- 分店（services/branches.py）的打卡與交易經由 CheckInRepository / TransactionRepository 寫入分店數據庫
+- 主數據庫的路由仍由 models/ 直接使用 SQLite（寫入佇列、ChangeLog 觸發器、封存等依賴 SQLite），
+  GYM_STORAGE_URL 只影響直接呼叫 get_storage() 的程式，不會改變應用程式使用的數據庫
+- 會員照片（大型 BLOB）與回饋點數規則、重算（依賴封存數據庫的 ATTACH）沒有資料存取層
+
+GYM_STORAGE_URL 決定使用的後端：
+    未設定或 sqlite                      database.DB_PATH 的 SQLite 數據庫
+    postgresql://user:pw@host:5432/gym   PostgreSQL
+"""
+
+import os
+from typing import Optional
+
+from storage.base import StorageBackend
+from storage.repositories import (
+    CheckInRepository,
+    LedgerRepository,
+    MemberRepository,
+    MembershipPlanRepository,
+    MembershipStatusRepository,
+    ProductRepository,
+    TransactionRepository,
+)
+
+STORAGE_URL = os.environ.get("GYM_STORAGE_URL", "sqlite")
+
+
+def get_storage(url: Optional[str] = None) -> StorageBackend:
+    """依連接字串建立儲存後端"""
+    url = url or STORAGE_URL
+    if url.startswith(("postgresql://", "postgres://")):
+        from storage.postgres import PostgresStorage
+
+        return PostgresStorage(url)
+    if url == "sqlite":
+        from storage.sqlite import SQLiteStorage
+
+        return SQLiteStorage()
+    raise ValueError(f"不支援的 GYM_STORAGE_URL: {url}")
+
+
+__all__ = [
+    "StorageBackend",
+    "get_storage",
+    "MemberRepository",
+    "MembershipStatusRepository",
+    "CheckInRepository",
+    "TransactionRepository",
+    "LedgerRepository",
+    "ProductRepository",
+    "MembershipPlanRepository",
+]
@@ -0,0 +1,111 @@
+"""
+儲存後端介面
+
+repositories.py 中的 SQL 只寫一次（以 ? 作為參數佔位符、不使用 SQLite 專屬的
+datetime('now', 'localtime')、PRAGMA 或 lastrowid），各數據庫的差異由後端處理：
+- 參數佔位符（PostgreSQL 為 %s）
+- 新增記錄後取得自動編號（SQLite 為 lastrowid，PostgreSQL 為 RETURNING）
+- 大量讀取時分批取出（PostgreSQL 使用伺服器端游標）
+- 鎖定要修改的記錄（SQLite 的寫入交易本身已互斥，PostgreSQL 使用 FOR UPDATE）
+- 只讀取的操作使用唯讀交易（SQLite 為延遲的 BEGIN，不取得寫入鎖；PostgreSQL 為 READ ONLY）
+- 讀出的日期時間統一為與 SQLite 相同的文字格式
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import date, datetime
+from typing import Any, Iterator, Optional, Sequence
+
+# 日期時間欄位以文字保存時的格式（與 SQLite 中的記錄相同）
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def normalize_value(value: Any) -> Any:
+    """將數據庫回傳的日期時間轉成與 SQLite 相同的文字格式"""
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class StorageSession:
+    """
+    一個交易中的數據庫操作
+
+    由 StorageBackend.transaction() 建立，離開 with 區塊時提交，發生例外時回滾。
+    """
+
+    def __init__(self, backend: "StorageBackend", cursor: Any):
+        self.backend = backend
+        self.cursor = cursor
+
+    def execute(self, query: str, params: Sequence = ()) -> "StorageSession":
+        self.cursor.execute(self.backend.sql(query), tuple(params))
+        return self
+
+    def fetchone(self) -> Optional[tuple]:
+        row = self.cursor.fetchone()
+        return self.backend.normalize_row(row) if row is not None else None
+
+    def fetchall(self) -> list[tuple]:
+        return [self.backend.normalize_row(row) for row in self.cursor.fetchall()]
+
+    @property
+    def rowcount(self) -> int:
+        return self.cursor.rowcount
+
+    def insert(self, query: str, params: Sequence, key: str) -> int:
+        """執行 INSERT 並返回自動編號欄位 key 的值"""
+        return self.backend.insert(self.cursor, query, params, key)
+
+
+class StorageBackend(ABC):
+    """
+    儲存後端
+
+    Attributes:
+        name: 後端名稱（sqlite / postgresql）
+        Error: 數據庫錯誤的基底類別
+        IntegrityError: 違反主鍵、外鍵或 CHECK 約束時的錯誤類別
+        for_update: 加在 SELECT 之後以鎖定讀到的記錄
+    """
+
+    name: str
+    Error: type[Exception]
+    IntegrityError: type[Exception]
+    for_update: str = ""
+
+    @abstractmethod
+    @contextmanager
+    def transaction(self) -> Iterator[StorageSession]:
+        """開始一個寫入交易，離開時提交，發生例外時回滾（只讀取時使用 read()）"""
+
+    @abstractmethod
+    @contextmanager
+    def read(self) -> Iterator[StorageSession]:
+        """開始一個唯讀交易，交易中的查詢看到同一個快照，離開時回滾"""
+
+    @abstractmethod
+    def stream(
+        self, query: str, params: Sequence = (), batch_size: int = 1000
+    ) -> Iterator[tuple]:
+        """分批讀取查詢結果，不會一次把所有記錄載入記憶體"""
+
+    @abstractmethod
+    def insert(self, cursor: Any, query: str, params: Sequence, key: str) -> int:
+        """執行 INSERT 並返回自動編號欄位 key 的值"""
+
+    @abstractmethod
+    def create_schema(self) -> None:
+        """建立或更新數據庫結構"""
+
+    def sql(self, query: str) -> str:
+        """將 ? 參數佔位符轉成此數據庫使用的格式"""
+        return query
+
+    def normalize_row(self, row: tuple) -> tuple:
+        return row
+
+    def close(self) -> None:
+        """釋放連接（連接池）"""
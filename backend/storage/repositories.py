@@ -0,0 +1,529 @@
+"""
+會員、會籍、打卡記錄、交易記錄、會員帳本、商品與會籍方案的資料存取
+
+同一份程式在任何 StorageBackend 上執行，SQL 使用兩種數據庫共通的語法，
+時間由 Python 以台北時區產生後以參數傳入。
+返回值與 models/ 相同：查詢返回 TypedDict，寫入返回含 message 或 error 的 dict。
+查詢使用唯讀交易（StorageBackend.read()），寫入使用 StorageBackend.transaction()。
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import logging
+from datetime import datetime
+from typing import Iterator, Optional
+
+import pytz
+
+from models.checkinrecord import CheckInRecordDict, CheckInResultDict
+from models.member import MemberDict
+from models.member_ledger import ACCOUNT_COLUMNS, INSUFFICIENT_MESSAGES, MemberLedgerDict
+from models.membership_plan import MembershipPlanDict
+from models.membership_status import MembershipStatusDict
+from models.product import ProductDict
+from models.pydantic_models import CheckInReason
+from models.transaction_record import TransactionRecordDict, transaction_total
+from storage.base import DATETIME_FORMAT, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+MEMBER_COLUMNS = ", ".join(MemberDict.__annotations__)
+CHECKIN_COLUMNS = ", ".join(CheckInRecordDict.__annotations__)
+TRANSACTION_COLUMNS = ", ".join(TransactionRecordDict.__annotations__)
+LEDGER_COLUMNS = ", ".join(MemberLedgerDict.__annotations__)
+PRODUCT_COLUMNS = ", ".join(ProductDict.__annotations__)
+PLAN_COLUMNS = ", ".join(MembershipPlanDict.__annotations__)
+# MembershipStatus 的編號欄位為 sid，返回時與 models/ 相同使用 sId
+MEMBERSHIP_COLUMNS = "sid, mContactNum, startDate, endDate, isActive"
+
+# 可以修改的會員欄位（電話變更時，相關記錄的外鍵 ON UPDATE CASCADE）
+MEMBER_UPDATABLE_FIELDS = [
+    field for field in MemberDict.__annotations__ if field != "creation_date"
+]
+
+
+def _now() -> str:
+    return datetime.now(pytz.timezone("Asia/Taipei")).strftime(DATETIME_FORMAT)
+
+
+class MemberRepository:
+    """會員資料存取"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def create(self, member: dict) -> dict[str, str]:
+        """新增會員（member 包含 MemberDict 中除 creation_date 以外的欄位）"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute(
+                    f"""
+                    INSERT INTO Member ({', '.join(MEMBER_UPDATABLE_FIELDS)})
+                    VALUES ({', '.join('?' for _ in MEMBER_UPDATABLE_FIELDS)})
+                    """,
+                    [member.get(field) for field in MEMBER_UPDATABLE_FIELDS],
+                )
+            return {"message": "會員創建成功"}
+        except self.storage.IntegrityError:
+            return {"error": "會員已存在"}
+        except self.storage.Error as e:
+            return {"error": f"創建會員失敗: {e}"}
+
+    def get(self, mContactNum: str) -> Optional[MemberDict]:
+        """查詢單一會員，不存在時返回 None"""
+        with self.storage.read() as session:
+            row = session.execute(
+                f"SELECT {MEMBER_COLUMNS} FROM Member WHERE mContactNum = ?",
+                (mContactNum,),
+            ).fetchone()
+        return dict(zip(MemberDict.__annotations__.keys(), row)) if row else None
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[MemberDict]:
+        """依電話順序逐筆讀取所有會員"""
+        for row in self.storage.stream(
+            f"SELECT {MEMBER_COLUMNS} FROM Member ORDER BY mContactNum", (), batch_size
+        ):
+            yield dict(zip(MemberDict.__annotations__.keys(), row))
+
+    def update(self, mContactNum: str, fields: dict) -> dict[str, str]:
+        """更新會員資料，只更新 fields 中有提供（不為 None）的欄位"""
+        unknown = set(fields) - set(MEMBER_UPDATABLE_FIELDS)
+        if unknown:
+            return {"error": f"無法更新的欄位: {', '.join(sorted(unknown))}"}
+        updates = {key: value for key, value in fields.items() if value is not None}
+        if not updates:
+            return {"message": "沒有需要更新的資料"}
+
+        try:
+            with self.storage.transaction() as session:
+                session.execute(
+                    f"""
+                    UPDATE Member SET {', '.join(f'{key} = ?' for key in updates)}
+                    WHERE mContactNum = ?
+                    """,
+                    [*updates.values(), mContactNum],
+                )
+                if session.rowcount == 0:
+                    return {"error": "會員不存在"}
+            return {"message": "會員資料更新成功"}
+        except self.storage.Error as e:
+            return {"error": f"更新會員資料失敗: {e}"}
+
+    def delete(self, mContactNum: str) -> dict[str, str]:
+        """刪除沒有任何相關記錄的會員"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute("DELETE FROM Member WHERE mContactNum = ?", (mContactNum,))
+                if session.rowcount == 0:
+                    return {"error": "會員不存在"}
+            return {"message": "會員刪除成功"}
+        except self.storage.IntegrityError:
+            return {"error": "會員仍有相關記錄，無法刪除"}
+        except self.storage.Error as e:
+            return {"error": f"刪除會員失敗: {e}"}
+
+
+class CheckInRepository:
+    """打卡記錄資料存取"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def check_in(
+        self, mContactNum: str, now: Optional[str] = None
+    ) -> Optional[CheckInResultDict]:
+        """
+        會員入場：確認會員存在、今天在有效會籍期間內、沒有未結束的打卡記錄，
+        允許入場時在同一個交易中建立打卡記錄
+
+        同一位會員的入場以鎖定會員記錄排隊，不會同時建立兩筆未結束的打卡記錄。
+        數據庫錯誤時返回 None。
+        """
+        now = now or _now()
+        today = now[:10]
+        try:
+            return self._check_in(mContactNum, now, today)
+        except self.storage.Error as e:
+            logger.error(f"入場打卡失敗: {e}")
+            return None
+
+    def _check_in(self, mContactNum: str, now: str, today: str) -> CheckInResultDict:
+        with self.storage.transaction() as session:
+            member = session.execute(
+                f"SELECT 1 FROM Member WHERE mContactNum = ?{self.storage.for_update}",
+                (mContactNum,),
+            ).fetchone()
+            if member is None:
+                reason = CheckInReason.MEMBER_NOT_FOUND
+            elif not session.execute(
+                """
+                SELECT 1 FROM MembershipStatus
+                WHERE mContactNum = ? AND isActive = 1 AND startDate <= ? AND endDate >= ?
+                LIMIT 1
+                """,
+                (mContactNum, today, today),
+            ).fetchone():
+                reason = CheckInReason.NO_ACTIVE_MEMBERSHIP
+            elif session.execute(
+                "SELECT 1 FROM CheckInRecord WHERE mContactNum = ? AND checkOutStatus = 0 LIMIT 1",
+                (mContactNum,),
+            ).fetchone():
+                reason = CheckInReason.ALREADY_CHECKED_IN
+            else:
+                reason = CheckInReason.ADMITTED
+
+            if reason != CheckInReason.ADMITTED:
+                return {"admitted": False, "reason": reason.value, "checkInNo": None}
+
+            checkInNo = session.insert(
+                """
+                INSERT INTO CheckInRecord (mContactNum, checkInDatetime, checkInStatus)
+                VALUES (?, ?, 1)
+                """,
+                (mContactNum, now),
+                "checkInNo",
+            )
+        return {"admitted": True, "reason": reason.value, "checkInNo": checkInNo}
+
+    def check_out(self, mContactNum: str, now: Optional[str] = None) -> dict[str, str]:
+        """會員退場：登出最新一筆未結束的打卡記錄"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute(
+                    """
+                    UPDATE CheckInRecord SET checkOutDatetime = ?, checkOutStatus = 1
+                    WHERE checkInNo = (
+                        SELECT checkInNo FROM CheckInRecord
+                        WHERE mContactNum = ? AND checkOutStatus = 0
+                        ORDER BY checkInNo DESC
+                        LIMIT 1
+                    )
+                    """,
+                    (now or _now(), mContactNum),
+                )
+                if session.rowcount == 0:
+                    exists = session.execute(
+                        "SELECT 1 FROM CheckInRecord WHERE mContactNum = ? LIMIT 1",
+                        (mContactNum,),
+                    ).fetchone()
+                    return {"error": "該記錄已經登出" if exists else "打卡記錄不存在"}
+            return {"message": "打卡記錄更新成功"}
+        except self.storage.IntegrityError:
+            return {"error": "登出時間必須晚於登入時間"}
+        except self.storage.Error as e:
+            return {"error": str(e)}
+
+    def list_for_member(self, mContactNum: str) -> list[CheckInRecordDict]:
+        """查詢會員的打卡記錄（新到舊）"""
+        with self.storage.read() as session:
+            rows = session.execute(
+                f"""
+                SELECT {CHECKIN_COLUMNS} FROM CheckInRecord
+                WHERE mContactNum = ? ORDER BY checkInNo DESC
+                """,
+                (mContactNum,),
+            ).fetchall()
+        return [dict(zip(CheckInRecordDict.__annotations__.keys(), row)) for row in rows]
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[CheckInRecordDict]:
+        """依編號順序逐筆讀取所有打卡記錄"""
+        for row in self.storage.stream(
+            f"SELECT {CHECKIN_COLUMNS} FROM CheckInRecord ORDER BY checkInNo", (), batch_size
+        ):
+            yield dict(zip(CheckInRecordDict.__annotations__.keys(), row))
+
+
+class TransactionRepository:
+    """
+    交易記錄資料存取
+
+    只處理交易記錄本身；回饋點數與會員帳本仍由 models.transaction_record 處理。
+    """
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def create(self, transaction: dict, now: Optional[str] = None) -> dict[str, str]:
+        """
+        新增交易記錄
+
+        transaction: mContactNum、gsNo、count、unitPrice、discount、paymentMethod
+        """
+        try:
+            with self.storage.transaction() as session:
+                item = session.execute(
+                    """
+                    SELECT
+                        EXISTS (SELECT 1 FROM Member WHERE mContactNum = ?),
+                        EXISTS (SELECT 1 FROM Product WHERE gsNo = ?)
+                        OR EXISTS (SELECT 1 FROM MembershipPlan WHERE gsNo = ?)
+                    """,
+                    (transaction["mContactNum"], transaction["gsNo"], transaction["gsNo"]),
+                ).fetchone()
+                if not item[0]:
+                    return {"error": "會員不存在"}
+                if not item[1]:
+                    return {"error": "商品或會籍方案不存在"}
+
+                total_amount = transaction_total(
+                    transaction["unitPrice"], transaction["count"], transaction["discount"]
+                )
+                tNo = session.insert(
+                    """
+                    INSERT INTO TransactionRecord (
+                        mContactNum, transDateTime, gsNo, count, unitPrice,
+                        discount, totalAmount, paymentMethod
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        transaction["mContactNum"],
+                        now or _now(),
+                        transaction["gsNo"],
+                        transaction["count"],
+                        transaction["unitPrice"],
+                        transaction["discount"],
+                        total_amount,
+                        transaction["paymentMethod"],
+                    ),
+                    "tNo",
+                )
+            return {"message": "交易記錄創建成功", "tNo": str(tNo)}
+        except self.storage.IntegrityError as e:
+            return {"error": f"交易資料不正確: {e}"}
+        except self.storage.Error as e:
+            return {"error": f"數據庫操作失敗: {e}"}
+
+    def list_for_member(self, mContactNum: str) -> list[TransactionRecordDict]:
+        """查詢會員的交易記錄（新到舊）"""
+        with self.storage.read() as session:
+            rows = session.execute(
+                f"""
+                SELECT {TRANSACTION_COLUMNS} FROM TransactionRecord
+                WHERE mContactNum = ? ORDER BY tNo DESC
+                """,
+                (mContactNum,),
+            ).fetchall()
+        return [
+            dict(zip(TransactionRecordDict.__annotations__.keys(), row)) for row in rows
+        ]
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[TransactionRecordDict]:
+        """依編號順序逐筆讀取所有交易記錄"""
+        for row in self.storage.stream(
+            f"SELECT {TRANSACTION_COLUMNS} FROM TransactionRecord ORDER BY tNo", (), batch_size
+        ):
+            yield dict(zip(TransactionRecordDict.__annotations__.keys(), row))
+
+
+class MembershipStatusRepository:
+    """會籍資料存取"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def create(
+        self, mContactNum: str, startDate: str, endDate: str, isActive: bool = True
+    ) -> dict[str, str]:
+        """新增會籍（日期為 YYYY-MM-DD）"""
+        try:
+            with self.storage.transaction() as session:
+                if not session.execute(
+                    "SELECT 1 FROM Member WHERE mContactNum = ?", (mContactNum,)
+                ).fetchone():
+                    return {"error": "會員不存在"}
+                sid = session.insert(
+                    """
+                    INSERT INTO MembershipStatus (mContactNum, startDate, endDate, isActive)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (mContactNum, startDate, endDate, int(isActive)),
+                    "sid",
+                )
+            return {"message": "會籍狀態創建成功", "sId": str(sid)}
+        except self.storage.IntegrityError:
+            return {"error": "結束日期必須晚於開始日期"}
+        except self.storage.Error as e:
+            return {"error": f"數據庫錯誤: {e}"}
+
+    def list_for_member(self, mContactNum: str) -> list[MembershipStatusDict]:
+        """查詢會員的所有會籍（結束日期新到舊）"""
+        with self.storage.read() as session:
+            rows = session.execute(
+                f"""
+                SELECT {MEMBERSHIP_COLUMNS} FROM MembershipStatus
+                WHERE mContactNum = ? ORDER BY endDate DESC, sid DESC
+                """,
+                (mContactNum,),
+            ).fetchall()
+        return [dict(zip(MembershipStatusDict.__annotations__.keys(), row)) for row in rows]
+
+    def active_on(self, mContactNum: str, day: str) -> Optional[MembershipStatusDict]:
+        """day（YYYY-MM-DD）在有效期間內的會籍，沒有時返回 None"""
+        with self.storage.read() as session:
+            row = session.execute(
+                f"""
+                SELECT {MEMBERSHIP_COLUMNS} FROM MembershipStatus
+                WHERE mContactNum = ? AND isActive = 1 AND startDate <= ? AND endDate >= ?
+                ORDER BY endDate DESC
+                LIMIT 1
+                """,
+                (mContactNum, day, day),
+            ).fetchone()
+        return dict(zip(MembershipStatusDict.__annotations__.keys(), row)) if row else None
+
+
+class LedgerRepository:
+    """
+    會員帳本資料存取
+
+    與 models.member_ledger 相同：以 `SET 欄位 = 欄位 + ?` 原子更新並確保不為負數，
+    帳本記錄與會員的目前值在同一個交易中寫入。
+    """
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def apply_delta(
+        self,
+        mContactNum: str,
+        account: str,
+        delta: int,
+        reason: Optional[str] = None,
+        now: Optional[str] = None,
+    ) -> dict[str, str]:
+        """
+        變動會員餘額或回饋點數並寫入帳本
+
+        Returns:
+            dict: 成功時包含 balance（變動後的值），失敗時包含 error
+        """
+        if account not in ACCOUNT_COLUMNS:
+            return {"error": "無效的帳本科目"}
+        column = ACCOUNT_COLUMNS[account]
+
+        try:
+            with self.storage.transaction() as session:
+                row = session.execute(
+                    f"""
+                    UPDATE Member SET {column} = {column} + ?
+                    WHERE mContactNum = ? AND {column} + ? >= 0
+                    RETURNING {column}
+                    """,
+                    (delta, mContactNum, delta),
+                ).fetchone()
+                if row is None:
+                    exists = session.execute(
+                        "SELECT 1 FROM Member WHERE mContactNum = ?", (mContactNum,)
+                    ).fetchone()
+                    return {"error": INSUFFICIENT_MESSAGES[account] if exists else "會員不存在"}
+                session.insert(
+                    """
+                    INSERT INTO MemberLedger
+                        (mContactNum, account, delta, balanceAfter, reason, createdAt)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (mContactNum, account, delta, row[0], reason, now or _now()),
+                    "ledgerNo",
+                )
+            return {"message": "會員帳本變動成功", "balance": str(row[0])}
+        except self.storage.Error as e:
+            return {"error": f"數據庫錯誤: {e}"}
+
+    def list_for_member(self, mContactNum: str, limit: int = 50) -> list[MemberLedgerDict]:
+        """查詢會員最近的帳本記錄（新到舊）"""
+        with self.storage.read() as session:
+            rows = session.execute(
+                f"""
+                SELECT {LEDGER_COLUMNS} FROM MemberLedger
+                WHERE mContactNum = ? ORDER BY ledgerNo DESC
+                LIMIT ?
+                """,
+                (mContactNum, limit),
+            ).fetchall()
+        return [dict(zip(MemberLedgerDict.__annotations__.keys(), row)) for row in rows]
+
+
+class ProductRepository:
+    """商品資料存取"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def create(self, product: dict) -> dict[str, str]:
+        """新增商品（product 包含 ProductDict 的欄位，pImage 可省略）"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute(
+                    f"INSERT INTO Product ({PRODUCT_COLUMNS}) VALUES (?, ?, ?, ?)",
+                    [product.get(field) for field in ProductDict.__annotations__],
+                )
+            return {"message": "商品創建成功"}
+        except self.storage.IntegrityError:
+            return {"error": "商品已存在或資料不正確"}
+        except self.storage.Error as e:
+            return {"error": f"數據庫錯誤: {e}"}
+
+    def get(self, gsNo: str) -> Optional[ProductDict]:
+        """查詢單一商品，不存在時返回 None"""
+        with self.storage.read() as session:
+            row = session.execute(
+                f"SELECT {PRODUCT_COLUMNS} FROM Product WHERE gsNo = ?", (gsNo,)
+            ).fetchone()
+        return dict(zip(ProductDict.__annotations__.keys(), row)) if row else None
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[ProductDict]:
+        """依編號順序逐筆讀取所有商品"""
+        for row in self.storage.stream(
+            f"SELECT {PRODUCT_COLUMNS} FROM Product ORDER BY gsNo", (), batch_size
+        ):
+            yield dict(zip(ProductDict.__annotations__.keys(), row))
+
+    def delete(self, gsNo: str) -> dict[str, str]:
+        """刪除商品"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute("DELETE FROM Product WHERE gsNo = ?", (gsNo,))
+                if session.rowcount == 0:
+                    return {"error": "商品不存在"}
+            return {"message": "商品刪除成功"}
+        except self.storage.Error as e:
+            return {"error": f"數據庫錯誤: {e}"}
+
+
+class MembershipPlanRepository:
+    """會籍方案資料存取"""
+
+    def __init__(self, storage: StorageBackend):
+        self.storage = storage
+
+    def create(self, plan: dict) -> dict[str, str]:
+        """新增會籍方案（plan 包含 MembershipPlanDict 的欄位）"""
+        try:
+            with self.storage.transaction() as session:
+                session.execute(
+                    f"INSERT INTO MembershipPlan ({PLAN_COLUMNS}) VALUES (?, ?, ?, ?)",
+                    [plan.get(field) for field in MembershipPlanDict.__annotations__],
+                )
+            return {"message": "會籍方案創建成功"}
+        except self.storage.IntegrityError:
+            return {"error": "會籍方案已存在或資料不正確"}
+        except self.storage.Error as e:
+            return {"error": f"數據庫錯誤: {e}"}
+
+    def get(self, gsNo: str) -> Optional[MembershipPlanDict]:
+        """查詢單一會籍方案，不存在時返回 None"""
+        with self.storage.read() as session:
+            row = session.execute(
+                f"SELECT {PLAN_COLUMNS} FROM MembershipPlan WHERE gsNo = ?", (gsNo,)
+            ).fetchone()
+        return dict(zip(MembershipPlanDict.__annotations__.keys(), row)) if row else None
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[MembershipPlanDict]:
+        """依編號順序逐筆讀取所有會籍方案"""
+        for row in self.storage.stream(
+            f"SELECT {PLAN_COLUMNS} FROM MembershipPlan ORDER BY gsNo", (), batch_size
+        ):
+            yield dict(zip(MembershipPlanDict.__annotations__.keys(), row))
@@ -0,0 +1,95 @@
+"""
+SQLite 儲存後端（目前應用程式使用的 gym.db，位置由 database.DB_PATH / GYM_DB_PATH 決定）
+"""
+
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+import database
+from storage.base import StorageBackend, StorageSession
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite 儲存後端：每個交易一個連接，結構由 migrations/ 管理
+
+    Args:
+        path: 數據庫檔案，None 時為 database.DB_PATH
+        attach: 每個連接額外 ATTACH 的數據庫 {別名: 檔案或 file: URI}，
+            查詢中沒有指定數據庫的表格名稱依序在主數據庫與 ATTACH 的數據庫中尋找
+            （分店數據庫以此唯讀讀取主數據庫的會員與商品）
+    """
+
+    name = "sqlite"
+    Error = sqlite3.Error
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(
+        self, path: Optional[Path] = None, attach: Optional[dict[str, str]] = None
+    ):
+        self.path = path
+        self.attach = attach or {}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = database.get_connection(self.path)
+        if conn is None:
+            raise sqlite3.OperationalError("數據庫連接失敗")
+        for alias, path in self.attach.items():
+            conn.execute(f"ATTACH DATABASE ? AS {alias}", (str(path),))
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[StorageSession]:
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            # 一開始就取得寫入鎖，交易中讀到的資料不會被其他寫入改變
+            cursor.execute("BEGIN IMMEDIATE")
+            yield StorageSession(self, cursor)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @contextmanager
+    def read(self) -> Iterator[StorageSession]:
+        conn = self._connect()
+        try:
+            cursor = conn.cursor()
+            # 連接只用於這個交易，query_only 擋下寫入；
+            # 延遲的 BEGIN 在第一次讀取時取得快照，不取得寫入鎖，不會與入場等寫入競爭
+            cursor.execute("PRAGMA query_only = ON")
+            cursor.execute("BEGIN")
+            yield StorageSession(self, cursor)
+        finally:
+            conn.rollback()
+            conn.close()
+
+    def stream(
+        self, query: str, params: Sequence = (), batch_size: int = 1000
+    ) -> Iterator[tuple]:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(query, tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def insert(self, cursor: Any, query: str, params: Sequence, key: str) -> int:
+        cursor.execute(query, tuple(params))
+        return cursor.lastrowid
+
+    def create_schema(self) -> None:
+        if self.path is not None:
+            # 分店數據庫的結構由 services/branches.py 建立
+            raise ValueError("只有主數據庫（path 為 None）的結構由 migrations/ 建立")
+        if not database.create_all_tables():
+            raise sqlite3.OperationalError("數據庫遷移失敗")
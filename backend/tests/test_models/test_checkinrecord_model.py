@@ -11,7 +11,8 @@ import unittest
 from gym_management.backend.database import get_connection
 from models.checkinrecord import CheckInRecord
 from models.member import Member
-from datetime import datetime
+from models.membership_status import MembershipStatus
+from datetime import date, datetime, timedelta
 
 from icecream import ic
 
@@ -37,6 +38,7 @@ class TestCheckInRecord(unittest.TestCase):
 
             # 清空相關表格（按照正確的順序）
             cursor.execute("DELETE FROM CheckInRecord")
+            cursor.execute("DELETE FROM MembershipStatus")
             cursor.execute("DELETE FROM Member")  # 最後刪除會員
             conn.commit()
 
@@ -58,8 +60,12 @@ class TestCheckInRecord(unittest.TestCase):
             "mBalance": 1000,
             "mRewardPoints": 100,
         }
-        # 確保測試會員存在
+        # 確保測試會員存在，並有有效會籍（入場需要有效會籍）
         Member.create_member(**self.test_member)
+        today = date.today()
+        MembershipStatus.create_membership_status(
+            self.test_member["mContactNum"], today, today + timedelta(days=30)
+        )
 
         self.test_checkin = {
             "mContactNum": "0912345699",
@@ -130,6 +136,26 @@ class TestCheckInRecord(unittest.TestCase):
         self.assertIsInstance(result, list)
         self.assertEqual(len(result), 2)
 
+    def test_7_auto_checkout_open_visits(self):
+        """測試批次自動登出"""
+        CheckInRecord.create_checkin_record(**self.test_checkin)
+
+        # 今天入場的記錄不會被登出
+        result = CheckInRecord.auto_checkout_open_visits()
+        ic(result)
+        self.assertEqual(result["message"], "自動登出成功")
+
+        # 以明天為界，所有未登出的記錄都會被登出
+        tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        result = CheckInRecord.auto_checkout_open_visits(before=tomorrow)
+        ic(result)
+        self.assertGreaterEqual(int(result["count"]), 1)
+
+        # 再次登出同一會員時應回報已經登出
+        result = CheckInRecord.update_checkin_record(self.test_checkin["mContactNum"])
+        ic(result)
+        self.assertEqual(result["error"], "該記錄已經登出")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,174 @@
+"""
+測試會員帳本模型
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from gym_management.backend.database import get_connection
+from models.member import Member
+from models.member_ledger import MemberLedger, apply_ledger_change
+from services.write_queue import WriteTimeout, run_write, submit_write
+
+from icecream import ic
+
+
+class TestMemberLedger(unittest.TestCase):
+    """測試會員帳本類別的所有方法"""
+
+    @classmethod
+    def setUpClass(cls):
+        """在所有測試開始前清空相關表格"""
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM MemberLedger")
+            cursor.execute("DELETE FROM Member")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+    def setUp(self):
+        """測試前準備：創建測試會員資料"""
+        self.test_member = {
+            "mContactNum": "0912345699",
+            "mName": "測試會員",
+            "mEmail": "test@example.com",
+            "mDob": "1990-01-01",
+            "mEmergencyName": "緊急聯絡人",
+            "mEmergencyNum": "0987654321",
+            "mBalance": 1000,
+            "mRewardPoints": 100,
+        }
+        Member.create_member(**self.test_member)
+
+    def test_1_apply_delta(self):
+        """測試以差額變動餘額"""
+        result = MemberLedger.apply_delta(
+            self.test_member["mContactNum"], "balance", -300, "測試扣款"
+        )
+        ic(result)
+        self.assertEqual(result.get("message"), "會員帳本變動成功")
+        self.assertEqual(result.get("balance"), "700")
+
+        member = Member.get_member(self.test_member["mContactNum"])
+        self.assertEqual(member["mBalance"], 700)
+
+    def test_2_get_member_ledger(self):
+        """測試查詢會員帳本"""
+        entries = MemberLedger.get_member_ledger(self.test_member["mContactNum"])
+        ic(entries)
+        self.assertGreater(len(entries), 0)
+        self.assertEqual(entries[0]["account"], "balance")
+        self.assertEqual(entries[0]["delta"], -300)
+        self.assertEqual(entries[0]["balanceAfter"], 700)
+
+    def test_3_reconcile(self):
+        """測試對帳"""
+        # 直接設定餘額也會寫入帳本，對帳仍一致
+        Member.update_member(self.test_member["mContactNum"], mRewardPoints=50)
+
+        result = MemberLedger.reconcile(batch_size=1)
+        ic(result)
+        self.assertGreater(result["checked"], 0)
+        self.assertEqual(result["mismatches"], [])
+
+    def test_4_error_cases(self):
+        """測試錯誤情況"""
+        # 餘額不可為負數
+        result = MemberLedger.apply_delta(
+            self.test_member["mContactNum"], "balance", -999999
+        )
+        ic(result)
+        self.assertEqual(result.get("error"), "會員餘額不足")
+
+        # 不存在的會員
+        result = MemberLedger.apply_delta("9999999999", "balance", 100)
+        ic(result)
+        self.assertEqual(result.get("error"), "會員不存在")
+
+    def test_5_concurrent_apply_delta(self):
+        """測試同時送出的變動經由寫入佇列全部成功，失敗的變動不影響同一批的其他變動"""
+        mContactNum = self.test_member["mContactNum"]
+        before = Member.get_member(mContactNum)["mRewardPoints"]
+
+        def change(i):
+            # 每 5 筆中有 1 筆點數不足
+            delta = -999999 if i % 5 == 0 else 1
+            return MemberLedger.apply_delta(mContactNum, "reward_points", delta, "同時變動")
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(change, range(50)))
+        ic(results[:5])
+
+        self.assertEqual(sum("message" in result for result in results), 40)
+        self.assertEqual(sum("error" in result for result in results), 10)
+        member = Member.get_member(mContactNum)
+        self.assertEqual(member["mRewardPoints"], before + 40)
+        self.assertEqual(MemberLedger.reconcile()["mismatches"], [])
+
+    def test_6_write_timeout(self):
+        """測試等待寫入逾時時拋出 WriteTimeout，佇列中的寫入被取消而不會執行"""
+        mContactNum = self.test_member["mContactNum"]
+        before = Member.get_member(mContactNum)["mRewardPoints"]
+
+        # 佔用寫入執行緒，讓下一個寫入留在佇列中
+        blocking = submit_write(lambda cursor: time.sleep(0.5) or {"message": "完成"})
+        with self.assertRaises(WriteTimeout):
+            run_write(apply_ledger_change, mContactNum, "reward_points", 1, "逾時", timeout=0.1)
+        ic(blocking.result())
+
+        self.assertEqual(Member.get_member(mContactNum)["mRewardPoints"], before)
+        result = run_write(apply_ledger_change, mContactNum, "reward_points", 1, "逾時後")
+        self.assertEqual(result["balance"], str(before + 1))
+
+    def test_7_reconcile_snapshot(self):
+        """測試對帳時在讀取會員與讀取帳本之間提交的變動不會被當成不一致"""
+        mContactNum = self.test_member["mContactNum"]
+
+        class WriteAfterMemberRead:
+            """讀取 Member 之後由寫入佇列（另一個連接）提交一筆變動"""
+
+            def __init__(self, target):
+                self.target = target
+
+            def cursor(self):
+                return WriteAfterMemberRead(self.target.cursor())
+
+            def execute(self, query, *args):
+                result = self.target.execute(query, *args)
+                if "FROM Member" in query:
+                    MemberLedger.apply_delta(mContactNum, "reward_points", 1, "對帳期間")
+                return result
+
+            def __getattr__(self, name):
+                return getattr(self.target, name)
+
+        with mock.patch(
+            "models.member_ledger.get_connection",
+            side_effect=lambda: WriteAfterMemberRead(get_connection()),
+        ):
+            result = MemberLedger.reconcile()
+        ic(result)
+        self.assertGreater(result["checked"], 0)
+        self.assertEqual(result["mismatches"], [])
+        self.assertEqual(MemberLedger.reconcile()["mismatches"], [])
+
+    @classmethod
+    def tearDownClass(cls):
+        """在所有測試結束後清理數據"""
+        Member.delete_member("0912345699")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,10 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 import unittest
 from gym_management.backend.database import get_connection
 from models.member import Member
+from services.branches import add_branch_membership, branch_path, create_branch
+from services.cascade_delete import get_cascade_job
+from services.record_archive import archive_path
+from datetime import date
 
 from icecream import ic
 
@@ -124,6 +128,12 @@ class TestMember(unittest.TestCase):
         member = Member.get_member(self.test_member["mContactNum"])
         self.assertIsNone(member)
 
+        # 分批刪除的進度
+        job = get_cascade_job(result["jobId"])
+        ic(job)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["deleted"]["Member"], 1)
+
     def test_6_error_cases(self):
         """測試錯誤情況"""
         # 確保測試會員存在
@@ -146,6 +156,58 @@ class TestMember(unittest.TestCase):
         ic(non_exist_delete)
         self.assertIn("error", non_exist_delete)
 
+    def test_7_delete_member_archives_and_branches(self):
+        """測試刪除會員時一併刪除封存數據庫與分店數據庫中的記錄"""
+        mContactNum = self.test_member["mContactNum"]
+        Member.create_member(**self.test_member)
+        # 2020 年的封存數據庫中有一筆打卡記錄
+        archive_path(2020).parent.mkdir(exist_ok=True)
+        conn = get_connection(archive_path(2020))
+        try:
+            conn.execute(
+                "CREATE TABLE CheckInRecord (checkInNo INTEGER, mContactNum VARCHAR(20), checkInDatetime DATETIME)"
+            )
+            conn.execute(
+                "INSERT INTO CheckInRecord VALUES (1, ?, '2020-01-01 10:00:00')", (mContactNum,)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        create_branch("DEL", "刪除測試店")
+        add_branch_membership("DEL", mContactNum, date(2020, 1, 1), date(2030, 1, 1))
+
+        try:
+            result = Member.delete_member(mContactNum)
+            ic(result)
+            self.assertEqual(result.get("message"), "會員刪除成功")
+
+            job = get_cascade_job(result["jobId"])
+            ic(job)
+            self.assertEqual(job["status"], "done")
+            self.assertEqual(job["deleted"]["archive_2020.CheckInRecord"], 1)
+            self.assertEqual(job["deleted"]["branch_DEL.MembershipStatus"], 1)
+            for path, table in (
+                (archive_path(2020), "CheckInRecord"),
+                (branch_path("DEL"), "MembershipStatus"),
+            ):
+                conn = get_connection(path)
+                try:
+                    count = conn.execute(
+                        f"SELECT COUNT(*) FROM {table} WHERE mContactNum = ?", (mContactNum,)
+                    ).fetchone()[0]
+                finally:
+                    conn.close()
+                self.assertEqual(count, 0)
+        finally:
+            conn = get_connection()
+            try:
+                conn.execute("DELETE FROM Branch WHERE branchId = 'DEL'")
+                conn.commit()
+            finally:
+                conn.close()
+            branch_path("DEL").unlink(missing_ok=True)
+            archive_path(2020).unlink(missing_ok=True)
+
     @classmethod
     def tearDownClass(cls):
         """
@@ -244,3 +244,34 @@ class TestMembershipStatus(unittest.TestCase):
         non_exist_delete = MembershipStatus.delete_membership_status("9999999999")
         ic(non_exist_delete)
         self.assertIn("error", non_exist_delete)
+
+    def test_7_deactivate_expired(self):
+        """測試停用過期會籍與剩餘天數計算"""
+        # 已過期的會籍
+        MembershipStatus.create_membership_status(
+            mContactNum=self.test_member["mContactNum"],
+            startDate=self.today - timedelta(days=60),
+            endDate=self.today - timedelta(days=1),
+            isActive=True,
+        )
+        # 仍有效的會籍
+        MembershipStatus.create_membership_status(
+            mContactNum=self.test_member2["mContactNum"],
+            startDate=self.today,
+            endDate=self.future_date,
+            isActive=True,
+        )
+
+        deactivated = MembershipStatus.deactivate_expired(self.today.isoformat())
+        ic(deactivated)
+        self.assertEqual(deactivated, 1)
+        self.assertIsNone(
+            MembershipStatus.get_membership_status(self.test_member["mContactNum"])
+        )
+
+        MembershipStatus.refresh_days_remaining(self.today.isoformat())
+        expiring = MembershipStatus.get_expiring_membership_status(within_days=30)
+        ic(expiring)
+        self.assertEqual(len(expiring), 1)
+        self.assertEqual(expiring[0]["mContactNum"], self.test_member2["mContactNum"])
+        self.assertEqual(expiring[0]["daysRemaining"], 30)
@@ -0,0 +1,189 @@
+"""
+測試回饋點數規則模型
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import unittest
+from gym_management.backend.database import get_connection
+from models.member import Member
+from models.product import Product
+from models.reward_point_rule import RewardPointRule, points_per_dollar
+from models.transaction_record import TransactionRecord
+from services.record_archive import archive_path
+
+from icecream import ic
+
+
+class TestRewardPointRule(unittest.TestCase):
+    """測試回饋點數規則與交易點數累積"""
+
+    @classmethod
+    def setUpClass(cls):
+        """在所有測試開始前清空相關表格，封存數據庫改放在暫存目錄"""
+        cls.archive_dir = tempfile.mkdtemp()
+        os.environ["GYM_ARCHIVE_DIR"] = cls.archive_dir
+
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM RewardPointRule")
+            cursor.execute("DELETE FROM MemberLedger")
+            cursor.execute("DELETE FROM TransactionRecord")
+            cursor.execute("DELETE FROM Member")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+        Member.create_member(
+            mContactNum="0912345699",
+            mName="測試會員",
+            mEmail="test@example.com",
+            mDob="1990-01-01",
+            mEmergencyName="緊急聯絡人",
+            mEmergencyNum="0987654321",
+            mBalance=1000,
+            mRewardPoints=100,
+        )
+        Product.create_product(gsNo="P001", salePrice=500, pName="運動毛巾")
+
+    def test_1_create_rule(self):
+        """測試創建規則"""
+        result = RewardPointRule.create_rule(pointsPerDollar=0.1)
+        ic(result)
+        self.assertEqual(result.get("message"), "回饋點數規則創建成功")
+
+        # 同一組商品/付款方式不能重複
+        result = RewardPointRule.create_rule(pointsPerDollar=0.2)
+        self.assertEqual(result.get("error"), "回饋點數規則已存在")
+
+    def test_2_accrue_and_redeem(self):
+        """測試交易時累積與兌換點數"""
+        transaction = {
+            "mContactNum": "0912345699",
+            "gsNo": "P001",
+            "count": 1,
+            "unitPrice": 500,
+            "discount": 1.0,
+            "paymentMethod": "cash",
+        }
+        TransactionRecord.create_transaction_record(transaction)
+        member = Member.get_member("0912345699")
+        self.assertEqual(member["mRewardPoints"], 150)
+
+        # 以回饋點數付款時扣除點數，點數不足時交易不成立
+        transaction["paymentMethod"] = "reward_points"
+        transaction["unitPrice"] = 1000
+        result = TransactionRecord.create_transaction_record(transaction)
+        ic(result)
+        self.assertEqual(result.get("error"), "回饋點數不足")
+        self.assertEqual(
+            TransactionRecord.get_member_transaction_record("0912345699").__len__(), 1
+        )
+
+    def test_3_recompute_points(self):
+        """測試點數重算"""
+        result = RewardPointRule.recompute_points()
+        ic(result)
+        self.assertEqual(result["checked"], 1)
+        self.assertEqual(result["adjustments"], [])
+
+        # 封存數據庫中不早於封存時間點的記錄（例如其他數據庫留下的舊檔）不計入
+        conn = get_connection()
+        try:
+            conn.execute("ATTACH DATABASE ? AS leftover", (str(archive_path(date.today().year)),))
+            conn.execute(
+                "CREATE TABLE leftover.TransactionRecord AS SELECT * FROM main.TransactionRecord"
+            )
+            conn.commit()
+            conn.execute("DETACH DATABASE leftover")
+        finally:
+            conn.close()
+        result = RewardPointRule.recompute_points()
+        ic(result)
+        self.assertEqual(result["checked"], 1)
+        self.assertEqual(result["adjustments"], [])
+
+    def test_4_cache_invalidated_by_other_process(self):
+        """測試其他程序修改規則並更新 CacheVersion 後，本程序的快取會重新載入"""
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            self.assertEqual(points_per_dollar(cursor, "P001", "cash"), 0.1)
+
+            # 模擬其他程序：直接修改數據庫並更新版本，不經過本程序的快取
+            cursor.execute(
+                "INSERT INTO RewardPointRule (gsNo, pointsPerDollar) VALUES ('P001', 0.3)"
+            )
+            cursor.execute(
+                "UPDATE CacheVersion SET version = version + 1 WHERE name = 'RewardPointRule'"
+            )
+            conn.commit()
+
+            self.assertEqual(points_per_dollar(cursor, "P001", "cash"), 0.3)
+        finally:
+            conn.close()
+
+    def test_5_update_and_delete_reverse_points(self):
+        """測試修改或刪除交易時沖銷已處理的點數，總金額四捨五入後寫入並處理點數"""
+        points = Member.get_member("0912345699")["mRewardPoints"]
+        rate = 0.3  # test_4 新增的 P001 規則
+
+        # 27 * 0.5 = 13.5，寫入與累積點數都使用四捨五入後的 14
+        transaction = {
+            "mContactNum": "0912345699",
+            "gsNo": "P001",
+            "count": 1,
+            "unitPrice": 27,
+            "discount": 0.5,
+            "paymentMethod": "cash",
+        }
+        TransactionRecord.create_transaction_record(transaction)
+        record = max(
+            TransactionRecord.get_member_transaction_record("0912345699"),
+            key=lambda record: record["tNo"],
+        )
+        ic(record)
+        self.assertEqual(record["totalAmount"], 14)
+        self.assertEqual(
+            Member.get_member("0912345699")["mRewardPoints"], points + int(14 * rate)
+        )
+
+        # 修改數量後依新的總金額重新累積
+        result = TransactionRecord.update_transaction_record(
+            "0912345699", record["tNo"], {"count": 10}
+        )
+        ic(result)
+        self.assertEqual(result.get("message"), "交易記錄更新成功")
+        self.assertEqual(
+            Member.get_member("0912345699")["mRewardPoints"], points + int(135 * rate)
+        )
+
+        # 刪除後點數回到交易前
+        result = TransactionRecord.delete_transaction_record("0912345699", record["tNo"])
+        self.assertEqual(result.get("message"), "交易記錄刪除成功")
+        self.assertEqual(Member.get_member("0912345699")["mRewardPoints"], points)
+
+    @classmethod
+    def tearDownClass(cls):
+        """在所有測試結束後清理數據"""
+        Member.delete_member("0912345699")
+        for rule in RewardPointRule.get_all_rules():
+            RewardPointRule.delete_rule(rule["ruleId"])
+        os.environ.pop("GYM_ARCHIVE_DIR", None)
+        shutil.rmtree(cls.archive_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
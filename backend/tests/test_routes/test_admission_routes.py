@@ -0,0 +1,101 @@
+"""
+測試限流與准入控制
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+from services.admission import AdmissionController, HEAVY_BURST, caller_id, classify
+
+
+class TestAdmissionRoutes(unittest.TestCase):
+
+    def setUp(self):
+        # 使用獨立的用戶端位址，不消耗其他測試的令牌
+        self.client = TestClient(app, client=("10.0.0.1", 50000))
+
+    def test_1_heavy_rate_limit(self):
+        """測試大量請求超過令牌數後返回 429，不影響其他呼叫者與入場打卡"""
+        statuses = [self.client.get("/transaction_records/").status_code for _ in range(HEAVY_BURST + 5)]
+        ic(statuses)
+        self.assertGreaterEqual(statuses.count(200), HEAVY_BURST)
+        self.assertEqual(statuses[-1], 429)
+
+        response = self.client.get("/transaction_records/")
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+        self.assertEqual(response.json(), {"detail": "請求過於頻繁，請稍後再試"})
+
+        # 一般請求與入場打卡不受影響
+        self.assertEqual(self.client.get("/products/").status_code, 200)
+        response = self.client.post("/checkinrecord/checkin/", json={"mContactNum": "0900000000"})
+        self.assertNotEqual(response.status_code, 429)
+        # 其他呼叫者有自己的令牌
+        other = TestClient(app, client=("10.0.0.2", 50000))
+        self.assertEqual(other.get("/transaction_records/").status_code, 200)
+
+    def test_2_concurrency_cap(self):
+        """測試 heavy 同時處理數上限：每個呼叫者一個，整個 worker 兩個"""
+        controller = AdmissionController(
+            limits={"heavy": (1.0, 3)},
+            heavy_max_concurrency=2,
+            heavy_max_concurrency_per_client=1,
+        )
+        self.assertIsNone(controller.admit("a", "heavy"))
+        # 同一個呼叫者的第二個請求被拒絕，不消耗令牌
+        self.assertEqual(controller.admit("a", "heavy"), 1)
+        self.assertEqual(controller.rejected, {"rate": 0, "concurrency": 1})
+        # 其他呼叫者不必等待
+        self.assertIsNone(controller.admit("b", "heavy"))
+        # 整個 worker 的上限
+        self.assertEqual(controller.admit("c", "heavy"), 1)
+        self.assertEqual(controller.rejected["concurrency"], 2)
+        # 入場打卡不受限制
+        self.assertIsNone(controller.admit("c", "checkin"))
+
+        controller.release("a", "heavy")
+        self.assertIsNone(controller.admit("a", "heavy"))
+        # a 的令牌只用了兩個，被拒絕的請求沒有消耗令牌
+        controller.release("a", "heavy")
+        self.assertIsNone(controller.admit("a", "heavy"))
+        self.assertEqual(controller.rejected["rate"], 0)
+
+    def test_3_classify(self):
+        """測試路由分類"""
+        self.assertEqual(classify("POST", "/checkinrecord/checkin/"), "checkin")
+        self.assertEqual(classify("PUT", "/checkinrecord/0912345678/"), "checkin")
+        self.assertEqual(classify("POST", "/branches/B01/checkin/"), "checkin")
+        self.assertEqual(classify("GET", "/member_photo/"), "heavy")
+        self.assertEqual(classify("GET", "/transaction_records/"), "heavy")
+        self.assertEqual(classify("POST", "/backups/"), "heavy")
+        self.assertEqual(classify("GET", "/member_photo/0912345678/"), "default")
+        self.assertEqual(classify("GET", "/checkinrecord/0912345678/"), "default")
+        self.assertEqual(classify("POST", "/transaction_records/"), "default")
+
+    def test_4_caller_header(self):
+        """測試同一個 IP（Streamlit 伺服器）的各個工作階段以 X-Client-Id 各自計算"""
+        counter_a = TestClient(app, client=("10.0.0.3", 50000), headers={"X-Client-Id": "session-a"})
+        counter_b = TestClient(app, client=("10.0.0.3", 50000), headers={"X-Client-Id": "session-b"})
+        statuses = [counter_a.get("/transaction_records/").status_code for _ in range(HEAVY_BURST + 5)]
+        ic(statuses)
+        self.assertEqual(statuses[-1], 429)
+        # 同一個 IP 的另一個工作階段有自己的令牌
+        self.assertEqual(counter_b.get("/transaction_records/").status_code, 200)
+        # 沒有標頭的請求以 IP 區分
+        no_header = TestClient(app, client=("10.0.0.3", 50000))
+        self.assertEqual(no_header.get("/transaction_records/").status_code, 200)
+
+        self.assertEqual(
+            caller_id({"headers": [(b"x-client-id", b"abc")], "client": ("10.0.0.3", 1)}), "id:abc"
+        )
+        self.assertEqual(caller_id({"headers": [], "client": ("10.0.0.3", 1)}), "ip:10.0.0.3")
+        # 過長的值不採用
+        self.assertEqual(
+            caller_id({"headers": [(b"x-client-id", b"x" * 65)], "client": ("10.0.0.3", 1)}),
+            "ip:10.0.0.3",
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
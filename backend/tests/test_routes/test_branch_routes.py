@@ -0,0 +1,259 @@
+"""測試分店相關 API"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import shutil
+import sqlite3
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+from models.member import Member
+from models.product import Product
+from models.reward_point_rule import RewardPointRule
+from services.branches import branch_dir, branch_path, relay_branch_changes
+from icecream import ic
+from gym_management.backend.database import get_connection
+
+
+class TestBranchRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """清空分店與分店數據庫，建立測試會員與商品"""
+        conn = get_connection()
+        try:
+            conn.execute("DELETE FROM Branch")
+            conn.commit()
+        finally:
+            conn.close()
+        shutil.rmtree(branch_dir(), ignore_errors=True)
+
+        Member.create_member(
+            mContactNum="0912345699",
+            mName="測試會員",
+            mEmail="test@example.com",
+            mDob="1990-01-01",
+            mEmergencyName="緊急聯絡人",
+            mEmergencyNum="0987654321",
+        )
+        Product.create_product(gsNo="P001", salePrice=500, pName="運動毛巾")
+        Product.create_product(gsNo="P777", salePrice=100, pName="分店點數商品")
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_1_create_branch(self):
+        """測試創建分店"""
+        for branchId, bName in (("TPE", "台北店"), ("TXG", "台中店")):
+            response = self.client.post("/branches/", json={"branchId": branchId, "bName": bName})
+            ic(response.json())
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post("/branches/", json={"branchId": "TPE", "bName": "台北店"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/branches/", json={"branchId": "../x", "bName": "x"})
+        self.assertEqual(response.status_code, 422)
+
+        response = self.client.get("/branches/")
+        self.assertEqual([b["branchId"] for b in response.json()], ["TPE", "TXG"])
+
+    def test_2_check_in_uses_branch_membership(self):
+        """測試入場依分店的會籍判斷"""
+        today = date.today()
+        response = self.client.post(
+            "/branches/TPE/membership_status/",
+            json={
+                "mContactNum": "0912345699",
+                "startDate": (today - timedelta(days=1)).isoformat(),
+                "endDate": (today + timedelta(days=30)).isoformat(),
+            },
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post("/branches/TPE/checkin/", json={"mContactNum": "0912345699"})
+        self.assertTrue(response.json()["admitted"])
+        # 台中店沒有會籍
+        response = self.client.post("/branches/TXG/checkin/", json={"mContactNum": "0912345699"})
+        self.assertEqual(response.json()["reason"], "no_active_membership")
+        response = self.client.post("/branches/TPE/checkin/", json={"mContactNum": "0900000000"})
+        self.assertEqual(response.json()["reason"], "member_not_found")
+        response = self.client.post("/branches/XXX/checkin/", json={"mContactNum": "0912345699"})
+        self.assertEqual(response.status_code, 404)
+
+        # 分店的打卡不寫入主數據庫
+        conn = get_connection()
+        try:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM CheckInRecord WHERE mContactNum = '0912345699'"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(count, 0)
+
+    def test_3_occupancy(self):
+        """測試各分店在場人數"""
+        response = self.client.get("/branches/occupancy/")
+        ic(response.json())
+        occupancy = {b["branchId"]: b["occupancy"] for b in response.json()}
+        self.assertEqual(occupancy, {"TPE": 1, "TXG": 0})
+
+        response = self.client.put("/branches/TPE/checkin/0912345699/")
+        self.assertIn(response.status_code, (200, 400))
+        records = self.client.get("/branches/TPE/checkin/0912345699/").json()
+        self.assertEqual(len(records), 1)
+
+    def test_4_revenue(self):
+        """測試各分店營收"""
+        transaction = {
+            "mContactNum": "0912345699",
+            "gsNo": "P001",
+            "count": 2,
+            "unitPrice": 500,
+            "discount": 1.0,
+            "paymentMethod": "cash",
+        }
+        for branchId in ("TPE", "TPE", "TXG"):
+            response = self.client.post(f"/branches/{branchId}/transaction_records/", json=transaction)
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/branches/TPE/transaction_records/", json={**transaction, "gsNo": "X999"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get("/branches/revenue/", params={"start_date": date.today().isoformat()})
+        ic(response.json())
+        revenue = {b["branchId"]: (b["transactions"], b["revenue"]) for b in response.json()}
+        self.assertEqual(revenue, {"TPE": (2, 2000), "TXG": (1, 1000)})
+
+        response = self.client.get("/branches/revenue/", params={"end_date": "2000-01-01"})
+        self.assertEqual([b["revenue"] for b in response.json()], [0, 0])
+
+    def _reward_points(self, mContactNum):
+        conn = get_connection()
+        try:
+            return conn.execute(
+                "SELECT mRewardPoints FROM Member WHERE mContactNum = ?", (mContactNum,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_5_points_and_changes(self):
+        """測試分店交易累積與兌換點數，並以 branchId 出現在變更記錄中"""
+        ruleId = int(RewardPointRule.create_rule(pointsPerDollar=0.1, gsNo="P777")["ruleId"])
+        version = self.client.get("/changes/latest").json()["version"]
+        transaction = {
+            "mContactNum": "0912345699",
+            "gsNo": "P777",
+            "count": 1,
+            "unitPrice": 500,
+            "discount": 1.0,
+            "paymentMethod": "cash",
+        }
+        try:
+            before = self._reward_points("0912345699")
+            response = self.client.post("/branches/TPE/transaction_records/", json=transaction)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self._reward_points("0912345699"), before + 50)
+
+            # 兌換 30 點，再累積 3 點
+            response = self.client.post(
+                "/branches/TXG/transaction_records/",
+                json={**transaction, "unitPrice": 30, "paymentMethod": "reward_points"},
+            )
+            ic(response.json())
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self._reward_points("0912345699"), before + 23)
+            response = self.client.post(
+                "/branches/TXG/transaction_records/",
+                json={**transaction, "unitPrice": 100000, "paymentMethod": "reward_points"},
+            )
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get(
+                "/changes/", params={"since": version, "tables": "TransactionRecord"}
+            )
+            ic(response.json())
+            changes = [c for c in response.json()["changes"] if c["branchId"]]
+            self.assertEqual([c["branchId"] for c in changes], ["TPE", "TXG"])
+            self.assertEqual(changes[1]["row"]["paymentMethod"], "reward_points")
+            self.assertEqual(changes[1]["row"]["branchId"], "TXG")
+
+            # 重算時計入分店的交易，沒有差額
+            result = RewardPointRule.recompute_points()
+            ic(result)
+            self.assertNotIn(
+                "0912345699", [a["mContactNum"] for a in result["adjustments"]]
+            )
+        finally:
+            RewardPointRule.delete_rule(ruleId)
+
+    def test_6_phone_change_reaches_branches(self):
+        """測試會員換電話後，分店數據庫中的記錄跟著換電話"""
+        conn = get_connection()
+        try:
+            conn.execute(
+                "UPDATE Member SET mContactNum = '0912345600' WHERE mContactNum = '0912345699'"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        records = self.client.get("/branches/TPE/checkin/0912345600/").json()
+        self.assertEqual(len(records), 1)
+        response = self.client.post("/branches/TXG/checkin/", json={"mContactNum": "0912345600"})
+        self.assertEqual(response.json()["reason"], "no_active_membership")
+        conn = get_connection(branch_path("TXG"))
+        try:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM TransactionRecord WHERE mContactNum = '0912345600'"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(count, 2)
+
+    def test_7_redeem_when_relay_fails(self):
+        """測試兌換後轉送失敗時點數已經扣除，之後轉送不會重複扣除"""
+        ruleId = int(RewardPointRule.create_rule(pointsPerDollar=0.1, gsNo="P777")["ruleId"])
+        transaction = {
+            "mContactNum": "0912345600",
+            "gsNo": "P777",
+            "count": 1,
+            "unitPrice": 10,
+            "discount": 1.0,
+            "paymentMethod": "reward_points",
+        }
+        try:
+            before = self._reward_points("0912345600")
+            with mock.patch(
+                "services.branches._relay", side_effect=sqlite3.OperationalError("轉送失敗")
+            ):
+                response = self.client.post("/branches/TXG/transaction_records/", json=transaction)
+                ic(response.json())
+                self.assertEqual(response.status_code, 200)
+                # 交易還沒轉送，點數已經扣除
+                self.assertEqual(self._reward_points("0912345600"), before - 10)
+                # 重算時計入已扣除、尚未轉送的兌換
+                result = RewardPointRule.recompute_points()
+                self.assertNotIn(
+                    "0912345600", [a["mContactNum"] for a in result["adjustments"]]
+                )
+
+            # 轉送時只累積點數
+            self.assertGreater(relay_branch_changes("TXG"), 0)
+            self.assertEqual(self._reward_points("0912345600"), before - 10 + 1)
+            result = RewardPointRule.recompute_points()
+            self.assertNotIn("0912345600", [a["mContactNum"] for a in result["adjustments"]])
+
+            # 點數不足時不寫入分店交易
+            response = self.client.post(
+                "/branches/TXG/transaction_records/", json={**transaction, "unitPrice": 100000}
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(self._reward_points("0912345600"), before - 9)
+        finally:
+            RewardPointRule.delete_rule(ruleId)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+測試變更記錄（增量同步）API
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+from datetime import date, timedelta
+from models.membership_status import MembershipStatus
+from gym_management.backend.database import get_connection
+from services.change_log import prune_change_log
+
+
+class TestChangeRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """清理數據庫"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM OrderTable")
+            cursor.execute("DELETE FROM MembershipStatus")
+            cursor.execute("DELETE FROM CheckInRecord")
+            cursor.execute("DELETE FROM TransactionRecord")
+            cursor.execute("DELETE FROM Member")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.test_member = {
+            "mContactNum": "0912345678",
+            "mName": "測試會員",
+            "mEmail": "test@example.com",
+            "mDob": "1990-01-01",
+            "mEmergencyName": "緊急聯絡人",
+            "mEmergencyNum": "0987654321",
+        }
+
+    def changes(self, since: int, **params) -> dict:
+        response = self.client.get("/changes/", params={"since": since, **params})
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_1_insert_and_update(self):
+        """測試新增與修改只返回最後的內容"""
+        since = self.client.get("/changes/latest").json()["version"]
+        self.assertEqual(self.changes(since)["changes"], [])
+
+        self.client.post("/members/", json=self.test_member)
+        self.client.put("/members/0912345678/", json={"mName": "新名字"})
+        today = date.today()
+        MembershipStatus.create_membership_status("0912345678", today, today + timedelta(days=30))
+        self.client.post("/checkinrecord/", json={"mContactNum": "0912345678"})
+
+        feed = self.changes(since)
+        self.assertFalse(feed["hasMore"])
+        self.assertEqual(
+            [(c["tableName"], c["operation"]) for c in feed["changes"]],
+            [("Member", "update"), ("MembershipStatus", "insert"), ("CheckInRecord", "insert")],
+        )
+        self.assertEqual(feed["changes"][0]["row"]["mName"], "新名字")
+        self.assertEqual(feed["changes"][2]["row"]["mContactNum"], "0912345678")
+        self.assertEqual(self.changes(feed["version"])["changes"], [])
+
+        # 只取得打卡記錄的變更
+        feed = self.changes(since, tables="CheckInRecord")
+        self.assertEqual([c["tableName"] for c in feed["changes"]], ["CheckInRecord"])
+
+    def test_2_paging_and_delete(self):
+        """測試分頁與刪除"""
+        since = self.client.get("/changes/latest").json()["version"]
+        for i in range(3):
+            self.client.post("/members/", json={**self.test_member, "mContactNum": f"093000000{i}"})
+        self.client.delete("/members/0930000001/")
+
+        feed = self.changes(since, limit=2, tables="Member")
+        self.assertTrue(feed["hasMore"])
+        self.assertEqual([c["rowKey"] for c in feed["changes"]], ["0930000000", "0930000001"])
+        # 之後已刪除的會員以刪除返回
+        self.assertEqual(feed["changes"][1]["operation"], "delete")
+        self.assertIsNone(feed["changes"][1]["row"])
+
+        feed = self.changes(feed["version"], limit=2, tables="Member")
+        self.assertFalse(feed["hasMore"])
+        self.assertEqual(
+            [(c["rowKey"], c["operation"]) for c in feed["changes"]],
+            [("0930000002", "insert"), ("0930000001", "delete")],
+        )
+
+    def test_3_primary_key_change(self):
+        """測試會員換電話時記錄舊電話的刪除"""
+        since = self.client.get("/changes/latest").json()["version"]
+        conn = get_connection()
+        try:
+            conn.execute("UPDATE Member SET mContactNum = '0930000009' WHERE mContactNum = '0930000002'")
+            conn.commit()
+        finally:
+            conn.close()
+        feed = self.changes(since, tables="Member")
+        self.assertEqual(
+            [(c["rowKey"], c["operation"]) for c in feed["changes"]],
+            [("0930000002", "delete"), ("0930000009", "update")],
+        )
+
+    def test_4_pruned(self):
+        """測試變更記錄清除後要求重新取得完整資料"""
+        self.assertEqual(self.client.get("/changes/", params={"since": 0, "tables": "Product"}).status_code, 400)
+        latest = self.client.get("/changes/latest").json()["version"]
+        self.assertEqual(self.client.get("/changes/", params={"since": latest + 1}).status_code, 410)
+
+        self.assertGreater(prune_change_log(retention_days=-1), 0)
+        self.assertEqual(self.client.get("/changes/", params={"since": 0}).status_code, 410)
+        self.assertEqual(self.changes(latest)["changes"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
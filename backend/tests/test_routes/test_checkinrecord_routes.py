@@ -3,9 +3,10 @@
 from fastapi.testclient import TestClient
 from gym_management.backend.main import app
 import unittest
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import pytz
 from models.member import Member
+from models.membership_status import MembershipStatus
 from icecream import ic
 from gym_management.backend.database import get_connection
 
@@ -30,6 +31,7 @@ class TestCheckInRecordRoutes(unittest.TestCase):
 
             # 清空相關表格（按照正確的順序）
             cursor.execute("DELETE FROM CheckInRecord")
+            cursor.execute("DELETE FROM MembershipStatus")
             cursor.execute("DELETE FROM Member")  # 最後刪除會員
             conn.commit()
 
@@ -52,8 +54,12 @@ class TestCheckInRecordRoutes(unittest.TestCase):
             "mBalance": 1000,
             "mRewardPoints": 100,
         }
-        # 確保測試會員存在
+        # 確保測試會員存在，並有有效會籍（入場需要有效會籍）
         Member.create_member(**self.test_member)
+        today = date.today()
+        MembershipStatus.create_membership_status(
+            self.test_member["mContactNum"], today, today + timedelta(days=30)
+        )
 
         self.test_checkin = {
             "mContactNum": "0912345699",
@@ -132,6 +138,55 @@ class TestCheckInRecordRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
         self.assertEqual(response.json()["detail"], "打卡記錄不存在")
 
+    def test_7_check_in(self):
+        """測試入場判斷"""
+        # 測試不存在的會員
+        response = self.client.post(
+            "/checkinrecord/checkin/", json={"mContactNum": "9999999999"}
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["admitted"])
+        self.assertEqual(response.json()["reason"], "member_not_found")
+
+        # 測試沒有有效會籍的會員
+        Member.create_member(**{**self.test_member, "mContactNum": "0912345698"})
+        response = self.client.post(
+            "/checkinrecord/checkin/", json={"mContactNum": "0912345698"}
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["admitted"])
+        self.assertEqual(response.json()["reason"], "no_active_membership")
+
+        # 舊的入場 API 同樣需要有效會籍
+        response = self.client.post("/checkinrecord/", json={"mContactNum": "0912345698"})
+        ic(response.json())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "沒有有效會籍")
+
+        # 測試有效會籍的會員入場，再次入場時已有未結束的打卡記錄
+        Member.create_member(**{**self.test_member, "mContactNum": "0912345697"})
+        today = date.today()
+        MembershipStatus.create_membership_status("0912345697", today, today + timedelta(days=30))
+        response = self.client.post(
+            "/checkinrecord/checkin/", json={"mContactNum": "0912345697"}
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["admitted"])
+        self.assertEqual(response.json()["reason"], "admitted")
+        self.assertIsNotNone(response.json()["checkInNo"])
+
+        response = self.client.post(
+            "/checkinrecord/checkin/", json={"mContactNum": "0912345697"}
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["admitted"])
+        self.assertEqual(response.json()["reason"], "already_checked_in")
+        self.assertIsNone(response.json()["checkInNo"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,102 @@
+"""
+測試列表 API 的 ETag / 304 與回應壓縮
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import gzip
+import json
+import unittest
+from icecream import ic
+from gym_management.backend.database import get_connection
+from services import compression
+
+
+class TestConditionalGetRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """清空商品後建立足以壓縮的商品列表"""
+        conn = get_connection()
+        try:
+            conn.execute("DELETE FROM Product WHERE gsNo LIKE 'E%'")
+            conn.execute("DELETE FROM MembershipPlan WHERE gsNo = 'EP01'")
+            conn.executemany(
+                "INSERT INTO Product (gsNo, salePrice, pName) VALUES (?, ?, ?)",
+                [(f"E{i:03d}", 100 + i, f"測試商品{i}") for i in range(50)],
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def test_1_not_modified(self):
+        """測試資料沒有變更時返回 304"""
+        response = self.client.get("/products/")
+        etag = response.headers["ETag"]
+        ic(etag)
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get("/products/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["ETag"], etag)
+        # 強 ETag 形式也視為相同
+        response = self.client.get("/products/", headers={"If-None-Match": etag[2:]})
+        self.assertEqual(response.status_code, 304)
+
+        # 查詢參數不同時 ETag 不同
+        response = self.client.get("/products/", params={"fields": "gsNo"})
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_2_etag_changes_after_write(self):
+        """測試修改資料後 ETag 改變"""
+        etag = self.client.get("/products/").headers["ETag"]
+        self.client.put("/products/E000", json={"salePrice": 999, "pName": "改名商品"})
+
+        response = self.client.get("/products/", headers={"If-None-Match": etag})
+        ic(response.headers["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+        # 其他表格的修改不影響商品的 ETag
+        etag = response.headers["ETag"]
+        self.client.post(
+            "/membership_plans/",
+            json={"gsNo": "EP01", "salePrice": 1000, "planType": "月卡", "planDuration": 30},
+        )
+        response = self.client.get("/products/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_3_gzip(self):
+        """測試大的回應以 gzip 壓縮，小的回應不壓縮"""
+        with self.client.stream("GET", "/products/", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(int(response.headers["Content-Length"]), len(raw))
+        self.assertEqual(json.loads(gzip.decompress(raw)), self.client.get("/products/").json())
+
+        response = self.client.get("/", headers={"Accept-Encoding": "gzip"})
+        self.assertNotIn("Content-Encoding", response.headers)
+        response = self.client.get("/products/", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", response.headers)
+
+    @unittest.skipIf(compression.brotli is None, "沒有安裝 brotli")
+    def test_4_brotli(self):
+        """測試接受 br 時優先使用 Brotli"""
+        response = self.client.get("/products/", headers={"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertGreater(len(response.json()), 0)
+
+    def test_5_choose_encoding(self):
+        """測試 Accept-Encoding 解析"""
+        self.assertIsNone(compression.choose_encoding("gzip;q=0, identity"))
+        self.assertEqual(compression.choose_encoding("deflate, gzip;q=0.5"), "gzip")
+        self.assertIsNone(compression.choose_encoding(""))
+
+
+if __name__ == "__main__":
+    unittest.main()
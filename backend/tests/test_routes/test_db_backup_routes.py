@@ -0,0 +1,46 @@
+"""
+測試數據庫備份相關 API
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+
+
+class TestDbBackupRoutes(unittest.TestCase):
+
+    def setUp(self):
+        """設置測試客戶端"""
+        self.client = TestClient(app)
+
+    def test_1_create_backup(self):
+        """測試建立備份 API"""
+        response = self.client.post("/backups/", params={"pages": 8})
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["integrity"], "ok")
+        self.assertGreater(response.json()["steps"], 0)
+
+        names = [backup["name"] for backup in self.client.get("/backups/").json()]
+        self.assertIn(response.json()["name"], names)
+
+        metrics = self.client.get("/backups/metrics").json()
+        ic(metrics)
+        self.assertEqual(metrics["lastBackup"]["name"], response.json()["name"])
+
+    def test_2_restore_backup(self):
+        """測試還原備份 API"""
+        backups = self.client.get("/backups/").json()
+        response = self.client.post(f"/backups/{backups[0]['name']}/restore")
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "數據庫還原成功")
+
+        # 不存在的備份
+        response = self.client.post("/backups/not_exist.db/restore")
+        self.assertEqual(response.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+測試即時動態（SSE）API 與事件分送
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import asyncio
+import json
+import threading
+import time
+import unittest
+import httpx
+import uvicorn
+from icecream import ic
+from gym_management.backend.database import get_connection
+from services.event_stream import OVERFLOW, EventBroker, EventDict
+
+
+def read_sse(response: httpx.Response, count: int) -> list[tuple[str, dict]]:
+    """讀取 count 個 SSE 事件 [(事件, {id, data})]"""
+    events, current = [], {}
+    for line in response.iter_lines():
+        if line.startswith("id: "):
+            current["id"] = int(line[4:])
+        elif line.startswith("event: "):
+            current["event"] = line[7:]
+        elif line.startswith("data: "):
+            current["data"] = json.loads(line[6:])
+        elif line == "" and "event" in current:
+            events.append((current.pop("event"), current))
+            current = {}
+            if len(events) == count:
+                break
+    return events
+
+
+class TestEventRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """清空打卡記錄，建立測試會員，並以 uvicorn 啟動伺服器（串流需要真正的連線）"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM CheckInRecord")
+            cursor.execute("DELETE FROM Member WHERE mContactNum = '0955000000'")
+            cursor.execute(
+                """
+                INSERT INTO Member (mContactNum, mName, mEmail, mDob, mEmergencyName, mEmergencyNum)
+                VALUES ('0955000000', '動態會員', 'event@example.com', '1990-01-01', '緊急聯絡人', '0987654321')
+                """
+            )
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+        cls.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=0, lifespan="off", log_level="warning")
+        )
+        cls.thread = threading.Thread(target=cls.server.run, daemon=True)
+        cls.thread.start()
+        while not cls.server.started:
+            time.sleep(0.05)
+        port = cls.server.servers[0].sockets[0].getsockname()[1]
+        cls.base_url = f"http://127.0.0.1:{port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.should_exit = True
+        cls.thread.join(timeout=10)
+
+    def test_1_checkin_and_checkout(self):
+        """測試入場與登出事件，以及以 Last-Event-ID 補送漏掉的事件"""
+        with httpx.Client(base_url=self.base_url, timeout=10) as client:
+            with client.stream("GET", "/events/stream", params={"types": "checkin,checkout"}) as response:
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.headers["Content-Type"].startswith("text/event-stream"))
+                # 其他 worker（另一個連接）寫入的入場記錄由輪詢讀到
+                conn = get_connection()
+                try:
+                    conn.execute(
+                        "INSERT INTO CheckInRecord (mContactNum, checkInDatetime) VALUES ('0955000000', '2026-01-01 09:00:00')"
+                    )
+                    conn.commit()
+                finally:
+                    conn.close()
+                client.put("/checkinrecord/0955000000/")
+                events = read_sse(response, 2)
+            ic(events)
+            self.assertEqual([name for name, _ in events], ["checkin", "checkout"])
+            self.assertEqual(events[1][1]["data"]["checkOutStatus"], 1)
+            checkin_id, checkout_id = events[0][1]["id"], events[1][1]["id"]
+            self.assertLess(checkin_id, checkout_id)
+
+            # 重新連線時補送入場之後的事件
+            headers = {"Last-Event-ID": str(checkin_id)}
+            with client.stream("GET", "/events/stream", headers=headers) as response:
+                events = read_sse(response, 1)
+            self.assertEqual(events[0][0], "checkout")
+            self.assertEqual(events[0][1]["id"], checkout_id)
+
+    def test_2_invalid_types(self):
+        """測試不支援的事件"""
+        response = TestClient(app).get("/events/stream", params={"types": "refund"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestEventBroker(unittest.IsolatedAsyncioTestCase):
+
+    async def test_1_fan_out(self):
+        """測試數百個訂閱者都收到自己訂閱的事件"""
+        broker = EventBroker()
+        subscriptions = [
+            await broker.subscribe(frozenset({"sale"} if i % 2 else {"checkin", "sale"}))
+            for i in range(500)
+        ]
+        for i in range(100):
+            broker.publish(EventDict(id=i, type="checkin" if i % 4 == 0 else "sale", data={}))
+        self.assertEqual(subscriptions[0].queue.qsize(), 100)
+        self.assertEqual(subscriptions[1].queue.qsize(), 75)
+        self.assertEqual(broker.dropped, 0)
+
+        for subscription in subscriptions:
+            broker.unsubscribe(subscription)
+        await asyncio.sleep(0.01)
+        self.assertEqual(broker.subscriber_count, 0)
+        self.assertIsNone(broker.version)
+
+    async def test_2_overflow(self):
+        """測試跟不上的訂閱者被中斷，不影響其他訂閱者"""
+        broker = EventBroker(queue_size=5)
+        slow = await broker.subscribe(frozenset({"checkin"}))
+        fast = await broker.subscribe(frozenset({"checkin"}))
+        for i in range(8):
+            broker.publish(EventDict(id=i, type="checkin", data={}))
+            if not fast.queue.empty():
+                fast.queue.get_nowait()
+
+        self.assertEqual(broker.dropped, 1)
+        self.assertEqual(broker.subscriber_count, 1)
+        self.assertEqual(slow.queue.qsize(), 1)
+        self.assertIs(slow.queue.get_nowait(), OVERFLOW)
+        broker.unsubscribe(fast)
+
+
+if __name__ == "__main__":
+    unittest.main()
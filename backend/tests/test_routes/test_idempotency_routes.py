@@ -0,0 +1,134 @@
+"""
+測試 Idempotency-Key（重複送出的 POST 只執行一次）
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+from gym_management.backend.database import get_connection
+from services.idempotency import fingerprint_request, prune_idempotency_keys, response_cache
+
+
+class TestIdempotencyRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """建立測試會員與商品"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM IdempotencyKey")
+            cursor.execute("DELETE FROM TransactionRecord WHERE mContactNum = '0966000000'")
+            cursor.execute("DELETE FROM Member WHERE mContactNum = '0966000000'")
+            cursor.execute("DELETE FROM Product WHERE gsNo = 'I001'")
+            cursor.execute(
+                """
+                INSERT INTO Member (mContactNum, mName, mEmail, mDob, mEmergencyName, mEmergencyNum)
+                VALUES ('0966000000', '重送會員', 'idem@example.com', '1990-01-01', '緊急聯絡人', '0987654321')
+                """
+            )
+            cursor.execute("INSERT INTO Product (gsNo, salePrice, pName) VALUES ('I001', 300, '測試商品')")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+    def setUp(self):
+        self.client = TestClient(app)
+        self.transaction = {
+            "mContactNum": "0966000000",
+            "gsNo": "I001",
+            "count": 1,
+            "unitPrice": 300,
+            "discount": 1.0,
+            "paymentMethod": "cash",
+        }
+
+    def count_transactions(self) -> int:
+        conn = get_connection()
+        try:
+            return conn.execute(
+                "SELECT COUNT(*) FROM TransactionRecord WHERE mContactNum = '0966000000'"
+            ).fetchone()[0]
+        finally:
+            conn.close()
+
+    def post(self, key: str, json: dict, path: str = "/transaction_records/"):
+        response = self.client.post(path, json=json, headers={"Idempotency-Key": key})
+        ic(response.status_code, response.json())
+        return response
+
+    def test_1_replay(self):
+        """測試相同的 key 重送只建立一筆交易，返回第一次的回應"""
+        before = self.count_transactions()
+        first = self.post("key-1", self.transaction)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+
+        # 記憶體快取與數據庫各重送一次
+        replays = [self.post("key-1", self.transaction)]
+        response_cache.clear()
+        replays.append(self.post("key-1", self.transaction))
+        for replay in replays:
+            self.assertEqual(replay.status_code, 200)
+            self.assertEqual(replay.json(), first.json())
+            self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(self.count_transactions(), before + 1)
+
+        # 不同的 key、沒有 key 照常建立
+        self.post("key-2", self.transaction)
+        self.client.post("/transaction_records/", json=self.transaction)
+        self.assertEqual(self.count_transactions(), before + 3)
+
+    def test_2_mismatch_and_errors(self):
+        """測試相同的 key 用於不同的請求返回 422，錯誤回應同樣只執行一次"""
+        self.post("key-3", self.transaction)
+        response = self.post("key-3", {**self.transaction, "count": 2})
+        self.assertEqual(response.status_code, 422)
+        response = self.post("key-3", {"mContactNum": "0966000000"}, "/checkinrecord/")
+        self.assertEqual(response.status_code, 422)
+
+        # 400 回應記錄後重送返回相同的錯誤
+        missing = {**self.transaction, "mContactNum": "0966999999"}
+        first = self.post("key-4", missing)
+        self.assertEqual(first.status_code, 400)
+        replay = self.post("key-4", missing)
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay.headers["Idempotent-Replayed"], "true")
+
+        self.assertEqual(self.post("x" * 256, self.transaction).status_code, 400)
+
+    def test_3_in_progress(self):
+        """測試第一次的請求處理中時返回 409，處理中太久的記錄由下一次請求接手"""
+        body = TestClient(app).build_request("POST", "/transaction_records/", json=self.transaction).content
+        fingerprint = fingerprint_request("POST", "/transaction_records/", b"", body)
+        conn = get_connection()
+        try:
+            conn.execute(
+                "INSERT INTO IdempotencyKey (idemKey, fingerprint) VALUES ('key-5', ?)", (fingerprint,)
+            )
+            conn.execute(
+                "INSERT INTO IdempotencyKey (idemKey, fingerprint, createdAt) VALUES ('key-6', ?, '2000-01-01 00:00:00')",
+                (fingerprint,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+        before = self.count_transactions()
+        self.assertEqual(self.post("key-5", self.transaction).status_code, 409)
+        self.assertEqual(self.post("key-6", self.transaction).status_code, 200)
+        self.assertEqual(self.count_transactions(), before + 1)
+
+    def test_4_prune(self):
+        """測試清除過期的記錄"""
+        self.post("key-7", self.transaction)
+        self.assertEqual(prune_idempotency_keys(), 0)
+        self.assertGreater(prune_idempotency_keys(ttl_hours=-1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
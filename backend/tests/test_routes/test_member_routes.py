@@ -67,6 +67,23 @@ class TestMemberRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json(), list)
 
+    def test_4_get_member_profile(self):
+        """測試查詢會員總覽 API"""
+        response = self.client.get(
+            f"/members/{self.test_member['mContactNum']}/profile"
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["member"]["mName"], self.test_member["mName"])
+        self.assertIn("membershipStatus", data)
+        self.assertIn("openCheckIn", data)
+        self.assertIsInstance(data["recentTransactions"], list)
+
+        # 測試查詢不存在會員的總覽
+        response = self.client.get("/members/9999999999/profile")
+        self.assertEqual(response.status_code, 404)
+
     def test_4_update_member(self):
         """測試更新會員資料 API"""
         update_data = {"mEmail": "updated@example.com", "mBalance": 2000}
@@ -100,7 +117,9 @@ class TestMemberRoutes(unittest.TestCase):
         # 測試刪除會員
         response = self.client.delete(f"/members/{self.test_member['mContactNum']}/")
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.json(), {"message": "會員刪除成功"})
+        self.assertEqual(response.json()["message"], "會員刪除成功")
+        # 相關記錄分批刪除，回應附上刪除工作的編號
+        self.assertIn("jobId", response.json())
 
         # 確認會員已被刪除
         response = self.client.get(f"/members/{self.test_member['mContactNum']}/")
@@ -0,0 +1,100 @@
+"""
+測試會員搜尋 API
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+from gym_management.backend.database import get_connection
+from models.member import Member
+
+
+class TestMemberSearchRoutes(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """清理數據庫後建立測試會員"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            cursor.execute("DELETE FROM OrderTable")
+            cursor.execute("DELETE FROM MembershipStatus")
+            cursor.execute("DELETE FROM CheckInRecord")
+            cursor.execute("DELETE FROM Member")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+        for mContactNum, mName, mEmail in (
+            ("0912345678", "王小明", "ming@example.com"),
+            ("0912345000", "陳美華", "mei@example.com"),
+            ("0933005678", "Alice Chen", "alice@fitopia.tw"),
+        ):
+            Member.create_member(
+                mContactNum=mContactNum,
+                mName=mName,
+                mEmail=mEmail,
+                mDob="1990-01-01",
+                mEmergencyName="緊急聯絡人",
+                mEmergencyNum="0987654321",
+            )
+
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def search(self, q: str, **params) -> list[dict]:
+        response = self.client.get("/members/search/", params={"q": q, **params})
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_1_phone(self):
+        """測試以電話前幾碼或其中幾碼搜尋"""
+        results = self.search("0912-345")
+        self.assertEqual([r["mContactNum"] for r in results], ["0912345000", "0912345678"])
+        self.assertEqual({r["matchType"] for r in results}, {"phone_prefix"})
+
+        # 前綴相符的排在其他包含的前面
+        results = self.search("5678")
+        self.assertEqual({r["mContactNum"] for r in results}, {"0912345678", "0933005678"})
+        self.assertEqual({r["matchType"] for r in results}, {"substring"})
+
+        self.assertEqual(len(self.search("0912", limit=1)), 1)
+
+    def test_2_name_and_email(self):
+        """測試以姓名或電子郵件搜尋"""
+        self.assertEqual([r["mName"] for r in self.search("小明")], ["王小明"])
+        self.assertEqual([r["mName"] for r in self.search("fitopia")], ["Alice Chen"])
+        self.assertEqual([r["mName"] for r in self.search("alice chen")], ["Alice Chen"])
+        self.assertEqual(self.search('"'), [])
+
+    def test_3_fuzzy(self):
+        """測試姓名打錯一個字也能找到"""
+        results = self.search("王小名")
+        self.assertEqual([r["mName"] for r in results], ["王小明"])
+        self.assertEqual(results[0]["matchType"], "fuzzy")
+        self.assertEqual(self.search("Alise")[0]["mName"], "Alice Chen")
+
+    def test_4_index_follows_member_changes(self):
+        """測試會員資料修改或刪除後搜尋結果跟著更新"""
+        Member.update_member("0912345678", mName="王大明")
+        self.assertEqual([r["mName"] for r in self.search("大明")], ["王大明"])
+        self.assertEqual(self.search("小明")[0]["matchType"], "fuzzy")
+
+        Member.delete_member("0912345000")
+        self.assertEqual(self.search("陳美華"), [])
+
+    def test_5_validation(self):
+        """測試參數驗證"""
+        response = self.client.get("/members/search/", params={"q": ""})
+        self.assertEqual(response.status_code, 422)
+        response = self.client.get("/members/search/", params={"q": "王", "limit": 1000})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
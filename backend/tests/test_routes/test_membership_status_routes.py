@@ -8,6 +8,7 @@ import unittest
 from icecream import ic
 from gym_management.backend.database import get_connection
 from models.member import Member
+from models.membership_plan import MembershipPlan
 from datetime import date, timedelta
 
 
@@ -179,6 +180,50 @@ class TestMembershipStatusRoutes(unittest.TestCase):
         # self.assertEqual(response.status_code, 404)
         # self.assertEqual(response.json()["detail"], "會籍狀態不存在")
 
+    def test_6_purchase_membership_plan(self):
+        """測試購買會籍方案 API"""
+        MembershipPlan.create_membership_plan(
+            gsNo="MTEST", salePrice=1500, planType="月費會員", planDuration=1
+        )
+        purchase_data = {
+            "mContactNum": self.test_member["mContactNum"],
+            "gsNo": "MTEST",
+            "paymentMethod": "cash",
+            "startDate": self.today.isoformat(),
+        }
+
+        # 沒有有效會籍時建立新會籍
+        response = self.client.post("/membership_status/purchase/", json=purchase_data)
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["message"], "會籍方案購買成功")
+        first_end = response.json()["endDate"]
+
+        # 會籍仍有效時延長結束日期
+        response = self.client.post("/membership_status/purchase/", json=purchase_data)
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.json()["endDate"], first_end)
+
+        # 回饋點數不足
+        purchase_data["paymentMethod"] = "reward_points"
+        response = self.client.post("/membership_status/purchase/", json=purchase_data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "回饋點數不足")
+
+        # 會籍方案不存在
+        purchase_data["gsNo"] = "M999"
+        response = self.client.post("/membership_status/purchase/", json=purchase_data)
+        self.assertEqual(response.status_code, 404)
+
+        # 會員不存在
+        purchase_data.update(gsNo="MTEST", mContactNum="0999999990")
+        response = self.client.post("/membership_status/purchase/", json=purchase_data)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()["detail"], "會員不存在")
+
+        MembershipPlan.delete_membership_plan("MTEST")
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=2)
@@ -65,6 +65,17 @@ class TestProductRoutes(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertIsInstance(response.json(), list)
 
+    def test_3_1_get_all_products_fields(self):
+        """測試查詢所有商品 API 只返回指定欄位"""
+        response = self.client.get("/products/", params={"fields": "pName,gsNo,salePrice"})
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        for product in response.json():
+            self.assertEqual(list(product), ["gsNo", "salePrice", "pName"])
+
+        response = self.client.get("/products/", params={"fields": "gsNo,password"})
+        self.assertEqual(response.status_code, 400)
+
     def test_4_update_product(self):
         """測試更新商品 API"""
         update_data = {"pName": "更新商品", "salePrice": 150}
@@ -0,0 +1,37 @@
+"""
+測試數據庫結構版本 API
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+from gym_management.backend.database import create_all_tables
+import unittest
+from icecream import ic
+
+
+class TestSchemaRoutes(unittest.TestCase):
+
+    def setUp(self):
+        """設置測試客戶端"""
+        self.client = TestClient(app)
+
+    def test_1_get_schema_migrations(self):
+        """測試查詢結構版本 API"""
+        self.assertTrue(create_all_tables())
+
+        response = self.client.get("/schema/migrations")
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["pending"], [])
+        self.assertGreaterEqual(response.json()["version"], 4)
+
+        # 已是最新版本時再次執行不會套用任何遷移
+        self.assertTrue(create_all_tables())
+        self.assertEqual(
+            response.json()["applied"],
+            self.client.get("/schema/migrations").json()["applied"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
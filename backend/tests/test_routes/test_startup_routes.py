@@ -0,0 +1,35 @@
+"""
+測試應用程式啟動與 /health API
+"""
+
+from fastapi.testclient import TestClient
+from gym_management.backend.main import app
+import unittest
+from icecream import ic
+
+
+class TestStartupRoutes(unittest.TestCase):
+
+    def test_1_health_after_startup(self):
+        """測試啟動完成後 /health 回報結構版本與耗時"""
+        # 使用 with 才會執行 lifespan 啟動流程
+        with TestClient(app) as client:
+            response = client.get("/health")
+            ic(response.json())
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()["ready"])
+            self.assertGreaterEqual(response.json()["schemaVersion"], 4)
+            self.assertGreater(response.json()["totalMs"], 0)
+
+    def test_2_request_id_header(self):
+        """測試回應帶回呼叫端的 X-Request-ID，未提供時自動產生"""
+        with TestClient(app) as client:
+            response = client.get("/", headers={"X-Request-ID": "test-request-1"})
+            self.assertEqual(response.headers["X-Request-ID"], "test-request-1")
+            response = client.get("/")
+            ic(response.headers["X-Request-ID"])
+            self.assertTrue(response.headers["X-Request-ID"])
+
+
+if __name__ == "__main__":
+    unittest.main()
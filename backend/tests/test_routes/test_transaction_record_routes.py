@@ -138,6 +138,14 @@ class TestTransactionRecordRoutes(unittest.TestCase):
         # 驗證返回的是列表
         self.assertIsInstance(response.json(), list)
 
+        # 只返回指定欄位（不含排序用的 transDateTime）
+        response = self.client.get("/transaction_records/", params={"fields": "tNo,totalAmount"})
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        records = response.json()
+        self.assertGreaterEqual(len(records), 2)
+        self.assertEqual({tuple(record) for record in records}, {("tNo", "totalAmount")})
+
     def test_3_get_member_transaction_record(self):
         """測試查詢會員所有交易記錄 API"""
         # 先創建兩筆交易
@@ -167,6 +175,27 @@ class TestTransactionRecordRoutes(unittest.TestCase):
             self.assertIn("discount", transaction)
             self.assertIn("paymentMethod", transaction)
 
+    def test_3_1_get_member_transaction_record_by_date(self):
+        """測試依日期範圍查詢會員交易記錄 API"""
+        self.client.post("/transaction_records/", json=self.test_transaction1)
+
+        today = datetime.now(pytz.timezone("Asia/Taipei")).date().isoformat()
+        response = self.client.get(
+            f"/transaction_records/member/{self.test_member['mContactNum']}/",
+            params={"start_date": today},
+        )
+        ic(response.json())
+        self.assertEqual(response.status_code, 200)
+        for transaction in response.json():
+            self.assertGreaterEqual(transaction["transDateTime"][:10], today)
+
+        # 範圍內沒有交易
+        response = self.client.get(
+            f"/transaction_records/member/{self.test_member['mContactNum']}/",
+            params={"start_date": "2000-01-01", "end_date": "2000-12-31"},
+        )
+        self.assertEqual(response.status_code, 404)
+
     def test_5_update_transaction_record(self):
         """測試更新交易記錄 API"""
         # 先創建一筆交易
@@ -241,6 +270,29 @@ class TestTransactionRecordRoutes(unittest.TestCase):
         ic(response.json())
         self.assertEqual(response.status_code, 404)
 
+    def test_7_create_errors(self):
+        """測試回饋點數不足返回 400，商品不存在返回 404"""
+        points = Member.get_member("0912345699")["mRewardPoints"]
+        transaction_data = {
+            "mContactNum": "0912345699",
+            "gsNo": "P001",
+            "count": 1,
+            "unitPrice": points + 1,
+            "discount": 1.0,
+            "paymentMethod": PaymentMethod.REWARD_POINTS,
+        }
+        response = self.client.post("/transaction_records/", json=transaction_data)
+        ic(response.json())
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["detail"], "回饋點數不足")
+        self.assertEqual(Member.get_member("0912345699")["mRewardPoints"], points)
+
+        transaction_data["gsNo"] = "X999"
+        transaction_data["paymentMethod"] = PaymentMethod.CASH
+        response = self.client.post("/transaction_records/", json=transaction_data)
+        ic(response.json())
+        self.assertEqual(response.status_code, 404)
+
     @classmethod
     def tearDownClass(cls):
         """在所有測試結束後清理數據"""
@@ -0,0 +1,328 @@
+"""
+測試儲存後端一致性：同一組測試分別在 SQLite 與 PostgreSQL 上執行
+
+PostgreSQL 測試以本機的 initdb / pg_ctl（GYM_PG_BIN 或 PATH）在暫存目錄啟動伺服器，
+沒有安裝 PostgreSQL 或 psycopg 時略過。
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import os
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from gym_management.backend.database import get_connection
+from storage.repositories import (
+    CheckInRepository,
+    LedgerRepository,
+    MemberRepository,
+    MembershipPlanRepository,
+    MembershipStatusRepository,
+    ProductRepository,
+    TransactionRepository,
+)
+from storage.sqlite import SQLiteStorage
+from storage import postgres
+
+from icecream import ic
+
+TEST_MEMBER = {
+    "mContactNum": "0912345699",
+    "mName": "測試會員",
+    "mEmail": "test@example.com",
+    "mDob": "1990-01-01",
+    "mEmergencyName": "緊急聯絡人",
+    "mEmergencyNum": "0987654321",
+    "mBalance": 1000,
+    "mRewardPoints": 100,
+}
+
+
+class StorageConformance:
+    """兩種後端共用的測試，子類別在 setUpClass 中設定 cls.storage"""
+
+    storage = None
+
+    @classmethod
+    def seed(cls):
+        """建立測試會員、今天有效的會籍與商品"""
+        cls.members = MemberRepository(cls.storage)
+        cls.checkins = CheckInRepository(cls.storage)
+        cls.transactions = TransactionRepository(cls.storage)
+        cls.memberships = MembershipStatusRepository(cls.storage)
+        cls.ledger = LedgerRepository(cls.storage)
+        cls.products = ProductRepository(cls.storage)
+        cls.plans = MembershipPlanRepository(cls.storage)
+
+        cls.members.create(TEST_MEMBER)
+        today = date.today()
+        with cls.storage.transaction() as session:
+            session.execute(
+                "INSERT INTO MembershipStatus (mContactNum, startDate, endDate, isActive) VALUES (?, ?, ?, 1)",
+                (
+                    TEST_MEMBER["mContactNum"],
+                    (today - timedelta(days=30)).isoformat(),
+                    (today + timedelta(days=30)).isoformat(),
+                ),
+            )
+            session.execute(
+                "INSERT INTO Product (gsNo, salePrice, pName) VALUES ('P001', 500, '運動毛巾')"
+            )
+
+    def test_1_create_and_get_member(self):
+        """測試新增與查詢會員"""
+        member = self.members.get(TEST_MEMBER["mContactNum"])
+        ic(member)
+        self.assertEqual(member["mName"], "測試會員")
+        self.assertEqual(member["mDob"], "1990-01-01")
+        self.assertEqual(member["creation_date"], date.today().isoformat())
+        self.assertIsNone(self.members.get("0900000000"))
+
+        result = self.members.create(TEST_MEMBER)
+        self.assertEqual(result.get("error"), "會員已存在")
+
+    def test_2_update_member(self):
+        """測試更新會員"""
+        result = self.members.update(TEST_MEMBER["mContactNum"], {"mName": "新名字", "mEmail": None})
+        self.assertEqual(result.get("message"), "會員資料更新成功")
+        member = self.members.get(TEST_MEMBER["mContactNum"])
+        self.assertEqual(member["mName"], "新名字")
+        self.assertEqual(member["mEmail"], "test@example.com")
+
+        self.assertIn("error", self.members.update(TEST_MEMBER["mContactNum"], {"creation_date": "2024-01-01"}))
+        self.assertEqual(self.members.update("0900000000", {"mName": "x"}).get("error"), "會員不存在")
+
+    def test_3_check_in(self):
+        """測試入場判斷"""
+        result = self.checkins.check_in(TEST_MEMBER["mContactNum"], "2030-01-01 09:00:00")
+        ic(result)
+        # 會籍期間以 now 的日期判斷
+        self.assertEqual(result["reason"], "no_active_membership")
+
+        result = self.checkins.check_in(TEST_MEMBER["mContactNum"])
+        self.assertTrue(result["admitted"])
+        self.assertIsInstance(result["checkInNo"], int)
+
+        result = self.checkins.check_in(TEST_MEMBER["mContactNum"])
+        self.assertEqual(result["reason"], "already_checked_in")
+        self.assertEqual(self.checkins.check_in("0900000000")["reason"], "member_not_found")
+
+    def test_4_check_out(self):
+        """測試退場"""
+        records = self.checkins.list_for_member(TEST_MEMBER["mContactNum"])
+        self.assertEqual(len(records), 1)
+        check_out_time = f"{records[0]['checkInDatetime'][:10]} 23:59:59"
+
+        result = self.checkins.check_out(TEST_MEMBER["mContactNum"], check_out_time)
+        self.assertEqual(result.get("message"), "打卡記錄更新成功")
+        record = self.checkins.list_for_member(TEST_MEMBER["mContactNum"])[0]
+        self.assertEqual(record["checkOutDatetime"], check_out_time)
+        self.assertEqual(record["checkOutStatus"], 1)
+
+        result = self.checkins.check_out(TEST_MEMBER["mContactNum"])
+        self.assertEqual(result.get("error"), "該記錄已經登出")
+        self.assertEqual(self.checkins.check_out("0900000000").get("error"), "打卡記錄不存在")
+
+    def test_5_create_transaction(self):
+        """測試新增交易記錄"""
+        transaction = {
+            "mContactNum": TEST_MEMBER["mContactNum"],
+            "gsNo": "P001",
+            "count": 3,
+            "unitPrice": 500,
+            "discount": 0.9,
+            "paymentMethod": "cash",
+        }
+        result = self.transactions.create(transaction, "2030-01-01 10:00:00")
+        ic(result)
+        self.assertEqual(result.get("message"), "交易記錄創建成功")
+
+        records = self.transactions.list_for_member(TEST_MEMBER["mContactNum"])
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["tNo"], int(result["tNo"]))
+        self.assertEqual(records[0]["transDateTime"], "2030-01-01 10:00:00")
+        self.assertEqual(records[0]["totalAmount"], 1350)
+        self.assertEqual(records[0]["discount"], 0.9)
+
+        self.assertEqual(
+            self.transactions.create({**transaction, "gsNo": "X999"}).get("error"),
+            "商品或會籍方案不存在",
+        )
+        self.assertIn("error", self.transactions.create({**transaction, "paymentMethod": "bitcoin"}))
+
+    def test_6_stream_all(self):
+        """測試分批讀取所有記錄"""
+        for i in range(25):
+            self.members.create({**TEST_MEMBER, "mContactNum": f"09500000{i:02d}"})
+
+        members = list(self.members.iter_all(batch_size=7))
+        numbers = [member["mContactNum"] for member in members]
+        self.assertEqual(len(members), 26)
+        self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(list(self.checkins.iter_all(batch_size=7))), 1)
+        self.assertEqual(len(list(self.transactions.iter_all(batch_size=7))), 1)
+
+    def test_7_delete_member(self):
+        """測試刪除會員：有相關記錄時不能刪除"""
+        result = self.members.delete(TEST_MEMBER["mContactNum"])
+        self.assertEqual(result.get("error"), "會員仍有相關記錄，無法刪除")
+        self.assertIsNotNone(self.members.get(TEST_MEMBER["mContactNum"]))
+
+        self.assertEqual(self.members.delete("0950000000").get("message"), "會員刪除成功")
+        self.assertEqual(self.members.delete("0950000000").get("error"), "會員不存在")
+
+    def test_8_concurrent_check_in(self):
+        """測試同一位會員同時入場只會成功一次"""
+        self.checkins.check_out(TEST_MEMBER["mContactNum"])
+        with ThreadPoolExecutor(8) as pool:
+            results = list(
+                pool.map(lambda _: self.checkins.check_in(TEST_MEMBER["mContactNum"]), range(16))
+            )
+        ic(results)
+        self.assertEqual(sum(result["admitted"] for result in results), 1)
+
+    def test_9_read_during_write(self):
+        """測試查詢使用唯讀交易：其他交易持有寫入鎖時不需等待，也不能寫入"""
+        with self.storage.transaction() as session:
+            session.execute(
+                "UPDATE Member SET mName = mName WHERE mContactNum = ?",
+                (TEST_MEMBER["mContactNum"],),
+            )
+            started = time.perf_counter()
+            member = self.members.get(TEST_MEMBER["mContactNum"])
+            records = self.checkins.list_for_member(TEST_MEMBER["mContactNum"])
+            elapsed = time.perf_counter() - started
+        ic(elapsed)
+        self.assertIsNotNone(member)
+        self.assertEqual(len(records), 2)
+        self.assertLess(elapsed, 1)
+
+        with self.assertRaises(self.storage.Error):
+            with self.storage.read() as session:
+                session.execute("DELETE FROM CheckInRecord")
+        self.assertEqual(len(self.checkins.list_for_member(TEST_MEMBER["mContactNum"])), 2)
+
+    def test_10_memberships(self):
+        """測試會籍的新增與查詢"""
+        today = date.today()
+        active = self.memberships.active_on(TEST_MEMBER["mContactNum"], today.isoformat())
+        ic(active)
+        self.assertEqual(active["mContactNum"], TEST_MEMBER["mContactNum"])
+        self.assertIsNone(self.memberships.active_on(TEST_MEMBER["mContactNum"], "2031-01-01"))
+
+        result = self.memberships.create(TEST_MEMBER["mContactNum"], "2031-01-01", "2031-12-31")
+        self.assertEqual(result.get("message"), "會籍狀態創建成功")
+        self.assertEqual(
+            self.memberships.active_on(TEST_MEMBER["mContactNum"], "2031-06-01")["sId"],
+            int(result["sId"]),
+        )
+        self.assertEqual(len(self.memberships.list_for_member(TEST_MEMBER["mContactNum"])), 2)
+        self.assertEqual(
+            self.memberships.create(TEST_MEMBER["mContactNum"], "2031-01-01", "2030-01-01").get("error"),
+            "結束日期必須晚於開始日期",
+        )
+        self.assertEqual(
+            self.memberships.create("0900000000", "2031-01-01", "2031-12-31").get("error"),
+            "會員不存在",
+        )
+
+    def test_11_ledger(self):
+        """測試會員帳本：原子變動、不可為負數、記錄變動後的值"""
+        result = self.ledger.apply_delta(TEST_MEMBER["mContactNum"], "balance", -300, "測試")
+        ic(result)
+        self.assertEqual(result.get("balance"), "700")
+        self.assertEqual(
+            self.ledger.apply_delta(TEST_MEMBER["mContactNum"], "reward_points", -101).get("error"),
+            "回饋點數不足",
+        )
+        self.assertEqual(self.ledger.apply_delta("0900000000", "balance", 1).get("error"), "會員不存在")
+        self.assertEqual(self.members.get(TEST_MEMBER["mContactNum"])["mBalance"], 700)
+
+        entries = self.ledger.list_for_member(TEST_MEMBER["mContactNum"])
+        self.assertEqual(len(entries), 1)
+        self.assertEqual((entries[0]["delta"], entries[0]["balanceAfter"]), (-300, 700))
+
+    def test_12_products_and_plans(self):
+        """測試商品與會籍方案"""
+        self.assertEqual(self.products.get("P001")["pName"], "運動毛巾")
+        self.assertEqual(
+            self.products.create({"gsNo": "P002", "salePrice": 300, "pName": "水壺"}).get("message"),
+            "商品創建成功",
+        )
+        self.assertIn("error", self.products.create({"gsNo": "P002", "salePrice": 300, "pName": "水壺"}))
+        self.assertEqual([p["gsNo"] for p in self.products.iter_all(batch_size=1)], ["P001", "P002"])
+        self.assertEqual(self.products.delete("P002").get("message"), "商品刪除成功")
+        self.assertEqual(self.products.delete("P002").get("error"), "商品不存在")
+
+        plan = {"gsNo": "M001", "salePrice": 1000, "planType": "月費會員", "planDuration": 1}
+        self.assertEqual(self.plans.create(plan).get("message"), "會籍方案創建成功")
+        self.assertEqual(self.plans.get("M001"), plan)
+        self.assertIn("error", self.plans.create({**plan, "planDuration": 0}))
+        self.assertEqual(len(list(self.plans.iter_all())), 1)
+
+
+class TestSQLiteStorage(StorageConformance, unittest.TestCase):
+    """SQLite 後端（測試數據庫）"""
+
+    @classmethod
+    def setUpClass(cls):
+        """清空相關表格後建立測試資料"""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("PRAGMA foreign_keys = OFF")
+            for table in (
+                "MemberLedger",
+                "TransactionRecord",
+                "CheckInRecord",
+                "MembershipStatus",
+                "MemberPhoto",
+                "Product",
+                "MembershipPlan",
+                "Member",
+            ):
+                cursor.execute(f"DELETE FROM {table}")
+            conn.commit()
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+            conn.commit()
+            conn.close()
+
+        cls.storage = SQLiteStorage()
+        cls.seed()
+
+    def test_13_create_schema_only_for_main_database(self):
+        """測試分店等其他數據庫不能以 create_schema 建立結構"""
+        with self.assertRaises(ValueError):
+            SQLiteStorage(Path("/tmp/other.db")).create_schema()
+
+
+@unittest.skipIf(postgres.psycopg is None, "沒有安裝 psycopg / psycopg_pool")
+@unittest.skipIf(postgres.find_postgres_bin() is None, "找不到 PostgreSQL（設定 GYM_PG_BIN）")
+@unittest.skipIf(hasattr(os, "geteuid") and os.geteuid() == 0, "PostgreSQL 不能以 root 執行")
+class TestPostgresStorage(StorageConformance, unittest.TestCase):
+    """PostgreSQL 後端（暫存目錄中的本機伺服器）"""
+
+    @classmethod
+    def setUpClass(cls):
+        """啟動伺服器、建立結構與測試資料"""
+        cls.server = postgres.LocalPostgres()
+        cls.server.start()
+        cls.storage = postgres.PostgresStorage(cls.server.url, pool_size=8)
+        cls.storage.create_schema()
+        cls.seed()
+
+    @classmethod
+    def tearDownClass(cls):
+        """關閉連接池並停止伺服器"""
+        cls.storage.close()
+        cls.server.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
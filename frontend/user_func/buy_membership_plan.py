@@ -10,9 +10,8 @@ from typing import Optional, Dict, Any
 
 
 from views.membership_plan import get_all_membership_plans
-from views.member import search_member
-from views.membership_status import get_membership_status, create_membership_status
-from views.transaction_record import create_transaction
+from views.membership_status import purchase_membership_plan
+from utils.api import get_cached_member_profile
 
 
 def display_available_plans_df(membership_plans: list) -> pd.DataFrame:
@@ -43,28 +42,21 @@ def display_selected_plan(df: pd.DataFrame, membership_plan: str) -> None:
 
 
 def handle_payment_method(member: Dict[str, Any], plan_price: int) -> Optional[str]:
-    """處理付款方式選擇"""
+    """處理付款方式選擇（會籍方案不能以會員點數（儲值餘額）購買）"""
     payment_methods = {
         "現金": "cash",
         "信用卡": "credit_card",
         "轉帳": "e_transfer",
         "回饋點數": "reward_points",
-        "會員點數": "member_points",
     }
 
     selected = st.selectbox("付款方式", list(payment_methods.keys()))
     payment_method = payment_methods[selected]
 
-    if payment_method in ["reward_points", "member_points"]:
-        points_field = (
-            "mRewardPoints" if payment_method == "reward_points" else "mBalance"
-        )
-        if member[points_field] < plan_price:
-            st.error(
-                f"{'回饋點數' if payment_method == 'reward_points' else '會員點數'} 不足"
-            )
-            st.write(f"目前點數: {member[points_field]}")
-            return None
+    if payment_method == "reward_points" and member["mRewardPoints"] < plan_price:
+        st.error("回饋點數 不足")
+        st.write(f"目前點數: {member['mRewardPoints']}")
+        return None
 
     return payment_method
 
@@ -79,7 +71,7 @@ def buy_membership_plan_page():
     4. 選擇要購買的會籍方案
     5. 確認付款方式
     6. 確認購買
-    7. 建立交易紀錄
+    7. 建立交易紀錄與會籍狀態 (後端同一交易)
     """
 
     st.title("會籍方案購買")
@@ -111,12 +103,15 @@ def buy_membership_plan_page():
 
     # 2. 確認會員存在
     if st.checkbox("搜尋該會員是否存在", key="search_member_button"):
-        member = search_member(phone_number)
+        # 一次取得會員資料與目前會籍
+        profile = get_cached_member_profile(phone_number)
 
-        if member is None:
+        if profile is None:
             st.warning("該會員不存在")
             return
 
+        member = profile["member"]
+
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("3. 會員資料:")
@@ -124,8 +119,10 @@ def buy_membership_plan_page():
 
         with col2:
             st.subheader("4. 會員目前會籍:")
-            membership_status = get_membership_status(member["mContactNum"])
-            if membership_status is not None:
+            membership_status = profile["membershipStatus"]
+            if membership_status is None:
+                st.warning("該會員目前沒有, 有效會籍")
+            else:
 
                 # 4. 顯示會籍狀態
                 status_df = pd.DataFrame(
@@ -183,17 +180,6 @@ def buy_membership_plan_page():
         with col3:
             st.subheader("7. 建立交易紀錄")
             if payment_method is not None:
-                # 7. 建立交易紀錄
-                transaction_data = {
-                    "mContactNum": str(member["mContactNum"]),
-                    "gsNo": str(membership_plan),  # M003
-                    "count": int(1),
-                    "unitPrice": int(
-                        df[df["gsNo"] == membership_plan]["salePrice"].values[0]
-                    ),
-                    "discount": float(1),
-                    "paymentMethod": str(payment_method),
-                }
                 st.write(f"會員號碼: {member['mContactNum']}")
                 st.write(f"會籍方案編號: {membership_plan}")
                 st.write(f"數量: {1}")
@@ -207,21 +193,17 @@ def buy_membership_plan_page():
                 st.subheader("8. 確認購買")
                 if st.toggle("確認購買"):
                     if st.button("購買"):
-                        if create_transaction(transaction_data):
-
-                            # 交易成功之後再建立新會籍狀態
-                            membership_status = {
+                        # 交易記錄與會籍狀態由後端一次建立
+                        result = purchase_membership_plan(
+                            {
                                 "mContactNum": str(member["mContactNum"]),
+                                "gsNo": str(membership_plan),
+                                "paymentMethod": str(payment_method),
                                 "startDate": str(start_date),
-                                "endDate": str(end_date),
-                                "isActive": True,
                             }
-                            if create_membership_status(membership_status):
-                                st.success("交易建立成功")
-                                st.success("會籍狀態建立成功")
-                                st.warning("請重新整理頁面")
-                            else:
-                                st.error("會籍狀態建立失敗, 查看是否已存在有效會籍")
-
-                        else:
-                            st.error("交易建立失敗")
+                        )
+                        if result is not None:
+                            st.success("交易建立成功")
+                            st.success(
+                                f"會籍狀態建立成功: {result['startDate']} ~ {result['endDate']}"
+                            )
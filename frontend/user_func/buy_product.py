@@ -3,16 +3,19 @@
 """
 
 import streamlit as st
-import requests
-from utils.api import API_BASE_URL
+from utils.api import (
+    get_cached_member,
+    get_cached_products,
+    invalidate_member,
+    post_idempotent,
+)
 from typing import Optional
 
 
 def show_all_products() -> Optional[list]:
-    response = requests.get(f"{API_BASE_URL}/products/")
-    if response.status_code == 200:
-        # st.write(response.json())
-        all_products = response.json()
+    # 選單只需要編號、名稱與價格，不需要商品圖片
+    all_products = get_cached_products(fields="gsNo,pName,salePrice")
+    if all_products is not None:
         st.dataframe(all_products, width=500)
         return all_products
     else:
@@ -21,12 +24,10 @@ def show_all_products() -> Optional[list]:
 
 
 def search_member_by_phone_number(phone_number: str) -> Optional[dict]:
-    response = requests.get(f"{API_BASE_URL}/members/{phone_number}")
-    if response.status_code == 200:
-        return response.json()
-    else:
+    member = get_cached_member(phone_number)
+    if member is None:
         st.error("無法取得會員資料")
-        return None
+    return member
 
 
 def buy_product_page():
@@ -159,12 +160,12 @@ def buy_product_page():
 
                     st.write(transaction_data)
 
-                    response = requests.post(
-                        f"{API_BASE_URL}/transaction_records/", json=transaction_data
-                    )
+                    # 重新執行造成的重複送出只會建立一筆交易
+                    response = post_idempotent("/transaction_records/", transaction_data)
 
                     st.write(response.json())
                     if response.status_code == 200:
+                        invalidate_member(member["mContactNum"])
                         st.success("交易建立成功")
                     else:
                         st.error("交易建立失敗")
@@ -3,9 +3,8 @@
 """
 
 import streamlit as st
-import requests
 
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, invalidate_catalog
 
 
 def create_product_page():
@@ -25,8 +24,9 @@ def create_product_page():
                 "salePrice": salePrice,
             }
 
-            response = requests.post(f"{API_BASE_URL}/products/", json=new_product)
+            response = api_session().post(f"{API_BASE_URL}/products/", json=new_product)
             if response.status_code == 200:
+                invalidate_catalog()
                 st.success("商品創建成功")
             else:
                 st.error("商品創建失敗")
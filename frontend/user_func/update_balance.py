@@ -3,8 +3,7 @@
 """
 
 import streamlit as st
-import requests
-from utils.api import API_BASE_URL
+from utils.api import get_cached_member, invalidate_member, post_idempotent
 
 
 def update_balance_page():
@@ -21,9 +20,9 @@ def update_balance_page():
         - 選擇變動標的: 回饋點數、點數餘額
         - 新增或減少
         - 變動數量
-        - 變動原因 # 沒做這個表單
+        - 變動原因
 
-    4. 按下按鈕，更新會員點數餘額
+    4. 按下按鈕，以差額更新會員點數餘額 (後端寫入會員帳本)
     """
 
     st.title("變動管理")
@@ -31,9 +30,8 @@ def update_balance_page():
     # 1. 透過手機號碼，確認會員存在
     phone_number = st.text_input("請輸入會員手機號碼")
     if st.toggle("查詢"):
-        response = requests.get(f"{API_BASE_URL}/members/{phone_number}/")
-        if response.status_code == 200:
-            member = response.json()
+        member = get_cached_member(phone_number)
+        if member is not None:
             # st.write(member)
 
             info_to_show = {
@@ -58,6 +56,7 @@ def update_balance_page():
             with col2:
                 change_type = st.radio("新增或減少", ["新增", "減少"])
                 change_amount = st.number_input("變動數量 (金額)", value=0)
+                reason = st.text_input("變動原因")
 
             if change_type == "新增":
                 new_value = target_value + change_amount
@@ -67,26 +66,27 @@ def update_balance_page():
             st.write(f"新{target}值: {new_value}")
 
             if target == "回饋點數":
-                target_name = "mRewardPoints"
+                account = "reward_points"
             else:
-                target_name = "mBalance"
+                account = "balance"
 
             if st.button("更新"):
-                update_data = {
-                    f"{target_name}": new_value,
+                # 只送出差額，由後端原子更新，避免同時操作時覆蓋彼此的修改
+                ledger_data = {
+                    "account": account,
+                    "delta": change_amount if change_type == "新增" else -change_amount,
+                    "reason": reason or None,
                 }
-                response = requests.put(
-                    f"{API_BASE_URL}/members/{phone_number}/", json=update_data
-                )
+                response = post_idempotent(f"/members/{phone_number}/ledger/", ledger_data)
                 if response.status_code == 200:
+                    invalidate_member(phone_number)
                     st.success("更新成功")
                 else:
-                    st.error("更新失敗")
+                    st.error(f"更新失敗: {response.json().get('detail')}")
 
                 # 更新後，顯示會員資料
-                response = requests.get(f"{API_BASE_URL}/members/{phone_number}/")
-                if response.status_code == 200:
-                    member = response.json()
+                member = get_cached_member(phone_number)
+                if member is not None:
                     st.dataframe(member, width=500)
 
             st.divider()
@@ -1,11 +1,44 @@
 """API utils for frontend"""
 
+import time
+import uuid
+
 import requests
 import streamlit as st
 from typing import Dict, Optional, List
 
 API_BASE_URL = "http://localhost:8000"
 
+# 快取有效時間 (秒)
+CATALOG_CACHE_TTL = 300  # 商品、會籍方案
+MEMBER_CACHE_TTL = 60  # 會員資料、會籍狀態
+
+# 每位會員的快取版本號，寫入後遞增使舊的快取鍵失效
+_member_versions: Dict[str, int] = {}
+
+# 列表 API 上次返回的 ETag 與內容 {path: (etag, data)}
+_etag_cache: Dict[str, tuple] = {}
+
+# 連線失敗、伺服器暫時無法處理時，以相同的 Idempotency-Key 重送的次數
+POST_RETRIES = 2
+POST_RETRY_DELAY = 0.5
+
+
+# 限流
+# 所有櫃台都經由這台 Streamlit 伺服器呼叫後端，對後端來說 IP 都相同。
+# 每個工作階段（瀏覽器分頁）一個 X-Client-Id，後端以它區分呼叫者，
+# 一個櫃台在載入列表時，其他櫃台的列表查詢不會被限流。
+
+
+def api_session() -> requests.Session:
+    """取得目前工作階段的 requests.Session（帶 X-Client-Id）"""
+    session = st.session_state.get("api_session")
+    if session is None:
+        session = requests.Session()
+        session.headers["X-Client-Id"] = uuid.uuid4().hex
+        st.session_state["api_session"] = session
+    return session
+
 
 class APIError(Exception):
     pass
@@ -21,9 +54,36 @@ def safe_request(func):
     return wrapper
 
 
+def show_rate_limited(response: requests.Response) -> None:
+    """伺服器限流（429）時顯示幾秒後再試"""
+    retry_after = response.headers.get("Retry-After", "1")
+    st.error(f"請求過於頻繁，請 {retry_after} 秒後再試")
+
+
+def get_with_etag(path: str) -> requests.Response:
+    """GET 列表 API，帶上次的 ETag；資料沒有變更時伺服器返回 304，改用上次的內容
+
+    伺服器限流（429）時顯示錯誤，不以上次的內容代替。
+
+    Returns:
+        requests.Response: 304 且有上次的內容時 status_code 改為 200、內容為上次的內容
+    """
+    cached = _etag_cache.get(path)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = api_session().get(f"{API_BASE_URL}{path}", headers=headers)
+    if response.status_code == 304 and cached:
+        response.status_code = 200
+        response._content = cached[1]
+    elif response.status_code == 200 and "ETag" in response.headers:
+        _etag_cache[path] = (response.headers["ETag"], response.content)
+    elif response.status_code == 429:
+        show_rate_limited(response)
+    return response
+
+
 @safe_request
 def get_members() -> List[Dict]:
-    response = requests.get(f"{API_BASE_URL}/members")
+    response = get_with_etag("/members/")
     if response.status_code == 200:
         return response.json()
     raise APIError(f"Failed to get members: {response.status_code}")
@@ -31,8 +91,185 @@ def get_members() -> List[Dict]:
 
 @safe_request
 def create_member(data: Dict) -> bool:
-    response = requests.post(f"{API_BASE_URL}/members", json=data)
+    response = api_session().post(f"{API_BASE_URL}/members", json=data)
     return response.status_code == 200
 
 
+# 快取層
+# Streamlit 每次互動都會重新執行整個頁面，以下函式將讀取結果快取起來，
+# 寫入操作後再呼叫 invalidate_* 讓受影響的快取失效。
+# 請求失敗時會拋出例外，因此錯誤結果不會被快取。
+
+
+@st.cache_data(ttl=CATALOG_CACHE_TTL, show_spinner=False)
+def _get_catalog(path: str) -> List[Dict]:
+    response = get_with_etag(path)
+    if response.status_code == 200:
+        return response.json()
+    raise APIError(f"Failed to get {path}: {response.status_code}")
+
+
+@st.cache_data(ttl=MEMBER_CACHE_TTL, show_spinner=False)
+def _get_member_scoped(path: str, version: int) -> Dict:
+    response = api_session().get(f"{API_BASE_URL}{path}")
+    if response.status_code == 200:
+        return response.json()
+    raise APIError(f"Failed to get {path}: {response.status_code}")
+
+
+def _fetch_catalog(path: str) -> Optional[List[Dict]]:
+    try:
+        return _get_catalog(path)
+    except (APIError, requests.RequestException):
+        return None
+
+
+def _fetch_member_scoped(path: str, mContactNum: str) -> Optional[Dict]:
+    try:
+        return _get_member_scoped(path, _member_versions.get(mContactNum, 0))
+    except (APIError, requests.RequestException):
+        return None
+
+
+def get_cached_membership_plans() -> Optional[List[Dict]]:
+    """取得所有會籍方案 (快取)"""
+    return _fetch_catalog("/membership_plans/")
+
 
+def get_cached_products(fields: Optional[str] = None) -> Optional[List[Dict]]:
+    """取得所有商品 (快取)，fields 以逗號分隔，只取得需要的欄位"""
+    if fields:
+        return _fetch_catalog(f"/products/?fields={fields}")
+    return _fetch_catalog("/products/")
+
+
+def get_cached_member(mContactNum: str) -> Optional[Dict]:
+    """取得單一會員 (快取)，會員不存在時返回 None"""
+    return _fetch_member_scoped(f"/members/{mContactNum}/", mContactNum)
+
+
+def get_cached_membership_status(mContactNum: str) -> Optional[Dict]:
+    """取得會員有效會籍 (快取)，沒有有效會籍時返回 None"""
+    return _fetch_member_scoped(f"/membership_status/{mContactNum}/", mContactNum)
+
+
+def get_cached_member_profile(mContactNum: str) -> Optional[Dict]:
+    """取得會員總覽 (快取)：會員資料、有效會籍、照片、未結束打卡、最近交易"""
+    return _fetch_member_scoped(f"/members/{mContactNum}/profile", mContactNum)
+
+
+def invalidate_catalog() -> None:
+    """商品或會籍方案異動後，清除目錄快取"""
+    _get_catalog.clear()
+
+
+def invalidate_member(mContactNum: str) -> None:
+    """會員資料、會籍或交易異動後，清除該會員的快取"""
+    _member_versions[mContactNum] = _member_versions.get(mContactNum, 0) + 1
+
+
+# 增量同步
+# 第一次取得完整列表與當時的版本，之後只以 /changes/ 取得新增、修改、刪除的資料列，
+# 套用到保存在 session_state 中的副本。變更記錄已清除（410）時重新取得完整列表。
+
+
+@safe_request
+def get_synced_rows(table: str, path: str, key: str) -> List[Dict]:
+    """取得表格的本機副本並更新到最新
+
+    Args:
+        table: 表格名稱（/changes/ 的 tables）
+        path: 完整列表的 API，例如 /checkinrecord/
+        key: 主鍵欄位，例如 checkInNo
+    """
+    state_key = f"synced_{table}"
+    synced = st.session_state.get(state_key)
+
+    if synced is not None:
+        while True:
+            response = api_session().get(
+                f"{API_BASE_URL}/changes/",
+                params={"since": synced["version"], "tables": table},
+            )
+            if response.status_code == 410:
+                synced = None
+                break
+            if response.status_code == 429:
+                show_rate_limited(response)
+            if response.status_code != 200:
+                raise APIError(f"Failed to get changes: {response.status_code}")
+            feed = response.json()
+            for change in feed["changes"]:
+                # 分店的記錄不在完整列表中（編號只在同一個分店中唯一）
+                if change.get("branchId"):
+                    continue
+                if change["row"] is None:
+                    synced["rows"].pop(change["rowKey"], None)
+                else:
+                    synced["rows"][change["rowKey"]] = change["row"]
+            synced["version"] = feed["version"]
+            if not feed["hasMore"]:
+                break
+
+    if synced is None:
+        # 先取得版本再取得列表，兩者之間的變更下次會再套用一次
+        version = api_session().get(f"{API_BASE_URL}/changes/latest").json()["version"]
+        response = api_session().get(f"{API_BASE_URL}{path}")
+        if response.status_code == 429:
+            show_rate_limited(response)
+        if response.status_code != 200:
+            raise APIError(f"Failed to get {path}: {response.status_code}")
+        synced = {
+            "version": version,
+            "rows": {str(row[key]): row for row in response.json()},
+        }
+
+    st.session_state[state_key] = synced
+    return list(synced["rows"].values())
+
+
+# 重複送出
+# 交易、打卡、購買帶 Idempotency-Key 送出。每個表單一個 key，保存在 session_state，
+# 在伺服器返回結果之前（頁面重新執行、連線逾時重送）都沿用同一個 key，
+# 伺服器只執行第一次；伺服器返回結果後才換新的 key，下一次送出是新的操作。
+
+
+def idempotency_key(action: str) -> str:
+    """取得表單目前的 Idempotency-Key（第一次顯示表單時產生）"""
+    keys = st.session_state.setdefault("idempotency_keys", {})
+    if action not in keys:
+        keys[action] = uuid.uuid4().hex
+    return keys[action]
+
+
+def reset_idempotency_key(action: str) -> None:
+    """表單送出完成，下一次送出使用新的 key"""
+    st.session_state.setdefault("idempotency_keys", {}).pop(action, None)
+
+
+def post_idempotent(path: str, data: Dict, action: Optional[str] = None) -> requests.Response:
+    """以表單的 Idempotency-Key 送出 POST，連線失敗或 409 / 502 / 503 時以相同的 key 重送
+
+    伺服器返回結果後（成功或 4xx，兩者伺服器都會記錄）換新的 key；
+    連線失敗、409、5xx 時保留 key，再次送出時伺服器只會執行一次。
+
+    Args:
+        path: API 路徑，例如 /transaction_records/
+        data: 請求內容
+        action: 表單名稱（預設為 path），不同的表單各自一個 key
+    """
+    action = action or path
+    headers = {"Idempotency-Key": idempotency_key(action)}
+    for attempt in range(POST_RETRIES + 1):
+        try:
+            response = api_session().post(f"{API_BASE_URL}{path}", json=data, headers=headers)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == POST_RETRIES:
+                raise
+        else:
+            # 409：第一次的請求還在處理中
+            if response.status_code not in (409, 502, 503) or attempt == POST_RETRIES:
+                if response.status_code < 500 and response.status_code != 409:
+                    reset_idempotency_key(action)
+                return response
+        time.sleep(POST_RETRY_DELAY * (attempt + 1))
@@ -3,8 +3,7 @@
 """
 
 import streamlit as st
-import requests
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, APIError, get_synced_rows, post_idempotent
 import pandas as pd
 from datetime import datetime
 
@@ -39,14 +38,28 @@ def display_tab1_stats(df_filtered):
         st.warning("所選日期無打卡記錄")
 
 
+CHECKIN_DENY_MESSAGES = {
+    "member_not_found": "會員不存在",
+    "no_active_membership": "會員沒有有效會籍",
+    "already_checked_in": "已有未結束的打卡記錄",
+}
+
+
 def create_checkin_record(mContactNum: str) -> bool:
     """
     快速打卡
+
+    後端一次確認會員、有效會籍與未結束打卡，不允許入場時顯示原因
     """
     data = {"mContactNum": mContactNum}
-    response = requests.post(f"{API_BASE_URL}/checkinrecord/", json=data)
-    st.write(response.json())
-    return response.status_code == 200
+    response = post_idempotent("/checkinrecord/checkin/", data)
+    if response.status_code != 200:
+        return False
+
+    result = response.json()
+    if not result["admitted"]:
+        st.warning(CHECKIN_DENY_MESSAGES.get(result["reason"], result["reason"]))
+    return result["admitted"]
 
 
 def get_member_checkin_record(mContactNum: str):
@@ -55,7 +68,7 @@ def get_member_checkin_record(mContactNum: str):
     response = requests.get(f"{API_BASE_URL}/checkinrecord")
     """
     st.write("取得會員打卡記錄")
-    response = requests.get(f"{API_BASE_URL}/checkinrecord/{mContactNum}")
+    response = api_session().get(f"{API_BASE_URL}/checkinrecord/{mContactNum}")
 
     if response.status_code == 200:
         return response.json()
@@ -66,14 +79,13 @@ def get_member_checkin_record(mContactNum: str):
 def get_all_checkin_records():
     """
     取得所有打卡記錄
-    response = requests.get(f"{API_BASE_URL}/checkinrecord")
-    """
-    response = requests.get(f"{API_BASE_URL}/checkinrecord")
-
-    if response.status_code == 200:
-        return response.json()
 
-    return []
+    第一次取得完整列表，之後重新整理只取得變更的記錄
+    """
+    try:
+        return get_synced_rows("CheckInRecord", "/checkinrecord/", "checkInNo")
+    except APIError:
+        return []
 
 
 def update_member_checkin_record(mContactNum: str):
@@ -83,7 +95,7 @@ def update_member_checkin_record(mContactNum: str):
     """
     st.write("更新會員打卡記錄-出場")
 
-    response = requests.put(f"{API_BASE_URL}/checkinrecord/{mContactNum}")
+    response = api_session().put(f"{API_BASE_URL}/checkinrecord/{mContactNum}")
     st.write(response)
     if response.status_code == 200:
         st.success("出場打卡成功")
@@ -2,16 +2,15 @@
 
 import streamlit as st
 import pandas as pd
-import requests
 from datetime import datetime
 from typing import Optional
 
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, get_cached_member, get_with_etag, invalidate_member
 
 
 def view_all_members() -> Optional[pd.DataFrame]:
     """查看所有會員"""
-    response = requests.get(f"{API_BASE_URL}/members/")
+    response = get_with_etag("/members/")
     if response.status_code == 200:
         members = response.json()
         df = pd.DataFrame(members)
@@ -52,14 +51,30 @@ def create_member() -> bool:
                 "mRewardPoints": reward_points,
             }
 
-            response = requests.post(f"{API_BASE_URL}/members", json=data)
+            response = api_session().post(f"{API_BASE_URL}/members", json=data)
             print(response.json())
+            if response.status_code == 200:
+                invalidate_member(contact_number)
 
             return response.status_code == 200
 
         return False
 
 
+def find_members(query: str) -> Optional[pd.DataFrame]:
+    """以電話（前幾碼或其中幾碼）、姓名或電子郵件搜尋會員
+
+    由後端搜尋並只回傳前幾筆，不需要下載所有會員
+    """
+    if query.strip() == "":
+        return None
+
+    response = api_session().get(f"{API_BASE_URL}/members/search/", params={"q": query})
+    if response.status_code == 200:
+        return pd.DataFrame(response.json())
+    return None
+
+
 def search_member(mContactNum: str) -> Optional[dict]:
     """搜尋會員
 
@@ -73,12 +88,7 @@ def search_member(mContactNum: str) -> Optional[dict]:
         st.warning("請輸入會員手機號碼")
         return
 
-    response = requests.get(f"{API_BASE_URL}/members/{mContactNum}")
-    if response.status_code == 200:
-        member = response.json()
-        return member
-    else:
-        return
+    return get_cached_member(mContactNum)
 
 
 def update_member(search_term: str):
@@ -125,10 +135,11 @@ def update_member(search_term: str):
                         "mRewardPoints": reward_points,
                     }
 
-                    response = requests.put(
+                    response = api_session().put(
                         f"{API_BASE_URL}/members/{search_term}", json=data
                     )
                     if response.status_code == 200:
+                        invalidate_member(search_term)
                         st.success("會員資料更新成功")
                         st.success("重新整理頁面")
                     else:
@@ -164,11 +175,15 @@ def member_management_page():
     with tab3:
         """收尋會員"""
         search_term = st.text_input(
-            "請輸入會員聯絡電話", key="search_member_search_term"
+            "請輸入會員電話、姓名或電子郵件", key="search_member_search_term"
         )
-        member = search_member(search_term)
-        if member is not None:
-            st.dataframe(member, column_config=None, width=400)
+        members = find_members(search_term)
+        if members is None:
+            st.info("電話可以只輸入前幾碼或其中幾碼")
+        elif members.empty:
+            st.warning("找不到符合的會員")
+        else:
+            st.dataframe(members, column_config=None)
 
     with tab4:
         """更新會員基本資料"""
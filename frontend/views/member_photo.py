@@ -3,11 +3,10 @@
 """
 
 import streamlit as st
-import requests
 import base64
 import io
 from PIL import Image
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session
 from typing import Optional
 from views.member import search_member
 
@@ -90,7 +89,7 @@ def create_member_photo_instance(bytes_data, mContactNum) -> bool:
 
     files = {"photo": bytes_data}
     data = {"mContactNum": mContactNum}
-    response = requests.post(f"{API_BASE_URL}/member_photo/", files=files, data=data)
+    response = api_session().post(f"{API_BASE_URL}/member_photo/", files=files, data=data)
 
     return response.status_code == 200
 
@@ -100,7 +99,7 @@ def get_member_current_photo(mContactNum):
     取得會員現有照片
 
     """
-    response = requests.get(f"{API_BASE_URL}/member_photo/{mContactNum}")
+    response = api_session().get(f"{API_BASE_URL}/member_photo/{mContactNum}")
     if response.status_code == 200:
         return response.json()
     else:
@@ -3,10 +3,9 @@
 """
 
 import streamlit as st
-import requests
 import pandas as pd
 from typing import Optional, List, TypedDict
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, get_cached_membership_plans, invalidate_catalog
 
 
 class MembershipPlan(TypedDict):
@@ -18,12 +17,10 @@ class MembershipPlan(TypedDict):
 
 
 def get_all_membership_plans() -> Optional[List[MembershipPlan]]:
-    response = requests.get(f"{API_BASE_URL}/membership_plans/")
-    if response.status_code == 200:
-        return response.json()
-    else:
+    membership_plans = get_cached_membership_plans()
+    if membership_plans is None:
         st.error("無法取得會籍方案資料")
-        return None
+    return membership_plans
 
 
 def create_membership_plan() -> None:
@@ -75,11 +72,12 @@ def create_membership_plan() -> None:
         if is_valid and st.button("新增", key="create_button"):
             with st.spinner("新增會籍方案中..."):
 
-                response = requests.post(
+                response = api_session().post(
                     f"{API_BASE_URL}/membership_plans/", json=new_membership_plan
                 )
 
                 if response.status_code == 200:
+                    invalidate_catalog()
                     st.success("新增會籍方案成功")
 
                     # show creation details
@@ -159,11 +157,12 @@ def update_membership_plan() -> None:
             st.write(
                 f"更新會籍方案: 會籍編號{gsNo_to_update}, 售價{updated_salePrice}, 方案類型{updated_planType}, 方案期限{updated_planDuration}"
             )
-            response = requests.put(
+            response = api_session().put(
                 f"{API_BASE_URL}/membership_plans/{gsNo_to_update}",
                 json=new_membership_plan,
             )
             if response.status_code == 200:
+                invalidate_catalog()
                 st.success("更新會籍方案成功")
                 st.write("請重新整理頁面")
             else:
@@ -227,13 +226,14 @@ def delete_membership_plan() -> None:
         if st.button("確定刪除", key="confirm_delete_button"):
 
             with st.spinner("刪除會籍方案中..."):
-                response = requests.delete(
+                response = api_session().delete(
                     f"{API_BASE_URL}/membership_plans/{gsNo_to_delete}"
                 )
 
             st.write(response.json())
 
             if response.status_code == 200:
+                invalidate_catalog()
                 st.success("刪除會籍方案成功")
                 st.info("請重新整理頁面以查看刪除的會籍方案")
 
@@ -7,7 +7,13 @@ import pandas as pd
 import requests
 from views.member import search_member
 
-from utils.api import API_BASE_URL
+from utils.api import (
+    API_BASE_URL,
+    api_session,
+    get_cached_membership_status,
+    invalidate_member,
+    post_idempotent,
+)
 from typing import Optional, TypedDict
 
 
@@ -35,23 +41,51 @@ def create_membership_status(membership_data: dict) -> bool:
         bool: True if successful, False if failed
     """
     try:
-        response = requests.post(
+        response = api_session().post(
             f"{API_BASE_URL}/membership_status/", json=membership_data
         )
         response.raise_for_status()  # Raises an HTTPError for bad responses
+        invalidate_member(membership_data["mContactNum"])
         return response.status_code == 200
     except requests.exceptions.RequestException as e:
         return False
 
 
+def purchase_membership_plan(purchase_data: dict) -> Optional[dict]:
+    """購買會籍方案
+
+    交易記錄、會籍狀態與點數扣除由後端在同一個交易中完成
+
+    Args:
+        purchase_data (dict): The purchase data
+            {
+                "mContactNum": str,
+                "gsNo": str,
+                "paymentMethod": str,
+                "startDate": str,
+            }
+
+    Returns:
+        Optional[dict]: 購買結果 (包含 tNo, sId, startDate, endDate)，失敗時返回 None
+    """
+    try:
+        response = post_idempotent("/membership_status/purchase/", purchase_data)
+        if response.status_code != 200:
+            st.error(f"會籍方案購買失敗: {response.json().get('detail')}")
+            return None
+        invalidate_member(purchase_data["mContactNum"])
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        st.error(f"會籍方案購買失敗: {e}")
+        return None
+
+
 def get_membership_status(mContactNum: str) -> Optional[MembershipStatus]:
     """取得會籍狀態"""
-    response = requests.get(f"{API_BASE_URL}/membership_status/{mContactNum}")
-    if response.status_code == 200:
-        return response.json()
-    else:
+    membership_status = get_cached_membership_status(mContactNum)
+    if membership_status is None:
         st.warning("該會員目前沒有, 有效會籍")
-        return None
+    return membership_status
 
 
 def membership_status_page():
@@ -3,16 +3,13 @@
 """
 
 import streamlit as st
-import requests
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, get_cached_products, invalidate_catalog
 from user_func.create_product import create_product_page
 
 
 def show_all_products():
-    response = requests.get(f"{API_BASE_URL}/products/")
-    if response.status_code == 200:
-        # st.write(response.json())
-        all_products = response.json()
+    all_products = get_cached_products()
+    if all_products is not None:
         st.dataframe(all_products, width=500)
     else:
         st.error("無法取得商品資料")
@@ -30,7 +27,9 @@ def update_product():
             "pName": pName,
             "salePrice": salePrice,
         }
-        response = requests.put(f"{API_BASE_URL}/products/{gsNo}/", json=update_data)
+        response = api_session().put(f"{API_BASE_URL}/products/{gsNo}/", json=update_data)
+        if response.status_code == 200:
+            invalidate_catalog()
         st.write(response.json())
 
 
@@ -3,15 +3,14 @@
 """
 
 import streamlit as st
-import requests
-from utils.api import API_BASE_URL
+from utils.api import API_BASE_URL, api_session, invalidate_member, post_idempotent
 
 
 def create_transaction(transaction_data: dict) -> bool:
     try:
-        response = requests.post(
-            f"{API_BASE_URL}/transaction_records/", json=transaction_data
-        )
+        response = post_idempotent("/transaction_records/", transaction_data)
+        if response.status_code == 200:
+            invalidate_member(transaction_data["mContactNum"])
         return response.status_code == 200
     except Exception as e:
         st.error(f"無法建立交易紀錄: {e}")
@@ -19,7 +18,7 @@ def create_transaction(transaction_data: dict) -> bool:
 
 
 def get_transaction_records():
-    response = requests.get(f"{API_BASE_URL}/transaction_records/")
+    response = api_session().get(f"{API_BASE_URL}/transaction_records/")
     if response.status_code == 200:
         return response.json()
     else:
@@ -32,7 +31,7 @@ def get_transaction_of_member(member_id: int):
     # 確認會員手機存在
 
     # 如果會員存在，取得交易紀錄
-    response = requests.get(f"{API_BASE_URL}/transaction_records/{member_id}")
+    response = api_session().get(f"{API_BASE_URL}/transaction_records/{member_id}")
     if response.status_code == 200:
         return response.json()
     else: